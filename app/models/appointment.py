@@ -2,14 +2,28 @@
 Appointment model class for Hospital Management System
 """
 
+from app.utils.enums import APPOINTMENT_STATUS
+
+# Length of an appointment when none is given, in minutes
+DEFAULT_DURATION = 30
+
+# Longest appointment, in minutes, so an overlap check only has to look at
+# appointments starting up to this long before the new one
+MAX_DURATION = 24 * 60
+
 class Appointment:
+    __slots__ = ('appointment_id', 'patient_id', 'doctor_id', 'appointment_date', 'status',
+                 'duration_minutes')
+
     def __init__(self, appointment_id=None, patient_id=None, doctor_id=None, 
-                 appointment_date=None, status="Scheduled"):
+                 appointment_date=None, status="Scheduled", duration_minutes=DEFAULT_DURATION):
         self.appointment_id = appointment_id
         self.patient_id = patient_id
         self.doctor_id = doctor_id
         self.appointment_date = appointment_date
         self.status = status
+        # Rows stored before durations existed have none
+        self.duration_minutes = DEFAULT_DURATION if duration_minutes is None else duration_minutes
     
     def to_dict(self):
         """Convert appointment object to dictionary"""
@@ -18,7 +32,8 @@ class Appointment:
             'patient_id': self.patient_id,
             'doctor_id': self.doctor_id,
             'appointment_date': self.appointment_date,
-            'status': self.status
+            'status': self.status,
+            'duration_minutes': self.duration_minutes
         }
     
     @classmethod
@@ -29,13 +44,14 @@ class Appointment:
             patient_id=data.get('patient_id'),
             doctor_id=data.get('doctor_id'),
             appointment_date=data.get('appointment_date'),
-            status=data.get('status', 'Scheduled')
+            status=data.get('status', 'Scheduled'),
+            duration_minutes=data.get('duration_minutes')
         )
     
     def validate(self):
         """Validate appointment data"""
         if not self.appointment_date:
             return False, "Appointment date is required"
-        if self.status not in ['Scheduled', 'Completed', 'Cancelled']:
+        if self.status not in APPOINTMENT_STATUS.known:
             return False, "Invalid status"
         return True, "Valid"
\ No newline at end of file
@@ -3,6 +3,8 @@ Doctor model class for Hospital Management System
 """
 
 class Doctor:
+    __slots__ = ('doctor_id', 'name', 'specialization', 'contact', 'email')
+
     def __init__(self, doctor_id=None, name=None, specialization=None, contact=None, email=None):
         self.doctor_id = doctor_id
         self.name = name
@@ -0,0 +1,141 @@
+"""
+In-memory doctor directory for Hospital Management System
+Holds every doctor once, with hash indexes by id, specialization and
+email and a sorted name index, so the booking and billing forms can list
+doctors of a specialization or complete a typed name without a query.
+DoctorService keeps the shared directory in step with its writes
+"""
+
+from bisect import bisect_left, insort
+
+from app.models.doctor import Doctor
+from app.utils.cache import SnapshotIndex
+from app.utils.enums import SPECIALIZATION
+
+
+def _copy(doctor):
+    return Doctor(doctor.doctor_id, doctor.name, doctor.specialization, doctor.contact, doctor.email)
+
+
+def _email_key(email):
+    return email.strip().lower() if email else None
+
+
+class DoctorDirectory(SnapshotIndex):
+    """
+    Indexed set of doctors.
+
+    Lookups return copies, so callers may edit what they get back. Until
+    load() or ensure_loaded() has run the directory is empty and ignores
+    put() and remove().
+    """
+
+    def __init__(self, doctors=None):
+        super().__init__()
+        if doctors is not None:
+            self.load(doctors)
+
+    def _reset(self):
+        self._by_id = {}
+        self._by_specialization = {}    # specialization -> {doctor_id: None}
+        self._by_email = {}             # lowercased email -> doctor_id
+        self._names = []                # sorted (lowercased name, doctor_id)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, doctor_id):
+        return doctor_id in self._by_id
+
+    # -- maintenance --------------------------------------------------------
+
+    def _fill(self, doctors):
+        """Add Doctor objects or dictionaries"""
+        for doctor in doctors:
+            if isinstance(doctor, dict):
+                doctor = Doctor.from_dict(doctor)
+            self._add(_copy(doctor))
+
+    def put(self, doctor):
+        """Add a doctor or replace the entry with the same doctor_id"""
+        with self._lock:
+            if self._changed():
+                self._discard(doctor.doctor_id)
+                self._add(_copy(doctor))
+
+    def remove(self, doctor_id):
+        """Drop a doctor; returns False if it was not listed"""
+        with self._lock:
+            self._changed()
+            return self._discard(doctor_id) is not None
+
+    def _add(self, doctor):
+        doctor_id = doctor.doctor_id
+        doctor.specialization = SPECIALIZATION.shared[doctor.specialization]
+        self._by_id[doctor_id] = doctor
+        self._by_specialization.setdefault(doctor.specialization, {})[doctor_id] = None
+        email = _email_key(doctor.email)
+        if email is not None:
+            self._by_email[email] = doctor_id
+        insort(self._names, ((doctor.name or '').lower(), doctor_id))
+
+    def _discard(self, doctor_id):
+        doctor = self._by_id.pop(doctor_id, None)
+        if doctor is None:
+            return None
+        members = self._by_specialization[doctor.specialization]
+        del members[doctor_id]
+        if not members:
+            del self._by_specialization[doctor.specialization]
+        email = _email_key(doctor.email)
+        if self._by_email.get(email) == doctor_id:
+            del self._by_email[email]
+        key = ((doctor.name or '').lower(), doctor_id)
+        del self._names[bisect_left(self._names, key)]
+        return doctor
+
+    # -- queries ------------------------------------------------------------
+
+    def get(self, doctor_id):
+        """Return the doctor with doctor_id, or None"""
+        doctor = self._by_id.get(doctor_id)
+        return None if doctor is None else _copy(doctor)
+
+    def by_email(self, email):
+        """Return the doctor with this email (case-insensitive), or None"""
+        with self._lock:
+            doctor_id = self._by_email.get(_email_key(email))
+            return None if doctor_id is None else self.get(doctor_id)
+
+    def by_specialization(self, specialization):
+        """Return the doctors of a specialization, ordered by name"""
+        with self._lock:
+            doctors = [self._by_id[doctor_id] for doctor_id in self._by_specialization.get(specialization, ())]
+        doctors.sort(key=lambda doctor: ((doctor.name or '').lower(), doctor.doctor_id))
+        return [_copy(doctor) for doctor in doctors]
+
+    def specializations(self):
+        """Return {specialization: number of doctors}, ordered by specialization"""
+        with self._lock:
+            counts = {specialization: len(members)
+                      for specialization, members in self._by_specialization.items()}
+        return dict(sorted(counts.items(), key=lambda item: (item[0] is None, item[0] or '')))
+
+    def name_prefix(self, prefix, limit=None):
+        """Return doctors whose name starts with prefix, ignoring case, ordered by name"""
+        needle = prefix.lower()
+        with self._lock:
+            names = self._names
+            start = bisect_left(names, (needle,))
+            found = []
+            for index in range(start, len(names)):
+                name, doctor_id = names[index]
+                if not name.startswith(needle) or (limit is not None and len(found) >= limit):
+                    break
+                found.append(self._by_id[doctor_id])
+        return [_copy(doctor) for doctor in found]
+
+    def all(self):
+        """Return every doctor, ordered by name"""
+        with self._lock:
+            return [_copy(self._by_id[doctor_id]) for _, doctor_id in self._names]
@@ -3,6 +3,8 @@ Medical Record model class for Hospital Management System
 """
 
 class MedicalRecord:
+    __slots__ = ('record_id', 'patient_id', 'doctor_id', 'diagnosis', 'prescription', 'visit_date')
+
     def __init__(self, record_id=None, patient_id=None, doctor_id=None, 
                  diagnosis=None, prescription=None, visit_date=None):
         self.record_id = record_id
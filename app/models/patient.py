@@ -3,6 +3,8 @@ Patient model class for Hospital Management System
 """
 
 class Patient:
+    __slots__ = ('patient_id', 'name', 'dob', 'gender', 'contact', 'address')
+
     def __init__(self, patient_id=None, name=None, dob=None, gender=None, contact=None, address=None):
         self.patient_id = patient_id
         self.name = name
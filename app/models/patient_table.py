@@ -0,0 +1,361 @@
+"""
+Columnar, array-backed patient store for Hospital Management System
+Keeps a snapshot of the whole patient table in a few compact buffers
+instead of one Patient object per row: ids and birth dates in typed
+arrays, gender as its GENDER code in one byte per row and the text
+columns packed into UTF-8 buffers with offsets. Sorted permutations of
+birth dates and lowercased names turn age bands and name prefixes into
+binary searches. Filters return byte masks that combine with & and |
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import date
+from itertools import compress, repeat
+
+from app.models.patient import Patient
+from app.utils.enums import GENDER
+
+# Stored birth year byte: 0 means unknown, otherwise year - _YEAR_BASE
+_YEAR_BASE = 1880
+_NO_DATE = -1
+
+
+def _parse_date(value):
+    """Return the proleptic ordinal of a YYYY-MM-DD string or date, or _NO_DATE"""
+    if not value:
+        return _NO_DATE
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return _NO_DATE
+
+
+def _years_before(day, years):
+    """Return the date years before day, moving 29 February to 28 February"""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+class PackedStrings:
+    """Immutable column of optional strings packed into one UTF-8 buffer"""
+
+    def __init__(self, values):
+        pieces = []
+        offsets = array('q', [0])
+        nulls = bytearray()
+        end = 0
+        for value in values:
+            if value is None:
+                nulls.append(1)
+            else:
+                encoded = str(value).encode('utf-8')
+                pieces.append(encoded)
+                end += len(encoded)
+                nulls.append(0)
+            offsets.append(end)
+        self.data = b''.join(pieces)
+        self.offsets = offsets
+        self.nulls = bytes(nulls)
+
+    def __len__(self):
+        return len(self.nulls)
+
+    def __getitem__(self, index):
+        if self.nulls[index]:
+            return None
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def raw(self, index):
+        """Return the UTF-8 bytes of a value without decoding ('' for NULL)"""
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    @property
+    def nbytes(self):
+        return len(self.data) + len(self.nulls) + self.offsets.itemsize * len(self.offsets)
+
+
+def _set_rows(mask, rows):
+    """Set mask[row] = 1 for every row, iterating in C"""
+    deque(map(mask.__setitem__, rows, repeat(1)), maxlen=0)
+
+
+class _RawKeys:
+    """Sequence view of a PackedStrings column as bytes, for bisect"""
+
+    __slots__ = ('column',)
+
+    def __init__(self, column):
+        self.column = column
+
+    def __len__(self):
+        return len(self.column)
+
+    def __getitem__(self, index):
+        return self.column.raw(index)
+
+
+class PatientRow:
+    """Lazy, read-only view of one row of a PatientTable"""
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def patient_id(self):
+        return self.table.ids[self.index]
+
+    @property
+    def name(self):
+        return self.table.names[self.index]
+
+    @property
+    def dob(self):
+        return self.table.dob_at(self.index)
+
+    @property
+    def gender(self):
+        return self.table.gender_at(self.index)
+
+    @property
+    def contact(self):
+        return self.table.contacts[self.index]
+
+    @property
+    def address(self):
+        return self.table.addresses[self.index]
+
+    def to_dict(self):
+        """Convert the row to a dictionary like Patient.to_dict"""
+        return {
+            'patient_id': self.patient_id,
+            'name': self.name,
+            'dob': self.dob,
+            'gender': self.gender,
+            'contact': self.contact,
+            'address': self.address
+        }
+
+    def to_patient(self):
+        """Materialize the row as a Patient object"""
+        return Patient.from_dict(self.to_dict())
+
+
+class PatientTable:
+    """
+    Columnar snapshot of patients.
+
+    Build it with from_patients() or load(); masks from the filter methods
+    are bytes with one 0/1 byte per row, so they combine with and_masks /
+    or_masks and turn into rows with select()
+    """
+
+    def __init__(self, patients=()):
+        ids = array('q')
+        dobs = array('i')
+        years = bytearray()
+        genders = bytearray()
+        names, contacts, addresses = [], [], []
+        for patient in patients:
+            if isinstance(patient, dict):
+                patient = Patient.from_dict(patient)
+            ids.append(patient.patient_id or 0)
+            ordinal = _parse_date(patient.dob)
+            dobs.append(ordinal)
+            year = date.fromordinal(ordinal).year - _YEAR_BASE if ordinal != _NO_DATE else 0
+            years.append(year if 0 < year < 256 else 0)
+            genders.append(GENDER.code(patient.gender))
+            names.append(patient.name)
+            contacts.append(patient.contact)
+            addresses.append(patient.address)
+
+        self.ids = ids
+        self.dobs = dobs
+        self.birth_years = bytes(years)
+        self.genders = bytes(genders)
+        self.gender_values = GENDER.values
+        self.names = PackedStrings(names)
+        self.contacts = PackedStrings(contacts)
+        self.addresses = PackedStrings(addresses)
+        self._ids_sorted = all(a < b for a, b in zip(ids, ids[1:]))
+        order = sorted(range(len(dobs)), key=dobs.__getitem__)
+        self._dob_order = array('i', order)
+        self._dob_sorted = array('i', (dobs[index] for index in order))
+        self._build_name_search(names)
+
+    @classmethod
+    def from_patients(cls, patients):
+        """Build a table from Patient objects or patient dictionaries"""
+        return cls(patients)
+
+    @classmethod
+    def load(cls, service=None, batch_size=5000):
+        """Build a table by streaming every patient from PatientService"""
+        if service is None:
+            from app.services.patient_service import PatientService
+            service = PatientService()
+        return cls(service.iter_patients(batch_size=batch_size))
+
+    def _build_name_search(self, names):
+        # Lowercased names in sorted order plus the row each one came from;
+        # a prefix is then one contiguous run found by binary search
+        lowered = [(name or '').lower() for name in names]
+        order = sorted(range(len(lowered)), key=lowered.__getitem__)
+        self._name_order = array('i', order)
+        self._sorted_names = PackedStrings(lowered[index] for index in order)
+
+    # -- access -------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError("Patient row out of range")
+        return PatientRow(self, index)
+
+    def __iter__(self):
+        return (PatientRow(self, index) for index in range(len(self.ids)))
+
+    def dob_at(self, index):
+        ordinal = self.dobs[index]
+        return None if ordinal == _NO_DATE else date.fromordinal(ordinal).isoformat()
+
+    def gender_at(self, index):
+        return self.gender_values[self.genders[index]]
+
+    def row_of(self, patient_id):
+        """Return the row index holding patient_id, or None"""
+        ids = self.ids
+        if self._ids_sorted:
+            index = bisect_left(ids, patient_id)
+            return index if index < len(ids) and ids[index] == patient_id else None
+        try:
+            return ids.index(patient_id)
+        except ValueError:
+            return None
+
+    def get(self, patient_id):
+        """Return a lazy view of the patient with patient_id, or None"""
+        index = self.row_of(patient_id)
+        return None if index is None else PatientRow(self, index)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the column buffers"""
+        return (self.ids.itemsize * len(self.ids) + self.dobs.itemsize * len(self.dobs)
+                + len(self.birth_years) + len(self.genders)
+                + self.names.nbytes + self.contacts.nbytes + self.addresses.nbytes
+                + self._name_order.itemsize * len(self._name_order) + self._sorted_names.nbytes
+                + self._dob_order.itemsize * len(self._dob_order)
+                + self._dob_sorted.itemsize * len(self._dob_sorted))
+
+    # -- filters ------------------------------------------------------------
+
+    def all_rows(self):
+        return b'\x01' * len(self.ids)
+
+    def gender_mask(self, *values):
+        """Mask of rows whose gender is one of values"""
+        table = bytearray(256)
+        for code in GENDER.codes(*values):
+            if code < 256:
+                table[code] = 1
+        return self.genders.translate(table)
+
+    def birth_year_mask(self, first, last):
+        """Mask of rows born in the years first..last inclusive"""
+        table = bytearray(256)
+        for year in range(max(first - _YEAR_BASE, 1), min(last - _YEAR_BASE, 255) + 1):
+            table[year] = 1
+        return self.birth_years.translate(table)
+
+    def dob_mask(self, earliest=None, latest=None):
+        """Mask of rows with a known birth date in [earliest, latest]"""
+        earliest = date.min if earliest is None else earliest
+        latest = date.max if latest is None else latest
+        if earliest > latest:
+            return bytes(len(self.ids))
+        # Whole years inside the range are selected by a byte translation;
+        # rows born in the two boundary years come from the sorted birth dates
+        mask = bytearray(self.birth_year_mask(earliest.year + 1, latest.year - 1))
+        for year in {earliest.year, latest.year}:
+            low = max(earliest, date(year, 1, 1)).toordinal()
+            high = min(latest, date(year, 12, 31)).toordinal()
+            start = bisect_left(self._dob_sorted, low)
+            end = bisect_right(self._dob_sorted, high, start)
+            _set_rows(mask, self._dob_order[start:end])
+        return bytes(mask)
+
+    def age_mask(self, min_age=None, max_age=None, today=None):
+        """Mask of rows aged min_age..max_age (inclusive) on today"""
+        today = today or date.today()
+        latest = _years_before(today, min_age) if min_age is not None else today
+        earliest = None
+        if max_age is not None:
+            earliest = date.fromordinal(_years_before(today, max_age + 1).toordinal() + 1)
+        return self.dob_mask(earliest, latest)
+
+    def name_prefix_mask(self, prefix):
+        """Mask of rows whose name starts with prefix, ignoring case"""
+        mask = bytearray(len(self.ids))
+        _set_rows(mask, self.name_prefix_rows(prefix))
+        return bytes(mask)
+
+    def name_prefix_rows(self, prefix):
+        """Row indexes of names starting with prefix, ignoring case, in name order"""
+        keys = _RawKeys(self._sorted_names)
+        needle = prefix.lower().encode('utf-8')
+        # No UTF-8 sequence contains 0xff, so it sorts after every continuation
+        low = bisect_left(keys, needle)
+        high = bisect_left(keys, needle + b'\xff', low)
+        return self._name_order[low:high]
+
+    @staticmethod
+    def and_masks(*masks):
+        """Intersect masks"""
+        result = int.from_bytes(masks[0], 'little')
+        for mask in masks[1:]:
+            result &= int.from_bytes(mask, 'little')
+        return result.to_bytes(len(masks[0]), 'little')
+
+    @staticmethod
+    def or_masks(*masks):
+        """Union masks"""
+        result = 0
+        for mask in masks:
+            result |= int.from_bytes(mask, 'little')
+        return result.to_bytes(len(masks[0]), 'little')
+
+    def select(self, mask):
+        """Return the row indexes selected by mask"""
+        return array('q', compress(range(len(mask)), mask))
+
+    def filter(self, gender=None, min_age=None, max_age=None, name_prefix=None, today=None):
+        """
+        Return lazy views of the rows matching every given condition
+        gender may be one value or a tuple of values
+        """
+        masks = []
+        if gender is not None:
+            masks.append(self.gender_mask(*(gender if isinstance(gender, tuple) else (gender,))))
+        if min_age is not None or max_age is not None:
+            masks.append(self.age_mask(min_age, max_age, today))
+        if name_prefix:
+            masks.append(self.name_prefix_mask(name_prefix))
+        mask = self.and_masks(*masks) if masks else self.all_rows()
+        return [PatientRow(self, index) for index in self.select(mask)]
+
+    def count(self, mask):
+        """Return how many rows mask selects"""
+        return mask.count(1)
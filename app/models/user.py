@@ -3,6 +3,8 @@ User model for authentication and authorization
 """
 
 class User:
+    __slots__ = ('user_id', 'username', 'password', 'role')
+
     def __init__(self, user_id=None, username=None, password=None, role=None):
         self.user_id = user_id
         self.username = username
@@ -0,0 +1,504 @@
+"""
+Appointment service class for Hospital Management System
+Handles booking, rescheduling, cancelling and listing appointments. A
+per-doctor interval index turns double-booking checks into a binary
+search instead of a query over the doctor's whole calendar, slot
+bitmaps answer availability questions across many doctors at once,
+batches of requests are spread over the doctors of a specialization and
+cancelled slots are offered to a priority waitlist
+"""
+
+import threading
+import weakref
+from datetime import datetime, timedelta
+
+from app.models.appointment import Appointment, DEFAULT_DURATION, MAX_DURATION
+from app.services.doctor_patient import DoctorService
+from app.utils import queries
+from app.utils.availability import SLOT_MINUTES, AvailabilityIndex, WorkingHours, slot_starts
+from app.utils.db import (DB_CONFIG, after_commit, create_connection, current_transaction,
+                          snapshot_max_age, transaction)
+from app.utils.enums import APPOINTMENT_STATUS
+from app.utils.intervals import IntervalIndex, from_minutes, parse_datetime, to_minutes
+from app.utils.row_mapper import RowMapper
+from app.utils.scheduling import AppointmentRequest, BatchScheduler
+from app.utils.waitlist import Waitlist
+
+# Builds Appointment objects from positional rows
+APPOINTMENT_ROWS = RowMapper(Appointment, encoded={'status': APPOINTMENT_STATUS})
+
+# doctor_id -> intervals of every appointment that is not cancelled;
+# loaded on first use and updated when this service's writes commit
+APPOINTMENT_CALENDAR = IntervalIndex()
+
+# The same appointments as booked 15-minute slots per doctor-day, against
+# each doctor's working hours; kept in step with APPOINTMENT_CALENDAR
+APPOINTMENT_SLOTS = AvailabilityIndex()
+
+# Patients waiting for a freed slot, per doctor and per specialization;
+# held in memory, like working hours
+APPOINTMENT_WAITLIST = Waitlist()
+
+# How appointment dates are stored, so they sort and compare as text
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Serializes check-then-write so two threads cannot take the same slot
+_BOOKING_LOCK = threading.RLock()
+
+# Bookings of open transactions, not in APPOINTMENT_CALENDAR until commit:
+# transaction -> {appointment_id: (doctor_id, start, end), or None once cancelled}
+_pending = weakref.WeakKeyDictionary()
+
+class AppointmentConflictError(ValueError):
+    """Raised when a booking overlaps an appointment the doctor already has"""
+
+    def __init__(self, doctor_id, conflicts):
+        listed = ', '.join(map(str, conflicts))
+        super().__init__(f"Doctor {doctor_id} is already booked at that time (appointment {listed})")
+        self.doctor_id = doctor_id
+        self.conflicts = conflicts
+
+class AppointmentService:
+    def __init__(self):
+        self.connection = create_connection()
+        self.doctor_service = None
+
+    def book_appointment(self, appointment):
+        """
+        Book an appointment, raising AppointmentConflictError if it overlaps
+        another appointment of the same doctor
+        APPOINTMENT_CALENDAR answers the check first; the appointments table
+        is then read again inside the write transaction, which catches
+        bookings made by other processes
+        """
+        if not isinstance(appointment, Appointment):
+            raise ValueError("Invalid appointment object")
+
+        valid, message = appointment.validate()
+        if not valid:
+            raise ValueError(message)
+        if appointment.patient_id is None or appointment.doctor_id is None:
+            raise ValueError("Patient and doctor are required")
+        start, end = self._interval(appointment.appointment_date, appointment.duration_minutes)
+        appointment.appointment_date = parse_datetime(appointment.appointment_date).strftime(DATE_FORMAT)
+
+        with _BOOKING_LOCK:
+            holds_time = appointment.status != 'Cancelled'
+            if holds_time:
+                self._check_free(appointment.doctor_id, start, end)
+            with transaction(immediate=True):
+                if holds_time:
+                    self._check_stored(appointment.doctor_id, start, end)
+                return self._insert(appointment, (appointment.doctor_id, start, end) if holds_time else None)
+
+    def schedule_requests(self, requests):
+        """
+        Book a batch of AppointmentRequests, each with the least loaded
+        doctor of its specialization who is free inside its window, most
+        urgent first. All bookings commit in one transaction, and each
+        placement is checked against the appointments table inside it, so a
+        time another process booked meanwhile leaves its request unscheduled.
+        Returns (appointments, unscheduled): the booked appointments in
+        request order and the requests no doctor had time for
+        """
+        requests = [request if isinstance(request, AppointmentRequest) else AppointmentRequest(*request)
+                    for request in requests]
+        prepared = []
+        for request in requests:
+            if request.patient_id is None or request.specialization is None:
+                raise ValueError("Patient and specialization are required")
+            duration = request.duration_minutes if request.duration_minutes is not None else DEFAULT_DURATION
+            self._slots(duration)
+            earliest, latest = to_minutes(request.earliest), to_minutes(request.latest)
+            if latest <= earliest:
+                raise ValueError("Request window must end after it starts")
+            prepared.append(request._replace(earliest=earliest, latest=latest, duration_minutes=duration))
+
+        appointments, unscheduled = [], []
+        with _BOOKING_LOCK:
+            held = [entry for entry in self._pending().values() if entry is not None]
+            scheduler = BatchScheduler(self._availability(), self._doctor_ids, held)
+            placed = scheduler.assign(prepared, lambda request: self._slots(request.duration_minutes))
+            with transaction(immediate=True):
+                for original, (request, doctor_id, start) in zip(requests, placed):
+                    if doctor_id is None or self._stored_conflicts(doctor_id, start,
+                                                                   start + request.duration_minutes):
+                        unscheduled.append(original)
+                        continue
+                    appointment = Appointment(
+                        patient_id=request.patient_id,
+                        doctor_id=doctor_id,
+                        appointment_date=from_minutes(start).strftime(DATE_FORMAT),
+                        duration_minutes=request.duration_minutes
+                    )
+                    appointments.append(self._insert(
+                        appointment, (doctor_id, start, start + request.duration_minutes)))
+        return appointments, unscheduled
+
+    def _doctors(self):
+        if self.doctor_service is None:
+            self.doctor_service = DoctorService()
+        return self.doctor_service
+
+    def _doctor_ids(self, specialization):
+        return [d.doctor_id for d in self._doctors().get_doctors_by_specialization(specialization)]
+
+    def _insert(self, appointment, entry):
+        """Insert an appointment row; entry is the (doctor_id, start, end) it holds, or None"""
+        try:
+            cursor = self.connection.cursor()
+            query = """
+            INSERT INTO appointments (patient_id, doctor_id, appointment_date, status, duration_minutes)
+            VALUES (%s, %s, %s, %s, %s)
+            """
+            cursor.execute(query, (
+                appointment.patient_id,
+                appointment.doctor_id,
+                appointment.appointment_date,
+                appointment.status,
+                appointment.duration_minutes
+            ))
+            self.connection.commit()
+            appointment.appointment_id = cursor.lastrowid
+            if entry is not None:
+                self._publish(appointment.appointment_id, entry)
+            return appointment
+        except Exception as e:
+            self.connection.rollback()
+            raise Exception(f"Error booking appointment: {str(e)}")
+        finally:
+            cursor.close()
+
+    def reschedule_appointment(self, appointment_id, appointment_date, duration_minutes=None):
+        """
+        Move an appointment to a new time, keeping its duration unless given
+        Returns False if there is no such appointment; raises
+        AppointmentConflictError if the new time is taken. The row is read
+        inside the write transaction, so on the primary
+        """
+        with _BOOKING_LOCK, transaction(immediate=True):
+            appointment = self.get_appointment_by_id(appointment_id)
+            if appointment is None:
+                return False
+            if appointment.status == 'Cancelled':
+                raise ValueError("Cannot reschedule a cancelled appointment")
+            if duration_minutes is None:
+                duration_minutes = appointment.duration_minutes
+            start, end = self._interval(appointment_date, duration_minutes)
+            self._check_free(appointment.doctor_id, start, end, exclude=appointment_id)
+            self._check_stored(appointment.doctor_id, start, end, exclude=appointment_id)
+            try:
+                cursor = self.connection.cursor()
+                cursor.execute("""
+                    UPDATE appointments
+                    SET appointment_date = %s, duration_minutes = %s
+                    WHERE appointment_id = %s
+                """, (parse_datetime(appointment_date).strftime(DATE_FORMAT), duration_minutes,
+                      appointment_id))
+                self.connection.commit()
+                self._publish(appointment_id, (appointment.doctor_id, start, end))
+                return cursor.rowcount > 0
+            except Exception as e:
+                self.connection.rollback()
+                raise Exception(f"Error rescheduling appointment: {str(e)}")
+            finally:
+                cursor.close()
+
+    def cancel_appointment(self, appointment_id):
+        """
+        Cancel a scheduled appointment, freeing its time. Once the
+        cancellation commits, a future slot is offered to the waitlist; the
+        row is read in the same transaction as the update, so on the primary
+        """
+        with _BOOKING_LOCK, transaction(immediate=True):
+            appointment = self.get_appointment_by_id(appointment_id)
+            try:
+                cursor = self.connection.cursor()
+                cursor.execute("""
+                    UPDATE appointments SET status = 'Cancelled'
+                    WHERE appointment_id = %s AND status = 'Scheduled'
+                """, (appointment_id,))
+                self.connection.commit()
+                if cursor.rowcount > 0:
+                    self._publish(appointment_id, None)
+                    self._offer_slot(appointment)
+                return cursor.rowcount > 0
+            except Exception as e:
+                self.connection.rollback()
+                raise Exception(f"Error cancelling appointment: {str(e)}")
+            finally:
+                cursor.close()
+
+    def add_to_waitlist(self, patient_id, doctor_id=None, specialization=None, urgency=0):
+        """
+        Put a patient on the waitlist of a doctor, or of any doctor of a
+        specialization; a higher urgency is offered freed slots first
+        Returns the WaitlistEntry
+        """
+        if patient_id is None:
+            raise ValueError("Patient is required")
+        if not isinstance(urgency, int):
+            raise ValueError("Urgency must be a whole number")
+        return APPOINTMENT_WAITLIST.add(patient_id, doctor_id, specialization, urgency)
+
+    def remove_from_waitlist(self, entry_id):
+        """Take an entry off the waitlist; returns False if it is not waiting"""
+        return APPOINTMENT_WAITLIST.remove(entry_id)
+
+    def get_waitlist(self, doctor_id=None, specialization=None):
+        """Return the entries waiting for a doctor or a specialization, best first"""
+        return APPOINTMENT_WAITLIST.entries(doctor_id, specialization)
+
+    def get_slot_offers(self, patient_id=None):
+        """Return the open offers of freed slots, optionally of one patient"""
+        return APPOINTMENT_WAITLIST.offers(patient_id)
+
+    def accept_slot_offer(self, offer_id):
+        """
+        Book the offered slot for the waiting patient and return the
+        Appointment; None if the offer is not open. If the slot was taken
+        meanwhile the patient goes back on the list and
+        AppointmentConflictError is raised
+        """
+        with _BOOKING_LOCK:
+            offer = APPOINTMENT_WAITLIST.get_offer(offer_id)
+            if offer is None:
+                return None
+            appointment_date, duration_minutes = offer.slot
+            appointment = Appointment(patient_id=offer.entry.patient_id, doctor_id=offer.doctor_id,
+                                      appointment_date=appointment_date, duration_minutes=duration_minutes)
+            try:
+                self.book_appointment(appointment)
+            except AppointmentConflictError:
+                APPOINTMENT_WAITLIST.withdraw(offer_id)
+                raise
+            after_commit(lambda: APPOINTMENT_WAITLIST.accept(offer_id))
+            return appointment
+
+    def decline_slot_offer(self, offer_id):
+        """Pass an offered slot on to the next patient; returns their Offer, or None"""
+        return APPOINTMENT_WAITLIST.decline(offer_id)
+
+    def waitlist_stats(self):
+        """Return the waitlist counters: fill rate, time-to-backfill and sizes"""
+        return APPOINTMENT_WAITLIST.stats()
+
+    def _offer_slot(self, appointment):
+        """Offer a cancelled appointment's time to the waitlist once the cancellation commits"""
+        if appointment is None or parse_datetime(appointment.appointment_date) <= datetime.now():
+            return
+        doctor = self._doctors().get_doctor_directory().get(appointment.doctor_id)
+        specialization = doctor.specialization if doctor is not None else None
+        slot = (appointment.appointment_date, appointment.duration_minutes)
+        after_commit(lambda: APPOINTMENT_WAITLIST.offer(slot, appointment.doctor_id, specialization))
+
+    def find_conflicts(self, doctor_id, appointment_date, duration_minutes=DEFAULT_DURATION, exclude=None):
+        """Return the ids of the doctor's appointments overlapping the given time"""
+        start, end = self._interval(appointment_date, duration_minutes)
+        return self._conflicts(doctor_id, start, end, exclude)
+
+    def set_working_hours(self, doctor_id, hours):
+        """
+        Set a doctor's weekly hours as {weekday: [('HH:MM', 'HH:MM'), ...]}
+        (0 is Monday) or a WorkingHours; None restores Monday to Friday 09:00-17:00.
+        Hours are held in memory only
+        """
+        if hours is not None and not isinstance(hours, WorkingHours):
+            hours = WorkingHours(hours)
+        APPOINTMENT_SLOTS.set_hours(doctor_id, hours)
+
+    def get_free_slots(self, doctor_id, day, duration_minutes=SLOT_MINUTES):
+        """Return the times on day when the doctor is working and free for duration_minutes"""
+        day_number = to_minutes(day) // 1440
+        slots = self._slots(duration_minutes)
+        free = self._availability().free_slots(doctor_id, day_number, slots)
+        return [self._slot_time(day_number, slot) for slot in free]
+
+    def get_booked_slots(self, doctor_id, day):
+        """Return the start of every booked slot of the doctor on day"""
+        day_number = to_minutes(day) // 1440
+        booked = slot_starts(self._availability().booked_mask(doctor_id, day_number))
+        return [self._slot_time(day_number, slot) for slot in booked]
+
+    def find_first_free_slot(self, specialization=None, doctor_ids=None, start=None, days=14,
+                             duration_minutes=DEFAULT_DURATION):
+        """
+        Find the earliest time from start (default now) within days when a
+        doctor of the specialization, or of doctor_ids, is free for
+        duration_minutes. Returns (doctor_id, datetime) or None
+        """
+        if doctor_ids is None:
+            if specialization is None:
+                raise ValueError("Give a specialization or doctor ids")
+            doctor_ids = self._doctor_ids(specialization)
+        start_minute = to_minutes(start if start is not None else datetime.now())
+        first_day, minute = divmod(start_minute, 1440)
+        from_slot = -(-minute // SLOT_MINUTES)
+        found = self._availability().first_free(list(doctor_ids), first_day, days,
+                                                self._slots(duration_minutes), from_slot)
+        if found is None:
+            return None
+        doctor_id, day_number, slot = found
+        return doctor_id, self._slot_time(day_number, slot)
+
+    def _availability(self):
+        return APPOINTMENT_SLOTS.ensure_loaded(self._calendar_entries, max_age=snapshot_max_age())
+
+    @staticmethod
+    def _slots(duration_minutes):
+        if not isinstance(duration_minutes, int) or duration_minutes < 1:
+            raise ValueError("Duration must be a whole number of minutes")
+        if duration_minutes > MAX_DURATION:
+            raise ValueError("An appointment cannot last more than a day")
+        return -(-duration_minutes // SLOT_MINUTES)
+
+    @staticmethod
+    def _slot_time(day_number, slot):
+        return from_minutes(day_number * 1440 + slot * SLOT_MINUTES)
+
+    def get_appointment_by_id(self, appointment_id):
+        """Get appointment by ID"""
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT * FROM appointments WHERE appointment_id = %s", (appointment_id,))
+            return APPOINTMENT_ROWS.one(cursor, cursor.fetchone())
+        except Exception as e:
+            raise Exception(f"Error retrieving appointment: {str(e)}")
+        finally:
+            cursor.close()
+
+    def get_doctor_appointments(self, doctor_id, start=None, end=None):
+        """Get a doctor's appointments, optionally those in [start, end), by time"""
+        if start is None and end is None:
+            query = queries.DOCTOR_APPOINTMENTS
+            params = (doctor_id,)
+        else:
+            query = queries.DOCTOR_APPOINTMENTS_BETWEEN
+            params = (doctor_id, self._bound(start, '0001-01-01'), self._bound(end, '9999-12-31'))
+        return self._select(query, params)
+
+    def get_patient_appointments(self, patient_id):
+        """Get a patient's appointments, by time"""
+        return self._select(queries.PATIENT_APPOINTMENTS, (patient_id,))
+
+    def get_appointments_on(self, day):
+        """Get every appointment on one day, by time"""
+        first = parse_datetime(day).replace(hour=0, minute=0, second=0, microsecond=0)
+        return self._select(queries.APPOINTMENTS_BETWEEN, (first.strftime(DATE_FORMAT),
+                                                          (first + timedelta(days=1)).strftime(DATE_FORMAT)))
+
+    def _select(self, query, params):
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(query, params)
+            return APPOINTMENT_ROWS.all(cursor, cursor.fetchall())
+        except Exception as e:
+            raise Exception(f"Error retrieving appointments: {str(e)}")
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _bound(value, default):
+        return parse_datetime(value if value is not None else default).strftime(DATE_FORMAT)
+
+    @staticmethod
+    def _interval(appointment_date, duration_minutes):
+        """Return the [start, end) minutes of an appointment"""
+        if not isinstance(duration_minutes, int) or duration_minutes < 1:
+            raise ValueError("Duration must be a whole number of minutes")
+        if duration_minutes > MAX_DURATION:
+            raise ValueError("An appointment cannot last more than a day")
+        start = to_minutes(appointment_date)
+        return start, start + duration_minutes
+
+    def _calendar_entries(self):
+        """Yield (appointment_id, doctor_id, start, end) for appointments holding time"""
+        try:
+            cursor = self.connection.cursor(buffered=False)
+            cursor.execute("""
+                SELECT appointment_id, doctor_id, appointment_date, duration_minutes
+                FROM appointments WHERE status != 'Cancelled'
+            """)
+            while True:
+                rows = cursor.fetchmany(5000)
+                if not rows:
+                    break
+                for appointment_id, doctor_id, appointment_date, duration in rows:
+                    start = to_minutes(appointment_date)
+                    yield appointment_id, doctor_id, start, start + (duration or DEFAULT_DURATION)
+        except Exception as e:
+            raise Exception(f"Error retrieving appointments: {str(e)}")
+        finally:
+            cursor.close()
+
+    def _conflicts(self, doctor_id, start, end, exclude=None):
+        index = APPOINTMENT_CALENDAR.ensure_loaded(self._calendar_entries, max_age=snapshot_max_age())
+        pending = self._pending()
+        conflicts = [item_id for _, _, item_id in index.overlapping(doctor_id, start, end, exclude)
+                     if item_id not in pending]
+        # This transaction's own uncommitted bookings count too
+        for item_id, entry in pending.items():
+            if entry is not None and item_id != exclude and entry[0] == doctor_id \
+                    and entry[1] < end and entry[2] > start:
+                conflicts.append(item_id)
+        return sorted(conflicts)
+
+    def _check_free(self, doctor_id, start, end, exclude=None):
+        conflicts = self._conflicts(doctor_id, start, end, exclude)
+        if conflicts:
+            raise AppointmentConflictError(doctor_id, conflicts)
+
+    def _stored_conflicts(self, doctor_id, start, end, exclude=None):
+        """
+        Return the ids of the doctor's stored appointments overlapping
+        [start, end), read in the open transaction. On MySQL the doctor row
+        and the rows read stay locked until it ends, so another process
+        cannot book the doctor in between; SQLite holds its write lock from
+        BEGIN IMMEDIATE (see db.transaction)
+        """
+        query = queries.DOCTOR_BOOKINGS_BETWEEN
+        params = (doctor_id, from_minutes(start - MAX_DURATION).strftime(DATE_FORMAT),
+                  from_minutes(end).strftime(DATE_FORMAT))
+        cursor = self.connection.cursor()
+        try:
+            if DB_CONFIG['backend'] == 'mysql':
+                cursor.execute(queries.LOCK_DOCTOR, (doctor_id,))
+                cursor.fetchall()
+                query += " FOR UPDATE"
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        return sorted(appointment_id for appointment_id, appointment_date, duration in rows
+                      if appointment_id != exclude
+                      and to_minutes(appointment_date) + (duration or DEFAULT_DURATION) > start)
+
+    def _check_stored(self, doctor_id, start, end, exclude=None):
+        conflicts = self._stored_conflicts(doctor_id, start, end, exclude)
+        if conflicts:
+            raise AppointmentConflictError(doctor_id, conflicts)
+
+    @staticmethod
+    def _pending():
+        transaction = current_transaction()
+        return {} if transaction is None else _pending.get(transaction, {})
+
+    @staticmethod
+    def _publish(appointment_id, entry):
+        """Record a booked (doctor_id, start, end) or freed (None) slot, in the index once committed"""
+        transaction = current_transaction()
+        if transaction is not None:
+            _pending.setdefault(transaction, {})[appointment_id] = entry
+
+        def publish():
+            for index in (APPOINTMENT_CALENDAR, APPOINTMENT_SLOTS):
+                if entry is None:
+                    index.remove(appointment_id)
+                else:
+                    index.put(appointment_id, *entry)
+        after_commit(publish)
+
+    def close_connection(self):
+        """Close database connection"""
+        if self.connection and self.connection.is_connected():
+            self.connection.close()
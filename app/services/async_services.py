@@ -0,0 +1,184 @@
+"""
+asyncio counterparts of the patient, doctor, appointment and billing services
+Each call runs the synchronous service method on a worker thread, so the
+event loop never blocks on the database. A semaphore bounds how many calls
+are in flight, and every worker thread keeps its own service instance
+because a connection handle must not be shared between threads
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.db import DB_CONFIG
+from app.services.patient_service import PatientService, PAGE_ORDERINGS as PATIENT_ORDERINGS
+from app.services.doctor_patient import DoctorService, PAGE_ORDERINGS as DOCTOR_ORDERINGS
+from app.services.appointment_service import AppointmentService
+from app.services.billing_service import BillingService
+
+
+def _delegate(name):
+    """Build an async method that runs the service method called name on a worker"""
+    async def method(self, *args, **kwargs):
+        return await self._call(name, *args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+class _AsyncService:
+    """
+    Shared machinery for the async services.
+
+    max_concurrency: calls allowed in flight at once (default: pool size)
+    executor: concurrent.futures executor to run calls on; by default each
+        async service owns a thread pool of max_concurrency workers
+
+    Cancelling an awaiting task releases its slot at once. A call that has
+    not started yet is dropped; one already running on a worker finishes
+    its statement and commits or rolls back as usual, and its result is
+    discarded.
+    """
+
+    service_class = None
+
+    def __init__(self, max_concurrency=None, executor=None):
+        self.max_concurrency = max_concurrency or DB_CONFIG['pool_size']
+        if self.max_concurrency < 1:
+            raise ValueError("Concurrency must be at least 1")
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix=self.__class__.__name__,
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._local = threading.local()
+        self._services = []
+        self._services_lock = threading.Lock()
+
+    async def _call(self, name, *args, **kwargs):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(self._run, name, args, kwargs)
+            )
+
+    def _run(self, name, args, kwargs):
+        return getattr(self._service(), name)(*args, **kwargs)
+
+    def _service(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self.service_class()
+            with self._services_lock:
+                self._services.append(service)
+        return service
+
+    async def _iter_pages(self, page_method, batch_size, order_by=None):
+        """Yield rows page by page using a keyset-paginated service method"""
+        kwargs = {'limit': batch_size}
+        if order_by is not None:
+            kwargs['order_by'] = order_by
+        after = None
+        while True:
+            rows, after = await self._call(page_method, after=after, **kwargs)
+            for row in rows:
+                yield row
+            if after is None:
+                return
+
+    def close(self):
+        """Close the worker services' connections and the owned executor"""
+        if self._owns_executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._services_lock:
+            services, self._services = self._services, []
+        for service in services:
+            service.connection.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+        return False
+
+
+class AsyncPatientService(_AsyncService):
+    service_class = PatientService
+
+    add_patient = _delegate('add_patient')
+    add_patients = _delegate('add_patients')
+    get_all_patients = _delegate('get_all_patients')
+    get_patients_page = _delegate('get_patients_page')
+    get_patient_by_id = _delegate('get_patient_by_id')
+    update_patient = _delegate('update_patient')
+    delete_patient = _delegate('delete_patient')
+    search = _delegate('search')
+    find_duplicates = _delegate('find_duplicates')
+    check_duplicates = _delegate('check_duplicates')
+    find_merge_candidates = _delegate('find_merge_candidates')
+
+    def iter_patients(self, batch_size=500, order_by='patient_id'):
+        """Async generator over all patients, fetched one page at a time"""
+        if order_by not in PATIENT_ORDERINGS:
+            raise ValueError(f"Cannot order patients by {order_by}")
+        return self._iter_pages('get_patients_page', batch_size, order_by)
+
+
+class AsyncDoctorService(_AsyncService):
+    service_class = DoctorService
+
+    add_doctor = _delegate('add_doctor')
+    get_all_doctors = _delegate('get_all_doctors')
+    get_doctors_page = _delegate('get_doctors_page')
+    get_doctor_by_id = _delegate('get_doctor_by_id')
+    update_doctor = _delegate('update_doctor')
+    delete_doctor = _delegate('delete_doctor')
+    get_doctors_by_specialization = _delegate('get_doctors_by_specialization')
+    search_doctors_by_name = _delegate('search_doctors_by_name')
+
+    def iter_doctors(self, batch_size=500, order_by='doctor_id'):
+        """Async generator over all doctors, fetched one page at a time"""
+        if order_by not in DOCTOR_ORDERINGS:
+            raise ValueError(f"Cannot order doctors by {order_by}")
+        return self._iter_pages('get_doctors_page', batch_size, order_by)
+
+
+class AsyncAppointmentService(_AsyncService):
+    service_class = AppointmentService
+
+    book_appointment = _delegate('book_appointment')
+    reschedule_appointment = _delegate('reschedule_appointment')
+    cancel_appointment = _delegate('cancel_appointment')
+    find_conflicts = _delegate('find_conflicts')
+    get_appointment_by_id = _delegate('get_appointment_by_id')
+    get_doctor_appointments = _delegate('get_doctor_appointments')
+    get_patient_appointments = _delegate('get_patient_appointments')
+    get_appointments_on = _delegate('get_appointments_on')
+    set_working_hours = _delegate('set_working_hours')
+    get_free_slots = _delegate('get_free_slots')
+    get_booked_slots = _delegate('get_booked_slots')
+    find_first_free_slot = _delegate('find_first_free_slot')
+    schedule_requests = _delegate('schedule_requests')
+    add_to_waitlist = _delegate('add_to_waitlist')
+    remove_from_waitlist = _delegate('remove_from_waitlist')
+    get_waitlist = _delegate('get_waitlist')
+    get_slot_offers = _delegate('get_slot_offers')
+    accept_slot_offer = _delegate('accept_slot_offer')
+    decline_slot_offer = _delegate('decline_slot_offer')
+    waitlist_stats = _delegate('waitlist_stats')
+
+
+class AsyncBillingService(_AsyncService):
+    service_class = BillingService
+
+    create_bill = _delegate('create_bill')
+    get_patient_bills = _delegate('get_patient_bills')
+    mark_as_paid = _delegate('mark_as_paid')
+    get_unpaid_bills = _delegate('get_unpaid_bills')
+    get_unpaid_bills_page = _delegate('get_unpaid_bills_page')
+
+    def iter_unpaid_bills(self, batch_size=500):
+        """Async generator over unpaid bills, oldest first, one page at a time"""
+        return self._iter_pages('get_unpaid_bills_page', batch_size)
@@ -3,7 +3,9 @@ Billing service class for Hospital Management System
 Handles business logic for billing operations
 """
 
-from app.utils.db import create_connection
+from datetime import datetime
+from app.utils import queries
+from app.utils.db import create_connection, keyset_query, keyset_cursor
 from app.utils.helpers import format_currency
 
 class BillingService:
@@ -34,13 +36,7 @@ class BillingService:
         """Get all bills for a patient"""
         try:
             cursor = self.connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT b.*, p.name as patient_name 
-                FROM billing b
-                JOIN patients p ON b.patient_id = p.patient_id
-                WHERE b.patient_id = %s
-                ORDER BY b.date_issued DESC
-            """, (patient_id,))
+            cursor.execute(queries.PATIENT_BILLS, (patient_id,))
             return cursor.fetchall()
         except Exception as e:
             raise Exception(f"Error retrieving bills: {str(e)}")
@@ -68,15 +64,30 @@ class BillingService:
         """Get all unpaid bills"""
         try:
             cursor = self.connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT b.*, p.name as patient_name 
-                FROM billing b
-                JOIN patients p ON b.patient_id = p.patient_id
-                WHERE b.payment_status = 'Unpaid'
-                ORDER BY b.date_issued ASC
-            """)
+            cursor.execute(queries.UNPAID_BILLS)
             return cursor.fetchall()
         except Exception as e:
             raise Exception(f"Error retrieving unpaid bills: {str(e)}")
         finally:
-            cursor.close()
\ No newline at end of file
+            cursor.close()
+    
+    def get_unpaid_bills_page(self, after=None, limit=50):
+        """
+        Get one page of unpaid bills, oldest first, using keyset pagination
+        Returns (bills, next_cursor); pass next_cursor back as after to get
+        the following page. next_cursor is None on the last page
+        """
+        if limit < 1:
+            raise ValueError("Page size must be at least 1")
+        
+        key_columns = queries.UNPAID_BILLS_KEY
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+            query, params = keyset_query(queries.BILLS_WITH_PATIENT, key_columns, after,
+                                         where=queries.UNPAID_BILLS_WHERE)
+            cursor.execute(query, params + (limit + 1,))
+            return keyset_cursor(cursor.fetchall(), key_columns, limit)
+        except Exception as e:
+            raise Exception(f"Error retrieving unpaid bills: {str(e)}")
+        finally:
+            cursor.close()
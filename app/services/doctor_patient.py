@@ -4,7 +4,21 @@ Handles business logic for doctor operations
 """
 
 from app.models.doctor import Doctor
-from app.utils.db import create_connection
+from app.models.doctor_directory import DoctorDirectory
+from app.utils import queries
+from app.utils.db import after_commit, create_connection, keyset_query, keyset_cursor, snapshot_max_age
+from app.utils.enums import SPECIALIZATION
+from app.utils.row_mapper import RowMapper
+
+# Builds Doctor objects from positional rows
+DOCTOR_ROWS = RowMapper(Doctor, encoded={'specialization': SPECIALIZATION})
+
+# Every doctor, indexed in memory; loaded on first use and updated when
+# this service's writes commit
+DOCTOR_DIRECTORY = DoctorDirectory()
+
+# Orderings available to get_doctors_page; the primary key breaks ties
+PAGE_ORDERINGS = queries.DOCTOR_PAGE_ORDERINGS
 
 class DoctorService:
     def __init__(self):
@@ -33,6 +47,7 @@ class DoctorService:
             ))
             self.connection.commit()
             doctor.doctor_id = cursor.lastrowid
+            self._publish(doctor)
             return doctor
         except Exception as e:
             self.connection.rollback()
@@ -43,10 +58,51 @@ class DoctorService:
     def get_all_doctors(self):
         """Get all doctors from database"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT * FROM doctors")
+            return DOCTOR_ROWS.all(cursor, cursor.fetchall())
+        except Exception as e:
+            raise Exception(f"Error retrieving doctors: {str(e)}")
+        finally:
+            cursor.close()
+    
+    def iter_doctors(self, batch_size=500):
+        """
+        Yield doctors lazily, fetching batch_size rows per round trip
+        Uses an unbuffered cursor, so memory stays bounded by the batch size.
+        The connection is busy until the generator is exhausted or closed,
+        so do not write through this service while iterating.
+        """
+        try:
+            cursor = self.connection.cursor(buffered=False)
             cursor.execute("SELECT * FROM doctors")
-            rows = cursor.fetchall()
-            return [Doctor.from_dict(row) for row in rows]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from DOCTOR_ROWS.all(cursor, rows)
+        except Exception as e:
+            raise Exception(f"Error retrieving doctors: {str(e)}")
+        finally:
+            cursor.close()
+    
+    def get_doctors_page(self, after=None, limit=50, order_by='doctor_id'):
+        """
+        Get one page of doctors using keyset pagination
+        Returns (doctors, next_cursor); pass next_cursor back as after to
+        get the following page. next_cursor is None on the last page
+        """
+        key_columns = PAGE_ORDERINGS.get(order_by)
+        if key_columns is None:
+            raise ValueError(f"Cannot order doctors by {order_by}")
+        if limit < 1:
+            raise ValueError("Page size must be at least 1")
+        
+        try:
+            cursor = self.connection.cursor()
+            query, params = keyset_query(queries.SELECT_DOCTORS, key_columns, after)
+            cursor.execute(query, params + (limit + 1,))
+            return keyset_cursor(DOCTOR_ROWS.all(cursor, cursor.fetchall()), key_columns, limit)
         except Exception as e:
             raise Exception(f"Error retrieving doctors: {str(e)}")
         finally:
@@ -55,15 +111,32 @@ class DoctorService:
     def get_doctor_by_id(self, doctor_id):
         """Get doctor by ID"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
+            cursor = self.connection.cursor()
             cursor.execute("SELECT * FROM doctors WHERE doctor_id = %s", (doctor_id,))
-            row = cursor.fetchone()
-            return Doctor.from_dict(row) if row else None
+            return DOCTOR_ROWS.one(cursor, cursor.fetchone())
         except Exception as e:
             raise Exception(f"Error retrieving doctor: {str(e)}")
         finally:
             cursor.close()
     
+    def get_doctor_directory(self):
+        """Return the shared DoctorDirectory, loading it on first use"""
+        return DOCTOR_DIRECTORY.ensure_loaded(self.get_all_doctors, max_age=snapshot_max_age())
+    
+    def get_doctors_by_specialization(self, specialization):
+        """Get the doctors of one specialization, ordered by name"""
+        return self.get_doctor_directory().by_specialization(specialization)
+    
+    def search_doctors_by_name(self, prefix, limit=20):
+        """Get up to limit doctors whose name starts with prefix, ignoring case"""
+        return self.get_doctor_directory().name_prefix(prefix, limit)
+    
+    @staticmethod
+    def _publish(doctor):
+        """Put a snapshot of doctor into the directory once the write commits"""
+        snapshot = Doctor.from_dict(doctor.to_dict())
+        after_commit(lambda: DOCTOR_DIRECTORY.put(snapshot))
+    
     def update_doctor(self, doctor):
         """Update doctor information"""
         if not isinstance(doctor, Doctor):
@@ -88,6 +161,8 @@ class DoctorService:
                 doctor.doctor_id
             ))
             self.connection.commit()
+            if cursor.rowcount > 0:
+                self._publish(doctor)
             return cursor.rowcount > 0
         except Exception as e:
             self.connection.rollback()
@@ -101,6 +176,7 @@ class DoctorService:
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM doctors WHERE doctor_id = %s", (doctor_id,))
             self.connection.commit()
+            after_commit(lambda: DOCTOR_DIRECTORY.remove(doctor_id))
             return cursor.rowcount > 0
         except Exception as e:
             self.connection.rollback()
@@ -4,14 +4,53 @@ Handles business logic for patient operations
 """
 
 from app.models.patient import Patient
-from app.utils.db import create_connection
+from app.utils.cache import LRUCache
+from app.utils import linkage, queries
+from app.utils.enums import GENDER
+from app.utils.db import (DB_CONFIG, after_commit, create_connection, current_transaction,
+                          keyset_query, keyset_cursor, snapshot_max_age)
+from app.utils.phone_index import PhoneIndex
+from app.utils.replication import read_from_primary
+from app.utils.row_mapper import RowMapper
+from app.utils.trigram import TrigramIndex
+from app.utils import validation
+
+# Builds Patient objects from positional rows
+PATIENT_ROWS = RowMapper(Patient, encoded={'gender': GENDER})
+
+# Recently looked up patients by id, held as constructor arguments so
+# every caller gets its own Patient object
+PATIENT_CACHE = LRUCache(maxsize=DB_CONFIG['patient_cache_size'], ttl=DB_CONFIG['patient_cache_ttl'])
+
+# Trigram index over name, contact and address for search(); loaded on
+# first use and updated when this service's writes commit
+PATIENT_SEARCH = TrigramIndex()
+
+# Orderings available to get_patients_page; the primary key breaks ties
+PAGE_ORDERINGS = queries.PATIENT_PAGE_ORDERINGS
+
+# Normalized numbers per IN query when checking an import batch
+CONTACT_CHUNK = 500
+
+class DuplicatePatientError(ValueError):
+    """Raised by add_patient when the contact is already registered"""
+    
+    def __init__(self, patient_ids):
+        super().__init__(f"Contact number already registered to patient(s) {', '.join(map(str, patient_ids))}")
+        self.patient_ids = patient_ids
 
 class PatientService:
     def __init__(self):
         self.connection = create_connection()
+        self._batch_id_step = None
     
-    def add_patient(self, patient):
-        """Add a new patient to the database"""
+    def add_patient(self, patient, check_duplicates=None):
+        """
+        Add a new patient to the database
+        With check_duplicates (default: DB_CONFIG['check_duplicate_contacts']),
+        refuse a contact number that is already registered by raising
+        DuplicatePatientError
+        """
         if not isinstance(patient, Patient):
             raise ValueError("Invalid patient object")
         
@@ -19,21 +58,30 @@ class PatientService:
         if not valid:
             raise ValueError(message)
         
+        if check_duplicates is None:
+            check_duplicates = DB_CONFIG['check_duplicate_contacts']
+        if check_duplicates:
+            patient_ids = self.find_duplicate_ids(patient.contact)
+            if patient_ids:
+                raise DuplicatePatientError(patient_ids)
+        
         try:
             cursor = self.connection.cursor()
             query = """
-            INSERT INTO patients (name, dob, gender, contact, address)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO patients (name, dob, gender, contact, address, normalized_contact)
+            VALUES (%s, %s, %s, %s, %s, %s)
             """
             cursor.execute(query, (
                 patient.name,
                 patient.dob,
                 patient.gender,
                 patient.contact,
-                patient.address
+                patient.address,
+                validation.normalize_phone(patient.contact)
             ))
             self.connection.commit()
             patient.patient_id = cursor.lastrowid
+            self._index_patients([patient])
             return patient
         except Exception as e:
             self.connection.rollback()
@@ -41,30 +89,354 @@ class PatientService:
         finally:
             cursor.close()
     
+    def add_patients(self, patients, chunk_size=1000):
+        """
+        Add many patients, inserting and committing once per chunk
+        Returns (ids, errors): ids lines up with the input, holding None for
+        rows that were not inserted, and errors lists (row_index, message)
+        """
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be at least 1")
+        
+        ids = []
+        errors = []
+        chunk = []
+        for index, patient in enumerate(patients):
+            ids.append(None)
+            if isinstance(patient, dict):
+                patient = Patient.from_dict(patient)
+            if not isinstance(patient, Patient):
+                errors.append((index, "Invalid patient object"))
+                continue
+            
+            chunk.append((index, patient))
+            if len(chunk) >= chunk_size:
+                self._insert_valid_patients(chunk, ids, errors)
+                chunk = []
+        
+        if chunk:
+            self._insert_valid_patients(chunk, ids, errors)
+        errors.sort()
+        return ids, errors
+    
+    def _insert_valid_patients(self, chunk, ids, errors):
+        """Validate a chunk in one pass and insert the rows that pass"""
+        invalid = validation.first_errors(
+            validation.PATIENT.validate_records([patient for _, patient in chunk])
+        )
+        for row, message in invalid.items():
+            errors.append((chunk[row][0], message))
+        valid = [entry for row, entry in enumerate(chunk) if row not in invalid]
+        if valid:
+            self._insert_patient_chunk(valid, ids, errors)
+    
+    def _id_step(self):
+        """
+        Distance between the ids of one executemany INSERT, or 0 when they
+        are not guaranteed to be evenly spaced. SQLite and the mock database
+        hold their write lock for the whole batch. MySQL gives a multi-row
+        INSERT consecutive ids only with innodb_autoinc_lock_mode 0 or 1;
+        the default of 2 (interleaved) does not
+        """
+        if self._batch_id_step is None:
+            self._batch_id_step = 1
+            if DB_CONFIG['backend'] == 'mysql':
+                cursor = self.connection.cursor()
+                try:
+                    cursor.execute("SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment")
+                    lock_mode, increment = cursor.fetchone()
+                    self.connection.commit()
+                finally:
+                    cursor.close()
+                self._batch_id_step = increment if lock_mode in (0, 1) else 0
+        return self._batch_id_step
+
+    def _insert_patient_chunk(self, chunk, ids, errors):
+        """
+        Insert one chunk in a single transaction, retrying row by row if it fails
+        The chunk goes in with executemany, which mysql-connector sends as
+        one multi-row INSERT; the ids then follow the first one (see
+        _id_step). Where they may not, each row is its own INSERT and its
+        id comes from lastrowid
+        """
+        query = """
+        INSERT INTO patients (name, dob, gender, contact, address, normalized_contact)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        rows = [
+            (p.name, p.dob, p.gender, p.contact, p.address, validation.normalize_phone(p.contact))
+            for _, p in chunk
+        ]
+        step = self._id_step()
+        cursor = self.connection.cursor()
+        try:
+            if step:
+                cursor.executemany(query, rows)
+                assigned = [cursor.lastrowid + n * step for n in range(len(rows))]
+            else:
+                assigned = []
+                for row in rows:
+                    cursor.execute(query, row)
+                    assigned.append(cursor.lastrowid)
+            self.connection.commit()
+            for (index, patient), patient_id in zip(chunk, assigned):
+                patient.patient_id = ids[index] = patient_id
+            self._index_patients([patient for _, patient in chunk])
+            return
+        except Exception:
+            self.connection.rollback()
+        finally:
+            cursor.close()
+        
+        # Find the offending rows without losing the rest of the chunk
+        cursor = self.connection.cursor()
+        try:
+            for (index, patient), row in zip(chunk, rows):
+                try:
+                    cursor.execute(query, row)
+                    patient.patient_id = cursor.lastrowid
+                    ids[index] = patient.patient_id
+                except Exception as e:
+                    errors.append((index, f"Error adding patient: {str(e)}"))
+            self.connection.commit()
+            self._index_patients([patient for index, patient in chunk if ids[index] is not None])
+        except Exception as e:
+            self.connection.rollback()
+            for index, patient in chunk:
+                if ids[index] is not None:
+                    ids[index] = patient.patient_id = None
+                    errors.append((index, f"Error adding patient: {str(e)}"))
+        finally:
+            cursor.close()
+    
     def get_all_patients(self):
         """Get all patients from database"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT * FROM patients")
+            return PATIENT_ROWS.all(cursor, cursor.fetchall())
+        except Exception as e:
+            raise Exception(f"Error retrieving patients: {str(e)}")
+        finally:
+            cursor.close()
+    
+    def iter_patients(self, batch_size=500):
+        """
+        Yield patients lazily, fetching batch_size rows per round trip
+        Uses an unbuffered cursor, so memory stays bounded by the batch size.
+        The connection is busy until the generator is exhausted or closed,
+        so do not write through this service while iterating.
+        """
+        try:
+            cursor = self.connection.cursor(buffered=False)
             cursor.execute("SELECT * FROM patients")
-            rows = cursor.fetchall()
-            return [Patient.from_dict(row) for row in rows]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from PATIENT_ROWS.all(cursor, rows)
+        except Exception as e:
+            raise Exception(f"Error retrieving patients: {str(e)}")
+        finally:
+            cursor.close()
+    
+    def get_patients_page(self, after=None, limit=50, order_by='patient_id'):
+        """
+        Get one page of patients using keyset pagination
+        Returns (patients, next_cursor); pass next_cursor back as after to
+        get the following page. next_cursor is None on the last page
+        """
+        key_columns = PAGE_ORDERINGS.get(order_by)
+        if key_columns is None:
+            raise ValueError(f"Cannot order patients by {order_by}")
+        if limit < 1:
+            raise ValueError("Page size must be at least 1")
+        
+        try:
+            cursor = self.connection.cursor()
+            query, params = keyset_query(queries.SELECT_PATIENTS, key_columns, after)
+            cursor.execute(query, params + (limit + 1,))
+            return keyset_cursor(PATIENT_ROWS.all(cursor, cursor.fetchall()), key_columns, limit)
         except Exception as e:
             raise Exception(f"Error retrieving patients: {str(e)}")
         finally:
             cursor.close()
     
     def get_patient_by_id(self, patient_id):
-        """Get patient by ID"""
+        """Get patient by ID, served from PATIENT_CACHE when possible"""
+        # Rows read inside a transaction may be uncommitted, so they are not cached
+        fields = PATIENT_CACHE.get_or_load(patient_id, lambda: self._load_patient(patient_id),
+                                           store=current_transaction() is None)
+        return None if fields is None else Patient(*fields)
+    
+    def _load_patient(self, patient_id):
+        """
+        Read one patient from the database as constructor arguments
+        Cache misses read the primary: a lagging replica would put the row
+        back into PATIENT_CACHE as it was before the last update
+        """
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM patients WHERE patient_id = %s", (patient_id,))
-            row = cursor.fetchone()
-            return Patient.from_dict(row) if row else None
+            cursor = self.connection.cursor()
+            with read_from_primary():
+                cursor.execute("SELECT * FROM patients WHERE patient_id = %s", (patient_id,))
+            patient = PATIENT_ROWS.one(cursor, cursor.fetchone())
+            if patient is None:
+                return None
+            return (patient.patient_id, patient.name, patient.dob, patient.gender,
+                    patient.contact, patient.address)
         except Exception as e:
             raise Exception(f"Error retrieving patient: {str(e)}")
         finally:
             cursor.close()
     
+    def search(self, query, limit=20):
+        """
+        Find patients by partial name, phone fragment or address, best match first
+        Typos and reformatted numbers still match; see app.utils.trigram
+        """
+        if limit < 1:
+            raise ValueError("Limit must be at least 1")
+        index = PATIENT_SEARCH.ensure_loaded(self._search_documents, max_age=snapshot_max_age())
+        ids = [patient_id for patient_id, _ in index.search(query, limit)]
+        try:
+            return self._get_patients_by_ids(ids)
+        except Exception as e:
+            raise Exception(f"Error searching patients: {str(e)}")
+    
+    def _get_patients_by_ids(self, ids):
+        """
+        Fetch patients with one IN query, in the order of ids
+        The ids come from indexes loaded from the primary, so the rows do too
+        """
+        if not ids:
+            return []
+        cursor = self.connection.cursor()
+        try:
+            placeholders = ', '.join(['%s'] * len(ids))
+            with read_from_primary():
+                cursor.execute(f"SELECT * FROM patients WHERE patient_id IN ({placeholders})", tuple(ids))
+            found = {p.patient_id: p for p in PATIENT_ROWS.all(cursor, cursor.fetchall())}
+            return [found[patient_id] for patient_id in ids if patient_id in found]
+        finally:
+            cursor.close()
+    
+    def _search_documents(self):
+        """Yield (patient_id, searchable fields) for every patient"""
+        for patient in self.iter_patients(batch_size=5000):
+            yield patient.patient_id, (patient.name, patient.contact, patient.address)
+    
+    def find_duplicate_ids(self, contact, exclude_id=None):
+        """
+        Return the ids of patients whose contact normalizes to the same number
+        Looked up on the indexed normalized_contact column of the primary, so
+        numbers registered by other processes count at once
+        """
+        key = validation.normalize_phone(contact)
+        if key is None:
+            return []
+        cursor = self.connection.cursor()
+        try:
+            with read_from_primary():
+                cursor.execute(queries.PATIENTS_BY_CONTACT, (key,))
+                return [patient_id for patient_id, in cursor.fetchall() if patient_id != exclude_id]
+        except Exception as e:
+            raise Exception(f"Error checking duplicates: {str(e)}")
+        finally:
+            cursor.close()
+    
+    def find_duplicates(self, contact, exclude_id=None):
+        """Return the patients registered with the same contact number"""
+        try:
+            return self._get_patients_by_ids(self.find_duplicate_ids(contact, exclude_id))
+        except Exception as e:
+            raise Exception(f"Error checking duplicates: {str(e)}")
+    
+    def check_duplicates(self, patients):
+        """
+        Check an import batch for contact numbers that are already registered
+        or repeated within the batch, before calling add_patients
+        patients may be Patient objects or dictionaries; returns a list of
+        app.utils.phone_index.DuplicateRow (row, record_ids, rows)
+        """
+        contacts = [p.get('contact') if isinstance(p, dict) else getattr(p, 'contact', None)
+                    for p in patients]
+        keys = sorted({key for key in map(validation.normalize_phone, contacts) if key is not None})
+        # Only the stored patients sharing a number of the batch are indexed
+        return PhoneIndex(self._contact_entries(keys)).check(contacts)
+    
+    def _contact_entries(self, keys):
+        """Return (patient_id, normalized_contact) of the patients holding any of keys"""
+        entries = []
+        cursor = self.connection.cursor()
+        try:
+            with read_from_primary():
+                for start in range(0, len(keys), CONTACT_CHUNK):
+                    chunk = keys[start:start + CONTACT_CHUNK]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    cursor.execute("SELECT patient_id, normalized_contact FROM patients "
+                                   f"WHERE normalized_contact IN ({placeholders})", tuple(chunk))
+                    entries.extend(cursor.fetchall())
+            return entries
+        except Exception as e:
+            raise Exception(f"Error checking duplicates: {str(e)}")
+        finally:
+            cursor.close()
+    
+    def _iter_columns(self, columns, batch_size=5000):
+        """Yield tuples of the given columns for every patient, streaming"""
+        try:
+            cursor = self.connection.cursor(buffered=False)
+            cursor.execute(f"SELECT {columns} FROM patients")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        except Exception as e:
+            raise Exception(f"Error retrieving patients: {str(e)}")
+        finally:
+            cursor.close()
+    
+    def find_merge_candidates(self, threshold=0.7, workers=None, max_block=1000):
+        """
+        Find pairs of patients that are probably the same person
+        Pairs sharing a dob, phone suffix or name soundex are scored on name,
+        dob and phone; see app.utils.linkage. Returns MergeCandidate tuples,
+        best first
+        """
+        records = self._iter_columns("patient_id, name, dob, contact")
+        return linkage.find_candidates(records, threshold, workers, max_block)
+    
+    def write_merge_report(self, path, **options):
+        """Write find_merge_candidates() to a CSV file; returns the number of pairs"""
+        candidates = self.find_merge_candidates(**options)
+        with open(path, 'w', newline='') as report:
+            linkage.write_report(candidates, report)
+        return len(candidates)
+    
+    @staticmethod
+    def _index_patients(patients):
+        """Update the search index with patients once the write commits"""
+        entries = [(p.patient_id, p.name, p.contact, p.address) for p in patients]
+        
+        def publish():
+            for entry in entries:
+                PATIENT_SEARCH.put(*entry)
+        after_commit(publish)
+    
+    @staticmethod
+    def _unindex_patient(patient_id):
+        """Drop a deleted patient from the search index once committed"""
+        after_commit(lambda: PATIENT_SEARCH.remove(patient_id))
+    
+    @staticmethod
+    def _forget_patient(patient_id):
+        """Drop a changed patient from the cache now and again once committed"""
+        # Another thread may re-cache the old row before an open transaction commits
+        PATIENT_CACHE.invalidate(patient_id)
+        if current_transaction() is not None:
+            after_commit(lambda: PATIENT_CACHE.invalidate(patient_id))
+    
     def update_patient(self, patient):
         """Update patient information"""
         if not isinstance(patient, Patient):
@@ -78,7 +450,7 @@ class PatientService:
             cursor = self.connection.cursor()
             query = """
             UPDATE patients 
-            SET name = %s, dob = %s, gender = %s, contact = %s, address = %s
+            SET name = %s, dob = %s, gender = %s, contact = %s, address = %s, normalized_contact = %s
             WHERE patient_id = %s
             """
             cursor.execute(query, (
@@ -87,9 +459,13 @@ class PatientService:
                 patient.gender,
                 patient.contact,
                 patient.address,
+                validation.normalize_phone(patient.contact),
                 patient.patient_id
             ))
             self.connection.commit()
+            self._forget_patient(patient.patient_id)
+            if cursor.rowcount > 0:
+                self._index_patients([patient])
             return cursor.rowcount > 0
         except Exception as e:
             self.connection.rollback()
@@ -103,6 +479,8 @@ class PatientService:
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM patients WHERE patient_id = %s", (patient_id,))
             self.connection.commit()
+            self._forget_patient(patient_id)
+            self._unindex_patient(patient_id)
             return cursor.rowcount > 0
         except Exception as e:
             self.connection.rollback()
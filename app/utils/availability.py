@@ -0,0 +1,264 @@
+"""
+Slot bitmaps for doctor availability
+A doctor-day is a bitmap of fixed-length slots (bit n is slot n of the
+day). Every doctor owns a lane of SLOTS_PER_DAY bits in one packed int per
+day, so "which of these doctors is free, and when" is a handful of
+bitwise operations over all of them at once rather than a loop
+"""
+
+from app.utils.cache import SnapshotIndex
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 1440 // SLOT_MINUTES
+DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+
+
+def parse_time(value):
+    """Return minutes since midnight of an 'HH:MM' string"""
+    hours, _, minutes = str(value).partition(':')
+    total = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= total <= 1440:
+        raise ValueError(f"Invalid time of day: {value!r}")
+    return total
+
+
+def slot_mask(first_minute, last_minute):
+    """Bits of the slots touched by [first_minute, last_minute) of one day"""
+    first = first_minute // SLOT_MINUTES
+    last = -(-last_minute // SLOT_MINUTES)
+    return ((1 << last) - 1) ^ ((1 << first) - 1) if last > first else 0
+
+
+def day_masks(start, end):
+    """Yield (day, mask) for an interval in absolute minutes (see intervals.to_minutes)"""
+    while start < end:
+        day, offset = divmod(start, 1440)
+        stop = min(end - day * 1440, 1440)
+        yield day, slot_mask(offset, stop)
+        start = day * 1440 + stop
+
+
+def slot_starts(mask, slots=1):
+    """Return the slots where a run of `slots` free slots of mask begins"""
+    runs = mask
+    for shift in range(1, slots):
+        runs &= mask >> shift
+    found = []
+    while runs:
+        low = runs & -runs
+        found.append(low.bit_length() - 1)
+        runs ^= low
+    return found
+
+
+class WorkingHours:
+    """
+    Weekly working-hour template.
+
+    hours maps a weekday (0 is Monday) to a list of ('HH:MM', 'HH:MM')
+    periods; days that are left out are off.
+    """
+
+    def __init__(self, hours=None):
+        self.hours = {weekday: list(periods) for weekday, periods in (hours or {}).items()}
+        self.masks = [0] * 7
+        for weekday, periods in self.hours.items():
+            for start, end in periods:
+                self.masks[weekday] |= slot_mask(parse_time(start), parse_time(end))
+
+    def mask(self, weekday):
+        return self.masks[weekday]
+
+
+DEFAULT_HOURS = WorkingHours({weekday: [("09:00", "17:00")] for weekday in range(5)})
+
+
+class AvailabilityIndex(SnapshotIndex):
+    """
+    Booked-slot bitmaps of every doctor, packed per day.
+
+    Days are whole days since 0001-01-01 (so day % 7 is the weekday) and
+    appointments come as (appointment_id, doctor_id, start, end) minutes,
+    like IntervalIndex entries. A slot is booked if any appointment
+    touches it. Working hours are configuration and survive clear().
+    """
+
+    def __init__(self, default_hours=DEFAULT_HOURS):
+        self.default_hours = default_hours
+        self._hours = {}            # doctor_id -> WorkingHours
+        self._lanes = {}            # doctor_id -> lane; lanes are never reused
+        self._doctors = []          # lane -> doctor_id
+        self._packed_cache = {}     # cached per-lane masks, dropped when lanes or hours change
+        super().__init__()
+
+    def _reset(self):
+        self._booked = {}           # day -> packed booked slots of every lane
+        self._held = {}             # (doctor_id, day) -> {appointment_id: mask}
+        self._spans = {}            # appointment_id -> (doctor_id, [day, ...])
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __contains__(self, appointment_id):
+        return appointment_id in self._spans
+
+    # -- configuration ------------------------------------------------------
+
+    def set_hours(self, doctor_id, hours):
+        """Give a doctor their own WorkingHours; None restores the default"""
+        with self._lock:
+            if hours is None:
+                self._hours.pop(doctor_id, None)
+            else:
+                self._hours[doctor_id] = hours
+            self._packed_cache.clear()
+
+    def hours_of(self, doctor_id):
+        return self._hours.get(doctor_id, self.default_hours)
+
+    def _lane(self, doctor_id):
+        lane = self._lanes.get(doctor_id)
+        if lane is None:
+            lane = self._lanes[doctor_id] = len(self._doctors)
+            self._doctors.append(doctor_id)
+            self._packed_cache.clear()
+        return lane
+
+    def _packed(self, key, build):
+        value = self._packed_cache.get(key)
+        if value is None:
+            value = self._packed_cache[key] = build()
+        return value
+
+    def _repeat(self, pattern):
+        """pattern copied into every lane"""
+        def build():
+            ones = self._packed('ones', lambda: sum(1 << (lane * SLOTS_PER_DAY)
+                                                    for lane in range(len(self._doctors))))
+            return pattern * ones
+        return self._packed(('repeat', pattern), build)
+
+    def _working(self, weekday):
+        return self._packed(('work', weekday), lambda: sum(
+            self.hours_of(doctor_id).mask(weekday) << (lane * SLOTS_PER_DAY)
+            for lane, doctor_id in enumerate(self._doctors)
+        ))
+
+    def _group(self, doctor_ids):
+        lanes = tuple(sorted(self._lane(doctor_id) for doctor_id in doctor_ids))
+        if len(self._packed_cache) > 256:
+            self._packed_cache.clear()
+        return self._packed(('group', lanes), lambda: sum(DAY_MASK << (lane * SLOTS_PER_DAY)
+                                                          for lane in lanes))
+
+    # -- maintenance --------------------------------------------------------
+
+    def _fill(self, entries):
+        """Add (appointment_id, doctor_id, start, end) tuples"""
+        for entry in entries:
+            self._add(*entry)
+
+    def put(self, appointment_id, doctor_id, start, end):
+        """Book the slots of an appointment, replacing its earlier time"""
+        with self._lock:
+            if self._changed():
+                self._discard(appointment_id)
+                self._add(appointment_id, doctor_id, start, end)
+
+    def remove(self, appointment_id):
+        """Free the slots of an appointment; returns False if it was not booked"""
+        with self._lock:
+            self._changed()
+            return self._discard(appointment_id)
+
+    def _add(self, appointment_id, doctor_id, start, end):
+        days = []
+        for day, mask in day_masks(start, end):
+            self._held.setdefault((doctor_id, day), {})[appointment_id] = mask
+            self._refresh(doctor_id, day)
+            days.append(day)
+        self._spans[appointment_id] = (doctor_id, days)
+
+    def _discard(self, appointment_id):
+        span = self._spans.pop(appointment_id, None)
+        if span is None:
+            return False
+        doctor_id, days = span
+        for day in days:
+            held = self._held[(doctor_id, day)]
+            del held[appointment_id]
+            if not held:
+                del self._held[(doctor_id, day)]
+            self._refresh(doctor_id, day)
+        return True
+
+    def _refresh(self, doctor_id, day):
+        """Rewrite one doctor-day lane from the appointments that hold it"""
+        mask = 0
+        for held in self._held.get((doctor_id, day), {}).values():
+            mask |= held
+        shift = self._lane(doctor_id) * SLOTS_PER_DAY
+        packed = self._booked.get(day, 0) & ~(DAY_MASK << shift) | (mask << shift)
+        if packed:
+            self._booked[day] = packed
+        else:
+            self._booked.pop(day, None)
+
+    # -- queries ------------------------------------------------------------
+
+    def booked_mask(self, doctor_id, day):
+        """Bitmap of the doctor's booked slots on day"""
+        with self._lock:
+            lane = self._lanes.get(doctor_id)
+            if lane is None:
+                return 0
+            return (self._booked.get(day, 0) >> (lane * SLOTS_PER_DAY)) & DAY_MASK
+
+    def free_mask(self, doctor_id, day):
+        """Bitmap of the doctor's working slots on day that are not booked"""
+        return self.hours_of(doctor_id).mask(day % 7) & ~self.booked_mask(doctor_id, day)
+
+    def free_slots(self, doctor_id, day, slots=1):
+        """Return the slots on day where `slots` free slots in a row begin"""
+        return slot_starts(self.free_mask(doctor_id, day), slots)
+
+    def first_free(self, doctor_ids, first_day, days=14, slots=1, from_slot=0):
+        """
+        Return (doctor_id, day, slot) of the earliest run of `slots` free
+        slots any of doctor_ids has from slot from_slot of first_day on,
+        looking days ahead; None if all of them are booked
+        Ties go to the doctor listed first in the index
+        """
+        if slots < 1 or slots > SLOTS_PER_DAY:
+            raise ValueError(f"A booking needs 1 to {SLOTS_PER_DAY} slots")
+        with self._lock:
+            if not doctor_ids:
+                return None
+            group = self._group(doctor_ids)
+            # Runs must start early enough to end inside the same lane
+            starts_ok = self._repeat(DAY_MASK >> (slots - 1))
+            lanes = len(self._doctors)
+            for day in range(first_day, first_day + days):
+                free = self._working(day % 7) & group & ~self._booked.get(day, 0)
+                if day == first_day and from_slot:
+                    free &= ~self._repeat((1 << from_slot) - 1)
+                runs = free
+                for shift in range(1, slots):
+                    runs &= free >> shift
+                runs &= starts_ok
+                if runs:
+                    slot = self._earliest_slot(runs, lanes)
+                    column = (runs >> slot) & self._repeat(1)
+                    lane = ((column & -column).bit_length() - 1) // SLOTS_PER_DAY
+                    return self._doctors[lane], day, slot
+        return None
+
+    @staticmethod
+    def _earliest_slot(packed, lanes):
+        """Lowest slot set in any lane: fold the upper half of the lanes onto the lower"""
+        while lanes > 1:
+            half = (lanes + 1) // 2
+            width = half * SLOTS_PER_DAY
+            packed = (packed & ((1 << width) - 1)) | (packed >> width)
+            lanes = half
+        return (packed & -packed).bit_length() - 1
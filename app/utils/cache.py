@@ -0,0 +1,241 @@
+"""
+In-process caching for the service layer
+A bounded, thread-safe LRU cache whose entries also expire after a TTL,
+with hit, miss, eviction and invalidation counters. Every cache is
+registered so clear_all() can drop them together, as db.reset() does
+when the backend changes
+"""
+
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from app.utils.replication import read_from_primary
+
+_caches = weakref.WeakSet()
+
+
+def register(cache):
+    """Have clear_all() call cache.clear(); caches are held weakly"""
+    _caches.add(cache)
+    return cache
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with a time-to-live.
+
+    maxsize=0 disables caching; ttl=None keeps entries until they are
+    evicted or invalidated. get_or_load() only stores what it loaded if
+    no invalidation happened meanwhile, so a slow read cannot put back a
+    value a concurrent write has just replaced.
+    """
+
+    def __init__(self, maxsize=256, ttl=60.0, clock=time.monotonic):
+        if maxsize < 0:
+            raise ValueError("Cache size cannot be negative")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires, value)
+        self._generation = 0            # bumped by every invalidation
+        self.reset_stats()
+        register(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._expired(entry)
+
+    def _expired(self, entry):
+        return entry[0] is not None and entry[0] <= self._clock()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value, generation=None):
+        """
+        Store value under key, evicting the least recently used entry if full
+        With generation (from self.generation), skip the store if the cache
+        was invalidated since
+        """
+        if not self.maxsize:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            expires = None if self.ttl is None else self._clock() + self.ttl
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get_or_load(self, key, load, store=True):
+        """Return the cached value, or call load() and cache a non-None result"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        generation = self._generation
+        value = load()
+        if value is not None and store:
+            self.put(key, value, generation)
+        return value
+
+    def invalidate(self, key):
+        """Drop key if cached"""
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry; counters are kept (see reset_stats)"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """Return the counters and current size as a dictionary"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+def clear_all():
+    """Clear every registered cache"""
+    for cache in list(_caches):
+        cache.clear()
+
+
+class SnapshotIndex:
+    """
+    Base for in-memory indexes built from one full read of a table and
+    then kept current by committed writes.
+
+    Subclasses implement _reset() to empty their structures and _fill()
+    to add a batch of items, and call _changed() (under self._lock) in
+    every mutator: it returns False until the first load, when changes
+    are only counted, since a load about to finish would not include
+    them and ensure_loaded() retries instead.
+
+    Writes made by other processes never reach the snapshot, so
+    ensure_loaded() reads it again once it is older than max_age.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._generation = 0        # bumped by every change
+        self.loaded = False
+        self.loaded_at = None
+        self._refreshing = False
+        self._reset()
+        register(self)
+
+    def _reset(self):
+        raise NotImplementedError
+
+    def _fill(self, items):
+        raise NotImplementedError
+
+    def _changed(self):
+        self._generation += 1
+        return self.loaded
+
+    def load(self, items):
+        """Replace the contents with items"""
+        with self._lock:
+            self._reset()
+            self._fill(items)
+            self.loaded = True
+            self.loaded_at = self.clock()
+        return self
+
+    def ensure_loaded(self, fetch, attempts=3, max_age=None):
+        """
+        Load from fetch() unless already loaded, or reload once the snapshot
+        is older than max_age seconds (None: never). fetch() reads the
+        primary, since a replica may lag behind the writes kept in step
+        Retries when a change lands while fetch() runs, so the snapshot
+        cannot miss it; after the last attempt a first load is kept anyway,
+        while a reload leaves the current contents for another max_age.
+        Other threads go on using the current contents during a reload
+        """
+        if not self.loaded:
+            self._fetch(fetch, attempts)
+        elif max_age is not None and self.clock() - self.loaded_at >= max_age:
+            with self._lock:
+                if self._refreshing:
+                    return self
+                self._refreshing = True
+            try:
+                self._fetch(fetch, attempts, reload=True)
+            finally:
+                self._refreshing = False
+        return self
+
+    def _fetch(self, fetch, attempts, reload=False):
+        for attempt in range(attempts):
+            if self.loaded and not reload:
+                return
+            generation = self._generation
+            with read_from_primary():
+                items = list(fetch())
+            with self._lock:
+                if self.loaded and not reload:
+                    return
+                if generation == self._generation:
+                    self.load(items)
+                    return
+                if attempt == attempts - 1:
+                    if reload:
+                        self.loaded_at = self.clock()
+                    else:
+                        self.load(items)
+                    return
+
+    def clear(self):
+        """Forget everything; the next ensure_loaded() loads again"""
+        with self._lock:
+            self._generation += 1
+            self.loaded = False
+            self._reset()
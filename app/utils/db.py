@@ -1,79 +1,260 @@
 """
-Mock database utility – NO real MySQL needed for demo
-Fully compatible with all views and services using in-memory data
+Database utility for the Hospital Management System
+The default 'mock' backend needs no MySQL server and keeps data in memory;
+'sqlite' stores everything in one local file and 'mysql' uses a server.
+All services share a bounded connection pool through create_connection;
+with a read replica configured, reads are routed to a second pool
 """
 
-class MockConnection:
-    def __init__(self):
-        # In-memory "database"
-        self.data = {
-            'patients': [
-                {'patient_id': 1, 'name': 'John Doe', 'dob': '1990-01-15', 'gender': 'M', 'contact': '123-456-7890', 'address': '123 Main St'},
-                {'patient_id': 2, 'name': 'Jane Smith', 'dob': '1985-03-22', 'gender': 'F', 'contact': '987-654-3210', 'address': '456 Oak Ave'}
-            ],
-            'doctors': [
-                {'doctor_id': 1, 'name': 'Dr. Alice Johnson', 'specialization': 'Cardiology', 'contact': '555-0101', 'email': 'alice@hospital.com'},
-                {'doctor_id': 2, 'name': 'Dr. Bob Wilson', 'specialization': 'Neurology', 'contact': '555-0102', 'email': 'bob@hospital.com'}
-            ],
-            'appointments': [
-                {'appointment_id': 1, 'patient_id': 1, 'doctor_id': 1, 'appointment_date': '2025-01-20 09:00:00', 'status': 'Scheduled'}
-            ],
-            'billing': [
-                {'bill_id': 1, 'patient_id': 1, 'amount': 150.00, 'description': 'Consultation fee', 'payment_status': 'Unpaid', 'date_issued': '2025-01-15'}
-            ]
-        }
-
-    def cursor(self, dictionary=False):
-        return MockCursor(self.data)
-
-    def commit(self):
-        pass
-
-    def close(self):
-        pass
-
-class MockCursor:
-    def __init__(self, data):
-        self.data = data
-        self.lastrowid = 1
-
-    def execute(self, query, params=None):
-        # Parse simple queries for demo
-        self.executed_query = query.lower()
-        if "insert into patients" in self.executed_query:
-            self.lastrowid += 1
-        elif "insert into doctors" in self.executed_query:
-            self.lastrowid += 1
-
-    def fetchall(self):
-        if "select * from patients" in self.executed_query:
-            return self.data['patients']
-        elif "select * from doctors" in self.executed_query:
-            return self.data['doctors']
-        elif "billing b join patients p" in self.executed_query.lower():
-            # Return joined billing data
-            return [
-                {
-                    'bill_id': 1,
-                    'patient_id': 1,
-                    'amount': 150.00,
-                    'description': 'Consultation fee',
-                    'payment_status': 'Unpaid',
-                    'date_issued': '2025-01-15',
-                    'patient_name': 'John Doe'
-                }
-            ]
-        return []
-
-    def fetchone(self):
-        if "select * from patients where patient_id" in self.executed_query:
-            return self.data['patients'][0] if self.data['patients'] else None
-        return None
-
-    def close(self):
-        pass
+import os
+import threading
+
+from app.utils import cache
+from app.utils.memory_db import MemoryDatabase
+from app.utils.pool import (ConnectionPool, PooledConnection, Transaction, after_commit,
+                            current_transaction)
+from app.utils.query_stats import QueryStats, InstrumentedConnection
+from app.utils.replication import RoutingConnection
+
+# Database settings, overridable through environment variables or configure()
+# backend is one of 'mock', 'sqlite' or 'mysql'
+DB_CONFIG = {
+    'backend': os.environ.get('HMS_DB_BACKEND', 'mock'),
+    'sqlite_path': os.environ.get('HMS_SQLITE_PATH', 'hospital.db'),
+    'mysql_host': os.environ.get('HMS_MYSQL_HOST', 'localhost'),
+    'mysql_port': int(os.environ.get('HMS_MYSQL_PORT', '3306')),
+    'mysql_user': os.environ.get('HMS_MYSQL_USER', 'root'),
+    'mysql_password': os.environ.get('HMS_MYSQL_PASSWORD', ''),
+    'mysql_database': os.environ.get('HMS_MYSQL_DATABASE', 'hospital_db'),
+    'pool_size': int(os.environ.get('HMS_DB_POOL_SIZE', '5')),
+    'pool_timeout': float(os.environ.get('HMS_DB_POOL_TIMEOUT', '30')),
+    'pool_idle_timeout': float(os.environ.get('HMS_DB_POOL_IDLE_TIMEOUT', '300')),
+    'instrument': os.environ.get('HMS_DB_INSTRUMENT', '') == '1',
+    # Read replica: a second SQLite file or MySQL host; empty disables routing
+    'sqlite_replica_path': os.environ.get('HMS_SQLITE_REPLICA_PATH', ''),
+    'mysql_replica_host': os.environ.get('HMS_MYSQL_REPLICA_HOST', ''),
+    # Seconds after a write during which the writing thread reads from the primary
+    'read_your_writes': float(os.environ.get('HMS_DB_READ_YOUR_WRITES', '0')),
+    # Patient lookup cache, read when the patient service is imported; size 0 disables it
+    'patient_cache_size': int(os.environ.get('HMS_PATIENT_CACHE_SIZE', '512')),
+    'patient_cache_ttl': float(os.environ.get('HMS_PATIENT_CACHE_TTL', '60')),
+    # Whether add_patient refuses a contact number that is already registered
+    'check_duplicate_contacts': os.environ.get('HMS_CHECK_DUPLICATE_CONTACTS', '1') == '1',
+    # Seconds before an in-memory index (doctor directory, patient search,
+    # appointment calendar and slots) is read again; 0 disables reloads
+    'snapshot_ttl': float(os.environ.get('HMS_SNAPSHOT_TTL', '300')),
+}
+
+def seed_data():
+    """Return the demo data set used by the mock backend"""
+    return {
+        'patients': [
+            {'patient_id': 1, 'name': 'John Doe', 'dob': '1990-01-15', 'gender': 'M', 'contact': '123-456-7890', 'address': '123 Main St', 'normalized_contact': '1234567890'},
+            {'patient_id': 2, 'name': 'Jane Smith', 'dob': '1985-03-22', 'gender': 'F', 'contact': '987-654-3210', 'address': '456 Oak Ave', 'normalized_contact': '9876543210'}
+        ],
+        'doctors': [
+            {'doctor_id': 1, 'name': 'Dr. Alice Johnson', 'specialization': 'Cardiology', 'contact': '555-0101', 'email': 'alice@hospital.com'},
+            {'doctor_id': 2, 'name': 'Dr. Bob Wilson', 'specialization': 'Neurology', 'contact': '555-0102', 'email': 'bob@hospital.com'}
+        ],
+        'appointments': [
+            {'appointment_id': 1, 'patient_id': 1, 'doctor_id': 1, 'appointment_date': '2025-01-20 09:00:00', 'status': 'Scheduled', 'duration_minutes': 30}
+        ],
+        'billing': [
+            {'bill_id': 1, 'patient_id': 1, 'amount': 150.00, 'description': 'Consultation fee', 'payment_status': 'Unpaid', 'date_issued': '2025-01-15'}
+        ]
+    }
+
+_pool = None
+_replica_pool = None
+_pool_lock = threading.Lock()
+_mock_database = None
+_mock_lock = threading.Lock()
+
+def get_mock_database():
+    """Return the shared in-memory database used by the mock backend"""
+    global _mock_database
+    if _mock_database is None:
+        # Worker threads may connect at once right after a reset
+        with _mock_lock:
+            if _mock_database is None:
+                print("✅ Using MOCK database (no MySQL required for demo)")
+                database = MemoryDatabase()
+                database.load(seed_data())
+                _mock_database = database
+    return _mock_database
+
+_query_stats = QueryStats()
+
+def snapshot_max_age():
+    """Return the max_age to pass to SnapshotIndex.ensure_loaded(), None if reloads are off"""
+    return DB_CONFIG['snapshot_ttl'] or None
+
+def query_stats():
+    """
+    Return the collector of statement and commit timings
+    Only filled while DB_CONFIG['instrument'] is on
+    """
+    return _query_stats
+
+def _connect(replica=False):
+    """Open a new raw connection, instrumented if configured"""
+    connection = _open_backend_connection(replica)
+    if DB_CONFIG['instrument']:
+        return InstrumentedConnection(connection, _query_stats)
+    return connection
+
+def _open_backend_connection(replica=False):
+    """Open a new raw connection to the primary or the read replica"""
+    backend = DB_CONFIG['backend']
+    if backend == 'mock':
+        return get_mock_database().connect()
+    if backend == 'sqlite':
+        from app.utils import sqlite_db
+        if replica:
+            # The replica receives its schema from the primary
+            return sqlite_db.connect(DB_CONFIG['sqlite_replica_path'], create_schema=False)
+        return sqlite_db.connect(DB_CONFIG['sqlite_path'])
+    if backend == 'mysql':
+        import mysql.connector
+        return mysql.connector.connect(
+            host=DB_CONFIG['mysql_replica_host'] if replica else DB_CONFIG['mysql_host'],
+            port=DB_CONFIG['mysql_port'],
+            user=DB_CONFIG['mysql_user'],
+            password=DB_CONFIG['mysql_password'],
+            database=DB_CONFIG['mysql_database'],
+        )
+    raise ValueError(f"Unknown database backend: {backend}")
+
+def _dialect():
+    return 'sqlite' if DB_CONFIG['backend'] == 'sqlite' else 'mysql'
+
+def get_pool():
+    """Return the shared connection pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                _connect,
+                max_size=DB_CONFIG['pool_size'],
+                timeout=DB_CONFIG['pool_timeout'],
+                idle_timeout=DB_CONFIG['pool_idle_timeout'],
+                dialect=_dialect(),
+            )
+        return _pool
+
+def replica_configured():
+    """Return True if a read replica is set for the current backend"""
+    backend = DB_CONFIG['backend']
+    if backend == 'sqlite':
+        return bool(DB_CONFIG['sqlite_replica_path'])
+    if backend == 'mysql':
+        return bool(DB_CONFIG['mysql_replica_host'])
+    return False
+
+def get_replica_pool():
+    """Return the read replica connection pool, creating it on first use"""
+    global _replica_pool
+    with _pool_lock:
+        if _replica_pool is None:
+            _replica_pool = ConnectionPool(
+                lambda: _connect(replica=True),
+                max_size=DB_CONFIG['pool_size'],
+                timeout=DB_CONFIG['pool_timeout'],
+                idle_timeout=DB_CONFIG['pool_idle_timeout'],
+                dialect=_dialect(),
+            )
+        return _replica_pool
+
+def configure(**options):
+    """
+    Update DB_CONFIG and drop the current pool so the next
+    create_connection() uses the new settings
+    """
+    unknown = set(options) - set(DB_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown database option(s): {', '.join(sorted(unknown))}")
+    DB_CONFIG.update(options)
+    reset()
+
+def reset():
+    """Close the shared pools and forget any mock data and cached rows"""
+    global _pool, _replica_pool, _mock_database
+    with _pool_lock:
+        for pool in (_pool, _replica_pool):
+            if pool is not None:
+                pool.close()
+        _pool = None
+        _replica_pool = None
+        _mock_database = None
+    cache.clear_all()
+
+def pool_stats():
+    """Return checkout, wait and eviction counters of the shared pool"""
+    return get_pool().stats()
+
+def keyset_query(select, key_columns, after=None, where=None):
+    """
+    Build a keyset (seek) pagination query from a SELECT ... FROM ... clause
+    Rows come back ordered by key_columns; after is the key of the last row
+    already seen, so the database seeks past it through an index instead of
+    skipping rows with OFFSET. Returns (query, params) ending in LIMIT %s;
+    the caller appends the limit to params
+    """
+    conditions = [where] if where else []
+    params = ()
+    if after is not None:
+        after = tuple(after)
+        if len(after) != len(key_columns):
+            raise ValueError("Page cursor does not match the ordering")
+        if len(key_columns) == 1:
+            conditions.append(f"{key_columns[0]} > %s")
+        else:
+            columns = ", ".join(key_columns)
+            placeholders = ", ".join(["%s"] * len(key_columns))
+            conditions.append(f"({columns}) > ({placeholders})")
+        params = after
+    query = select
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY " + ", ".join(key_columns) + " LIMIT %s"
+    return query, params
+
+def keyset_cursor(rows, key_columns, limit):
+    """
+    Return (page_rows, next_cursor) from up to limit + 1 fetched rows
+    Rows may be dictionaries or model objects; next_cursor is None when
+    there is no further page
+    """
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    names = [column.split('.')[-1] for column in key_columns]
+    if isinstance(last, dict):
+        return rows[:limit], tuple(last[name] for name in names)
+    return rows[:limit], tuple(getattr(last, name) for name in names)
+
+def transaction(immediate=False):
+    """
+    Open a unit of work spanning every service call in this thread
+        with db.transaction():
+            patient = PatientService().add_patient(patient)
+            BillingService().create_bill(patient.patient_id, 150.0, "Registration")
+    Service commits are deferred and the whole block commits once on exit,
+    or rolls back atomically if an exception escapes it. immediate=True
+    starts it with BEGIN IMMEDIATE on SQLite, for check-then-write units
+    """
+    return Transaction(get_pool(), immediate)
 
 def create_connection():
-    """Returns a fully functional mock database connection for demo"""
-    print("✅ Using MOCK database (no MySQL required for demo)")
-    return MockConnection()
\ No newline at end of file
+    """
+    Returns a connection handle backed by the shared connection pool
+    With a read replica configured, read-only statements outside a
+    transaction go to the replica pool
+    """
+    if replica_configured():
+        return RoutingConnection(
+            PooledConnection(get_pool()),
+            PooledConnection(get_replica_pool()),
+            read_your_writes=DB_CONFIG['read_your_writes'],
+        )
+    return PooledConnection(get_pool())
\ No newline at end of file
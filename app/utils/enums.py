@@ -0,0 +1,120 @@
+"""
+Dictionary-encoded enumerations for Hospital Management System
+Low-cardinality text columns (statuses, gender, role) are held as small
+integer codes into a shared lookup table, so every row refers to one
+canonical string and filters compare integers. Specialization is free
+text, so its table learns values as rows are mapped and stops adding
+codes once it is full
+"""
+
+import sys
+import threading
+
+# Code 0 is reserved for NULL in every table
+NULL = 0
+
+# Codes a table hands out at most, NULL included
+MAX_CODES = 256
+
+
+class _Shared(dict):
+    """value -> shared string; values never seen map to themselves"""
+
+    def __missing__(self, value):
+        return value
+
+
+class _Learned(_Shared):
+    """_Shared that gives an unseen value a code while its table has room"""
+
+    def __init__(self, table):
+        super().__init__()
+        self.table = table
+
+    def __missing__(self, value):
+        if value is None or len(self.table) >= self.table.max_size:
+            return value
+        try:
+            self.table.code(value)
+        except ValueError:
+            return value
+        return self.get(value, value)
+
+
+class CodeTable:
+    """
+    Two-way mapping between the values of one column and small int codes.
+
+    Codes are handed out in first-seen order and never change, so they
+    can be stored in indexes. Values outside `known` still get a code;
+    validation decides whether they are acceptable. A table holds at most
+    max_size codes, so stray values cannot grow it without bound.
+
+    With learn, mapping a value through .shared also gives it a code while
+    the table has room; values seen after that pass through unchanged.
+    """
+
+    def __init__(self, name, known=(), max_size=MAX_CODES, learn=False):
+        self.name = name
+        self.known = tuple(known)
+        self.max_size = max_size
+        self.values = [None]
+        self._codes = {None: NULL}
+        self.shared = _Learned(self) if learn else _Shared()
+        self._lock = threading.Lock()
+        for value in self.known:
+            self.code(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, value):
+        return value in self._codes
+
+    def code(self, value):
+        """Return the code of value, assigning the next free one if it is new"""
+        code = self._codes.get(value)
+        if code is None:
+            if not isinstance(value, str):
+                value = str(value)
+                code = self._codes.get(value)
+                if code is not None:
+                    return code
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    if code >= self.max_size:
+                        raise ValueError(f"Too many distinct {self.name} values")
+                    self.values.append(sys.intern(value))
+                    self.shared[value] = self.values[code]
+                    self._codes[value] = code
+        return code
+
+    def lookup(self, value):
+        """Return the code of value, or None if it was never seen"""
+        code = self._codes.get(value)
+        if code is None and value is not None and not isinstance(value, str):
+            code = self._codes.get(str(value))
+        return code
+
+    def canonical(self, value):
+        """Return the shared string equal to value, or value itself if it has no code"""
+        return self.shared[value]
+
+    def value(self, code):
+        """Return the canonical string for code"""
+        return self.values[code]
+
+    def codes(self, *values):
+        """Return the set of codes for values, skipping ones never seen"""
+        found = {self.lookup(value) for value in values}
+        found.discard(None)
+        return found
+
+
+GENDER = CodeTable('gender', ['M', 'F', 'Other'])
+APPOINTMENT_STATUS = CodeTable('appointment_status', ['Scheduled', 'Completed', 'Cancelled'])
+PAYMENT_STATUS = CodeTable('payment_status', ['Unpaid', 'Paid'])
+ROLE = CodeTable('role', ['admin', 'doctor', 'receptionist'])
+SPECIALIZATION = CodeTable('specialization', learn=True)
@@ -3,8 +3,8 @@ Helper functions for the Hospital Management System
 """
 
 import datetime
-import re
 from tkinter import messagebox
+from app.utils.validation import EMAIL_RE, PHONE_RE
 
 def format_date(date_str):
     """Format date string to YYYY-MM-DD format"""
@@ -23,13 +23,11 @@ def format_date(date_str):
 
 def validate_email(email):
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_RE.match(email) is not None
 
 def validate_phone(phone):
     """Validate phone number format"""
-    pattern = r'^[0-9+\s\-()]{10,15}$'
-    return re.match(pattern, phone) is not None
+    return PHONE_RE.match(phone) is not None
 
 def show_success(message):
     """Show success message dialog"""
@@ -0,0 +1,158 @@
+"""
+Per-key interval index for calendar conflict checks
+Each key (a doctor) keeps its intervals sorted by start, so the intervals
+overlapping a proposed booking are found with one binary search and a
+short backward scan, however much history the key has. Times are whole
+minutes (see to_minutes)
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+
+from app.utils.cache import SnapshotIndex
+
+_EPOCH = datetime(1, 1, 1)
+
+
+def parse_datetime(value):
+    """Return value (datetime, date or ISO string) as a datetime"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Invalid date and time: {value!r}") from None
+
+
+def to_minutes(value):
+    """Return a date and time as whole minutes since 0001-01-01"""
+    moment = parse_datetime(value)
+    return (moment.toordinal() - 1) * 1440 + moment.hour * 60 + moment.minute
+
+
+def from_minutes(minutes):
+    """Inverse of to_minutes"""
+    return _EPOCH + timedelta(minutes=minutes)
+
+
+class _Calendar:
+    __slots__ = ('starts', 'items', 'longest')
+
+    def __init__(self):
+        self.starts = []        # ascending start of each item
+        self.items = []         # (start, end, item_id), in the same order
+        self.longest = 0        # longest duration ever stored, bounds the scan
+
+
+class IntervalIndex(SnapshotIndex):
+    """
+    Half-open [start, end) intervals grouped by key.
+
+    Intervals of one key may overlap (legacy data does); lookups only
+    assume that no stored interval is longer than the longest one seen,
+    so they scan back from the query end no further than that.
+    """
+
+    def _reset(self):
+        self._calendars = {}    # key -> _Calendar
+        self._where = {}        # item_id -> (key, start)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, item_id):
+        return item_id in self._where
+
+    # -- maintenance --------------------------------------------------------
+
+    def _fill(self, entries):
+        """Add (item_id, key, start, end) tuples"""
+        for entry in entries:
+            self._add(*entry)
+
+    def put(self, item_id, key, start, end):
+        """Store an interval, replacing the earlier one of item_id"""
+        with self._lock:
+            if self._changed():
+                self._discard(item_id)
+                self._add(item_id, key, start, end)
+
+    def remove(self, item_id):
+        """Drop an interval; returns False if it was not stored"""
+        with self._lock:
+            self._changed()
+            return self._discard(item_id)
+
+    def _add(self, item_id, key, start, end):
+        if end <= start:
+            raise ValueError("Interval must end after it starts")
+        calendar = self._calendars.get(key)
+        if calendar is None:
+            calendar = self._calendars[key] = _Calendar()
+        position = bisect_right(calendar.starts, start)
+        calendar.starts.insert(position, start)
+        calendar.items.insert(position, (start, end, item_id))
+        if end - start > calendar.longest:
+            calendar.longest = end - start
+        self._where[item_id] = (key, start)
+
+    def _discard(self, item_id):
+        found = self._where.pop(item_id, None)
+        if found is None:
+            return False
+        key, start = found
+        calendar = self._calendars[key]
+        position = bisect_left(calendar.starts, start)
+        while calendar.items[position][2] != item_id:
+            position += 1
+        del calendar.starts[position]
+        del calendar.items[position]
+        if not calendar.items:
+            del self._calendars[key]
+        return True
+
+    # -- queries ------------------------------------------------------------
+
+    def overlapping(self, key, start, end, exclude=None):
+        """Return (start, end, item_id) of the intervals of key overlapping [start, end)"""
+        with self._lock:
+            calendar = self._calendars.get(key)
+            if calendar is None:
+                return []
+            starts, items = calendar.starts, calendar.items
+            # Only intervals starting before end can overlap, and none of
+            # them starts earlier than start - longest
+            found = []
+            earliest = start - calendar.longest
+            position = bisect_left(starts, end) - 1
+            while position >= 0 and starts[position] > earliest:
+                item = items[position]
+                if item[1] > start and item[2] != exclude:
+                    found.append(item)
+                position -= 1
+        found.reverse()
+        return found
+
+    def between(self, key, start, end):
+        """Return (start, end, item_id) of the intervals of key starting in [start, end)"""
+        with self._lock:
+            calendar = self._calendars.get(key)
+            if calendar is None:
+                return []
+            starts = calendar.starts
+            return calendar.items[bisect_left(starts, start):bisect_left(starts, end)]
+
+    def get(self, item_id):
+        """Return (key, start, end) of item_id, or None"""
+        with self._lock:
+            found = self._where.get(item_id)
+            if found is None:
+                return None
+            key, start = found
+            calendar = self._calendars[key]
+            position = bisect_left(calendar.starts, start)
+            while calendar.items[position][2] != item_id:
+                position += 1
+            return key, start, calendar.items[position][1]
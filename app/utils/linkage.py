@@ -0,0 +1,260 @@
+"""
+Record linkage for finding duplicate patients
+Records are grouped into blocks that share a date of birth, a phone
+suffix or a name soundex, and only pairs inside a block are scored, so
+the work grows with the block sizes instead of with every pair of
+records. Blocks are scored in parallel on a process pool
+"""
+
+import csv
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from app.utils.validation import normalize_phone
+
+MergeCandidate = namedtuple('MergeCandidate', ['patient_id', 'other_id', 'score',
+                                               'name_score', 'dob_score', 'phone_score'])
+
+# Blocking key kinds, in the order pairs are attributed to them
+DOB, PHONE, NAME = 0, 1, 2
+PHONE_SUFFIX_DIGITS = 7
+
+# Weights of the field scores; they sum to 1
+NAME_WEIGHT, DOB_WEIGHT, PHONE_WEIGHT = 0.5, 0.25, 0.25
+
+_LETTERS_RE = re.compile(r'[^\W\d_]+')
+_NON_ASCII_LETTER_RE = re.compile(r'[^a-z]+')
+_SOUNDEX = str.maketrans('bfpvcgjkqsxzdtlmnr', '111122222222334556', 'aeiouyhw')
+_SEPARATORS = 'hw'
+
+
+def soundex(word):
+    """Return the four-character American Soundex code of word, or None"""
+    word = _NON_ASCII_LETTER_RE.sub('', word.lower()) if word else ''
+    if not word:
+        return None
+    code = word[0].upper()
+    previous = word[0].translate(_SOUNDEX)
+    for char in word[1:]:
+        digit = char.translate(_SOUNDEX)
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # Vowels separate repeated codes, h and w do not
+        if digit or char not in _SEPARATORS:
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def jaro_winkler(a, b):
+    """Return the Jaro-Winkler similarity of two strings, 0..1"""
+    if a == b:
+        return 1.0 if a else 0.0
+    len_a, len_b = len(a), len(b)
+    if not len_a or not len_b:
+        return 0.0
+    if len_a > len_b:
+        a, b, len_a, len_b = b, a, len_b, len_a
+    window = len_b // 2 - 1 if len_b > 3 else 0
+    taken = []
+    matched_a = []
+    for i, char in enumerate(a):
+        start = i - window if i > window else 0
+        end = i + window + 1
+        j = b.find(char, start, end)
+        while j in taken:
+            j = b.find(char, j + 1, end)
+        if j != -1:
+            taken.append(j)
+            matched_a.append(char)
+    matches = len(matched_a)
+    if not matches:
+        return 0.0
+    taken.sort()
+    transpositions = 0
+    for char, j in zip(matched_a, taken):
+        if char != b[j]:
+            transpositions += 1
+    transpositions //= 2
+    jaro = (matches / len_a + matches / len_b + (matches - transpositions) / matches) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def prepare(record_id, name, dob, contact):
+    """
+    Return the comparison form of a record:
+    (record_id, name, dob, phone, keys) where name is lowercase words in
+    sorted order and keys holds the blocking key of each kind (or None)
+    """
+    words = sorted(_LETTERS_RE.findall(name.lower())) if name else []
+    phone = normalize_phone(contact)
+    dob = str(dob) if dob else None
+    name_key = None
+    if name:
+        # Surname and first-name soundex together keep common surnames apart
+        written = _LETTERS_RE.findall(name.lower())
+        sound = soundex(written[-1]) if written else None
+        if sound:
+            name_key = sound + (soundex(written[0]) or '') if len(written) > 1 else sound
+    keys = [dob, phone[-PHONE_SUFFIX_DIGITS:] if phone else None, name_key]
+    return (record_id, ' '.join(words), dob, phone, keys)
+
+
+def _dob_score(a, b):
+    if a is None or b is None:
+        return 0.0
+    if a == b:
+        return 1.0
+    if len(a) != len(b):
+        return 0.0
+    # One mistyped digit, or day and month swapped (YYYY-MM-DD)
+    head, tail = len(a) // 2, len(a) - len(a) // 2
+    if a[:head] == b[:head]:
+        if sum(x != y for x, y in zip(a[head:], b[head:])) == 1:
+            return 0.5
+        if len(a) == 10 and a[5:7] == b[8:10] and a[8:10] == b[5:7]:
+            return 0.5
+    elif a[-tail:] == b[-tail:] and sum(x != y for x, y in zip(a[:head], b[:head])) == 1:
+        return 0.5
+    return 0.0
+
+
+def _phone_score(a, b):
+    if a is None or b is None:
+        return 0.0
+    if a == b:
+        return 1.0
+    return 0.5 if a[-PHONE_SUFFIX_DIGITS:] == b[-PHONE_SUFFIX_DIGITS:] else 0.0
+
+
+def score_pair(a, b, threshold=0.0):
+    """Return the MergeCandidate for two prepared records, or None below threshold"""
+    dob = _dob_score(a[2], b[2])
+    phone = _phone_score(a[3], b[3])
+    partial = DOB_WEIGHT * dob + PHONE_WEIGHT * phone
+    if partial + NAME_WEIGHT < threshold:
+        return None
+    name = jaro_winkler(a[1], b[1])
+    score = partial + NAME_WEIGHT * name
+    if score < threshold:
+        return None
+    first, second = (a[0], b[0]) if a[0] < b[0] else (b[0], a[0])
+    return MergeCandidate(first, second, round(score, 4), round(name, 4), dob, phone)
+
+
+def _score_blocks(blocks, threshold):
+    """Score the pairs of each (kind, records) block; runs in pool workers"""
+    found = []
+    for kind, records in blocks:
+        for i, a in enumerate(records):
+            earlier = [(k, key) for k, key in enumerate(a[4][:kind]) if key is not None]
+            for b in records[i + 1:]:
+                # A pair that also shares an earlier kind of key is scored there
+                if earlier and any(b[4][k] == key for k, key in earlier):
+                    continue
+                candidate = score_pair(a, b, threshold)
+                if candidate is not None:
+                    found.append(candidate)
+    return found
+
+
+def make_blocks(records, max_block=1000):
+    """
+    Group prepared records into blocks of two or more per key
+    Returns ([(kind, records)], skipped) where skipped counts blocks over
+    max_block; their key is cleared so other kinds still pair the records
+    """
+    blocks = []
+    skipped = 0
+    for kind in (DOB, PHONE, NAME):
+        groups = {}
+        for record in records:
+            key = record[4][kind]
+            if key is not None:
+                groups.setdefault(key, []).append(record)
+        for members in groups.values():
+            if len(members) > max_block:
+                skipped += 1
+                for record in members:
+                    record[4][kind] = None
+            elif len(members) > 1:
+                blocks.append((kind, members))
+    return blocks, skipped
+
+
+def _batches(blocks, batch_pairs):
+    batch, pairs = [], 0
+    for block in blocks:
+        batch.append(block)
+        pairs += len(block[1]) * (len(block[1]) - 1) // 2
+        if pairs >= batch_pairs:
+            yield batch
+            batch, pairs = [], 0
+    if batch:
+        yield batch
+
+
+def find_candidates(records, threshold=0.7, workers=None, max_block=1000, batch_pairs=200000):
+    """
+    Return merge candidates among (record_id, name, dob, contact) records
+    Candidates score at least threshold and come best first. workers is
+    the process count (None for one per CPU, 1 to score in this process)
+    """
+    if not 0 <= threshold <= 1:
+        raise ValueError("Threshold must be between 0 and 1")
+    prepared = [prepare(*record) for record in records]
+    blocks, _ = make_blocks(prepared, max_block)
+    # Large blocks first so the pool does not end on one long task
+    blocks.sort(key=lambda block: len(block[1]), reverse=True)
+    batches = list(_batches(blocks, batch_pairs))
+
+    found = []
+    if workers == 1 or len(batches) < 2:
+        for batch in batches:
+            found.extend(_score_blocks(batch, threshold))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_score_blocks, batches, [threshold] * len(batches)):
+                found.extend(result)
+    found.sort(key=lambda c: (-c.score, c.patient_id, c.other_id))
+    return found
+
+
+def clusters(candidates):
+    """Group linked record ids into sorted clusters, largest first"""
+    parent = {}
+
+    def root(record_id):
+        parent.setdefault(record_id, record_id)
+        while parent[record_id] != record_id:
+            parent[record_id] = parent[parent[record_id]]
+            record_id = parent[record_id]
+        return record_id
+
+    for candidate in candidates:
+        first, second = root(candidate.patient_id), root(candidate.other_id)
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+    groups = {}
+    for record_id in parent:
+        groups.setdefault(root(record_id), []).append(record_id)
+    return sorted((sorted(group) for group in groups.values()), key=lambda group: (-len(group), group[0]))
+
+
+def write_report(candidates, file):
+    """Write candidates as CSV, with the cluster each pair belongs to"""
+    cluster_of = {}
+    for number, group in enumerate(clusters(candidates), start=1):
+        for record_id in group:
+            cluster_of[record_id] = number
+    writer = csv.writer(file)
+    writer.writerow(('cluster',) + MergeCandidate._fields)
+    for candidate in candidates:
+        writer.writerow((cluster_of[candidate.patient_id],) + tuple(candidate))
@@ -0,0 +1,1849 @@
+"""
+In-memory table engine used by the mock database backend
+Stores rows per table with a hash index on the primary key, optional
+secondary indexes, and runs the parameterized SQL the services issue
+"""
+
+import bisect
+import itertools
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from app.utils.enums import APPOINTMENT_STATUS, GENDER, PAYMENT_STATUS, ROLE, CodeTable
+
+
+class DatabaseError(Exception):
+    """Base class for errors raised by the in-memory engine"""
+
+
+class ProgrammingError(DatabaseError):
+    """Raised for SQL the engine cannot parse or that references unknown names"""
+
+
+class IntegrityError(DatabaseError):
+    """Raised when a statement would violate a primary key"""
+
+
+# Table definitions: columns as (name, python type), first column is the key.
+# A CodeTable in place of the type stores the column dictionary-encoded.
+# 'indexes' are hash indexes for equality lookups; 'ordered_indexes' keep
+# entries sorted by their columns plus the key, for ORDER BY and keyset paging
+DEFAULT_TABLES = {
+    'patients': {
+        'columns': [('patient_id', int), ('name', str), ('dob', str), ('gender', GENDER),
+                    ('contact', str), ('address', str), ('normalized_contact', str)],
+        'indexes': [('contact',), ('normalized_contact',)],
+        'ordered_indexes': [('name',)],
+    },
+    'doctors': {
+        'columns': [('doctor_id', int), ('name', str), ('specialization', str),
+                    ('contact', str), ('email', str)],
+        'indexes': [('specialization',), ('email',)],
+        'ordered_indexes': [('name',)],
+    },
+    'appointments': {
+        'columns': [('appointment_id', int), ('patient_id', int), ('doctor_id', int),
+                    ('appointment_date', str), ('status', APPOINTMENT_STATUS),
+                    ('duration_minutes', int)],
+        'indexes': [('patient_id',), ('doctor_id',)],
+        'ordered_indexes': [('doctor_id', 'appointment_date'), ('patient_id', 'appointment_date'),
+                            ('appointment_date',)],
+    },
+    'billing': {
+        'columns': [('bill_id', int), ('patient_id', int), ('amount', float),
+                    ('description', str), ('payment_status', PAYMENT_STATUS), ('date_issued', str),
+                    ('payment_date', str)],
+        'indexes': [('patient_id',), ('payment_status',)],
+        'ordered_indexes': [('patient_id', 'date_issued'), ('payment_status', 'date_issued')],
+    },
+    'medical_records': {
+        'columns': [('record_id', int), ('patient_id', int), ('doctor_id', int),
+                    ('diagnosis', str), ('prescription', str), ('visit_date', str)],
+        'indexes': [('patient_id',)],
+    },
+    'users': {
+        'columns': [('user_id', int), ('username', str), ('password', str), ('role', ROLE)],
+        'indexes': [('username',)],
+    },
+}
+
+
+class HashIndex:
+    """Secondary index mapping a column value (or tuple of values) to primary keys"""
+
+    def __init__(self, positions):
+        self.positions = positions
+        self.buckets = {}
+        if len(positions) == 1:
+            position = positions[0]
+            self.key_of = lambda row: row[position]
+        else:
+            self.key_of = lambda row: tuple(row[p] for p in positions)
+
+    def add(self, pk, row):
+        self.buckets.setdefault(self.key_of(row), set()).add(pk)
+
+    def remove(self, pk, row):
+        key = self.key_of(row)
+        bucket = self.buckets.get(key)
+        if bucket is not None:
+            bucket.discard(pk)
+            if not bucket:
+                del self.buckets[key]
+
+    def lookup(self, key):
+        return self.buckets.get(key, ())
+
+
+class _Top:
+    """Sorts after every other value; used to build exclusive range bounds"""
+
+    def __eq__(self, other):
+        return other is self
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return other is self
+
+    def __gt__(self, other):
+        return other is not self
+
+    def __ge__(self, other):
+        return True
+
+    __hash__ = object.__hash__
+
+
+TOP = _Top()
+
+
+class SortedList:
+    """
+    Sorted sequence stored as a list of bounded sublists, so inserts and
+    removals cost O(log n + load) instead of shifting one huge list
+    """
+
+    LOAD = 512
+
+    def __init__(self):
+        self._lists = []
+        self._maxes = []
+        self.version = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, value):
+        lists, maxes = self._lists, self._maxes
+        if not maxes:
+            lists.append([value])
+            maxes.append(value)
+        else:
+            pos = bisect.bisect_left(maxes, value)
+            if pos == len(maxes):
+                pos -= 1
+                lists[pos].append(value)
+                maxes[pos] = value
+            else:
+                bisect.insort(lists[pos], value)
+            if len(lists[pos]) > 2 * self.LOAD:
+                sublist = lists[pos]
+                half = sublist[self.LOAD:]
+                del sublist[self.LOAD:]
+                maxes[pos] = sublist[-1]
+                lists.insert(pos + 1, half)
+                maxes.insert(pos + 1, half[-1])
+        self.size += 1
+        self.version += 1
+
+    def remove(self, value):
+        maxes = self._maxes
+        pos = bisect.bisect_left(maxes, value)
+        if pos == len(maxes):
+            return
+        sublist = self._lists[pos]
+        i = bisect.bisect_left(sublist, value)
+        if i == len(sublist) or sublist[i] != value:
+            return
+        del sublist[i]
+        if sublist:
+            maxes[pos] = sublist[-1]
+        else:
+            del self._lists[pos]
+            del maxes[pos]
+        self.size -= 1
+        self.version += 1
+
+    def irange(self, low=None, high=None, reverse=False):
+        """
+        Yield values v with low <= v < high (either bound may be None).
+        Safe against changes made while the generator is suspended.
+        """
+        if reverse:
+            yield from self._irange_reverse(low, high)
+            return
+        value = low
+        inclusive = True
+        while True:
+            version = self.version
+            lists, maxes = self._lists, self._maxes
+            if value is None:
+                pos, i = 0, 0
+            else:
+                find = bisect.bisect_left if inclusive else bisect.bisect_right
+                pos = find(maxes, value)
+                if pos == len(maxes):
+                    return
+                i = find(lists[pos], value)
+            while pos < len(lists):
+                sublist = lists[pos]
+                while i < len(sublist):
+                    value = sublist[i]
+                    if high is not None and not value < high:
+                        return
+                    yield value
+                    if self.version != version:
+                        break
+                    i += 1
+                else:
+                    pos += 1
+                    i = 0
+                    continue
+                break
+            else:
+                return
+            inclusive = False
+
+    def _irange_reverse(self, low, high):
+        value = high
+        inclusive = False
+        while True:
+            version = self.version
+            lists, maxes = self._lists, self._maxes
+            if not maxes:
+                return
+            if value is None:
+                pos = len(lists) - 1
+                i = len(lists[pos]) - 1
+            else:
+                find = bisect.bisect_right if inclusive else bisect.bisect_left
+                pos = find(maxes, value)
+                if pos == len(maxes):
+                    pos -= 1
+                    i = len(lists[pos]) - 1
+                else:
+                    i = find(lists[pos], value) - 1
+            while pos >= 0:
+                sublist = lists[pos]
+                while i >= 0:
+                    value = sublist[i]
+                    if low is not None and value < low:
+                        return
+                    yield value
+                    if self.version != version:
+                        break
+                    i -= 1
+                else:
+                    pos -= 1
+                    i = len(lists[pos]) - 1 if pos >= 0 else -1
+                    continue
+                break
+            else:
+                return
+            inclusive = False
+
+
+class OrderedIndex:
+    """
+    Secondary index kept sorted by (columns..., primary key).
+    NULLs sort first; entries wrap each value as (is_not_null, value).
+    """
+
+    def __init__(self, positions):
+        self.positions = positions
+        self.entries = SortedList()
+
+    def entry(self, pk, row):
+        return tuple((row[p] is not None, row[p]) for p in self.positions) + (pk,)
+
+    def add(self, pk, row):
+        self.entries.add(self.entry(pk, row))
+
+    def remove(self, pk, row):
+        self.entries.remove(self.entry(pk, row))
+
+
+class Table:
+    """Rows of one table keyed by primary key, plus its indexes"""
+
+    def __init__(self, name, columns, indexes=(), ordered_indexes=()):
+        self.name = name
+        self.columns = [column for column, _ in columns]
+        # Encoded columns hold CodeTable codes in the rows; their type is str
+        self.codecs = {position: column_type for position, (_, column_type) in enumerate(columns)
+                       if isinstance(column_type, CodeTable)}
+        self.types = [str if position in self.codecs else column_type
+                      for position, (_, column_type) in enumerate(columns)]
+        self.positions = {column: i for i, column in enumerate(self.columns)}
+        self.primary_key = self.columns[0]
+        self.rows = {}          # primary key -> row tuple
+        self.keys = []          # primary keys in ascending order
+        self.version = 0        # bumped whenever keys is reshaped
+        self.next_id = 1
+        self.indexes = {}
+        self.ordered_indexes = {}
+        self._maintained = []
+        for index_columns in indexes:
+            self.create_index(index_columns)
+        for index_columns in ordered_indexes:
+            self.create_index(index_columns, ordered=True)
+
+    def create_index(self, columns, ordered=False):
+        """Declare a hash index, or an ordered one, on one or more columns"""
+        columns = tuple(columns)
+        registry = self.ordered_indexes if ordered else self.indexes
+        if columns in registry:
+            return
+        for column in columns:
+            if column not in self.positions:
+                raise ProgrammingError(f"Unknown column '{column}' in table '{self.name}'")
+        index_class = OrderedIndex if ordered else HashIndex
+        index = index_class([self.positions[c] for c in columns])
+        for pk, row in self.rows.items():
+            index.add(pk, row)
+        registry[columns] = index
+        self._maintained.append(index)
+
+    def coerce(self, position, value):
+        """Convert a value to what the row stores at position"""
+        value = _coerce(self.types[position], value)
+        codec = self.codecs.get(position)
+        return value if codec is None else codec.code(value)
+
+    def insert(self, values):
+        """Insert a row given as {column: value}; returns (pk, row)"""
+        positions = []
+        for column in values:
+            position = self.positions.get(column)
+            if position is None:
+                raise ProgrammingError(f"Unknown column '{column}' in table '{self.name}'")
+            positions.append(position)
+        return self.insert_at(positions, list(values.values()))
+
+    def insert_at(self, positions, values):
+        """Insert a row given as parallel lists of column positions and values"""
+        row = [None] * len(self.columns)
+        types = self.types
+        for position, value in zip(positions, values):
+            row[position] = value if value is None or type(value) is types[position] \
+                else _coerce(types[position], value)
+        for position, codec in self.codecs.items():
+            row[position] = codec.code(row[position])
+        pk = row[0]
+        if pk is None:
+            pk = row[0] = self.next_id
+        elif pk in self.rows:
+            raise IntegrityError(f"Duplicate entry '{pk}' for key '{self.primary_key}'")
+        if isinstance(pk, int) and pk >= self.next_id:
+            self.next_id = pk + 1
+        row = tuple(row)
+        self._store(pk, row)
+        return pk, row
+
+    def replace(self, pk, new_row):
+        """Swap the stored row for pk, keeping indexes in step"""
+        old_row = self.rows[pk]
+        for index in self._maintained:
+            index.remove(pk, old_row)
+            index.add(pk, new_row)
+        self.rows[pk] = new_row
+        return old_row
+
+    def delete(self, pk):
+        row = self.rows.pop(pk)
+        for index in self._maintained:
+            index.remove(pk, row)
+        position = bisect.bisect_left(self.keys, pk)
+        del self.keys[position]
+        self.version += 1
+        return row
+
+    def restore(self, pk, row):
+        """Put back a deleted row (used by rollback)"""
+        self._store(pk, row)
+
+    def scan_keys(self, low=None, low_inclusive=True, high=None, high_inclusive=True,
+                  reverse=False):
+        """
+        Yield primary keys in order within optional bounds.
+        Safe against inserts and deletes made while the generator is suspended.
+        """
+        keys = self.keys
+        if not reverse:
+            if low is None:
+                i = 0
+            elif low_inclusive:
+                i = bisect.bisect_left(keys, low)
+            else:
+                i = bisect.bisect_right(keys, low)
+            version = self.version
+            while i < len(keys):
+                pk = keys[i]
+                if high is not None and (pk > high or (pk == high and not high_inclusive)):
+                    return
+                yield pk
+                if self.version != version:
+                    version = self.version
+                    i = bisect.bisect_right(keys, pk)
+                else:
+                    i += 1
+        else:
+            if high is None:
+                i = len(keys) - 1
+            elif high_inclusive:
+                i = bisect.bisect_right(keys, high) - 1
+            else:
+                i = bisect.bisect_left(keys, high) - 1
+            version = self.version
+            while i >= 0:
+                if i >= len(keys):
+                    i = len(keys) - 1
+                    continue
+                pk = keys[i]
+                if low is not None and (pk < low or (pk == low and not low_inclusive)):
+                    return
+                yield pk
+                if self.version != version:
+                    version = self.version
+                    i = bisect.bisect_left(keys, pk) - 1
+                else:
+                    i -= 1
+
+    def _store(self, pk, row):
+        self.rows[pk] = row
+        keys = self.keys
+        if not keys or pk > keys[-1]:
+            keys.append(pk)
+        else:
+            bisect.insort(keys, pk)
+            self.version += 1
+        for index in self._maintained:
+            index.add(pk, row)
+
+
+def _coerce(column_type, value):
+    if value is None or isinstance(value, column_type):
+        return value
+    if column_type is float and isinstance(value, int):
+        return float(value)
+    try:
+        return column_type(value)
+    except (TypeError, ValueError):
+        return value
+
+
+# ---------------------------------------------------------------------------
+# SQL parsing
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<number>\d+\.\d*|\.\d+|\d+)
+  | (?P<param>%s)
+  | (?P<name>[A-Za-z_][A-Za-z_0-9]*|`[^`]+`)
+  | (?P<op><=|>=|<>|!=|[=<>(),.*;])
+""", re.VERBOSE)
+
+_KEYWORDS = {
+    'SELECT', 'FROM', 'WHERE', 'AND', 'OR', 'NOT', 'IN', 'IS', 'NULL', 'LIKE',
+    'BETWEEN', 'ORDER', 'BY', 'ASC', 'DESC', 'LIMIT', 'OFFSET', 'INSERT', 'INTO',
+    'VALUES', 'UPDATE', 'SET', 'DELETE', 'JOIN', 'INNER', 'ON', 'AS', 'GROUP',
+    'TRUE', 'FALSE', 'DISTINCT', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'TO',
+}
+
+_AGGREGATES = {'COUNT', 'SUM', 'MIN', 'MAX', 'AVG'}
+
+
+def _tokenize(sql):
+    tokens = []
+    position = 0
+    params = 0
+    while position < len(sql):
+        match = _TOKEN_RE.match(sql, position)
+        if not match:
+            raise ProgrammingError(f"Unexpected character {sql[position]!r} in SQL")
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'space':
+            continue
+        if kind == 'string':
+            tokens.append(('lit', text[1:-1].replace("''", "'")))
+        elif kind == 'number':
+            tokens.append(('lit', float(text) if '.' in text else int(text)))
+        elif kind == 'param':
+            tokens.append(('param', params))
+            params += 1
+        elif kind == 'name':
+            if text.startswith('`'):
+                tokens.append(('name', text[1:-1]))
+            elif text.upper() in _KEYWORDS:
+                tokens.append(('kw', text.upper()))
+            else:
+                tokens.append(('name', text))
+        else:
+            tokens.append(('op', text))
+    tokens.append(('end', None))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser for the SQL subset the services use"""
+
+    def __init__(self, sql):
+        self.tokens = _tokenize(sql)
+        self.position = 0
+
+    # token helpers
+    def peek(self, offset=0):
+        return self.tokens[self.position + offset]
+
+    def next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def accept(self, kind, value=None):
+        token = self.peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.position += 1
+            return token
+        return None
+
+    def expect(self, kind, value=None):
+        token = self.accept(kind, value)
+        if token is None:
+            found = self.peek()[1]
+            raise ProgrammingError(f"Expected {value or kind} but found {found!r}")
+        return token
+
+    def keyword(self, *words):
+        for word in words:
+            self.expect('kw', word)
+
+    def name(self):
+        return self.expect('name')[1]
+
+    # statements
+    def parse(self):
+        token = self.peek()
+        if token == ('kw', 'SELECT'):
+            statement = self.select()
+        elif token == ('kw', 'INSERT'):
+            statement = self.insert()
+        elif token == ('kw', 'UPDATE'):
+            statement = self.update()
+        elif token == ('kw', 'DELETE'):
+            statement = self.delete()
+        elif token[0] == 'kw' and token[1] in ('SAVEPOINT', 'RELEASE', 'ROLLBACK'):
+            statement = self.savepoint()
+        else:
+            raise ProgrammingError(f"Unsupported statement starting with {token[1]!r}")
+        self.accept('op', ';')
+        if self.peek()[0] != 'end':
+            raise ProgrammingError(f"Unexpected {self.peek()[1]!r} after end of statement")
+        return statement
+
+    def savepoint(self):
+        if self.accept('kw', 'SAVEPOINT'):
+            return {'type': 'savepoint', 'action': 'set', 'name': self.name()}
+        if self.accept('kw', 'RELEASE'):
+            action = 'release'
+        else:
+            self.keyword('ROLLBACK', 'TO')
+            action = 'rollback'
+        self.accept('kw', 'SAVEPOINT')
+        return {'type': 'savepoint', 'action': action, 'name': self.name()}
+
+    def select(self):
+        self.keyword('SELECT')
+        distinct = bool(self.accept('kw', 'DISTINCT'))
+        items = [self.select_item()]
+        while self.accept('op', ','):
+            items.append(self.select_item())
+        sources = []
+        joins = []
+        if self.accept('kw', 'FROM'):
+            sources.append(self.table_ref())
+            while self.peek() in (('kw', 'JOIN'), ('kw', 'INNER')):
+                self.accept('kw', 'INNER')
+                self.keyword('JOIN')
+                sources.append(self.table_ref())
+                self.keyword('ON')
+                joins.append(self.expr())
+        where = self.expr() if self.accept('kw', 'WHERE') else None
+        group_by = []
+        if self.accept('kw', 'GROUP'):
+            self.keyword('BY')
+            group_by.append(self.expr())
+            while self.accept('op', ','):
+                group_by.append(self.expr())
+        order_by = []
+        if self.accept('kw', 'ORDER'):
+            self.keyword('BY')
+            order_by.append(self.order_item())
+            while self.accept('op', ','):
+                order_by.append(self.order_item())
+        limit = offset = None
+        if self.accept('kw', 'LIMIT'):
+            limit = self.value_token()
+            if self.accept('op', ','):
+                offset, limit = limit, self.value_token()
+            elif self.accept('kw', 'OFFSET'):
+                offset = self.value_token()
+        return {
+            'type': 'select', 'items': items, 'distinct': distinct, 'sources': sources,
+            'joins': joins, 'where': where, 'group_by': group_by,
+            'order_by': order_by, 'limit': limit, 'offset': offset,
+        }
+
+    def select_item(self):
+        if self.accept('op', '*'):
+            return ('star', None)
+        if self.peek()[0] == 'name' and self.peek(1) == ('op', '.') and self.peek(2) == ('op', '*'):
+            qualifier = self.name()
+            self.position += 2
+            return ('star', qualifier)
+        expression = self.expr()
+        alias = None
+        if self.accept('kw', 'AS'):
+            alias = self.name()
+        elif self.peek()[0] == 'name':
+            alias = self.name()
+        return ('expr', expression, alias)
+
+    def table_ref(self):
+        table = self.name()
+        alias = table
+        if self.accept('kw', 'AS'):
+            alias = self.name()
+        elif self.peek()[0] == 'name':
+            alias = self.name()
+        return (table, alias)
+
+    def order_item(self):
+        expression = self.expr()
+        descending = False
+        if self.accept('kw', 'DESC'):
+            descending = True
+        else:
+            self.accept('kw', 'ASC')
+        return (expression, descending)
+
+    def value_token(self):
+        token = self.next()
+        if token[0] == 'param':
+            return ('param', token[1])
+        if token[0] == 'lit' and isinstance(token[1], int):
+            return ('lit', token[1])
+        raise ProgrammingError(f"Expected a number but found {token[1]!r}")
+
+    def insert(self):
+        self.keyword('INSERT', 'INTO')
+        table = self.name()
+        columns = None
+        if self.accept('op', '('):
+            columns = [self.name()]
+            while self.accept('op', ','):
+                columns.append(self.name())
+            self.expect('op', ')')
+        self.keyword('VALUES')
+        rows = [self.value_list()]
+        while self.accept('op', ','):
+            rows.append(self.value_list())
+        return {'type': 'insert', 'table': table, 'columns': columns, 'rows': rows}
+
+    def value_list(self):
+        self.expect('op', '(')
+        values = [self.expr()]
+        while self.accept('op', ','):
+            values.append(self.expr())
+        self.expect('op', ')')
+        return values
+
+    def update(self):
+        self.keyword('UPDATE')
+        table = self.table_ref()
+        self.keyword('SET')
+        assignments = [self.assignment()]
+        while self.accept('op', ','):
+            assignments.append(self.assignment())
+        where = self.expr() if self.accept('kw', 'WHERE') else None
+        return {'type': 'update', 'source': table, 'assignments': assignments, 'where': where}
+
+    def assignment(self):
+        column = self.name()
+        if self.accept('op', '.'):
+            column = self.name()
+        self.expect('op', '=')
+        return (column, self.expr())
+
+    def delete(self):
+        self.keyword('DELETE', 'FROM')
+        table = self.table_ref()
+        where = self.expr() if self.accept('kw', 'WHERE') else None
+        return {'type': 'delete', 'source': table, 'where': where}
+
+    # expressions
+    def expr(self):
+        terms = [self.and_expr()]
+        while self.accept('kw', 'OR'):
+            terms.append(self.and_expr())
+        return terms[0] if len(terms) == 1 else ('or', terms)
+
+    def and_expr(self):
+        terms = [self.not_expr()]
+        while self.accept('kw', 'AND'):
+            terms.append(self.not_expr())
+        return terms[0] if len(terms) == 1 else ('and', terms)
+
+    def not_expr(self):
+        if self.accept('kw', 'NOT'):
+            return ('not', self.not_expr())
+        return self.predicate()
+
+    def predicate(self):
+        left = self.primary()
+        token = self.peek()
+        if token[0] == 'op' and token[1] in ('=', '<>', '!=', '<', '<=', '>', '>='):
+            self.position += 1
+            op = '!=' if token[1] == '<>' else token[1]
+            return ('cmp', op, left, self.primary())
+        if self.accept('kw', 'IS'):
+            negate = bool(self.accept('kw', 'NOT'))
+            self.keyword('NULL')
+            return ('isnull', left, negate)
+        negate = bool(self.accept('kw', 'NOT'))
+        if self.accept('kw', 'IN'):
+            return ('in', left, self.value_list(), negate)
+        if self.accept('kw', 'LIKE'):
+            return ('like', left, self.primary(), negate)
+        if self.accept('kw', 'BETWEEN'):
+            low = self.primary()
+            self.keyword('AND')
+            return ('between', left, low, self.primary(), negate)
+        if negate:
+            raise ProgrammingError("Expected IN, LIKE or BETWEEN after NOT")
+        return left
+
+    def primary(self):
+        token = self.next()
+        kind, value = token
+        if kind == 'param':
+            return ('param', value)
+        if kind == 'lit':
+            return ('lit', value)
+        if token == ('kw', 'NULL'):
+            return ('lit', None)
+        if token == ('kw', 'TRUE'):
+            return ('lit', 1)
+        if token == ('kw', 'FALSE'):
+            return ('lit', 0)
+        if token == ('op', '('):
+            items = [self.expr()]
+            while self.accept('op', ','):
+                items.append(self.expr())
+            self.expect('op', ')')
+            return items[0] if len(items) == 1 else ('tuple', items)
+        if kind == 'name':
+            if self.accept('op', '('):
+                function = value.upper()
+                if self.accept('op', '*'):
+                    args = '*'
+                else:
+                    distinct = bool(self.accept('kw', 'DISTINCT'))
+                    args = [self.expr()]
+                    while self.accept('op', ','):
+                        args.append(self.expr())
+                    if distinct:
+                        function += ' DISTINCT'
+                self.expect('op', ')')
+                return ('func', function, args)
+            if self.accept('op', '.'):
+                return ('col', value, self.name())
+            return ('col', None, value)
+        raise ProgrammingError(f"Unexpected {value!r} in expression")
+
+
+@lru_cache(maxsize=512)
+def parse(sql):
+    """Parse one SQL statement into a plain-data syntax tree"""
+    return _Parser(sql).parse()
+
+
+# ---------------------------------------------------------------------------
+# Expression compilation
+# ---------------------------------------------------------------------------
+
+class _Scope:
+    """Resolves column references to (source index, column position)"""
+
+    def __init__(self, sources):
+        self.sources = sources      # list of (alias, Table)
+
+    def resolve(self, qualifier, column):
+        matches = []
+        for i, (alias, table) in enumerate(self.sources):
+            if qualifier is not None and qualifier not in (alias, table.name):
+                continue
+            if column in table.positions:
+                matches.append((i, table.positions[column], table.types[table.positions[column]]))
+        if not matches:
+            name = f"{qualifier}.{column}" if qualifier else column
+            raise ProgrammingError(f"Unknown column '{name}'")
+        if len(matches) > 1:
+            raise ProgrammingError(f"Column '{column}' is ambiguous")
+        return matches[0]
+
+    def codec(self, node):
+        """Return the CodeTable of an encoded column node, else None"""
+        if node[0] != 'col':
+            return None
+        source, position, _ = self.resolve(node[1], node[2])
+        return self.sources[source][1].codecs.get(position)
+
+
+def _column_type(node, scope):
+    if node[0] == 'col':
+        return scope.resolve(node[1], node[2])[2]
+    return None
+
+
+def _compile(node, scope):
+    """Compile a syntax node into fn(rows, params)"""
+    kind = node[0]
+    if kind == 'col':
+        source, position, _ = scope.resolve(node[1], node[2])
+        codec = scope.sources[source][1].codecs.get(position)
+        if codec is not None:
+            return _decoded(source, position, codec)
+        return lambda rows, params: rows[source][position]
+    if kind == 'param':
+        index = node[1]
+        return lambda rows, params: params[index]
+    if kind == 'lit':
+        value = node[1]
+        return lambda rows, params: value
+    if kind == 'tuple':
+        items = [_compile(item, scope) for item in node[1]]
+        return lambda rows, params: tuple(item(rows, params) for item in items)
+    if kind == 'cmp':
+        return _compile_compare(node[1], node[2], node[3], scope)
+    if kind == 'and':
+        terms = [_compile(term, scope) for term in node[1]]
+
+        def conjunction(rows, params):
+            result = True
+            for term in terms:
+                value = term(rows, params)
+                if value is False or value == 0:
+                    return False
+                if value is None:
+                    result = None
+            return result
+        return conjunction
+    if kind == 'or':
+        terms = [_compile(term, scope) for term in node[1]]
+
+        def disjunction(rows, params):
+            result = False
+            for term in terms:
+                value = term(rows, params)
+                if value is None:
+                    result = None
+                elif value:
+                    return True
+            return result
+        return disjunction
+    if kind == 'not':
+        term = _compile(node[1], scope)
+
+        def negation(rows, params):
+            value = term(rows, params)
+            return None if value is None else not value
+        return negation
+    if kind == 'isnull':
+        term = _compile(node[1], scope)
+        if node[2]:
+            return lambda rows, params: term(rows, params) is not None
+        return lambda rows, params: term(rows, params) is None
+    if kind == 'in':
+        if scope.codec(node[1]) is not None and all(_is_constant(item) for item in node[2]):
+            return _compile_code_membership(node, scope)
+        term = _compile(node[1], scope)
+        column_type = _column_type(node[1], scope)
+        items = [_compile_value(item, scope, column_type) for item in node[2]]
+        negate = node[3]
+
+        def membership(rows, params):
+            value = term(rows, params)
+            if value is None:
+                return None
+            found = any(value == item(rows, params) for item in items)
+            return not found if negate else found
+        return membership
+    if kind == 'like':
+        term = _compile(node[1], scope)
+        pattern = _compile(node[2], scope)
+        negate = node[3]
+
+        def like(rows, params):
+            value = term(rows, params)
+            if value is None:
+                return None
+            matched = _like_regex(pattern(rows, params)).match(str(value)) is not None
+            return not matched if negate else matched
+        return like
+    if kind == 'between':
+        term = node[1]
+        low = _compile_compare('>=', term, node[2], scope)
+        high = _compile_compare('<=', term, node[3], scope)
+        negate = node[4]
+
+        def between(rows, params):
+            inside = low(rows, params) and high(rows, params)
+            if inside is None:
+                return None
+            return not inside if negate else bool(inside)
+        return between
+    if kind == 'func':
+        raise ProgrammingError(f"Function {node[1]} is only supported in the select list")
+    raise ProgrammingError(f"Unsupported expression {kind}")
+
+
+def _compile_value(node, scope, column_type):
+    """Compile a value, coercing constants to the column type they are compared with"""
+    fn = _compile(node, scope)
+    if column_type is None or node[0] not in ('param', 'lit'):
+        return fn
+    return lambda rows, params: _coerce(column_type, fn(rows, params))
+
+
+def _decoded(source, position, codec):
+    """Read an encoded column back as its string value"""
+    values = codec.values
+    return lambda rows, params: values[rows[source][position]]
+
+
+def _compile_raw(node, scope):
+    """Like _compile, but an encoded column yields its code"""
+    if scope.codec(node) is None:
+        return _compile(node, scope)
+    source, position, _ = scope.resolve(node[1], node[2])
+    return lambda rows, params: rows[source][position]
+
+
+def _compile_code_membership(node, scope):
+    """IN over an encoded column: look the constants up once, compare codes"""
+    source, position, _ = scope.resolve(node[1][1], node[1][2])
+    codec = scope.codec(node[1])
+    items = [_compile(item, scope) for item in node[2]]
+    negate = node[3]
+
+    def membership(rows, params):
+        code = rows[source][position]
+        if not code:
+            return None
+        found = code in codec.codes(*(item(rows, params) for item in items))
+        return not found if negate else found
+    return membership
+
+
+def _compile_code_equality(op, column_node, value_node, scope):
+    """= or != between an encoded column and a constant, as an int comparison"""
+    source, position, _ = scope.resolve(column_node[1], column_node[2])
+    lookup = scope.codec(column_node).lookup
+    value = _compile(value_node, scope)
+    equal = op == '='
+
+    def comparison(rows, params):
+        code = rows[source][position]
+        constant = value(rows, params)
+        if not code or constant is None:
+            return None
+        return (code == lookup(constant)) is equal
+    return comparison
+
+
+def _compile_compare(op, left_node, right_node, scope):
+    if op in ('=', '!='):
+        if scope.codec(left_node) is not None and _is_constant(right_node):
+            return _compile_code_equality(op, left_node, right_node, scope)
+        if scope.codec(right_node) is not None and _is_constant(left_node):
+            return _compile_code_equality(op, right_node, left_node, scope)
+    if left_node[0] == 'tuple' and right_node[0] == 'tuple':
+        left_types = [_column_type(item, scope) for item in left_node[1]]
+        right_types = [_column_type(item, scope) for item in right_node[1]]
+        left_items = [_compile_value(item, scope, t) for item, t in zip(left_node[1], right_types)]
+        right_items = [_compile_value(item, scope, t) for item, t in zip(right_node[1], left_types)]
+        left = lambda rows, params: tuple(item(rows, params) for item in left_items)
+        right = lambda rows, params: tuple(item(rows, params) for item in right_items)
+    else:
+        left = _compile_value(left_node, scope, _column_type(right_node, scope))
+        right = _compile_value(right_node, scope, _column_type(left_node, scope))
+    compare = _OPERATORS[op]
+
+    def comparison(rows, params):
+        a = left(rows, params)
+        b = right(rows, params)
+        if a is None or b is None:
+            return None
+        if isinstance(a, tuple) and (None in a or None in b):
+            return None
+        try:
+            return compare(a, b)
+        except TypeError:
+            return compare(str(a), str(b))
+    return comparison
+
+
+_OPERATORS = {
+    '=': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+@lru_cache(maxsize=256)
+def _like_regex(pattern):
+    regex = ''.join(
+        '.*' if ch == '%' else '.' if ch == '_' else re.escape(ch)
+        for ch in str(pattern)
+    )
+    return re.compile(regex + r'\Z', re.IGNORECASE | re.DOTALL)
+
+
+def _conjuncts(node):
+    if node is None:
+        return []
+    if node[0] == 'and':
+        return [leaf for term in node[1] for leaf in _conjuncts(term)]
+    return [node]
+
+
+def _is_constant(node):
+    if node[0] in ('param', 'lit'):
+        return True
+    if node[0] == 'tuple':
+        return all(_is_constant(item) for item in node[1])
+    return False
+
+
+def _sort_key(value):
+    # NULLs sort first, as in MySQL and SQLite
+    return (value is not None, value)
+
+
+_FLIPPED = {'=': '=', '<': '>', '<=': '>=', '>': '<', '>=': '<=', '!=': '!='}
+
+
+# ---------------------------------------------------------------------------
+# Query planning and execution
+# ---------------------------------------------------------------------------
+
+class _AccessPlan:
+    """Index choices for reading rows of one table, decided from the WHERE clause"""
+
+    def __init__(self, table, source_index, conjuncts, scope):
+        self.table = table
+        self.pk_equal = []
+        self.pk_in = []
+        self.pk_ranges = []
+        self.index_equal = {}     # column -> value fn
+
+        pk_position = table.positions[table.primary_key]
+        for node in conjuncts:
+            if node[0] == 'cmp':
+                op, left, right = node[1], node[2], node[3]
+                column, value = self._column_and_value(left, right, source_index, scope)
+                if column is None:
+                    column, value = self._column_and_value(right, left, source_index, scope)
+                    op = _FLIPPED[op]
+                if column is None:
+                    continue
+                value_fn = self._constant(value, table, column)
+                if column == pk_position:
+                    if op == '=':
+                        self.pk_equal.append(value_fn)
+                    elif op in ('<', '<=', '>', '>='):
+                        self.pk_ranges.append((op, value_fn))
+                elif op == '=':
+                    self.index_equal.setdefault(table.columns[column], value_fn)
+            elif node[0] == 'in' and not node[3]:
+                column, _ = self._column_and_value(node[1], ('lit', None), source_index, scope)
+                if column == pk_position and all(_is_constant(item) for item in node[2]):
+                    self.pk_in = [self._constant(item, table, column) for item in node[2]]
+            elif node[0] == 'between' and not node[4]:
+                column, _ = self._column_and_value(node[1], node[2], source_index, scope)
+                if column == pk_position and _is_constant(node[2]) and _is_constant(node[3]):
+                    self.pk_ranges.append(('>=', self._constant(node[2], table, column)))
+                    self.pk_ranges.append(('<=', self._constant(node[3], table, column)))
+
+        self.hash_indexes = [
+            (columns, index) for columns, index in table.indexes.items()
+            if all(column in self.index_equal for column in columns)
+        ]
+
+    @staticmethod
+    def _column_and_value(column_node, value_node, source_index, scope):
+        if column_node[0] != 'col' or not _is_constant(value_node):
+            return None, None
+        source, position, _ = scope.resolve(column_node[1], column_node[2])
+        if source != source_index:
+            return None, None
+        return position, value_node
+
+    @staticmethod
+    def _constant(node, table, position):
+        fn = _compile(node, _Scope([]))
+        codec = table.codecs.get(position)
+        if codec is not None:
+            # Index keys hold codes; a value never stored matches nothing
+            return lambda params: codec.lookup(fn(None, params))
+        column_type = table.types[position]
+        return lambda params: _coerce(column_type, fn(None, params))
+
+    def keys(self, params, reverse=False):
+        """Return (iterable of primary keys, whether they come in key order)"""
+        table = self.table
+        if self.pk_equal:
+            values = {fn(params) for fn in self.pk_equal}
+            if len(values) != 1:
+                return [], True
+            pk = values.pop()
+            return ([pk] if pk in table.rows else []), True
+        if self.pk_in:
+            keys = sorted({fn(params) for fn in self.pk_in} & table.rows.keys(), reverse=reverse)
+            return keys, True
+        if self.hash_indexes:
+            best = None
+            for columns, index in self.hash_indexes:
+                if len(columns) == 1:
+                    key = self.index_equal[columns[0]](params)
+                else:
+                    key = tuple(self.index_equal[c](params) for c in columns)
+                bucket = index.lookup(key)
+                if best is None or len(bucket) < len(best):
+                    best = bucket
+            return sorted(best, reverse=reverse), True
+        low = high = None
+        low_inclusive = high_inclusive = True
+        for op, fn in self.pk_ranges:
+            value = fn(params)
+            if op in ('>', '>='):
+                inclusive = op == '>='
+                if low is None or value > low or (value == low and not inclusive):
+                    low, low_inclusive = value, inclusive
+            else:
+                inclusive = op == '<='
+                if high is None or value < high or (value == high and not inclusive):
+                    high, high_inclusive = value, inclusive
+        return table.scan_keys(low, low_inclusive, high, high_inclusive, reverse), True
+
+
+class _Join:
+    """Index nested-loop join step for one joined table"""
+
+    def __init__(self, table, source_index, condition, scope):
+        self.table = table
+        self.condition = _compile(condition, scope)
+        self.probe = None
+        for node in _conjuncts(condition):
+            if node[0] != 'cmp' or node[1] != '=' or node[2][0] != 'col' or node[3][0] != 'col':
+                continue
+            left = scope.resolve(node[2][1], node[2][2])
+            right = scope.resolve(node[3][1], node[3][2])
+            if right[0] == source_index and left[0] < source_index:
+                left, right = right, left
+            if left[0] == source_index and right[0] < source_index:
+                if table.codecs.get(left[1]) is not scope.sources[right[0]][1].codecs.get(right[1]):
+                    continue
+                column = table.columns[left[1]]
+                outer_source, outer_position = right[0], right[1]
+                if column == table.primary_key:
+                    self.probe = ('pk', outer_source, outer_position, None)
+                    break
+                if (column,) in table.indexes:
+                    self.probe = ('index', outer_source, outer_position, table.indexes[(column,)])
+
+    def matches(self, rows):
+        table = self.table
+        if self.probe is None:
+            candidates = table.scan_keys()
+        else:
+            kind, outer_source, outer_position, index = self.probe
+            value = rows[outer_source][outer_position]
+            if kind == 'pk':
+                candidates = [value] if value in table.rows else []
+            else:
+                candidates = sorted(index.lookup(value))
+        for pk in candidates:
+            row = table.rows.get(pk)
+            if row is not None:
+                yield row
+
+
+class _OrderedScan:
+    """
+    Reads primary keys in ORDER BY order from an ordered index: equality
+    conditions pin a prefix of the index columns, and range or row-value
+    conditions such as (name, patient_id) > (%s, %s) seek straight to the
+    first qualifying entry, so a keyset page costs the same at any depth
+    """
+
+    def __init__(self, index, prefix, lower, upper, descending):
+        self.index = index
+        self.prefix = prefix        # value fns for the equality prefix
+        self.lower = lower          # (op, [(wrap, fn)]) or None
+        self.upper = upper
+        self.descending = descending
+
+    @classmethod
+    def plan(cls, table, order_by, conjuncts, scope):
+        if len({descending for _, descending in order_by}) != 1:
+            return None
+        order_positions = []
+        for node, _ in order_by:
+            if node[0] != 'col':
+                return None
+            try:
+                source, position, _ = scope.resolve(node[1], node[2])
+            except ProgrammingError:
+                return None
+            if source != 0 or position in table.codecs:
+                # Codes are not in collation order
+                return None
+            order_positions.append(position)
+
+        equalities = {}
+        comparisons = []
+        for node in conjuncts:
+            if node[0] != 'cmp':
+                continue
+            op, left, right = node[1], node[2], node[3]
+            if _is_constant(left):
+                op, left, right = _FLIPPED[op], right, left
+            if not _is_constant(right):
+                continue
+            columns = left[1] if left[0] == 'tuple' else [left]
+            values = right[1] if right[0] == 'tuple' else [right]
+            if len(columns) != len(values) or any(c[0] != 'col' for c in columns):
+                continue
+            resolved = [scope.resolve(c[1], c[2]) for c in columns]
+            if any(r[0] != 0 for r in resolved):
+                continue
+            positions = [r[1] for r in resolved]
+            if op != '=' and any(p in table.codecs for p in positions):
+                continue
+            if op == '=' and len(positions) == 1:
+                equalities.setdefault(positions[0], values[0])
+            elif op in ('<', '<=', '>', '>='):
+                comparisons.append((op, positions, values))
+
+        for index in table.ordered_indexes.values():
+            full = list(index.positions) + [0]
+            pinned = 0
+            while pinned < len(index.positions) and index.positions[pinned] in equalities:
+                pinned += 1
+            for prefix_length in range(pinned, -1, -1):
+                rest = full[prefix_length:]
+                if order_positions == rest[:len(order_positions)]:
+                    break
+            else:
+                continue
+
+            def constant(position, node, wrap):
+                fn = _AccessPlan._constant(node, table, position)
+                return (wrap, fn)
+
+            prefix = [constant(p, equalities[p], True) for p in full[:prefix_length]]
+            lower = upper = None
+            for op, positions, values in comparisons:
+                if positions != rest[:len(positions)]:
+                    continue
+                bound = (op, [constant(p, v, p != 0) for p, v in zip(positions, values)])
+                if op in ('>', '>=') and lower is None:
+                    lower = bound
+                elif op in ('<', '<=') and upper is None:
+                    upper = bound
+            return cls(index, prefix, lower, upper, order_by[0][1])
+        return None
+
+    @staticmethod
+    def _encode(parts, params):
+        values = []
+        for wrap, fn in parts:
+            value = fn(params)
+            values.append((value is not None, value) if wrap else value)
+        return tuple(values)
+
+    def keys(self, params):
+        prefix = self._encode(self.prefix, params)
+        low = prefix or None
+        high = prefix + (TOP,) if prefix else None
+        if self.lower is not None:
+            op, parts = self.lower
+            key = prefix + self._encode(parts, params)
+            low = key + (TOP,) if op == '>' else key
+        if self.upper is not None:
+            op, parts = self.upper
+            key = prefix + self._encode(parts, params)
+            high = key + (TOP,) if op == '<=' else key
+        for entry in self.index.entries.irange(low, high, self.descending):
+            yield entry[-1]
+
+
+class _SelectPlan:
+    def __init__(self, database, tree):
+        self.sources = [(alias, database.table(name)) for name, alias in tree['sources']]
+        scope = self.scope = _Scope(self.sources)
+        conjuncts = _conjuncts(tree['where'])
+
+        self.where = _compile(tree['where'], scope) if tree['where'] is not None else None
+        self.access = None
+        self.joins = []
+        if self.sources:
+            self.access = _AccessPlan(self.sources[0][1], 0, conjuncts, scope)
+            for i, condition in enumerate(tree['joins'], start=1):
+                self.joins.append(_Join(self.sources[i][1], i, condition, scope))
+
+        # Encoded columns group by code; outputs are decoded from each group's first row
+        self.group_by = [_compile_raw(node, scope) for node in tree['group_by']]
+        self.aggregate = bool(tree['group_by']) or any(
+            item[0] == 'expr' and item[1][0] == 'func' and item[1][1].split()[0] in _AGGREGATES
+            for item in tree['items']
+        )
+        self.names = []
+        self.outputs = []
+        for item in tree['items']:
+            if item[0] == 'star':
+                for i, (alias, table) in enumerate(self.sources):
+                    if item[1] is not None and item[1] not in (alias, table.name):
+                        continue
+                    for position, column in enumerate(table.columns):
+                        self.names.append(column)
+                        if position in table.codecs:
+                            self.outputs.append(('expr', _decoded(i, position, table.codecs[position])))
+                        else:
+                            self.outputs.append(('col', i, position))
+                continue
+            node, alias = item[1], item[2]
+            self.names.append(alias or self._default_name(node))
+            if node[0] == 'func' and node[1].split()[0] in _AGGREGATES:
+                args = node[2]
+                argument = None if args == '*' else _compile(args[0], scope)
+                self.outputs.append(('agg', node[1], argument))
+            else:
+                self.outputs.append(('expr', _compile(node, scope)))
+        if not self.names:
+            raise ProgrammingError("SELECT * requires a FROM clause")
+
+        self.order_by = []
+        for node, descending in tree['order_by']:
+            self.order_by.append((self._order_key(node, scope), descending))
+        self.pk_order = None
+        if self.sources and not self.aggregate and len(tree['order_by']) == 1:
+            node, descending = tree['order_by'][0]
+            if node[0] == 'col':
+                try:
+                    source, position, _ = scope.resolve(node[1], node[2])
+                except ProgrammingError:
+                    source = None
+                table = self.sources[0][1]
+                if source == 0 and table.columns[position] == table.primary_key:
+                    self.pk_order = descending
+        self.ordered_scan = None
+        if self.sources and not self.aggregate and tree['order_by'] and self.pk_order is None:
+            self.ordered_scan = _OrderedScan.plan(self.sources[0][1], tree['order_by'],
+                                                  conjuncts, scope)
+        self.distinct = tree['distinct']
+        self.limit = tree['limit']
+        self.offset = tree['offset']
+
+    @staticmethod
+    def _default_name(node):
+        if node[0] == 'col':
+            return node[2]
+        if node[0] == 'func':
+            return f"{node[1]}(*)" if node[2] == '*' else f"{node[1]}(...)"
+        return str(node[1])
+
+    def _order_key(self, node, scope):
+        # ORDER BY may name an output column alias
+        if node[0] == 'col' and node[1] is None and node[2] in self.names:
+            index = self.names.index(node[2])
+            return ('output', index)
+        if self.aggregate:
+            raise ProgrammingError("ORDER BY in grouped queries must name an output column")
+        return ('row', _compile(node, scope))
+
+    def run(self, params):
+        """Return an iterator over result tuples"""
+        if not self.sources:
+            row = tuple(output[1]([], params) for output in self.outputs)
+            return iter([row])
+        if self.aggregate:
+            results = self._aggregate(self._matching(params, False)[0], params)
+            ordered = False
+        else:
+            source_rows, ordered = self._matching(params, bool(self.pk_order))
+            results = ((self._project(rows, params), rows) for rows in source_rows)
+            if self.order_by and not ordered:
+                results = self._sort(list(results), params)
+            results = (row for row, _ in results)
+        if self.distinct:
+            results = _unique(results)
+        return self._slice(results, params)
+
+    def _matching(self, params, reverse):
+        access = self.access
+        scan = self.ordered_scan
+        if scan is not None and not access.pk_equal and not access.pk_in and (
+                scan.prefix or not access.hash_indexes):
+            keys = scan.keys(params)
+            ordered = True
+        else:
+            keys, key_ordered = access.keys(params, reverse)
+            ordered = key_ordered and self.pk_order is not None
+        rows_by_pk = self.access.table.rows
+        where = self.where
+
+        def generate():
+            for pk in keys:
+                row = rows_by_pk.get(pk)
+                if row is None:
+                    continue
+                for rows in self._join([row], 0, params):
+                    if where is None or where(rows, params):
+                        yield rows
+        return generate(), ordered
+
+    def _join(self, rows, depth, params):
+        if depth == len(self.joins):
+            yield rows
+            return
+        join = self.joins[depth]
+        for row in join.matches(rows):
+            combined = rows + [row]
+            if join.condition(combined, params):
+                yield from self._join(combined, depth + 1, params)
+
+    def _project(self, rows, params):
+        values = []
+        for output in self.outputs:
+            if output[0] == 'col':
+                values.append(rows[output[1]][output[2]])
+            else:
+                values.append(output[1](rows, params))
+        return tuple(values)
+
+    def _sort(self, results, params):
+        for key, descending in reversed(self.order_by):
+            if key[0] == 'output':
+                index = key[1]
+                results.sort(key=lambda item: _sort_key(item[0][index]), reverse=descending)
+            else:
+                fn = key[1]
+                results.sort(key=lambda item: _sort_key(fn(item[1], params)), reverse=descending)
+        return results
+
+    def _aggregate(self, source_rows, params):
+        groups = {}
+        for rows in source_rows:
+            key = tuple(fn(rows, params) for fn in self.group_by)
+            state = groups.get(key)
+            if state is None:
+                state = groups[key] = [rows, [_Accumulator(o[1]) if o[0] == 'agg' else None
+                                              for o in self.outputs]]
+            for accumulator, output in zip(state[1], self.outputs):
+                if accumulator is not None:
+                    accumulator.add(output[2](rows, params) if output[2] else 1)
+        if not groups and not self.group_by:
+            groups[()] = [None, [_Accumulator(o[1]) if o[0] == 'agg' else None
+                                 for o in self.outputs]]
+        results = []
+        for first_rows, accumulators in groups.values():
+            values = []
+            for accumulator, output in zip(accumulators, self.outputs):
+                if accumulator is not None:
+                    values.append(accumulator.result())
+                elif first_rows is None:
+                    values.append(None)
+                elif output[0] == 'col':
+                    values.append(first_rows[output[1]][output[2]])
+                else:
+                    values.append(output[1](first_rows, params))
+            results.append(tuple(values))
+        for key, descending in reversed(self.order_by):
+            index = key[1]
+            results.sort(key=lambda row: _sort_key(row[index]), reverse=descending)
+        return iter(results)
+
+    def _slice(self, results, params):
+        limit = _bound_value(self.limit, params)
+        offset = _bound_value(self.offset, params) or 0
+        if limit is None and not offset:
+            return iter(results)
+        stop = None if limit is None else offset + limit
+        return itertools.islice(results, offset, stop)
+
+
+class _Accumulator:
+    def __init__(self, function):
+        self.function, _, distinct = function.partition(' ')
+        self.seen = set() if distinct else None
+        self.count = 0
+        self.value = None
+
+    def add(self, value):
+        if value is None:
+            return
+        if self.seen is not None:
+            if value in self.seen:
+                return
+            self.seen.add(value)
+        self.count += 1
+        if self.function == 'SUM' or self.function == 'AVG':
+            self.value = value if self.value is None else self.value + value
+        elif self.function == 'MIN':
+            self.value = value if self.value is None or value < self.value else self.value
+        elif self.function == 'MAX':
+            self.value = value if self.value is None or value > self.value else self.value
+
+    def result(self):
+        if self.function == 'COUNT':
+            return self.count
+        if self.function == 'AVG':
+            return self.value / self.count if self.count else None
+        return self.value
+
+
+def _bound_value(node, params):
+    if node is None:
+        return None
+    value = params[node[1]] if node[0] == 'param' else node[1]
+    return int(value)
+
+
+def _unique(results):
+    seen = set()
+    for row in results:
+        if row not in seen:
+            seen.add(row)
+            yield row
+
+
+class _WritePlan:
+    """Compiled UPDATE or DELETE statement"""
+
+    def __init__(self, database, tree):
+        name, alias = tree['source']
+        self.table = database.table(name)
+        scope = _Scope([(alias, self.table)])
+        self.access = _AccessPlan(self.table, 0, _conjuncts(tree['where']), scope)
+        self.where = _compile(tree['where'], scope) if tree['where'] is not None else None
+        self.assignments = []
+        for column, node in tree.get('assignments', []):
+            if column not in self.table.positions:
+                raise ProgrammingError(f"Unknown column '{column}' in table '{name}'")
+            self.assignments.append((self.table.positions[column], _compile(node, scope)))
+
+    def matching_keys(self, params):
+        keys, _ = self.access.keys(params)
+        rows = self.table.rows
+        where = self.where
+        return [pk for pk in list(keys)
+                if pk in rows and (where is None or where([rows[pk]], params))]
+
+
+class _InsertPlan:
+    def __init__(self, database, tree):
+        self.table = database.table(tree['table'])
+        columns = tree['columns'] or self.table.columns
+        for column in columns:
+            if column not in self.table.positions:
+                raise ProgrammingError(f"Unknown column '{column}' in table '{tree['table']}'")
+        self.positions = [self.table.positions[column] for column in columns]
+        scope = _Scope([])
+        self.rows = []
+        for values in tree['rows']:
+            if len(values) != len(columns):
+                raise ProgrammingError("Column count doesn't match value count")
+            self.rows.append([_compile(node, scope) for node in values])
+
+
+# ---------------------------------------------------------------------------
+# Database, connection and cursor
+# ---------------------------------------------------------------------------
+
+# Compiled statements kept per database; IN lists of every length are
+# separate statements, so the least recently used plans are dropped
+PLAN_CACHE_SIZE = 512
+
+
+class MemoryDatabase:
+    """A set of in-memory tables shared by every connection opened on it"""
+
+    def __init__(self, tables=None):
+        self.tables = {}
+        self.lock = threading.RLock()
+        self._plans = OrderedDict()     # sql -> (kind, plan), most recently used last
+        for name, spec in (DEFAULT_TABLES if tables is None else tables).items():
+            self.create_table(name, spec['columns'], spec.get('indexes', ()),
+                              spec.get('ordered_indexes', ()))
+
+    def create_table(self, name, columns, indexes=(), ordered_indexes=()):
+        """Create a table; the first column is the auto-increment primary key"""
+        with self.lock:
+            self.tables[name] = Table(name, columns, indexes, ordered_indexes)
+            self._plans.clear()
+
+    def create_index(self, table, columns, ordered=False):
+        """Declare a secondary index on an existing table"""
+        with self.lock:
+            self.table(table).create_index(columns, ordered)
+            self._plans.clear()
+
+    def table(self, name):
+        try:
+            return self.tables[name]
+        except KeyError:
+            raise ProgrammingError(f"Table '{name}' doesn't exist") from None
+
+    def load(self, data):
+        """Bulk-load {table: [row dict, ...]} without an undo log"""
+        with self.lock:
+            for name, rows in data.items():
+                table = self.table(name)
+                for row in rows:
+                    table.insert(row)
+
+    def connect(self):
+        return MemoryConnection(self)
+
+    def plan(self, sql):
+        plan = self._plans.get(sql)
+        if plan is not None:
+            self._plans.move_to_end(sql)
+        else:
+            tree = parse(sql)
+            kind = tree['type']
+            if kind == 'select':
+                plan = _SelectPlan(self, tree)
+            elif kind == 'insert':
+                plan = _InsertPlan(self, tree)
+            elif kind == 'savepoint':
+                plan = tree
+            else:
+                plan = _WritePlan(self, tree)
+            self._plans[sql] = (kind, plan)
+            if len(self._plans) > PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+            return kind, plan
+        return plan
+
+
+class MemoryConnection:
+    """DB-API style connection to a MemoryDatabase with commit/rollback"""
+
+    def __init__(self, database):
+        self.database = database
+        self._undo = []
+        self._savepoints = []      # (name, undo log length), innermost last
+        self._open = True
+
+    def cursor(self, dictionary=False, buffered=None):
+        return MemoryCursor(self, dictionary, buffered)
+
+    def commit(self):
+        self._undo = []
+        self._savepoints = []
+
+    def rollback(self):
+        with self.database.lock:
+            self._undo_to(0)
+        self._savepoints = []
+
+    def _undo_to(self, length):
+        undo = self._undo
+        while len(undo) > length:
+            kind, table, pk, row = undo.pop()
+            if kind == 'insert':
+                table.delete(pk)
+            elif kind == 'delete':
+                table.restore(pk, row)
+            else:
+                table.replace(pk, row)
+
+    def _savepoint(self, action, name):
+        """Handle SAVEPOINT, RELEASE SAVEPOINT and ROLLBACK TO SAVEPOINT"""
+        if action == 'set':
+            self._savepoints.append((name, len(self._undo)))
+            return
+        names = [saved for saved, _ in self._savepoints]
+        if name not in names:
+            raise ProgrammingError(f"Savepoint {name} does not exist")
+        position = len(names) - 1 - names[::-1].index(name)
+        if action == 'release':
+            del self._savepoints[position:]
+        else:
+            self._undo_to(self._savepoints[position][1])
+            del self._savepoints[position + 1:]
+
+    def is_connected(self):
+        return self._open
+
+    def close(self):
+        if self._undo:
+            self.rollback()
+        self._open = False
+
+
+class MemoryCursor:
+    """
+    Cursor returning tuples, or dicts when opened with dictionary=True.
+    With buffered=False, SELECT results are produced as they are fetched
+    instead of being materialized by execute(), and rowcount stays -1.
+    """
+
+    def __init__(self, connection, dictionary=False, buffered=None):
+        self.connection = connection
+        self.dictionary = dictionary
+        self.buffered = buffered is not False
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self.arraysize = 1
+        self._names = None
+        self._results = iter(())
+
+    def execute(self, query, params=None):
+        params = tuple(params) if params is not None else ()
+        database = self.connection.database
+        with database.lock:
+            kind, plan = database.plan(query)
+            if kind == 'select':
+                self._names = plan.names
+                self.description = [(name, None, None, None, None, None, True)
+                                    for name in plan.names]
+                if self.buffered:
+                    rows = list(plan.run(params))
+                    self.rowcount = len(rows)
+                    self._results = iter(rows)
+                else:
+                    self.rowcount = -1
+                    self._results = plan.run(params)
+                return
+            self.description = None
+            self._names = None
+            self._results = iter(())
+            if kind == 'savepoint':
+                self.connection._savepoint(plan['action'], plan['name'])
+                self.rowcount = 0
+            elif kind == 'insert':
+                self._insert(plan, params)
+            elif kind == 'update':
+                self._update(plan, params)
+            else:
+                self._delete(plan, params)
+
+    def executemany(self, query, seq_params):
+        database = self.connection.database
+        first_id = None
+        total = 0
+        with database.lock:
+            kind, plan = database.plan(query)
+            if kind == 'select':
+                raise ProgrammingError("executemany() does not return SELECT results")
+            run = {'insert': self._insert, 'update': self._update, 'delete': self._delete}[kind]
+            for params in seq_params:
+                run(plan, tuple(params))
+                total += self.rowcount
+                if first_id is None:
+                    first_id = self.lastrowid
+        self.description = None
+        self._results = iter(())
+        self.rowcount = total
+        if first_id is not None:
+            # Like mysql-connector's batched inserts, report the first new id
+            self.lastrowid = first_id
+
+    def _insert(self, plan, params):
+        undo = self.connection._undo
+        first = None
+        for values in plan.rows:
+            pk, _ = plan.table.insert_at(plan.positions, [fn(None, params) for fn in values])
+            undo.append(('insert', plan.table, pk, None))
+            if first is None:
+                first = pk
+        self.lastrowid = first
+        self.rowcount = len(plan.rows)
+
+    def _update(self, plan, params):
+        table = plan.table
+        undo = self.connection._undo
+        changed = 0
+        for pk in plan.matching_keys(params):
+            old_row = table.rows[pk]
+            new_row = list(old_row)
+            for position, fn in plan.assignments:
+                new_row[position] = table.coerce(position, fn([old_row], params))
+            new_row = tuple(new_row)
+            if new_row[0] != pk:
+                raise IntegrityError("Updating the primary key is not supported")
+            if new_row != old_row:
+                table.replace(pk, new_row)
+                undo.append(('update', table, pk, old_row))
+                changed += 1
+        self.rowcount = changed
+
+    def _delete(self, plan, params):
+        table = plan.table
+        undo = self.connection._undo
+        keys = plan.matching_keys(params)
+        for pk in keys:
+            undo.append(('delete', table, pk, table.delete(pk)))
+        self.rowcount = len(keys)
+
+    def _wrap(self, row):
+        if row is not None and self.dictionary:
+            return dict(zip(self._names, row))
+        return row
+
+    def fetchone(self):
+        with self.connection.database.lock:
+            return self._wrap(next(self._results, None))
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        with self.connection.database.lock:
+            return [self._wrap(row) for row in itertools.islice(self._results, size)]
+
+    def fetchall(self):
+        with self.connection.database.lock:
+            return [self._wrap(row) for row in self._results]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._results = iter(())
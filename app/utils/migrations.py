@@ -0,0 +1,333 @@
+"""
+Versioned schema migrations for the SQLite and MySQL backends
+Each migration has a version number and per-dialect statements; applied
+versions are recorded in schema_migrations so migrate() only runs new ones
+"""
+
+from datetime import datetime
+
+from app.utils import queries
+from app.utils.db import keyset_query
+from app.utils.validation import normalize_phone
+
+
+class Migration:
+    def __init__(self, version, description, sqlite, mysql):
+        self.version = version
+        self.description = description
+        self.statements = {'sqlite': sqlite, 'mysql': mysql}
+
+
+class CreateIndex:
+    """
+    MySQL CREATE INDEX that is skipped when the index already exists
+    MySQL commits every DDL statement on its own, so a migration that
+    fails halfway leaves its first indexes behind; checking
+    information_schema first lets the migration run again
+    """
+
+    def __init__(self, name, table, columns):
+        self.name = name
+        self.table = table
+        self.columns = columns
+
+    def apply(self, cursor):
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (self.table, self.name))
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE INDEX {self.name} ON {self.table} ({', '.join(self.columns)})")
+
+
+class AddColumn:
+    """MySQL ALTER TABLE ... ADD COLUMN that is skipped when the column exists (see CreateIndex)"""
+
+    def __init__(self, table, column, definition):
+        self.table = table
+        self.column = column
+        self.definition = definition
+
+    def apply(self, cursor):
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (self.table, self.column))
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"ALTER TABLE {self.table} ADD COLUMN {self.column} {self.definition}")
+
+
+class NormalizeContacts:
+    """Fill patients.normalized_contact for rows written before the column existed"""
+
+    def apply(self, cursor):
+        cursor.execute("SELECT patient_id, contact FROM patients WHERE normalized_contact IS NULL")
+        rows = [(normalize_phone(contact), patient_id) for patient_id, contact in cursor.fetchall()]
+        rows = [row for row in rows if row[0] is not None]
+        if rows:
+            cursor.executemany("UPDATE patients SET normalized_contact = %s WHERE patient_id = %s", rows)
+
+
+MIGRATIONS = [
+    Migration(1, "Create base tables", sqlite=[
+        """CREATE TABLE IF NOT EXISTS patients (
+            patient_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            dob TEXT,
+            gender TEXT,
+            contact TEXT NOT NULL,
+            address TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS doctors (
+            doctor_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            specialization TEXT NOT NULL,
+            contact TEXT,
+            email TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS appointments (
+            appointment_id INTEGER PRIMARY KEY,
+            patient_id INTEGER NOT NULL REFERENCES patients(patient_id) ON DELETE CASCADE,
+            doctor_id INTEGER NOT NULL REFERENCES doctors(doctor_id) ON DELETE CASCADE,
+            appointment_date TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Scheduled'
+        )""",
+        """CREATE TABLE IF NOT EXISTS billing (
+            bill_id INTEGER PRIMARY KEY,
+            patient_id INTEGER NOT NULL REFERENCES patients(patient_id) ON DELETE CASCADE,
+            amount REAL NOT NULL,
+            description TEXT,
+            payment_status TEXT NOT NULL DEFAULT 'Unpaid',
+            date_issued TEXT,
+            payment_date TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS medical_records (
+            record_id INTEGER PRIMARY KEY,
+            patient_id INTEGER NOT NULL REFERENCES patients(patient_id) ON DELETE CASCADE,
+            doctor_id INTEGER REFERENCES doctors(doctor_id) ON DELETE SET NULL,
+            diagnosis TEXT NOT NULL,
+            prescription TEXT,
+            visit_date TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT,
+            role TEXT NOT NULL
+        )""",
+    ], mysql=[
+        """CREATE TABLE IF NOT EXISTS patients (
+            patient_id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            dob DATE,
+            gender VARCHAR(10),
+            contact VARCHAR(20) NOT NULL,
+            address VARCHAR(255)
+        ) ENGINE=InnoDB""",
+        """CREATE TABLE IF NOT EXISTS doctors (
+            doctor_id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            specialization VARCHAR(100) NOT NULL,
+            contact VARCHAR(20),
+            email VARCHAR(100) NOT NULL
+        ) ENGINE=InnoDB""",
+        """CREATE TABLE IF NOT EXISTS appointments (
+            appointment_id INT AUTO_INCREMENT PRIMARY KEY,
+            patient_id INT NOT NULL,
+            doctor_id INT NOT NULL,
+            appointment_date DATETIME NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'Scheduled',
+            FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE,
+            FOREIGN KEY (doctor_id) REFERENCES doctors(doctor_id) ON DELETE CASCADE
+        ) ENGINE=InnoDB""",
+        """CREATE TABLE IF NOT EXISTS billing (
+            bill_id INT AUTO_INCREMENT PRIMARY KEY,
+            patient_id INT NOT NULL,
+            amount DECIMAL(10, 2) NOT NULL,
+            description VARCHAR(255),
+            payment_status VARCHAR(20) NOT NULL DEFAULT 'Unpaid',
+            date_issued DATE,
+            payment_date DATE,
+            FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE
+        ) ENGINE=InnoDB""",
+        """CREATE TABLE IF NOT EXISTS medical_records (
+            record_id INT AUTO_INCREMENT PRIMARY KEY,
+            patient_id INT NOT NULL,
+            doctor_id INT,
+            diagnosis TEXT NOT NULL,
+            prescription TEXT,
+            visit_date DATE NOT NULL,
+            FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE,
+            FOREIGN KEY (doctor_id) REFERENCES doctors(doctor_id) ON DELETE SET NULL
+        ) ENGINE=InnoDB""",
+        """CREATE TABLE IF NOT EXISTS users (
+            user_id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) NOT NULL UNIQUE,
+            password VARCHAR(255),
+            role VARCHAR(20) NOT NULL
+        ) ENGINE=InnoDB""",
+    ]),
+    # Composite indexes for the access paths the services use. The primary
+    # key is implicitly the last index column in both InnoDB and SQLite, so
+    # ORDER BY ..., <primary key> keyset queries are served too
+    Migration(2, "Add indexes for service queries", sqlite=[
+        "CREATE INDEX IF NOT EXISTS idx_billing_patient_date ON billing (patient_id, date_issued)",
+        "CREATE INDEX IF NOT EXISTS idx_billing_status_date ON billing (payment_status, date_issued)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date ON appointments (doctor_id, appointment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_patient_date ON appointments (patient_id, appointment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (appointment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_patients_name ON patients (name)",
+        "CREATE INDEX IF NOT EXISTS idx_patients_contact ON patients (contact)",
+        "CREATE INDEX IF NOT EXISTS idx_doctors_name ON doctors (name)",
+        "CREATE INDEX IF NOT EXISTS idx_doctors_specialization ON doctors (specialization)",
+        "CREATE INDEX IF NOT EXISTS idx_medical_records_patient_date ON medical_records (patient_id, visit_date)",
+    ], mysql=[
+        CreateIndex("idx_billing_patient_date", "billing", ("patient_id", "date_issued")),
+        CreateIndex("idx_billing_status_date", "billing", ("payment_status", "date_issued")),
+        CreateIndex("idx_appointments_doctor_date", "appointments", ("doctor_id", "appointment_date")),
+        CreateIndex("idx_appointments_patient_date", "appointments", ("patient_id", "appointment_date")),
+        CreateIndex("idx_appointments_date", "appointments", ("appointment_date",)),
+        CreateIndex("idx_patients_name", "patients", ("name",)),
+        CreateIndex("idx_patients_contact", "patients", ("contact",)),
+        CreateIndex("idx_doctors_name", "doctors", ("name",)),
+        CreateIndex("idx_doctors_specialization", "doctors", ("specialization",)),
+        CreateIndex("idx_medical_records_patient_date", "medical_records", ("patient_id", "visit_date")),
+    ]),
+    Migration(3, "Add appointment duration", sqlite=[
+        "ALTER TABLE appointments ADD COLUMN duration_minutes INTEGER NOT NULL DEFAULT 30",
+    ], mysql=[
+        AddColumn("appointments", "duration_minutes", "INT NOT NULL DEFAULT 30"),
+    ]),
+    # Duplicate checks look up the digits-only contact (validation.normalize_phone)
+    Migration(4, "Store normalized contact numbers", sqlite=[
+        "ALTER TABLE patients ADD COLUMN normalized_contact TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_patients_normalized_contact ON patients (normalized_contact)",
+        NormalizeContacts(),
+    ], mysql=[
+        AddColumn("patients", "normalized_contact", "VARCHAR(20)"),
+        CreateIndex("idx_patients_normalized_contact", "patients", ("normalized_contact",)),
+        NormalizeContacts(),
+    ]),
+]
+
+
+def _page(select, key_columns, after, where=None):
+    """A keyset page query exactly as the services build it, with a limit of 50"""
+    query, params = keyset_query(select, key_columns, after, where=where)
+    return query, params + (50,)
+
+
+# Service queries and the index each one is expected to use
+SERVICE_QUERIES = [
+    ("BillingService.get_patient_bills", queries.PATIENT_BILLS, (1,), 'idx_billing_patient_date'),
+    ("BillingService.get_unpaid_bills", queries.UNPAID_BILLS, (), 'idx_billing_status_date'),
+    ("BillingService.get_unpaid_bills_page",
+     *_page(queries.BILLS_WITH_PATIENT, queries.UNPAID_BILLS_KEY, ('2025-01-01', 0),
+            where=queries.UNPAID_BILLS_WHERE), 'idx_billing_status_date'),
+    ("PatientService.get_patients_page(order_by='name')",
+     *_page(queries.SELECT_PATIENTS, queries.PATIENT_PAGE_ORDERINGS['name'], ('', 0)), 'idx_patients_name'),
+    ("DoctorService.get_doctors_page(order_by='name')",
+     *_page(queries.SELECT_DOCTORS, queries.DOCTOR_PAGE_ORDERINGS['name'], ('', 0)), 'idx_doctors_name'),
+    ("PatientService.find_duplicate_ids", queries.PATIENTS_BY_CONTACT, ('5553141592',),
+     'idx_patients_normalized_contact'),
+    ("AppointmentService.get_doctor_appointments", queries.DOCTOR_APPOINTMENTS_BETWEEN,
+     (1, '2025-01-20', '2025-01-21'), 'idx_appointments_doctor_date'),
+    ("AppointmentService.book_appointment", queries.DOCTOR_BOOKINGS_BETWEEN,
+     (1, '2025-01-19 09:00:00', '2025-01-20 09:30:00'), 'idx_appointments_doctor_date'),
+    ("AppointmentService.get_patient_appointments", queries.PATIENT_APPOINTMENTS,
+     (1,), 'idx_appointments_patient_date'),
+    ("AppointmentService.get_appointments_on", queries.APPOINTMENTS_BETWEEN,
+     ('2025-01-20', '2025-01-21'), 'idx_appointments_date'),
+]
+
+
+def dialect_of(connection):
+    """Return 'sqlite' or 'mysql' for a raw or pooled connection"""
+    return getattr(connection, 'dialect', 'mysql')
+
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at VARCHAR(32) NOT NULL
+        )
+    """)
+
+
+def current_version(connection):
+    """Return the highest applied migration version (0 for an empty database)"""
+    cursor = connection.cursor()
+    try:
+        _ensure_version_table(cursor)
+        cursor.execute("SELECT MAX(version) FROM schema_migrations")
+        row = cursor.fetchone()
+        connection.commit()
+        return row[0] or 0
+    finally:
+        cursor.close()
+
+
+def migrate(connection, target=None, migrations=MIGRATIONS):
+    """
+    Apply pending migrations up to target (default: latest) in order
+    Returns the list of versions applied
+    """
+    dialect = dialect_of(connection)
+    version = current_version(connection)
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= version:
+            continue
+        if target is not None and migration.version > target:
+            break
+        cursor = connection.cursor()
+        try:
+            for statement in migration.statements[dialect]:
+                if isinstance(statement, str):
+                    cursor.execute(statement)
+                else:
+                    statement.apply(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, %s)",
+                (migration.version, migration.description, datetime.now().isoformat(timespec='seconds'))
+            )
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            raise Exception(f"Error applying migration {migration.version}: {str(e)}")
+        finally:
+            cursor.close()
+        applied.append(migration.version)
+    return applied
+
+
+def explain(connection, query, params=()):
+    """Return the query plan as a list of text lines"""
+    dialect = dialect_of(connection)
+    cursor = connection.cursor(dictionary=True)
+    try:
+        if dialect == 'sqlite':
+            cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+            return [row['detail'] for row in cursor.fetchall()]
+        cursor.execute("EXPLAIN " + query, params)
+        return [
+            f"{row.get('table')}: key={row.get('key')} type={row.get('type')} extra={row.get('Extra')}"
+            for row in cursor.fetchall()
+        ]
+    finally:
+        cursor.close()
+
+
+def check_query_plans(connection, queries=SERVICE_QUERIES):
+    """
+    EXPLAIN each service query and check that it uses its expected index
+    Returns [(name, expected_index, used, plan_lines)]
+    """
+    results = []
+    for name, query, params, index in queries:
+        plan = explain(connection, query, params)
+        used = any(index in line for line in plan)
+        results.append((name, index, used, plan))
+    return results
@@ -0,0 +1,84 @@
+"""
+Normalized phone-number index for duplicate detection
+Maps the canonical digits-only form of a contact number (see
+validation.normalize_phone) to the records holding it, so an import file
+can be checked against the stored numbers it shares, and against itself,
+in a single pass
+"""
+
+from collections import namedtuple
+
+from app.utils.validation import normalize_phone
+
+# row is the index in the checked batch; record_ids are stored records with
+# the same number and rows are earlier rows of the batch that repeat it
+DuplicateRow = namedtuple('DuplicateRow', ['row', 'record_ids', 'rows'])
+
+
+class PhoneIndex:
+    """
+    Hash index from normalized phone number to record ids, built once from
+    (record_id, contact) pairs to check a batch against.
+
+    A number held by one record maps straight to its id and only shared
+    numbers get a tuple, which keeps a large index small. Contacts that do
+    not normalize (too few digits) are not indexed.
+    """
+
+    def __init__(self, entries=()):
+        self._records = {}      # phone key -> id, or tuple of ids
+        self._keys = {}         # id -> phone key
+        for record_id, contact in entries:
+            self._add(record_id, normalize_phone(contact))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, record_id):
+        return record_id in self._keys
+
+    def _add(self, record_id, key):
+        if key is None:
+            return
+        self._keys[record_id] = key
+        held = self._records.get(key)
+        if held is None:
+            self._records[key] = record_id
+        elif isinstance(held, tuple):
+            self._records[key] = held + (record_id,)
+        else:
+            self._records[key] = (held, record_id)
+
+    # -- queries ------------------------------------------------------------
+
+    def _ids(self, key):
+        held = self._records.get(key)
+        if held is None:
+            return []
+        return sorted(held) if isinstance(held, tuple) else [held]
+
+    def lookup(self, contact):
+        """Return the ids of records with the same normalized number, ascending"""
+        key = normalize_phone(contact)
+        if key is None:
+            return []
+        return self._ids(key)
+
+    def check(self, contacts):
+        """
+        Check a batch of contacts against the index and against each other
+        Returns a DuplicateRow for every row whose number is already stored
+        or appeared earlier in the batch, in row order
+        """
+        found = []
+        seen = {}               # phone key -> rows of the batch so far
+        for row, contact in enumerate(contacts):
+            key = normalize_phone(contact)
+            if key is None:
+                continue
+            earlier = seen.setdefault(key, [])
+            record_ids = self._ids(key)
+            if record_ids or earlier:
+                found.append(DuplicateRow(row, record_ids, list(earlier)))
+            earlier.append(row)
+        return found
@@ -0,0 +1,523 @@
+"""
+Connection pool for the Hospital Management System
+Keeps a bounded set of database connections that services share through
+app.utils.db.create_connection instead of opening one connection each
+"""
+
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the wait timeout"""
+
+
+# Stack of the Transaction scopes open in each thread, outermost first
+_local = threading.local()
+
+
+def current_transaction():
+    """Return the outermost Transaction open in this thread, or None"""
+    stack = getattr(_local, 'transactions', None)
+    return stack[0] if stack else None
+
+
+def after_commit(callback):
+    """
+    Run callback once the surrounding transaction commits, or right away
+    when no transaction is open. Callbacks of rolled back work are dropped
+    """
+    transaction = current_transaction()
+    if transaction is None:
+        callback()
+    else:
+        transaction._callbacks.append(callback)
+
+
+def default_health_check(connection):
+    """Return True if a raw connection still looks usable"""
+    is_connected = getattr(connection, 'is_connected', None)
+    if callable(is_connected):
+        try:
+            return bool(is_connected())
+        except Exception:
+            return False
+    return True
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of raw database connections.
+
+    factory: callable returning a new raw connection
+    max_size: maximum number of connections open at once
+    timeout: default seconds checkout() waits for a free connection
+    idle_timeout: seconds an unused connection may sit idle before eviction
+    health_check: callable(connection) -> bool, run before handing out an
+        idle connection
+    dialect: SQL dialect of the connections, 'sqlite' or 'mysql'
+    """
+
+    def __init__(self, factory, max_size=5, timeout=30.0, idle_timeout=300.0,
+                 health_check=default_health_check, clock=time.monotonic, dialect='mysql'):
+        if max_size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.factory = factory
+        self.dialect = dialect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.clock = clock
+
+        self._lock = threading.Condition()
+        self._idle = []        # list of (connection, returned_at), newest last
+        self._in_use = set()
+        self._closed = False
+
+        self._stats = {
+            'created': 0,
+            'checkouts': 0,
+            'checkins': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'evicted_idle': 0,
+            'health_check_failures': 0,
+        }
+
+    def checkout(self, timeout=None):
+        """Take a connection from the pool, opening one if below max_size"""
+        if timeout is None:
+            timeout = self.timeout
+        started = self.clock()
+        waited = False
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                self._evict_idle_locked()
+
+                while self._idle:
+                    connection, _ = self._idle.pop()
+                    if self.health_check and not self.health_check(connection):
+                        self._stats['health_check_failures'] += 1
+                        self._close_quietly(connection)
+                        continue
+                    return self._hand_out_locked(connection, started, waited)
+
+                if len(self._in_use) < self.max_size:
+                    # Reserve the slot before releasing the lock to connect
+                    placeholder = object()
+                    self._in_use.add(placeholder)
+                    break
+
+                remaining = timeout - (self.clock() - started)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {timeout:.1f}s "
+                        f"(pool size {self.max_size})"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+
+        try:
+            connection = self.factory()
+        except Exception:
+            with self._lock:
+                self._in_use.discard(placeholder)
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            self._in_use.discard(placeholder)
+            self._stats['created'] += 1
+            return self._hand_out_locked(connection, started, waited)
+
+    def checkin(self, connection, discard=False):
+        """Return a connection to the pool; discard closes it instead"""
+        with self._lock:
+            if connection not in self._in_use:
+                return
+            self._in_use.discard(connection)
+            self._stats['checkins'] += 1
+            if discard or self._closed:
+                self._close_quietly(connection)
+            else:
+                self._idle.append((connection, self.clock()))
+            self._lock.notify()
+
+    def evict_idle(self):
+        """Close connections that have been idle longer than idle_timeout"""
+        with self._lock:
+            return self._evict_idle_locked()
+
+    def stats(self):
+        """Return a snapshot of pool counters and pool-wait metrics"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['size'] = len(self._in_use) + len(self._idle)
+            snapshot['in_use'] = len(self._in_use)
+            snapshot['idle'] = len(self._idle)
+            snapshot['max_size'] = self.max_size
+            waits = snapshot['waits']
+            snapshot['wait_time_avg'] = snapshot['wait_time_total'] / waits if waits else 0.0
+            return snapshot
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            for connection, _ in self._idle:
+                self._close_quietly(connection)
+            self._idle = []
+            self._lock.notify_all()
+
+    def _hand_out_locked(self, connection, started, waited):
+        self._in_use.add(connection)
+        self._stats['checkouts'] += 1
+        if waited:
+            wait_time = self.clock() - started
+            self._stats['waits'] += 1
+            self._stats['wait_time_total'] += wait_time
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+        return connection
+
+    def _evict_idle_locked(self):
+        if self.idle_timeout is None or not self._idle:
+            return 0
+        cutoff = self.clock() - self.idle_timeout
+        keep = []
+        evicted = 0
+        for connection, returned_at in self._idle:
+            if returned_at < cutoff:
+                self._close_quietly(connection)
+                evicted += 1
+            else:
+                keep.append((connection, returned_at))
+        self._idle = keep
+        self._stats['evicted_idle'] += evicted
+        return evicted
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """
+    Connection handle given to services by create_connection.
+
+    A raw connection is checked out of the pool when a cursor is opened and
+    handed back as soon as the work is finished: after commit/rollback, or
+    when the last cursor of a read-only statement is closed. Many service
+    instances can therefore share a handful of real connections.
+
+    A connection that only ran reads is rolled back before it goes back, so
+    drivers without autocommit (MySQL under REPEATABLE READ) do not leave
+    the next borrower reading an old snapshot.
+
+    Inside a Transaction on the same pool the handle joins it: statements
+    run on the transaction's connection, commit() only releases a savepoint
+    and rollback() rolls back to it, so the real commit happens once when
+    the outermost scope exits.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._raw = None
+        self._open_cursors = 0
+        self._in_transaction = False
+        self._snapshot_open = False     # reads ran since the last commit/rollback
+        self._closed = False
+        self._transaction = None
+        self._savepoint = None
+
+    @property
+    def dialect(self):
+        """SQL dialect of the pool's connections"""
+        return self.pool.dialect
+
+    def cursor(self, *args, **kwargs):
+        """Open a cursor on a pooled connection"""
+        raw = self._acquire()
+        cursor = PooledCursor(self, raw.cursor(*args, **kwargs))
+        self._open_cursors += 1
+        return cursor
+
+    def commit(self):
+        """Commit the current transaction and release the connection"""
+        if self._transaction is not None:
+            if self._savepoint is not None:
+                self._transaction._release(self._savepoint)
+                self._transaction.deferred_commits += 1
+        elif self._raw is not None:
+            self._raw.commit()
+        self._savepoint = None
+        self._in_transaction = False
+        self._snapshot_open = False
+        self._release_if_idle()
+
+    def rollback(self):
+        """Roll back the current transaction and release the connection"""
+        if self._transaction is not None:
+            savepoint, self._savepoint = self._savepoint, None
+            self._in_transaction = False
+            if savepoint is not None:
+                self._transaction._rollback_to(savepoint)
+            self._release_if_idle()
+            return
+        if self._raw is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                # A connection that cannot roll back is not safe to reuse
+                raw, self._raw = self._raw, None
+                self._in_transaction = False
+                self._snapshot_open = False
+                self._open_cursors = 0
+                self.pool.checkin(raw, discard=True)
+                raise
+        self._in_transaction = False
+        self._snapshot_open = False
+        self._release_if_idle()
+
+    def is_connected(self):
+        """Check whether this handle can still be used"""
+        return not self._closed
+
+    def close(self):
+        """Return any held connection to the pool and close this handle"""
+        if self._transaction is not None:
+            if self._savepoint is not None:
+                try:
+                    self._transaction._rollback_to(self._savepoint)
+                except Exception:
+                    pass
+            self._transaction = None
+            self._savepoint = None
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            if self._in_transaction or self._snapshot_open:
+                self._checkin_rolled_back(raw)
+            else:
+                self.pool.checkin(raw)
+        self._open_cursors = 0
+        self._in_transaction = False
+        self._snapshot_open = False
+        self._closed = True
+
+    def _acquire(self):
+        if self._closed:
+            raise Exception("Connection is closed")
+        if self._transaction is not None:
+            if self._transaction is current_transaction():
+                return self._transaction._connection()
+            # The transaction ended while this handle still had a cursor open
+            self._transaction = None
+            self._savepoint = None
+            self._in_transaction = False
+        if self._raw is None:
+            transaction = current_transaction()
+            if transaction is not None and transaction.pool is self.pool:
+                self._transaction = transaction
+                return transaction._connection()
+            self._raw = self.pool.checkout()
+        return self._raw
+
+    def _statement_executed(self, query):
+        if not _is_read_only(query):
+            if self._transaction is not None and self._savepoint is None:
+                self._savepoint = self._transaction._set_savepoint()
+            self._in_transaction = True
+        elif self._transaction is None:
+            self._snapshot_open = True
+
+    def _cursor_closed(self):
+        self._open_cursors = max(0, self._open_cursors - 1)
+        self._release_if_idle()
+
+    def _release_if_idle(self):
+        if self._in_transaction or self._open_cursors:
+            return
+        if self._transaction is not None:
+            self._transaction = None
+        elif self._raw is not None:
+            raw, self._raw = self._raw, None
+            if self._snapshot_open:
+                self._snapshot_open = False
+                self._checkin_rolled_back(raw)
+            else:
+                self.pool.checkin(raw)
+
+    def _checkin_rolled_back(self, raw):
+        """End the connection's read snapshot, then return it to the pool"""
+        try:
+            raw.rollback()
+        except Exception:
+            # A connection that cannot roll back is not safe to reuse
+            self.pool.checkin(raw, discard=True)
+            return
+        self.pool.checkin(raw)
+
+
+class Transaction:
+    """
+    Unit of work spanning every service call made in this thread.
+
+    Handles on the same pool join the transaction, so their commits are
+    deferred and the whole unit commits once when the outermost scope exits,
+    or rolls back if it exits with an exception. A nested scope becomes a
+    savepoint that is rolled back on its own if an exception leaves it.
+
+    immediate asks backends with a begin(immediate) hook (SQLite) to take
+    the write lock when the unit starts; it has no effect on a nested scope.
+    """
+
+    def __init__(self, pool, immediate=False):
+        self.pool = pool
+        self.immediate = immediate
+        self.deferred_commits = 0
+        self._root = None
+        self._raw = None
+        self._savepoints = 0
+        self._savepoint = None
+        self._callbacks = []
+        self._callback_mark = 0
+
+    def __enter__(self):
+        stack = getattr(_local, 'transactions', None)
+        if stack is None:
+            stack = _local.transactions = []
+        if stack:
+            root = self._root = stack[0]
+            self._savepoint = root._set_savepoint()
+            self._callback_mark = len(root._callbacks)
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.transactions.pop()
+        if self._root is not None:
+            if exc_type is None:
+                self._root._release(self._savepoint)
+            else:
+                self._root._rollback_to(self._savepoint)
+                del self._root._callbacks[self._callback_mark:]
+            return False
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def commit(self):
+        """Commit the unit of work and run the after_commit callbacks"""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            try:
+                raw.commit()
+            except Exception:
+                self._discard(raw)
+                self._callbacks = []
+                raise
+            self.pool.checkin(raw)
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        """Roll back everything done in the unit of work"""
+        raw, self._raw = self._raw, None
+        self._callbacks = []
+        if raw is not None:
+            try:
+                raw.rollback()
+            except Exception:
+                self._discard(raw)
+                raise
+            self.pool.checkin(raw)
+
+    def _connection(self):
+        if self._root is not None:
+            return self._root._connection()
+        if self._raw is None:
+            self._raw = self.pool.checkout()
+            # Backends that autocommit outside BEGIN (SQLite) need an explicit
+            # start, or releasing the first savepoint would commit
+            begin = getattr(self._raw, 'begin', None)
+            if begin is not None:
+                if self.immediate:
+                    begin(immediate=True)
+                else:
+                    begin()
+        return self._raw
+
+    def _execute(self, statement):
+        cursor = self._connection().cursor()
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    def _set_savepoint(self):
+        self._savepoints += 1
+        name = f"hms_sp_{self._savepoints}"
+        self._execute(f"SAVEPOINT {name}")
+        return name
+
+    def _release(self, name):
+        self._execute(f"RELEASE SAVEPOINT {name}")
+
+    def _rollback_to(self, name):
+        self._execute(f"ROLLBACK TO SAVEPOINT {name}")
+        self._execute(f"RELEASE SAVEPOINT {name}")
+
+    def _discard(self, raw):
+        self.pool.checkin(raw, discard=True)
+
+
+class PooledCursor:
+    """Cursor wrapper that tells its PooledConnection when work is done"""
+
+    def __init__(self, connection, cursor):
+        self._connection = connection
+        self._cursor = cursor
+        self._closed = False
+
+    def execute(self, query, params=None):
+        self._connection._statement_executed(query)
+        if params is None:
+            return self._cursor.execute(query)
+        return self._cursor.execute(query, params)
+
+    def executemany(self, query, seq_params):
+        self._connection._statement_executed(query)
+        return self._cursor.executemany(query, seq_params)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._cursor.close()
+        finally:
+            self._connection._cursor_closed()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _is_read_only(query):
+    """Return True for statements that cannot start a write transaction"""
+    keyword = query.lstrip().split(None, 1)[0].upper() if query.strip() else ''
+    return keyword in ('SELECT', 'SHOW', 'EXPLAIN', 'DESCRIBE', 'WITH', 'PRAGMA')
@@ -0,0 +1,70 @@
+"""
+SQL shared by the services and by migrations.check_query_plans
+The services run these statements and the plan check EXPLAINs the very
+same text, so a query that changes is checked as it now reads
+"""
+
+# -- billing ----------------------------------------------------------------
+
+BILLS_WITH_PATIENT = """
+    SELECT b.*, p.name as patient_name
+    FROM billing b
+    JOIN patients p ON b.patient_id = p.patient_id"""
+
+PATIENT_BILLS = BILLS_WITH_PATIENT + """
+    WHERE b.patient_id = %s
+    ORDER BY b.date_issued DESC
+"""
+
+UNPAID_BILLS = BILLS_WITH_PATIENT + """
+    WHERE b.payment_status = 'Unpaid'
+    ORDER BY b.date_issued ASC
+"""
+
+# Keyset pagination of unpaid bills (see db.keyset_query)
+UNPAID_BILLS_WHERE = "b.payment_status = 'Unpaid'"
+UNPAID_BILLS_KEY = ('b.date_issued', 'b.bill_id')
+
+# -- patients and doctors ---------------------------------------------------
+
+SELECT_PATIENTS = "SELECT * FROM patients"
+
+# Patients by digits-only contact number (validation.normalize_phone)
+PATIENTS_BY_CONTACT = "SELECT patient_id FROM patients WHERE normalized_contact = %s ORDER BY patient_id"
+SELECT_DOCTORS = "SELECT * FROM doctors"
+
+# Orderings available to the keyset page methods; the primary key breaks ties
+PATIENT_PAGE_ORDERINGS = {
+    'patient_id': ('patient_id',),
+    'name': ('name', 'patient_id'),
+}
+DOCTOR_PAGE_ORDERINGS = {
+    'doctor_id': ('doctor_id',),
+    'name': ('name', 'doctor_id'),
+}
+
+# -- appointments -----------------------------------------------------------
+
+DOCTOR_APPOINTMENTS = "SELECT * FROM appointments WHERE doctor_id = %s ORDER BY appointment_date"
+
+DOCTOR_APPOINTMENTS_BETWEEN = """
+    SELECT * FROM appointments
+    WHERE doctor_id = %s AND appointment_date >= %s AND appointment_date < %s
+    ORDER BY appointment_date
+"""
+
+PATIENT_APPOINTMENTS = "SELECT * FROM appointments WHERE patient_id = %s ORDER BY appointment_date"
+
+# Re-check of a booking inside its write transaction; MySQL appends FOR UPDATE
+LOCK_DOCTOR = "SELECT doctor_id FROM doctors WHERE doctor_id = %s FOR UPDATE"
+
+DOCTOR_BOOKINGS_BETWEEN = """
+    SELECT appointment_id, appointment_date, duration_minutes FROM appointments
+    WHERE doctor_id = %s AND appointment_date >= %s AND appointment_date < %s AND status != 'Cancelled'
+"""
+
+APPOINTMENTS_BETWEEN = """
+    SELECT * FROM appointments
+    WHERE appointment_date >= %s AND appointment_date < %s
+    ORDER BY appointment_date
+"""
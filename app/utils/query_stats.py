@@ -0,0 +1,245 @@
+"""
+Query timing instrumentation for the database layer
+When enabled, create_connection wraps each raw connection so every
+statement records its latency, rows returned and errors, keyed by
+normalized SQL, and every commit records its duration
+"""
+
+import bisect
+import re
+import threading
+import time
+from functools import lru_cache
+
+# Upper bounds (seconds) of the latency histogram buckets; the last is +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s|\?")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(query):
+    """Collapse whitespace and replace literals and placeholders with ?"""
+    normalized = _SPACE_RE.sub(' ', query).strip()
+    normalized = _LITERAL_RE.sub('?', normalized)
+    normalized = _IN_LIST_RE.sub('(...)', normalized)
+    return normalized
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket containing it"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'avg': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip(self.bounds + (float('inf'),), self.counts)),
+        }
+
+
+class StatementStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.rows = 0
+        self.errors = 0
+
+
+class QueryStats:
+    """Thread-safe collector of per-statement and commit timings"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.statements = {}
+            self.commits = Histogram()
+            self.rollbacks = 0
+
+    def record_statement(self, query, seconds, error=False):
+        key = normalize_sql(query)
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats()
+            stats.latency.observe(seconds)
+            if error:
+                stats.errors += 1
+        return key
+
+    def record_rows(self, key, rows):
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is not None:
+                stats.rows += rows
+
+    def record_commit(self, seconds):
+        with self._lock:
+            self.commits.observe(seconds)
+
+    def record_rollback(self):
+        with self._lock:
+            self.rollbacks += 1
+
+    def snapshot(self):
+        """Return all counters as plain dictionaries"""
+        with self._lock:
+            return {
+                'statements': {
+                    sql: dict(stats.latency.to_dict(), rows=stats.rows, errors=stats.errors)
+                    for sql, stats in self.statements.items()
+                },
+                'commits': self.commits.to_dict(),
+                'rollbacks': self.rollbacks,
+            }
+
+    def slowest(self, limit=10, by='total'):
+        """Return [(sql, stats)] ordered by total, avg, max or p95 latency"""
+        statements = self.snapshot()['statements']
+        ranked = sorted(statements.items(), key=lambda item: item[1][by], reverse=True)
+        return ranked[:limit]
+
+    def export_text(self):
+        """Export counters in the Prometheus text exposition format"""
+        lines = [
+            '# HELP hms_db_statement_seconds Statement latency by normalized SQL',
+            '# TYPE hms_db_statement_seconds histogram',
+        ]
+        snapshot = self.snapshot()
+        for sql, stats in sorted(snapshot['statements'].items()):
+            label = 'sql="' + sql.replace('\\', '\\\\').replace('"', '\\"') + '"'
+            lines.extend(_histogram_lines('hms_db_statement_seconds', label, stats))
+        lines.append('# TYPE hms_db_statement_rows_total counter')
+        for sql, stats in sorted(snapshot['statements'].items()):
+            label = 'sql="' + sql.replace('\\', '\\\\').replace('"', '\\"') + '"'
+            lines.append(f'hms_db_statement_rows_total{{{label}}} {stats["rows"]}')
+        lines.append('# TYPE hms_db_statement_errors_total counter')
+        for sql, stats in sorted(snapshot['statements'].items()):
+            label = 'sql="' + sql.replace('\\', '\\\\').replace('"', '\\"') + '"'
+            lines.append(f'hms_db_statement_errors_total{{{label}}} {stats["errors"]}')
+        lines.append('# HELP hms_db_commit_seconds Commit latency')
+        lines.append('# TYPE hms_db_commit_seconds histogram')
+        lines.extend(_histogram_lines('hms_db_commit_seconds', '', snapshot['commits']))
+        lines.append('# TYPE hms_db_rollbacks_total counter')
+        lines.append(f'hms_db_rollbacks_total {snapshot["rollbacks"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(name, label, stats):
+    lines = []
+    cumulative = 0
+    prefix = label + ',' if label else ''
+    for bound, count in stats['buckets'].items():
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+    suffix = '{' + label + '}' if label else ''
+    lines.append(f'{name}_sum{suffix} {stats["total"]}')
+    lines.append(f'{name}_count{suffix} {stats["count"]}')
+    return lines
+
+
+class InstrumentedConnection:
+    """Raw connection wrapper that times statements and commits"""
+
+    def __init__(self, connection, stats, clock=time.perf_counter):
+        self._connection = connection
+        self._stats = stats
+        self._clock = clock
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._stats, self._clock)
+
+    def commit(self):
+        started = self._clock()
+        self._connection.commit()
+        self._stats.record_commit(self._clock() - started)
+
+    def rollback(self):
+        self._stats.record_rollback()
+        self._connection.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that records latency, rows and errors per statement"""
+
+    def __init__(self, cursor, stats, clock):
+        self._cursor = cursor
+        self._stats = stats
+        self._clock = clock
+        self._key = None
+
+    def execute(self, query, params=None):
+        return self._timed(query, self._cursor.execute, query, params)
+
+    def executemany(self, query, seq_params):
+        return self._timed(query, self._cursor.executemany, query, seq_params)
+
+    def _timed(self, query, method, *args):
+        started = self._clock()
+        try:
+            result = method(*args)
+        except Exception:
+            self._key = self._stats.record_statement(query, self._clock() - started, error=True)
+            raise
+        self._key = self._stats.record_statement(query, self._clock() - started)
+        return result
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.record_rows(self._key, 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.record_rows(self._key, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.record_rows(self._key, len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
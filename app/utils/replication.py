@@ -0,0 +1,189 @@
+"""
+Read/write splitting for the Hospital Management System
+When a read replica is configured, create_connection returns a
+RoutingConnection: read-only statements outside a transaction run on the
+replica pool and everything else on the primary pool
+"""
+
+import sqlite3
+import threading
+import time
+
+from app.utils.pool import _is_read_only, current_transaction
+
+# Per-thread routing state: time of this thread's last committed write and
+# the depth of read_from_primary() blocks
+_state = threading.local()
+
+
+def last_write():
+    """Return the clock time of this thread's last committed write, or None"""
+    return getattr(_state, 'last_write', None)
+
+
+def _record_write(clock):
+    _state.last_write = clock()
+
+
+def forget_writes():
+    """Clear this thread's read-your-writes history"""
+    _state.last_write = None
+
+
+class read_from_primary:
+    """Context manager sending every read in this thread to the primary"""
+
+    def __enter__(self):
+        _state.primary_depth = getattr(_state, 'primary_depth', 0) + 1
+        return self
+
+    def __exit__(self, *exc_info):
+        _state.primary_depth -= 1
+        return False
+
+
+class RoutingConnection:
+    """
+    Connection handle that splits statements between two pooled handles.
+
+    primary, replica: PooledConnection handles on the primary and replica pools
+    read_your_writes: seconds after this thread commits a write during which
+        its reads also go to the primary, so it sees its own changes despite
+        replication lag (0 disables)
+    """
+
+    def __init__(self, primary, replica, read_your_writes=0.0, clock=time.monotonic):
+        self.primary = primary
+        self.replica = replica
+        self.read_your_writes = read_your_writes
+        self.clock = clock
+
+    @property
+    def dialect(self):
+        return self.primary.dialect
+
+    def cursor(self, *args, **kwargs):
+        """Open a cursor; the target is chosen when a statement is executed"""
+        return RoutingCursor(self, args, kwargs)
+
+    def commit(self):
+        """Commit on the primary and start the read-your-writes window"""
+        wrote = self.primary._in_transaction
+        self.primary.commit()
+        if wrote:
+            _record_write(self.clock)
+
+    def rollback(self):
+        self.primary.rollback()
+
+    def is_connected(self):
+        return self.primary.is_connected()
+
+    def close(self):
+        self.replica.close()
+        self.primary.close()
+
+    def _route(self, query):
+        """Return the handle that should run query"""
+        if not _is_read_only(query) or self.primary._in_transaction:
+            return self.primary
+        if current_transaction() is not None:
+            return self.primary
+        if getattr(_state, 'primary_depth', 0):
+            return self.primary
+        if self.read_your_writes:
+            written = last_write()
+            if written is not None and self.clock() - written < self.read_your_writes:
+                return self.primary
+        return self.replica
+
+
+class RoutingCursor:
+    """Cursor that opens its underlying cursor on the handle chosen per statement"""
+
+    def __init__(self, connection, args, kwargs):
+        self._connection = connection
+        self._args = args
+        self._kwargs = kwargs
+        self._handle = None
+        self._cursor = None
+
+    def execute(self, query, params=None):
+        self._switch(self._connection._route(query))
+        if params is None:
+            return self._cursor.execute(query)
+        return self._cursor.execute(query, params)
+
+    def executemany(self, query, seq_params):
+        self._switch(self._connection._route(query))
+        return self._cursor.executemany(query, seq_params)
+
+    def _switch(self, handle):
+        # Once a cursor has run on the primary it stays there
+        if self._handle is handle or self._handle is self._connection.primary:
+            return
+        self.close()
+        self._handle = handle
+        self._cursor = handle.cursor(*self._args, **self._kwargs)
+
+    def close(self):
+        if self._cursor is not None:
+            cursor, self._cursor = self._cursor, None
+            self._handle = None
+            cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        cursor = self.__dict__.get('_cursor')
+        if cursor is None:
+            raise AttributeError(name)
+        return getattr(cursor, name)
+
+
+class SQLiteReplicator:
+    """
+    Stand-in for database replication between two SQLite files
+    Copies the primary into the replica with the online backup API, either
+    on demand with sync() or every interval seconds from a background thread
+    """
+
+    def __init__(self, primary_path, replica_path, interval=1.0):
+        self.primary_path = primary_path
+        self.replica_path = replica_path
+        self.interval = interval
+        self.last_sync = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sync(self):
+        """Copy the current primary contents into the replica"""
+        source = sqlite3.connect(self.primary_path)
+        target = sqlite3.connect(self.replica_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.last_sync = time.monotonic()
+
+    def start(self):
+        """Sync now, then keep syncing in a daemon thread"""
+        self.sync()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sqlite-replicator', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+            except sqlite3.Error as e:
+                print(f"Replication error: {str(e)}")
@@ -0,0 +1,102 @@
+"""
+Positional row mapping for the service layer
+Builds model objects straight from the tuples a plain cursor returns,
+using a column-to-argument mapping compiled once per result shape, so
+listing queries skip the row dict and the from_dict lookups
+"""
+
+from inspect import signature
+from itertools import starmap
+from operator import itemgetter
+
+
+class RowMapper:
+    """
+    Maps cursor rows onto a model class.
+
+    By default the fields are the model constructor's parameters, passed
+    positionally in the same order. Rows that already are dictionaries (from a
+    dictionary cursor) go through model.from_dict instead.
+
+    encoded maps fields to the CodeTable of their column (see app.utils.enums).
+    Their values are swapped for the table's shared string once, here, so
+    every model built from a row refers to the same few strings.
+    """
+
+    def __init__(self, model, fields=None, encoded=None):
+        self.model = model
+        self.fields = tuple(fields or signature(model).parameters)
+        self.encoded = dict(encoded or {})
+        self._compiled = {}
+
+    def _compile(self, cursor):
+        """Return (callable turning one row into constructor arguments, field positions)"""
+        description = cursor.description
+        names = tuple(column[0] for column in description) if description else ()
+        compiled = self._compiled.get(names)
+        if compiled is None:
+            positions = {name: index for index, name in enumerate(names)}
+            missing = [field for field in self.fields if field not in positions]
+            if missing:
+                raise ValueError(f"Result has no column for {', '.join(missing)}")
+            columns = tuple(positions[field] for field in self.fields)
+            getter = itemgetter(*columns)
+            if len(self.fields) == 1:
+                single = getter
+                getter = lambda row: (single(row),)
+            if self.encoded:
+                getter = self._canonicalizing(getter)
+            compiled = self._compiled[names] = (getter, columns)
+        return compiled
+
+    def _getter(self, cursor):
+        return self._compile(cursor)[0]
+
+    def _canonicalizing(self, getter):
+        """Wrap getter so encoded fields come out as their shared strings"""
+        tables = [(index, self.encoded[field].shared)
+                  for index, field in enumerate(self.fields) if field in self.encoded]
+
+        def canonical_getter(row):
+            values = list(getter(row))
+            for index, shared in tables:
+                values[index] = shared[values[index]]
+            return values
+        return canonical_getter
+
+    def _columns(self, cursor, rows):
+        """Per-field iterators over rows, encoded fields mapped to their shared strings"""
+        columns = []
+        for field, position in zip(self.fields, self._compile(cursor)[1]):
+            column = map(itemgetter(position), rows)
+            if field in self.encoded:
+                column = map(self.encoded[field].shared.__getitem__, column)
+            columns.append(column)
+        return columns
+
+    def _from_dict(self, row):
+        if self.encoded:
+            row = dict(row)
+            for field, table in self.encoded.items():
+                if field in row:
+                    row[field] = table.shared[row[field]]
+        return self.model.from_dict(row)
+
+    def all(self, cursor, rows):
+        """Map a list of rows fetched from cursor"""
+        if not rows:
+            return []
+        if isinstance(rows[0], dict):
+            return [self._from_dict(row) for row in rows]
+        if self.encoded:
+            # Column by column, so the lookups run without a Python call per row
+            return list(starmap(self.model, zip(*self._columns(cursor, rows))))
+        return list(starmap(self.model, map(self._getter(cursor), rows)))
+
+    def one(self, cursor, row):
+        """Map a single row, or return None"""
+        if row is None:
+            return None
+        if isinstance(row, dict):
+            return self._from_dict(row)
+        return self.model(*self._getter(cursor)(row))
@@ -0,0 +1,114 @@
+"""
+Batch assignment of appointment requests to doctors
+Requests are placed most urgent first. Each specialization keeps its
+doctors in a heap ordered by booked slots, so every request goes to the
+least loaded doctor who is free in its window, at that doctor's earliest
+free time. Times are whole minutes (see intervals.to_minutes)
+"""
+
+import heapq
+from collections import namedtuple
+
+from app.utils.availability import SLOT_MINUTES, day_masks, slot_mask
+
+# One request of a batch; a higher priority is placed first
+AppointmentRequest = namedtuple('AppointmentRequest', ['patient_id', 'specialization', 'earliest', 'latest',
+                                                       'priority', 'duration_minutes'],
+                                defaults=(0, None))
+
+
+def _popcount(mask):
+    return bin(mask).count('1')
+
+
+class BatchScheduler:
+    """
+    Greedy load-balancing scheduler over an AvailabilityIndex.
+
+    doctors_of maps a specialization to its doctor ids. held lists
+    (doctor_id, start, end) that are taken but not in the index yet, such
+    as uncommitted bookings. The index itself is only read; what the
+    scheduler assigns is tracked on the side.
+    """
+
+    def __init__(self, availability, doctors_of, held=()):
+        self.availability = availability
+        self.doctors_of = doctors_of
+        self._taken = {}        # (doctor_id, day) -> slots assigned or held here
+        self._heaps = {}        # specialization -> [(load, doctor_id)]
+        for doctor_id, start, end in held:
+            self._take(doctor_id, start, end)
+
+    def assign(self, requests, slots_of):
+        """
+        Return (request, doctor_id, start) for each request, in the order
+        given; doctor_id and start are None for requests that do not fit.
+        Requests carry earliest and latest as minutes, and slots_of(request)
+        is the number of slots it needs
+        """
+        requests = list(requests)
+        if not requests:
+            return []
+        first_day = min(request.earliest for request in requests) // 1440
+        last_day = max(request.latest - 1 for request in requests) // 1440
+        placed = [None] * len(requests)
+        order = sorted(range(len(requests)),
+                       key=lambda n: (-requests[n].priority, requests[n].earliest, n))
+        for n in order:
+            request = requests[n]
+            heap = self._heaps.get(request.specialization)
+            if heap is None:
+                heap = self._heaps[request.specialization] = self._load(
+                    self.doctors_of(request.specialization), first_day, last_day)
+            placed[n] = (request,) + self._place(heap, request, slots_of(request))
+        return placed
+
+    def _load(self, doctor_ids, first_day, last_day):
+        """Heap of (booked slots between the days, doctor_id)"""
+        heap = []
+        for doctor_id in doctor_ids:
+            load = 0
+            for day in range(first_day, last_day + 1):
+                load += _popcount(self.availability.booked_mask(doctor_id, day))
+            heap.append((load, doctor_id))
+        heapq.heapify(heap)
+        return heap
+
+    def _place(self, heap, request, slots):
+        """Pop doctors until one fits the request, then put them all back"""
+        skipped = []
+        found = (None, None)
+        while heap:
+            load, doctor_id = heapq.heappop(heap)
+            start = self._first_fit(doctor_id, request.earliest, request.latest, slots)
+            if start is not None:
+                self._take(doctor_id, start, start + slots * SLOT_MINUTES)
+                heapq.heappush(heap, (load + slots, doctor_id))
+                found = (doctor_id, start)
+                break
+            skipped.append((load, doctor_id))
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return found
+
+    def _first_fit(self, doctor_id, earliest, latest, slots):
+        """Earliest start of `slots` free slots inside [earliest, latest), or None"""
+        for day in range(earliest // 1440, (latest - 1) // 1440 + 1):
+            base = day * 1440
+            # Slots wholly inside the window on this day
+            first = -(-max(earliest - base, 0) // SLOT_MINUTES)
+            last = min(latest - base, 1440) // SLOT_MINUTES
+            if last - first < slots:
+                continue
+            window = slot_mask(first * SLOT_MINUTES, last * SLOT_MINUTES)
+            free = self.availability.free_mask(doctor_id, day) & window & ~self._taken.get((doctor_id, day), 0)
+            runs = free
+            for shift in range(1, slots):
+                runs &= free >> shift
+            if runs:
+                return base + ((runs & -runs).bit_length() - 1) * SLOT_MINUTES
+        return None
+
+    def _take(self, doctor_id, start, end):
+        for day, mask in day_masks(start, end):
+            self._taken[(doctor_id, day)] = self._taken.get((doctor_id, day), 0) | mask
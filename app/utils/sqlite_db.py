@@ -0,0 +1,160 @@
+"""
+Embedded SQLite backend for single-workstation deployments
+Wraps sqlite3 so services can keep using mysql-connector style calls:
+%s placeholders, cursor(dictionary=True) and lastrowid after inserts
+"""
+
+import re
+import sqlite3
+from functools import lru_cache
+
+# Applied to every new connection. WAL lets readers run while a write is in
+# progress; synchronous=NORMAL is durable across application crashes in WAL mode
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'temp_store': 'MEMORY',
+    'cache_size': -16000,          # 16 MB page cache
+    'mmap_size': 268435456,        # 256 MB memory-mapped I/O
+    'busy_timeout': 5000,
+}
+
+_PLACEHOLDER_RE = re.compile(r"('(?:[^']|'')*')|%s|%%")
+
+
+@lru_cache(maxsize=512)
+def translate_placeholders(query):
+    """Rewrite MySQL-style %s placeholders as SQLite ? placeholders"""
+    def replace(match):
+        if match.group(1):
+            return match.group(1)
+        return '?' if match.group() == '%s' else '%'
+    return _PLACEHOLDER_RE.sub(replace, query)
+
+
+def connect(path, create_schema=True):
+    """Open a tuned SQLite connection wrapped for the services"""
+    raw = sqlite3.connect(path, check_same_thread=False)
+    for name, value in PRAGMAS.items():
+        raw.execute(f"PRAGMA {name} = {value}")
+    connection = SQLiteConnection(raw)
+    if create_schema:
+        from app.utils import migrations
+        migrations.migrate(connection)
+    return connection
+
+
+class SQLiteConnection:
+    """mysql-connector compatible wrapper around a sqlite3 connection"""
+
+    dialect = 'sqlite'
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._open = True
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self.raw.cursor(), dictionary)
+
+    def begin(self, immediate=False):
+        """
+        Start a transaction explicitly so savepoints nest inside it
+        immediate takes the write lock at once, so no other connection can
+        write between this transaction's reads and its own writes
+        """
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def is_connected(self):
+        if not self._open:
+            return False
+        try:
+            self.raw.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._open = False
+        self.raw.close()
+
+
+class SQLiteCursor:
+    """Cursor returning tuples, or dicts when opened with dictionary=True"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self.dictionary = dictionary
+        self.lastrowid = None
+        self._names = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def arraysize(self):
+        return self._cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, size):
+        self._cursor.arraysize = size
+
+    def execute(self, query, params=None):
+        self._cursor.execute(translate_placeholders(query), tuple(params) if params else ())
+        self.lastrowid = self._cursor.lastrowid
+        self._set_names()
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(translate_placeholders(query), seq_params)
+        self._set_names()
+        if query.lstrip()[:6].upper() == 'INSERT' and self._cursor.rowcount > 0:
+            # sqlite3 leaves lastrowid unset here; report the first new id
+            # like mysql-connector does for batched inserts
+            last = self._cursor.connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+            self.lastrowid = last - self._cursor.rowcount + 1
+        else:
+            self.lastrowid = None
+
+    def _set_names(self):
+        description = self._cursor.description
+        self._names = [column[0] for column in description] if description else None
+
+    def _wrap(self, row):
+        if row is not None and self.dictionary:
+            return dict(zip(self._names, row))
+        return row
+
+    def fetchone(self):
+        return self._wrap(self._cursor.fetchone())
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+        if self.dictionary:
+            names = self._names
+            return [dict(zip(names, row)) for row in rows]
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if self.dictionary:
+            names = self._names
+            return [dict(zip(names, row)) for row in rows]
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
@@ -0,0 +1,216 @@
+"""
+Trigram inverted index for fuzzy text search
+Documents are split into lowercase word tokens (plus a digits-only token
+for values such as phone numbers); each token contributes its padded
+three-character grams. A query scores documents by the share of its
+grams they contain, so partial words, typos and number fragments still
+rank the closest matches first
+"""
+
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+from math import ceil
+
+from app.utils.cache import SnapshotIndex
+
+_WORD_RE = re.compile(r'[^\W_]+')
+_NON_DIGIT_RE = re.compile(r'\D+')
+_EMPTY = array('i')
+
+# Probing one slot by binary search costs about as much as counting this
+# many posting entries
+_COUNT_RATIO = 8
+
+
+def tokens(*texts):
+    """Return the search tokens of texts: lowercase words and digit runs"""
+    found = []
+    for text in texts:
+        if not text:
+            continue
+        text = str(text).lower()
+        words = _WORD_RE.findall(text)
+        found.extend(words)
+        digits = _NON_DIGIT_RE.sub('', text)
+        if len(words) > 1 and len(digits) >= 3 and digits not in words:
+            found.append(digits)
+    return found
+
+
+def document_grams(*texts):
+    """Grams of a stored document: each token padded as '  token '"""
+    grams = set()
+    for token in tokens(*texts):
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def query_grams(query):
+    """
+    Grams of a query; tokens are padded only in front so a partial word
+    still matches. A query without letters is one run of digits
+    """
+    query = str(query).lower()
+    if not re.search(r'[^\W\d_]', query):
+        digits = _NON_DIGIT_RE.sub('', query)
+        words = [digits] if digits else []
+    else:
+        words = _WORD_RE.findall(query)
+    grams = set()
+    for word in words:
+        padded = f"  {word}"
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex(SnapshotIndex):
+    """
+    Inverted index from gram to the documents containing it.
+
+    Each stored version of a document gets a new slot number, so posting
+    lists stay sorted and only ever grow at the end; replaced and removed
+    slots are marked dead, and once they make up half of the slots the
+    live documents are renumbered into fresh arrays.
+    """
+
+    def _reset(self):
+        self._postings = {}             # gram -> array of slots, ascending
+        self._doc_ids = []              # slot -> document id
+        self._sizes = array('H')        # slot -> number of grams
+        self._alive = bytearray()       # slot -> 1 while current
+        self._slots = {}                # document id -> current slot
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._slots
+
+    # -- maintenance --------------------------------------------------------
+
+    def _fill(self, documents):
+        """Add (doc_id, texts) pairs"""
+        for doc_id, texts in documents:
+            self._add(doc_id, texts)
+
+    def put(self, doc_id, *texts):
+        """Index a document, replacing any earlier version of it"""
+        with self._lock:
+            if self._changed():
+                self._discard(doc_id)
+                self._add(doc_id, texts)
+
+    def remove(self, doc_id):
+        """Drop a document; returns False if it was not indexed"""
+        with self._lock:
+            self._changed()
+            return self._discard(doc_id)
+
+    def _add(self, doc_id, texts):
+        slot = len(self._doc_ids)
+        grams = document_grams(*texts)
+        postings = self._postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('i')
+            posting.append(slot)
+        self._doc_ids.append(doc_id)
+        self._sizes.append(min(len(grams), 0xffff))
+        self._alive.append(1)
+        self._slots[doc_id] = slot
+
+    def _discard(self, doc_id):
+        slot = self._slots.pop(doc_id, None)
+        if slot is None:
+            return False
+        self._alive[slot] = 0
+        self._dead += 1
+        if self._dead * 2 > len(self._doc_ids):
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Renumber the live slots from 0, keeping their order so postings stay sorted"""
+        alive = self._alive
+        renumbered = {}                 # old slot -> new slot
+        doc_ids, sizes = [], array('H')
+        for slot, doc_id in enumerate(self._doc_ids):
+            if alive[slot]:
+                renumbered[slot] = len(doc_ids)
+                doc_ids.append(doc_id)
+                sizes.append(self._sizes[slot])
+        postings = {}
+        for gram, posting in self._postings.items():
+            kept = array('i', [renumbered[slot] for slot in posting if alive[slot]])
+            if kept:
+                postings[gram] = kept
+        self._postings = postings
+        self._doc_ids = doc_ids
+        self._sizes = sizes
+        self._alive = bytearray(b'\x01') * len(doc_ids)
+        self._slots = {doc_id: slot for slot, doc_id in enumerate(doc_ids)}
+        self._dead = 0
+
+    # -- queries ------------------------------------------------------------
+
+    def search(self, query, limit=20, threshold=0.5):
+        """
+        Return [(doc_id, score)] for the best matches, best first
+        score is the share of query grams found (0..1]; documents below
+        threshold are skipped and ties go to the shorter document
+        """
+        grams = query_grams(query)
+        if not grams or limit < 1:
+            return []
+        total = len(grams)
+        lowest = max(1, ceil(total * threshold))
+        with self._lock:
+            lists = sorted((self._postings.get(gram, _EMPTY) for gram in grams), key=len)
+            alive, sizes, doc_ids = self._alive, self._sizes, self._doc_ids
+            # Ask for every gram first and relax only while there are fewer
+            # than limit hits: anything found at a stricter level outranks
+            # whatever a looser one would add
+            needed = total
+            while True:
+                hits = [(slot, matched) for slot, matched in self._matches(lists, needed).items()
+                        if matched >= needed and alive[slot]]
+                if len(hits) >= limit or needed == lowest:
+                    break
+                needed = max(lowest, needed - max(1, total // 4))
+            best = heapq.nlargest(limit, (
+                (matched / total, matched / (sizes[slot] or 1), -slot) for slot, matched in hits
+            ))
+            return [(doc_ids[-negated], score) for score, _, negated in best]
+
+    @staticmethod
+    def _matches(lists, needed):
+        """Count matched grams per slot for slots that can match `needed` of lists"""
+        total = len(lists)
+        # A match is in at least one of the total - needed + 1 shortest
+        # lists, so only those are counted in full
+        probe = total - needed + 1
+        counts = Counter(chain.from_iterable(lists[:probe]))
+        for position in range(probe, total):
+            posting = lists[position]
+            size = len(posting)
+            if size <= len(counts) * _COUNT_RATIO:
+                # Scanning the list is cheaper than probing it per candidate
+                counts.update(filter(counts.__contains__, posting))
+            else:
+                for slot in counts:
+                    index = bisect_left(posting, slot)
+                    if index < size and posting[index] == slot:
+                        counts[slot] += 1
+            remaining = total - position - 1
+            if remaining < needed - 1:
+                # Drop candidates that can no longer reach `needed`
+                short = needed - remaining
+                counts = Counter({slot: matched for slot, matched in counts.items() if matched >= short})
+        return counts
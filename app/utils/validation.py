@@ -0,0 +1,155 @@
+"""
+Batch validation for the Hospital Management System
+Rules are built once and run column by column over a whole batch of
+records, returning structured per-row errors instead of raising or
+showing dialogs. The model rule sets mirror Model.validate(): the first
+error reported for a row is the message validate() would return
+"""
+
+import re
+from collections import namedtuple
+from operator import attrgetter
+
+from app.utils.enums import APPOINTMENT_STATUS
+
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_RE = re.compile(r'^[0-9+\s\-()]{10,15}$')
+_NON_DIGIT_RE = re.compile(r'\D+')
+
+# Numbers are compared on their last PHONE_KEY_DIGITS digits, so a country
+# code or trunk prefix does not hide a duplicate
+PHONE_KEY_DIGITS = 10
+PHONE_MIN_DIGITS = 7
+
+# row is the index of the record in the batch
+RowError = namedtuple('RowError', ['row', 'field', 'message'])
+
+
+class Required:
+    """The field must be set; with strip=True whitespace-only strings fail too"""
+
+    def __init__(self, field, message, strip=True):
+        self.field = field
+        self.message = message
+        self.strip = strip
+
+    def failures(self, column):
+        if self.strip:
+            return [i for i, v in enumerate(column) if not v or (v.__class__ is str and v.isspace())]
+        return [i for i, v in enumerate(column) if not v]
+
+
+class Matches:
+    """A non-empty field must match a compiled regex"""
+
+    def __init__(self, field, pattern, message):
+        self.field = field
+        self.match = re.compile(pattern).match
+        self.message = message
+
+    def failures(self, column):
+        match = self.match
+        return [i for i, v in enumerate(column) if v and not match(str(v))]
+
+
+class OneOf:
+    """The field must be one of a fixed set of values"""
+
+    def __init__(self, field, values, message):
+        self.field = field
+        self.values = frozenset(values)
+        self.message = message
+
+    def failures(self, column):
+        values = self.values
+        return [i for i, v in enumerate(column) if v not in values]
+
+
+class Validator:
+    """Runs a list of rules over record batches or columns"""
+
+    def __init__(self, *rules):
+        self.rules = rules
+        self.fields = tuple(dict.fromkeys(rule.field for rule in rules))
+
+    def extend(self, *rules):
+        """Return a new validator with extra rules checked after these ones"""
+        return Validator(*(self.rules + rules))
+
+    def validate_columns(self, columns):
+        """
+        Validate {field: [values]} where every list holds one value per row
+        Returns RowError tuples ordered by row, then by rule order
+        """
+        found = []
+        for order, rule in enumerate(self.rules):
+            message = rule.message
+            field = rule.field
+            found.extend((row, order, field, message) for row in rule.failures(columns[field]))
+        found.sort()
+        return [RowError(row, field, message) for row, _, field, message in found]
+
+    def validate_records(self, records):
+        """Validate a batch of model objects or dictionaries"""
+        if not isinstance(records, list):
+            records = list(records)
+        columns = {}
+        for field in self.fields:
+            if records and isinstance(records[0], dict):
+                columns[field] = [record.get(field) for record in records]
+            else:
+                columns[field] = list(map(attrgetter(field), records))
+        return self.validate_columns(columns)
+
+    def validate_one(self, record):
+        """Validate one record, returning (valid, message) like Model.validate"""
+        errors = self.validate_records([record])
+        return (False, errors[0].message) if errors else (True, "Valid")
+
+
+def normalize_phone(phone):
+    """
+    Return the canonical digits-only form of a phone number, or None
+    "+1 (555) 123-4567" and "555.123.4567" give the same key; values with
+    fewer than PHONE_MIN_DIGITS digits have none
+    """
+    if not phone:
+        return None
+    digits = _NON_DIGIT_RE.sub('', str(phone))
+    if len(digits) < PHONE_MIN_DIGITS:
+        return None
+    return digits[-PHONE_KEY_DIGITS:]
+
+
+def first_errors(errors):
+    """Return {row: message} keeping only the first error of each row"""
+    result = {}
+    for error in errors:
+        result.setdefault(error.row, error.message)
+    return result
+
+
+PATIENT = Validator(
+    Required('name', "Name is required"),
+    Required('contact', "Contact is required"),
+)
+
+DOCTOR = Validator(
+    Required('name', "Name is required"),
+    Required('specialization', "Specialization is required"),
+    Required('email', "Email is required"),
+)
+
+APPOINTMENT = Validator(
+    Required('appointment_date', "Appointment date is required", strip=False),
+    OneOf('status', APPOINTMENT_STATUS.known, "Invalid status"),
+)
+
+MEDICAL_RECORD = Validator(
+    Required('diagnosis', "Diagnosis is required"),
+    Required('visit_date', "Visit date is required", strip=False),
+)
+
+# Stricter variants for imports, adding the format checks the views apply
+PATIENT_IMPORT = PATIENT.extend(Matches('contact', PHONE_RE, "Invalid phone number"))
+DOCTOR_IMPORT = DOCTOR.extend(Matches('email', EMAIL_RE, "Invalid email format"))
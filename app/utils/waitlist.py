@@ -0,0 +1,224 @@
+"""
+Priority waitlist for freed appointment slots
+Patients wait for a particular doctor or for any doctor of a
+specialization, in heaps ordered by urgency and then by how long they
+have waited. A freed slot is offered to the better of the two heap tops,
+so finding the next candidate costs O(log n) however long the list is
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import namedtuple
+
+from app.utils.cache import register
+
+WaitlistEntry = namedtuple('WaitlistEntry', ['entry_id', 'patient_id', 'doctor_id', 'specialization',
+                                             'urgency', 'added_at'])
+
+# slot is whatever the caller offers; the service passes (start, duration_minutes)
+Offer = namedtuple('Offer', ['offer_id', 'entry', 'doctor_id', 'specialization', 'slot',
+                             'freed_at', 'offered_at'])
+
+
+class Waitlist:
+    """
+    Thread-safe waitlist with offer bookkeeping and fill counters.
+
+    An entry waits for a doctor_id, or for a specialization when doctor_id
+    is None; a higher urgency goes first, then the longest wait. Offering
+    a slot takes the best entry off the list until it accepts or declines.
+    Entries that declined a slot stay off the list until that slot is
+    filled or given up, so it is never offered to them twice. Removed
+    entries are dropped from their heap lazily, when they reach the top.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._queues = {}           # ('doctor', id) or ('specialization', name) -> heap
+        self._waiting = {}          # entry_id -> WaitlistEntry still on the list
+        self._offers = {}           # offer_id -> Offer awaiting an answer
+        self._declined = {}         # offer_id -> entries that declined the slot of that offer
+        self.reset_stats()
+        register(self)
+
+    def __len__(self):
+        return len(self._waiting)
+
+    def reset_stats(self):
+        with self._lock:
+            self.slots_freed = 0
+            self.offers_made = 0
+            self.declined = 0
+            self.filled = 0
+            self.unfilled = 0
+            self.backfill_seconds = 0.0
+            self.max_backfill_seconds = 0.0
+
+    # -- entries ------------------------------------------------------------
+
+    def add(self, patient_id, doctor_id=None, specialization=None, urgency=0):
+        """Put a patient on the list of a doctor, or of a specialization"""
+        if doctor_id is None and not specialization:
+            raise ValueError("A waitlist entry needs a doctor or a specialization")
+        with self._lock:
+            entry = WaitlistEntry(next(self._ids), patient_id, doctor_id,
+                                  specialization if doctor_id is None else None, urgency, self.clock())
+            self._push(entry)
+            return entry
+
+    def remove(self, entry_id):
+        """Take an entry off the list; returns False if it is not waiting"""
+        with self._lock:
+            if self._waiting.pop(entry_id, None) is not None:
+                return True
+            for declined in self._declined.values():
+                for n, entry in enumerate(declined):
+                    if entry.entry_id == entry_id:
+                        del declined[n]
+                        return True
+            return False
+
+    def entries(self, doctor_id=None, specialization=None):
+        """Return the waiting entries of one list, best first"""
+        with self._lock:
+            queue = self._queues.get(self._key(doctor_id, specialization), [])
+            return [item[-1] for item in sorted(queue) if item[-1].entry_id in self._waiting]
+
+    @staticmethod
+    def _key(doctor_id, specialization):
+        return ('doctor', doctor_id) if doctor_id is not None else ('specialization', specialization)
+
+    def _push(self, entry):
+        self._waiting[entry.entry_id] = entry
+        heapq.heappush(self._queues.setdefault(self._key(entry.doctor_id, entry.specialization), []),
+                       (-entry.urgency, entry.added_at, entry.entry_id, entry))
+
+    def _top(self, key):
+        """Best waiting item of a queue, dropping removed entries on the way"""
+        queue = self._queues.get(key)
+        while queue and queue[0][2] not in self._waiting:
+            heapq.heappop(queue)
+        return queue[0] if queue else None
+
+    def _pop_best(self, doctor_id, specialization):
+        keys = [self._key(doctor_id, None)]
+        if specialization:
+            keys.append(self._key(None, specialization))
+        best = None
+        for key in keys:
+            top = self._top(key)
+            if top is not None and (best is None or top < best[1]):
+                best = (key, top)
+        if best is None:
+            return None
+        heapq.heappop(self._queues[best[0]])
+        return self._waiting.pop(best[1][2])
+
+    # -- offers -------------------------------------------------------------
+
+    def offer(self, slot, doctor_id, specialization=None, freed_at=None):
+        """
+        Offer a freed slot of doctor_id to the best entry waiting for that
+        doctor or for its specialization. Returns the Offer, or None (the
+        slot counts as unfilled) when nobody is waiting
+        """
+        with self._lock:
+            self.slots_freed += 1
+            return self._next_offer(slot, doctor_id, specialization,
+                                    self.clock() if freed_at is None else freed_at)
+
+    def _next_offer(self, slot, doctor_id, specialization, freed_at):
+        entry = self._pop_best(doctor_id, specialization)
+        if entry is None:
+            self.unfilled += 1
+            return None
+        self.offers_made += 1
+        offer = Offer(next(self._ids), entry, doctor_id, specialization, slot, freed_at, self.clock())
+        self._offers[offer.offer_id] = offer
+        return offer
+
+    def get_offer(self, offer_id):
+        with self._lock:
+            return self._offers.get(offer_id)
+
+    def offers(self, patient_id=None):
+        """Return the open offers, oldest first, optionally of one patient"""
+        with self._lock:
+            return [offer for offer in self._offers.values()
+                    if patient_id is None or offer.entry.patient_id == patient_id]
+
+    def accept(self, offer_id):
+        """Record that an offer was taken up; returns the Offer, or None if it is not open"""
+        with self._lock:
+            offer = self._offers.pop(offer_id, None)
+            if offer is not None:
+                waited = max(self.clock() - offer.freed_at, 0.0)
+                self.filled += 1
+                self.backfill_seconds += waited
+                self.max_backfill_seconds = max(self.max_backfill_seconds, waited)
+                self._restore(self._declined.pop(offer_id, ()))
+            return offer
+
+    def decline(self, offer_id):
+        """
+        Pass an offer on to the next best entry that has not declined the
+        slot yet. Those declining get their place back once the slot is
+        filled or given up. Returns the next Offer, or None when nobody
+        else is waiting (the slot then counts as unfilled)
+        """
+        with self._lock:
+            offer = self._offers.pop(offer_id, None)
+            if offer is None:
+                return None
+            self.declined += 1
+            declined = self._declined.pop(offer_id, [])
+            declined.append(offer.entry)
+            following = self._next_offer(offer.slot, offer.doctor_id, offer.specialization, offer.freed_at)
+            if following is None:
+                self._restore(declined)
+            else:
+                self._declined[following.offer_id] = declined
+            return following
+
+    def withdraw(self, offer_id):
+        """Close an offer whose slot is gone, putting its entry back; returns False if not open"""
+        with self._lock:
+            offer = self._offers.pop(offer_id, None)
+            if offer is None:
+                return False
+            self.unfilled += 1
+            self._push(offer.entry)
+            self._restore(self._declined.pop(offer_id, ()))
+            return True
+
+    def _restore(self, entries):
+        for entry in entries:
+            self._push(entry)
+
+    def clear(self):
+        """Drop every entry and open offer; counters are kept (see reset_stats)"""
+        with self._lock:
+            self._queues.clear()
+            self._waiting.clear()
+            self._offers.clear()
+            self._declined.clear()
+
+    def stats(self):
+        """Return the counters, fill rate and mean time-to-backfill as a dictionary"""
+        with self._lock:
+            return {
+                'waiting': len(self._waiting),
+                'open_offers': len(self._offers),
+                'slots_freed': self.slots_freed,
+                'offers': self.offers_made,
+                'declined': self.declined,
+                'filled': self.filled,
+                'unfilled': self.unfilled,
+                'fill_rate': self.filled / self.slots_freed if self.slots_freed else 0.0,
+                'mean_backfill_seconds': self.backfill_seconds / self.filled if self.filled else 0.0,
+                'max_backfill_seconds': self.max_backfill_seconds,
+            }
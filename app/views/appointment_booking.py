@@ -2,6 +2,7 @@
 Appointment Booking View
 """
 
+import re
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from datetime import datetime, timedelta
@@ -11,15 +12,39 @@ from app.utils.style import (
     create_button, create_entry, create_label, create_card
 )
 from app.utils.helpers import validate_required_fields, format_date
+from app.models.appointment import Appointment
+from app.services.appointment_service import AppointmentService, AppointmentConflictError
+from app.services.doctor_patient import DoctorService
+from app.services.patient_service import PatientService
+
+# Dropdown entries end in "(ID: <id>)"
+ID_RE = re.compile(r'\(ID: (\d+)\)\s*$')
 
 class AppointmentBookingView:
     def __init__(self, root):
         self.root = root
         self.root.title("Appointment Booking")
         self.root.geometry("900x700")
+        self.appointment_service = AppointmentService()
+        self.patient_names = {}
+        self.doctor_names = {}
+        self.doctor_specializations = {}
+        self.load_options()
         
         self.create_widgets()
     
+    def load_options(self):
+        # First page of patients and every doctor, for the dropdowns
+        try:
+            patients, _ = PatientService().get_patients_page(limit=200, order_by='name')
+            doctors = DoctorService().get_doctor_directory().all()
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.patient_names = {p.patient_id: p.name for p in patients}
+        self.doctor_names = {d.doctor_id: f"{d.name} - {d.specialization}" for d in doctors}
+        self.doctor_specializations = {d.doctor_id: d.specialization for d in doctors}
+    
     def create_widgets(self):
         # Main frame
         main_frame = tk.Frame(self.root, bg=BACKGROUND_COLOR)
@@ -64,14 +89,14 @@ class AppointmentBookingView:
         # Patient selection
         create_label(form_frame, "Patient:", font=BUTTON_FONT)
         self.patient_var = tk.StringVar()
-        patient_options = ["John Doe (ID: 1)", "Jane Smith (ID: 2)", "Robert Johnson (ID: 3)"]
+        patient_options = [f"{name} (ID: {patient_id})" for patient_id, name in self.patient_names.items()]
         patient_dropdown = ttk.Combobox(form_frame, textvariable=self.patient_var, values=patient_options, font=NORMAL_FONT)
         patient_dropdown.pack(fill=tk.X, pady=(0, 10))
         
         # Doctor selection
         create_label(form_frame, "Doctor:", font=BUTTON_FONT)
         self.doctor_var = tk.StringVar()
-        doctor_options = ["Dr. Smith - Cardiology", "Dr. Johnson - Neurology", "Dr. Williams - Pediatrics"]
+        doctor_options = [f"{label} (ID: {doctor_id})" for doctor_id, label in self.doctor_names.items()]
         doctor_dropdown = ttk.Combobox(form_frame, textvariable=self.doctor_var, values=doctor_options, font=NORMAL_FONT)
         doctor_dropdown.pack(fill=tk.X, pady=(0, 10))
         
@@ -91,6 +116,11 @@ class AppointmentBookingView:
         time_dropdown = ttk.Combobox(time_frame, textvariable=self.time_var, values=time_options, font=NORMAL_FONT, width=10)
         time_dropdown.pack(side=tk.LEFT)
         
+        tk.Label(time_frame, text="Duration (min):", font=NORMAL_FONT, bg="white").pack(side=tk.LEFT, padx=(20, 5))
+        self.duration_var = tk.StringVar(value="30")
+        duration_dropdown = ttk.Combobox(time_frame, textvariable=self.duration_var, values=["15", "30", "45", "60"], font=NORMAL_FONT, width=5)
+        duration_dropdown.pack(side=tk.LEFT)
+        
         # Status
         create_label(form_frame, "Status:", font=BUTTON_FONT)
         self.status_var = tk.StringVar(value="Scheduled")
@@ -147,8 +177,8 @@ class AppointmentBookingView:
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # Add mock data
-        self.load_mock_appointments()
+        # Appointments on the date in the booking form
+        self.load_appointments()
         
         # Buttons frame
         button_frame = tk.Frame(table_card, bg=BACKGROUND_COLOR)
@@ -157,7 +187,7 @@ class AppointmentBookingView:
         create_button(
             button_frame,
             "Refresh",
-            command=self.load_mock_appointments,
+            command=self.load_appointments,
             bg="#17A2B8"
         ).pack(side=tk.LEFT, padx=5)
         
@@ -190,12 +220,40 @@ class AppointmentBookingView:
         }):
             return
         
-        # Mock booking - in real app this would save to database
-        appointment_id = f"A{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        messagebox.showinfo("Success", f"Appointment booked successfully!\nAppointment ID: {appointment_id}\nPatient: {patient}\nDoctor: {doctor}\nDate: {date} at {time}")
+        patient_id = self.selected_id(patient)
+        doctor_id = self.selected_id(doctor)
+        if patient_id is None or doctor_id is None:
+            messagebox.showerror("Error", "Please choose the patient and doctor from the lists")
+            return
+        formatted_date = format_date(date)
+        if not formatted_date:
+            messagebox.showerror("Error", "Invalid date format. Please use YYYY-MM-DD")
+            return
+        
+        try:
+            appointment = self.appointment_service.book_appointment(Appointment(
+                patient_id=patient_id,
+                doctor_id=doctor_id,
+                appointment_date=f"{formatted_date} {time}",
+                status=status,
+                duration_minutes=int(self.duration_var.get())
+            ))
+        except AppointmentConflictError as e:
+            messagebox.showerror("Doctor Unavailable", f"{e}\nPlease choose another time.")
+            return
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        messagebox.showinfo("Success", f"Appointment booked successfully!\nAppointment ID: {appointment.appointment_id}\nPatient: {patient}\nDoctor: {doctor}\nDate: {date} at {time}")
         
         # Refresh the table
-        self.load_mock_appointments()
+        self.load_appointments()
+    
+    @staticmethod
+    def selected_id(option):
+        match = ID_RE.search(option)
+        return int(match.group(1)) if match else None
     
     def check_availability(self):
         doctor = self.doctor_var.get()
@@ -205,30 +263,61 @@ class AppointmentBookingView:
             messagebox.showwarning("Warning", "Please select doctor and date first")
             return
         
-        available_slots = ["09:00", "11:00", "14:00", "16:00"]
-        booked_slots = ["10:00", "15:00"]
+        doctor_id = self.selected_id(doctor)
+        formatted_date = format_date(date)
+        if doctor_id is None or not formatted_date:
+            messagebox.showerror("Error", "Please choose a doctor from the list and a date as YYYY-MM-DD")
+            return
+        
+        try:
+            duration = int(self.duration_var.get())
+            available_slots = self.appointment_service.get_free_slots(doctor_id, formatted_date, duration)
+            booked_slots = self.appointment_service.get_booked_slots(doctor_id, formatted_date)
+            specialization = self.doctor_specializations.get(doctor_id)
+            earliest = None
+            if specialization:
+                earliest = self.appointment_service.find_first_free_slot(
+                    specialization, start=max(datetime.now(), datetime.strptime(formatted_date, '%Y-%m-%d')),
+                    duration_minutes=duration
+                )
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
         
         availability_text = f" Availability for {doctor} on {date}:\n\n"
-        availability_text += "✅ Available: " + ", ".join(available_slots) + "\n"
-        availability_text += "❌ Booked: " + ", ".join(booked_slots)
+        availability_text += "✅ Available: " + (", ".join(slot.strftime('%H:%M') for slot in available_slots) or "none") + "\n"
+        availability_text += "❌ Booked: " + (", ".join(slot.strftime('%H:%M') for slot in booked_slots) or "none")
+        if earliest is not None:
+            other_id, when = earliest
+            availability_text += (f"\n\nFirst free {specialization} doctor in the next 14 days:\n"
+                                  f"{self.doctor_names.get(other_id, other_id)} on {when.strftime('%Y-%m-%d at %H:%M')}")
         
         messagebox.showinfo("Doctor Availability", availability_text)
     
-    def load_mock_appointments(self):
+    def load_appointments(self):
         # Clear existing data
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        # Add mock data
-        mock_appointments = [
-            (1, "John Doe", "Dr. Smith - Cardiology", "2024-01-16", "09:00", "Scheduled"),
-            (2, "Jane Smith", "Dr. Johnson - Neurology", "2024-01-16", "10:00", "Scheduled"),
-            (3, "Robert Johnson", "Dr. Williams - Pediatrics", "2024-01-17", "14:00", "Completed"),
-            (4, "Mary Williams", "Dr. Smith - Cardiology", "2024-01-18", "11:00", "Scheduled")
-        ]
+        date = format_date(self.date_entry.get().strip())
+        if not date:
+            return
+        try:
+            appointments = self.appointment_service.get_appointments_on(date)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
         
-        for appt in mock_appointments:
-            self.tree.insert('', tk.END, values=appt)
+        for appt in appointments:
+            day, _, time = str(appt.appointment_date).partition(' ')
+            self.tree.insert('', tk.END, values=(
+                appt.appointment_id,
+                self.patient_names.get(appt.patient_id, f"Patient {appt.patient_id}"),
+                self.doctor_names.get(appt.doctor_id, f"Doctor {appt.doctor_id}"),
+                day,
+                time[:5],
+                appt.status
+            ))
     
     def edit_appointment(self):
         selected_item = self.tree.selection()
@@ -238,7 +327,25 @@ class AppointmentBookingView:
         
         item = self.tree.item(selected_item[0])
         appt_data = item['values']
-        messagebox.showinfo("Edit Appointment", f"Editing appointment ID: {appt_data[0]}")
+        new_time = simpledialog.askstring(
+            "Reschedule Appointment",
+            f"New date and time for appointment {appt_data[0]} (YYYY-MM-DD HH:MM):",
+            initialvalue=f"{appt_data[3]} {appt_data[4]}",
+            parent=self.root
+        )
+        if not new_time:
+            return
+        
+        try:
+            self.appointment_service.reschedule_appointment(int(appt_data[0]), new_time.strip())
+        except AppointmentConflictError as e:
+            messagebox.showerror("Doctor Unavailable", str(e))
+            return
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        messagebox.showinfo("Success", "Appointment rescheduled successfully!")
+        self.load_appointments()
     
     def cancel_appointment(self):
         selected_item = self.tree.selection()
@@ -247,5 +354,14 @@ class AppointmentBookingView:
             return
         
         if messagebox.askyesno("Confirm Cancel", "Are you sure you want to cancel this appointment?"):
-            self.tree.delete(selected_item[0])
-            messagebox.showinfo("Success", "Appointment cancelled successfully!")
\ No newline at end of file
+            appt_data = self.tree.item(selected_item[0])['values']
+            try:
+                cancelled = self.appointment_service.cancel_appointment(int(appt_data[0]))
+            except Exception as e:
+                messagebox.showerror("Error", str(e))
+                return
+            if not cancelled:
+                messagebox.showwarning("Warning", "Only scheduled appointments can be cancelled")
+                return
+            messagebox.showinfo("Success", "Appointment cancelled successfully!")
+            self.load_appointments()
\ No newline at end of file
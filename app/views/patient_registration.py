@@ -10,12 +10,15 @@ from app.utils.style import (
     create_button, create_entry, create_label, create_card
 )
 from app.utils.helpers import validate_required_fields, format_date
+from app.models.patient import Patient
+from app.services.patient_service import PatientService
 
 class PatientRegistrationView:
     def __init__(self, root):
         self.root = root
         self.root.title("Patient Registration")
         self.root.geometry("800x600")
+        self.patient_service = None
         
         self.create_widgets()
     
@@ -124,12 +127,38 @@ class PatientRegistrationView:
             messagebox.showerror("Error", "Invalid date format. Please use YYYY-MM-DD")
             return
         
-        # Mock registration - in real app this would save to database
+        patient = Patient(name=name, dob=formatted_dob, gender=gender, contact=contact, address=address)
+        try:
+            if self.patient_service is None:
+                self.patient_service = PatientService()
+            
+            # Offer the existing chart before creating a second one
+            duplicates = self.patient_service.find_duplicates(contact)
+            if duplicates and not self.confirm_duplicate(patient, duplicates):
+                return
+            
+            self.patient_service.add_patient(patient, check_duplicates=not duplicates)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
         messagebox.showinfo("Success", f"Patient {name} registered successfully!")
         
         # Clear form after successful registration
         self.clear_form()
     
+    def confirm_duplicate(self, patient, duplicates):
+        listed = "\n".join(
+            f"  #{p.patient_id} {p.name} (born {p.dob or 'unknown'})" for p in duplicates[:5]
+        )
+        if len(duplicates) > 5:
+            listed += f"\n  ... and {len(duplicates) - 5} more"
+        return messagebox.askyesno(
+            "Possible Duplicate",
+            f"Contact number {patient.contact} is already registered to:\n{listed}\n\n"
+            "Register a new patient anyway?"
+        )
+    
     def clear_form(self):
         self.name_entry.delete(0, tk.END)
         self.dob_entry.delete(0, tk.END)
@@ -0,0 +1,69 @@
+"""
+Benchmark: double-booking checks with the interval index vs a scan
+Fills each doctor's calendar with years of 30-minute appointments, then
+times the overlap check a booking makes against the interval index and
+against a linear pass over the doctor's appointments
+Run with: python -m benchmarks.bench_appointment_conflicts [doctors] [years]
+"""
+
+import random
+import sys
+import time
+from app.utils.intervals import IntervalIndex, to_minutes
+
+SLOTS_PER_DAY = 16          # 08:00-16:00 in 30-minute slots
+WORKING_DAYS = 250
+
+def make_calendar(doctors, years):
+    rng = random.Random(9)
+    first_day = to_minutes("2015-01-05")
+    appointment_id = 0
+    for doctor_id in range(1, doctors + 1):
+        for day in range(int(years * WORKING_DAYS)):
+            base = first_day + (day // 5 * 7 + day % 5) * 1440 + 8 * 60
+            for slot in range(SLOTS_PER_DAY):
+                if rng.random() < 0.8:
+                    appointment_id += 1
+                    start = base + slot * 30
+                    yield appointment_id, doctor_id, start, start + 30
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+def main():
+    doctors = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    years = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    entries = list(make_calendar(doctors, years))
+    started = time.perf_counter()
+    index = IntervalIndex().load(entries)
+    print(f"indexed {len(entries)} appointments for {doctors} doctors in {time.perf_counter() - started:.2f} s")
+
+    doctor_id = doctors // 2 + 1
+    calendar = [(start, end, item_id) for item_id, key, start, end in entries if key == doctor_id]
+    rng = random.Random(10)
+    probes = [rng.choice(calendar)[0] + rng.choice((0, 15, 45)) for _ in range(1000)]
+
+    def scan():
+        for start in probes:
+            [item_id for s, e, item_id in calendar if s < start + 30 and e > start]
+
+    def indexed():
+        for start in probes:
+            index.overlapping(doctor_id, start, start + 30)
+
+    scan_time = timed(scan, 1) / len(probes)
+    index_time = timed(indexed, 5) / len(probes)
+    print(f"overlap check with {len(calendar)} appointments on the calendar: "
+          f"scan {scan_time * 1000:.2f} ms  index {index_time * 1e6:.1f} us  ({scan_time / index_time:.0f}x)")
+
+    started = time.perf_counter()
+    for start in probes:
+        index.put(-start, doctor_id, start, start + 30)
+        index.remove(-start)
+    print(f"book and cancel: {(time.perf_counter() - started) / len(probes) * 1e6:.1f} us each")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: earliest free slot across many doctors, bitmaps vs a loop
+Books most of each doctor's working slots over a two-week horizon, then
+times finding the first free hour for a group of doctors with the packed
+slot bitmaps and with a loop over doctors, days and slots that asks the
+interval index about each candidate time
+Run with: python -m benchmarks.bench_availability [doctors] [days]
+"""
+
+import random
+import sys
+import time
+from app.utils.availability import SLOT_MINUTES, AvailabilityIndex, DEFAULT_HOURS
+from app.utils.intervals import IntervalIndex, to_minutes
+
+FIRST_DAY = to_minutes("2025-01-20") // 1440
+
+def make_bookings(doctors, days, fill):
+    rng = random.Random(11)
+    appointment_id = 0
+    for doctor_id in range(1, doctors + 1):
+        for day in range(FIRST_DAY, FIRST_DAY + days):
+            mask = DEFAULT_HOURS.mask(day % 7)
+            for slot in range(0, 96, 2):
+                if mask >> slot & 1 and rng.random() < fill:
+                    appointment_id += 1
+                    start = day * 1440 + slot * SLOT_MINUTES
+                    yield appointment_id, doctor_id, start, start + 30
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat, result
+
+def main():
+    doctors = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+    entries = list(make_bookings(doctors, days, fill=0.97))
+    slots = AvailabilityIndex().load(entries)
+    calendar = IntervalIndex().load(entries)
+    doctor_ids = list(range(1, doctors + 1))
+    print(f"{len(entries)} appointments for {doctors} doctors over {days} days")
+
+    def loop():
+        for day in range(FIRST_DAY, FIRST_DAY + days):
+            mask = DEFAULT_HOURS.mask(day % 7)
+            best = None
+            for doctor_id in doctor_ids:
+                for slot in range(96 - 3):
+                    if mask >> slot & 0b1111 == 0b1111:
+                        start = day * 1440 + slot * SLOT_MINUTES
+                        if not calendar.overlapping(doctor_id, start, start + 60):
+                            if best is None or slot < best[2]:
+                                best = (doctor_id, day, slot)
+                            break
+            if best is not None:
+                return best
+        return None
+
+    def bitmaps():
+        return slots.first_free(doctor_ids, FIRST_DAY, days, slots=4)
+
+    loop_time, expected = timed(loop, 1)
+    bitmap_time, found = timed(bitmaps, 50)
+    assert found == expected, (found, expected)
+    print(f"first free hour {found}: loop {loop_time * 1000:.1f} ms  "
+          f"bitmaps {bitmap_time * 1000:.3f} ms  ({loop_time / bitmap_time:.0f}x)")
+
+    started = time.perf_counter()
+    for n in range(1000):
+        start = (FIRST_DAY + n % days) * 1440 + 600
+        slots.put(-n - 1, doctor_ids[n % doctors], start, start + 30)
+        slots.remove(-n - 1)
+    print(f"book and cancel: {(time.perf_counter() - started) * 1000:.1f} us each")
+
+if __name__ == '__main__':
+    main()
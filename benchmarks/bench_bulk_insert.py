@@ -0,0 +1,58 @@
+"""
+Benchmark: PatientService.add_patient loop vs add_patients batches
+Run with: python -m benchmarks.bench_bulk_insert [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from app.utils import db, sqlite_db
+from app.models.patient import Patient
+from app.services.patient_service import PatientService
+
+def make_patients(count, start=0):
+    return [
+        Patient(name=f"Patient {i}", dob="1990-01-15", gender="MF"[i % 2],
+                contact=f"555-{i:07d}", address=f"{i} Main St")
+        for i in range(start, start + count)
+    ]
+
+def run(backend, rows, label=None):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db.configure(backend=backend, sqlite_path=os.path.join(tmpdir, 'bench.db'))
+        service = PatientService()
+
+        started = time.perf_counter()
+        for patient in make_patients(rows):
+            service.add_patient(patient, check_duplicates=False)
+        per_row = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ids, errors = service.add_patients(make_patients(rows, start=rows), chunk_size=1000)
+        batched = time.perf_counter() - started
+
+        service.close_connection()
+        db.reset()
+
+    assert not errors and None not in ids
+    print(f"{label or backend:>14}: add_patient loop {per_row:.3f}s  "
+          f"add_patients {batched:.3f}s  speedup {per_row / batched:.1f}x  ({rows} rows)")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    saved = dict(db.DB_CONFIG)
+    saved_pragmas = dict(sqlite_db.PRAGMAS)
+    try:
+        for backend in ('sqlite', 'mock'):
+            run(backend, rows)
+        # Every commit is fsynced here, as on a durable database server
+        sqlite_db.PRAGMAS['synchronous'] = 'FULL'
+        sqlite_db.PRAGMAS['journal_mode'] = 'DELETE'
+        run('sqlite', rows, 'sqlite durable')
+    finally:
+        sqlite_db.PRAGMAS.update(saved_pragmas)
+        db.configure(**saved)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: blocked record linkage vs all-pairs comparison
+Generates patients with a share of near-duplicates (typos in the name,
+reformatted phone numbers), runs the blocked job and extrapolates what
+scoring every pair would cost from a timed sample
+Run with: python -m benchmarks.bench_dedupe [rows] [workers]
+"""
+
+import random
+import sys
+import time
+from app.utils import linkage
+
+SYLLABLES = ["ka", "lo", "mi", "ren", "sa", "to", "vi", "na", "del", "or", "an", "be", "cho", "du",
+             "fa", "gi", "ha", "jo", "ku", "li", "mo", "ne", "pa", "qui", "ro", "si", "ta", "ul", "wen", "zy"]
+
+def word(rng, syllables):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+def typo(rng, text):
+    i = rng.randrange(1, len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+def make_records(rows, duplicate_share=0.02):
+    rng = random.Random(3)
+    first = [word(rng, rng.randint(2, 3)) for _ in range(2000)]
+    last = [word(rng, rng.randint(2, 4)) for _ in range(50000)]
+    records = []
+    originals = int(rows * (1 - duplicate_share))
+    for i in range(1, originals + 1):
+        dob = f"{rng.randint(1925, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        a, b = rng.randint(100, 999), rng.randint(1000, 9999)
+        records.append((i, f"{rng.choice(first)} {rng.choice(last)}", dob, f"{rng.randint(200, 999)}-{a}-{b}"))
+    planted = set()
+    for i in range(originals + 1, rows + 1):
+        source = rng.choice(records[:originals])
+        area, a, b = source[3].split('-')
+        records.append((i, typo(rng, source[1]), source[2], f"({area}) {a} {b}"))
+        planted.add((source[0], i))
+    return records, planted
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    records, planted = make_records(rows)
+
+    started = time.perf_counter()
+    prepared = [linkage.prepare(*record) for record in records]
+    blocks, skipped = linkage.make_blocks(prepared)
+    pairs = sum(len(members) * (len(members) - 1) // 2 for _, members in blocks)
+    print(f"{len(blocks)} blocks, {pairs} pairs in blocks, {skipped} oversized "
+          f"(prepared in {time.perf_counter() - started:.1f} s)")
+
+    started = time.perf_counter()
+    candidates = linkage.find_candidates(records, workers=workers)
+    elapsed = time.perf_counter() - started
+    found = {(c.patient_id, c.other_id) for c in candidates}
+    print(f"blocked job: {elapsed:.1f} s, {len(candidates)} candidates, "
+          f"{len(planted & found)}/{len(planted)} planted duplicates found")
+
+    sample = 200000
+    rng = random.Random(4)
+    started = time.perf_counter()
+    for _ in range(sample):
+        linkage.score_pair(rng.choice(prepared), rng.choice(prepared), 0.7)
+    per_pair = (time.perf_counter() - started) / sample
+    all_pairs = rows * (rows - 1) // 2
+    print(f"all pairs: {all_pairs} pairs at {per_pair * 1e6:.2f} us = {all_pairs * per_pair / 3600:.0f} h")
+
+if __name__ == '__main__':
+    main()
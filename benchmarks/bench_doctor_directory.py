@@ -0,0 +1,72 @@
+"""
+Benchmark: doctors by specialization and name prefix, SQL vs DoctorDirectory
+Run with: python -m benchmarks.bench_doctor_directory [doctors]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from app.utils import db
+from app.models.doctor import Doctor
+from app.services.doctor_patient import DoctorService, DOCTOR_ROWS
+
+SPECIALIZATIONS = ["Cardiology", "Neurology", "Pediatrics", "Oncology", "Dermatology",
+                   "Orthopedics", "Radiology", "Psychiatry", "Surgery", "ENT"]
+
+def best_of(fn, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+def query(service, sql, params):
+    cursor = service.connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        return DOCTOR_ROWS.all(cursor, cursor.fetchall())
+    finally:
+        cursor.close()
+
+def run(backend, doctors):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db.configure(backend=backend, sqlite_path=os.path.join(tmpdir, 'bench.db'))
+        service = DoctorService()
+        with db.transaction():
+            for i in range(doctors):
+                service.add_doctor(Doctor(name=f"Dr. {i:05d} {SPECIALIZATIONS[i % 7]}",
+                                          specialization=SPECIALIZATIONS[i % len(SPECIALIZATIONS)],
+                                          contact="555-0100", email=f"dr{i}@hospital.com"))
+        _, load_time = best_of(lambda: service.get_doctor_directory(), repeat=1)
+        cases = {
+            "specialization": (
+                lambda: query(service, "SELECT * FROM doctors WHERE specialization = %s ORDER BY name",
+                              ("Cardiology",)),
+                lambda: service.get_doctors_by_specialization("Cardiology")),
+            "name prefix": (
+                lambda: query(service, "SELECT * FROM doctors WHERE name LIKE %s ORDER BY name LIMIT 20",
+                              ("Dr. 012%",)),
+                lambda: service.search_doctors_by_name("Dr. 012")),
+        }
+        print(f"{backend:>7}: directory load {load_time * 1000:.1f} ms ({doctors} doctors)")
+        for label, (sql, directory) in cases.items():
+            expected, sql_time = best_of(sql)
+            found, directory_time = best_of(directory)
+            assert [d.doctor_id for d in expected] == [d.doctor_id for d in found]
+            print(f"{label:>16}: sql {sql_time * 1000:7.2f} ms  directory {directory_time * 1000:7.2f} ms  "
+                  f"speedup {sql_time / directory_time:6.1f}x  ({len(found)} rows)")
+        service.connection.close()
+
+def main():
+    doctors = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    saved = dict(db.DB_CONFIG)
+    try:
+        for backend in ('mock', 'sqlite'):
+            run(backend, doctors)
+    finally:
+        db.configure(**saved)
+
+if __name__ == '__main__':
+    main()
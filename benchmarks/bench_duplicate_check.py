@@ -0,0 +1,82 @@
+"""
+Benchmark: duplicate contact checks with the phone index vs a scan
+Times one registration-time lookup and a whole import file checked
+against every stored number, with and without PhoneIndex, and the
+PatientService checks on the indexed normalized_contact column of SQLite
+Run with: python -m benchmarks.bench_duplicate_check [rows] [import_rows]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from app.services.patient_service import PatientService
+from app.utils import db, sqlite_db
+from app.utils.phone_index import PhoneIndex
+from app.utils.validation import normalize_phone
+
+FORMATS = ["555-{a}-{b}", "(555) {a} {b}", "+1 555 {a} {b}", "555{a}{b}"]
+
+def make_contacts(rows, seed):
+    rng = random.Random(seed)
+    for _ in range(rows):
+        fmt = rng.choice(FORMATS)
+        yield fmt.format(a=rng.randint(100, 999), b=rng.randint(1000, 9999))
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    import_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    stored = list(enumerate(make_contacts(rows, 5), start=1))
+    incoming = list(make_contacts(import_rows, 6))
+
+    index, load_time = timed(lambda: PhoneIndex(stored))
+    print(f"indexed {rows} contacts in {load_time:.2f} s")
+
+    probe = stored[rows // 2][1]
+    key = normalize_phone(probe)
+    scan, scan_time = timed(lambda: [i for i, c in stored if normalize_phone(c) == key])
+    found, lookup_time = timed(lambda: index.lookup(probe))
+    assert found == scan
+    print(f"one lookup: scan {scan_time * 1000:8.1f} ms  index {lookup_time * 1e6:8.1f} us")
+
+    # The scan baseline normalizes the stored numbers once, as a careful
+    # one-off script would, then probes a dict built from them
+    def scan_batch():
+        keys = {}
+        for i, c in stored:
+            keys.setdefault(normalize_phone(c), []).append(i)
+        return sum(1 for c in incoming if normalize_phone(c) in keys)
+    scanned, batch_scan_time = timed(scan_batch)
+    checked, batch_time = timed(lambda: index.check(incoming))
+    print(f"import of {import_rows}: rebuild {batch_scan_time * 1000:8.1f} ms  "
+          f"index {batch_time * 1000:8.1f} ms  ({len(checked)} flagged, {scanned} already stored)")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'bench.db')
+        connection = sqlite_db.connect(path)
+        connection.cursor().executemany(
+            "INSERT INTO patients (patient_id, name, contact, normalized_contact) VALUES (%s, %s, %s, %s)",
+            [(i, f"Patient {i}", c, normalize_phone(c)) for i, c in stored])
+        connection.commit()
+        connection.close()
+        saved_config = dict(db.DB_CONFIG)
+        db.configure(backend='sqlite', sqlite_path=path)
+        try:
+            service = PatientService()
+            found, query_time = timed(lambda: service.find_duplicate_ids(probe))
+            assert found == scan
+            checked_sql, check_time = timed(lambda: service.check_duplicates([{'contact': c} for c in incoming]))
+            assert len(checked_sql) == len(checked)
+            print(f"sqlite column: one lookup {query_time * 1e6:8.1f} us  "
+                  f"import of {import_rows} {check_time * 1000:8.1f} ms")
+        finally:
+            db.configure(**saved_config)
+
+if __name__ == '__main__':
+    main()
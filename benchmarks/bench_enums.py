@@ -0,0 +1,103 @@
+"""
+Benchmark: dictionary-encoded enum columns vs free strings
+Reports model memory when every row brings its own status string (as
+rows from a database driver do) against rows mapped onto the shared
+strings, what that mapping costs, and filters and group-bys in the
+in-memory engine
+Run with: python -m benchmarks.bench_enums [rows]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from unittest.mock import MagicMock
+from app.models.appointment import Appointment
+from app.utils import memory_db
+from app.utils.enums import APPOINTMENT_STATUS, CodeTable
+from app.utils.memory_db import MemoryDatabase
+from app.utils.row_mapper import RowMapper
+
+STATUSES = ["Unpaid", "Paid", "Paid", "Paid"]
+COLUMNS = ('appointment_id', 'patient_id', 'doctor_id', 'appointment_date', 'status', 'duration_minutes')
+
+def fresh(value):
+    # A new string object, as each fetched row would carry
+    return ''.join(list(value))
+
+def fetched(rows):
+    statuses = ["Scheduled", "Completed", "Cancelled"]
+    return [(i, i, i % 50, "2025-01-20 09:00:00", fresh(statuses[i % 3]), 30) for i in range(rows)]
+
+def fake_cursor():
+    fake = MagicMock()
+    fake.description = [(name,) for name in COLUMNS]
+    return fake
+
+def held_bytes(make):
+    gc.collect()
+    tracemalloc.start()
+    value = make()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+def plain_tables():
+    """DEFAULT_TABLES with every encoded column declared as plain str"""
+    return {name: dict(spec, columns=[(column, str if isinstance(kind, CodeTable) else kind)
+                                      for column, kind in spec['columns']])
+            for name, spec in memory_db.DEFAULT_TABLES.items()}
+
+def billing_database(tables, rows):
+    database = MemoryDatabase(tables)
+    database.load({'billing': [{'patient_id': i % 1000, 'amount': 10.0, 'description': "Consult",
+                                'payment_status': fresh(STATUSES[i % 4]), 'date_issued': "2025-01-01"}
+                               for i in range(rows)]})
+    return database
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    plain_rows = RowMapper(Appointment)
+    shared_rows = RowMapper(Appointment, encoded={'status': APPOINTMENT_STATUS})
+    plain, plain_bytes = held_bytes(lambda: plain_rows.all(fake_cursor(), fetched(rows)))
+    shared, shared_bytes = held_bytes(lambda: shared_rows.all(fake_cursor(), fetched(rows)))
+    assert [a.status for a in plain] == [a.status for a in shared]
+    print(f"appointments: {plain_bytes / rows:5.0f} -> {shared_bytes / rows:5.0f} B/row  ({rows} rows)")
+
+    batch = fetched(rows)
+    _, plain_time = timed(lambda: plain_rows.all(fake_cursor(), batch))
+    _, shared_time = timed(lambda: shared_rows.all(fake_cursor(), batch))
+    print(f"mapping: plain {plain_time * 1000:7.1f} ms  shared strings {shared_time * 1000:7.1f} ms  "
+          f"cost {shared_time / plain_time:4.2f}x")
+
+    queries = {
+        "unpaid bills": ("SELECT bill_id FROM billing WHERE payment_status = %s AND amount > %s",
+                               ("Unpaid", 0)),
+        "group by status": ("SELECT payment_status, COUNT(*) FROM billing GROUP BY payment_status", ()),
+    }
+    databases = [billing_database(plain_tables(), rows), billing_database(None, rows)]
+    for label, (sql, params) in queries.items():
+        timings = []
+        results = []
+        for database in databases:
+            cursor = database.connect().cursor()
+            def run():
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+            result, elapsed = timed(run)
+            results.append(sorted(result))
+            timings.append(elapsed)
+        assert results[0] == results[1]
+        print(f"{label:>20}: strings {timings[0] * 1000:7.1f} ms  codes {timings[1] * 1000:7.1f} ms  "
+              f"speedup {timings[0] / timings[1]:4.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: memory and construction cost of the __slots__ model classes
+Compares each model with an otherwise identical class that keeps a
+per-instance __dict__ (the previous layout)
+Run with: python -m benchmarks.bench_models [rows]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from app.models.patient import Patient
+from app.models.doctor import Doctor
+from app.models.appointment import Appointment
+from app.models.medical_record import MedicalRecord
+from app.models.user import User
+
+def sample_rows(rows):
+    return {
+        Patient: [{'patient_id': i, 'name': f"Patient {i}", 'dob': "1990-01-15", 'gender': "MF"[i % 2],
+                   'contact': f"555-{i:07d}", 'address': "Main St"} for i in range(rows)],
+        Doctor: [{'doctor_id': i, 'name': f"Dr. {i}", 'specialization': "Cardiology",
+                  'contact': f"555-{i:07d}", 'email': f"dr{i}@hospital.com"} for i in range(rows)],
+        Appointment: [{'appointment_id': i, 'patient_id': i, 'doctor_id': i % 50,
+                       'appointment_date': "2025-01-20 09:00:00", 'status': "Scheduled"} for i in range(rows)],
+        MedicalRecord: [{'record_id': i, 'patient_id': i, 'doctor_id': i % 50, 'diagnosis': "Flu",
+                         'prescription': "Rest", 'visit_date': "2025-01-20"} for i in range(rows)],
+        User: [{'user_id': i, 'username': f"user{i}", 'password': "x", 'role': "receptionist"}
+               for i in range(rows)],
+    }
+
+def with_dict(cls):
+    """Same constructor, but instances carry a __dict__"""
+    return type(cls.__name__, (), {'__init__': cls.__init__, 'from_dict': cls.__dict__['from_dict']})
+
+def measure(cls, rows):
+    gc.collect()
+    tracemalloc.start()
+    objects = [cls.from_dict(row) for row in rows]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Subtract the list holding the objects
+    per_instance = (size - sys.getsizeof(objects)) / len(objects)
+    del objects
+    # Throughput without tracemalloc overhead
+    started = time.perf_counter()
+    objects = [cls.from_dict(row) for row in rows]
+    elapsed = time.perf_counter() - started
+    del objects
+    return per_instance, len(rows) / elapsed
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    data = sample_rows(rows)
+    print(f"{'model':>14}  {'bytes/obj':>16}  {'objects/s (from_dict)':>28}   ({rows} rows)")
+    for cls, cls_rows in data.items():
+        dict_bytes, dict_rate = measure(with_dict(cls), cls_rows)
+        slot_bytes, slot_rate = measure(cls, cls_rows)
+        print(f"{cls.__name__:>14}  {dict_bytes:6.0f} -> {slot_bytes:6.0f}  "
+              f"{dict_rate:12,.0f} -> {slot_rate:12,.0f}")
+
+if __name__ == '__main__':
+    main()
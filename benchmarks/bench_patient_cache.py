@@ -0,0 +1,57 @@
+"""
+Benchmark: get_patient_by_id with and without the patient cache
+Simulates a clinic session resolving the same few dozen patients again
+and again, with an occasional update invalidating one of them
+Run with: python -m benchmarks.bench_patient_cache [lookups]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from app.utils import db
+from app.models.patient import Patient
+from app.services.patient_service import PatientService, PATIENT_CACHE
+
+def session(service, ids, lookups):
+    rng = random.Random(3)
+    started = time.perf_counter()
+    for i in range(lookups):
+        patient = service.get_patient_by_id(rng.choice(ids))
+        if i % 500 == 0:
+            service.update_patient(patient)
+    return time.perf_counter() - started
+
+def run(backend, lookups):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db.configure(backend=backend, sqlite_path=os.path.join(tmpdir, 'bench.db'))
+        service = PatientService()
+        ids, _ = service.add_patients([Patient(name=f"Patient {i}", dob="1990-01-15", gender="MF"[i % 2],
+                                               contact=f"555-{i:07d}", address=f"{i} Main St")
+                                       for i in range(5000)])
+        working_set = ids[:40]
+        maxsize = PATIENT_CACHE.maxsize
+        PATIENT_CACHE.maxsize = 0
+        uncached = session(service, working_set, lookups)
+        PATIENT_CACHE.maxsize = maxsize
+        PATIENT_CACHE.clear()
+        PATIENT_CACHE.reset_stats()
+        cached = session(service, working_set, lookups)
+        stats = PATIENT_CACHE.stats()
+        service.close_connection()
+    print(f"{backend:>7}: uncached {uncached * 1e6 / lookups:6.1f} us/lookup  "
+          f"cached {cached * 1e6 / lookups:6.1f} us/lookup  speedup {uncached / cached:5.1f}x  "
+          f"(hit rate {stats['hit_rate']:.1%}, {stats['invalidations']} invalidations)")
+
+def main():
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    saved = dict(db.DB_CONFIG)
+    try:
+        for backend in ('mock', 'sqlite'):
+            run(backend, lookups)
+    finally:
+        db.configure(**saved)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: trigram index search vs a substring scan over all patients
+Builds the index straight from generated rows, then times typical
+front-desk queries: partial names, a typo, a phone fragment, an address
+Run with: python -m benchmarks.bench_patient_search [rows]
+"""
+
+import random
+import sys
+import time
+from app.utils.trigram import TrigramIndex
+
+SYLLABLES = ["ka", "lo", "mi", "ren", "sa", "to", "vi", "na", "del", "or", "an", "be", "cho", "du",
+             "fa", "gi", "ha", "jo", "ku", "li", "mo", "ne", "pa", "qui", "ro", "si", "ta", "ul", "wen", "zy"]
+KINDS = ["St", "Street", "Rd", "Road", "Avenue", "Lane", "Close", "Way"]
+
+def word(rng, syllables):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+def make_rows(rows):
+    rng = random.Random(11)
+    first = [word(rng, rng.randint(2, 3)) for _ in range(400)]
+    last = [word(rng, rng.randint(2, 4)) for _ in range(5000)]
+    streets = [f"{word(rng, 3)} {rng.choice(KINDS)}" for _ in range(2000)]
+    for i in range(1, rows + 1):
+        yield i, (f"{rng.choice(first)} {rng.choice(last)}",
+                  f"555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+                  f"{rng.randint(1, 999)} {rng.choice(streets)}")
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    data = list(make_rows(rows))
+    index = TrigramIndex()
+    started = time.perf_counter()
+    index.load(data)
+    print(f"indexed {rows} patients in {time.perf_counter() - started:.1f} s")
+
+    # A full name, a typo of it, a partial name, a phone fragment and an address
+    name, phone, address = data[len(data) // 2][1]
+    typo = name[:3] + name[4:]
+    queries = [name, typo, name.split()[1][:4], phone[4:11], address]
+    for query in queries:
+        needle = query.lower()
+        _, scan_time = timed(lambda: [i for i, texts in data
+                                      if any(t and needle in t.lower() for t in texts)], repeat=1)
+        found, index_time = timed(lambda: index.search(query, limit=20))
+        top = found[0] if found else (None, 0)
+        print(f"{query!r:>20}: scan {scan_time * 1000:7.1f} ms  index {index_time * 1000:7.1f} ms  "
+              f"({len(found)} results, best score {top[1]:.2f})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: list of Patient objects vs columnar PatientTable
+Reports memory held and the time of typical UI filters
+Run with: python -m benchmarks.bench_patient_table [rows]
+"""
+
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date
+from app.models.patient import Patient
+from app.models.patient_table import PatientTable
+
+FIRST = ["John", "Jane", "Joanna", "Ali", "Maria", "Chen", "Olga", "Samuel", "Priya", "Kwame"]
+LAST = ["Doe", "Smith", "Nguyen", "Garcia", "Okafor", "Ivanova", "Patel", "Kim", "Muller", "Silva"]
+
+def make_patients(rows):
+    rng = random.Random(7)
+    return [
+        Patient(patient_id=i, name=f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}",
+                dob=date.fromordinal(rng.randint(date(1930, 1, 1).toordinal(),
+                                                 date(2024, 12, 31).toordinal())).isoformat(),
+                gender=rng.choice("MF"), contact=f"555-{i:07d}", address=f"{i} Main St")
+        for i in range(1, rows + 1)
+    ]
+
+def held_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+def age_on(dob, today):
+    born = date.fromisoformat(dob)
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    today = date(2025, 1, 15)
+    # Each side generates its own rows so it pays for its own strings
+    objects, object_bytes = held_bytes(lambda: make_patients(rows))
+    table, table_bytes = held_bytes(lambda: PatientTable.from_patients(make_patients(rows)))
+    print(f"memory: {object_bytes / rows:6.0f} B/row objects  {table_bytes / rows:6.0f} B/row table  "
+          f"({object_bytes / table_bytes:.1f}x less, {rows} rows)")
+
+    queries = {
+        "gender = F": (
+            lambda: [p for p in objects if p.gender == "F"],
+            lambda: table.select(table.gender_mask("F"))),
+        "age 18-65": (
+            lambda: [p for p in objects if 18 <= age_on(p.dob, today) <= 65],
+            lambda: table.select(table.age_mask(18, 65, today))),
+        "name prefix 'jo'": (
+            lambda: [p for p in objects if p.name.lower().startswith("jo")],
+            lambda: table.select(table.name_prefix_mask("jo"))),
+        "F, 18-65, 'jo'": (
+            lambda: [p for p in objects if p.gender == "F" and p.name.lower().startswith("jo")
+                     and 18 <= age_on(p.dob, today) <= 65],
+            lambda: table.select(table.and_masks(table.gender_mask("F"), table.age_mask(18, 65, today),
+                                                 table.name_prefix_mask("jo")))),
+    }
+    for label, (scan_objects, scan_table) in queries.items():
+        expected, object_time = timed(scan_objects)
+        found, table_time = timed(scan_table)
+        assert [p.patient_id for p in expected] == [table.ids[i] for i in found]
+        print(f"{label:>18}: objects {object_time * 1000:8.1f} ms  table {table_time * 1000:7.1f} ms  "
+              f"speedup {object_time / table_time:5.1f}x  ({len(found)} rows)")
+
+if __name__ == '__main__':
+    main()
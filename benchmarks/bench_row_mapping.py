@@ -0,0 +1,70 @@
+"""
+Benchmark: dictionary rows + from_dict vs positional RowMapper
+Times get_all_patients and get_all_doctors against the previous path
+Run with: python -m benchmarks.bench_row_mapping [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from app.utils import db
+from app.models.patient import Patient
+from app.models.doctor import Doctor
+from app.services.patient_service import PatientService
+from app.services.doctor_patient import DoctorService
+
+def dict_path(service, table, model):
+    """The listing path before RowMapper: dict rows, then from_dict"""
+    cursor = service.connection.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT * FROM {table}")
+        return [model.from_dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def run(backend, rows):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db.configure(backend=backend, sqlite_path=os.path.join(tmpdir, 'bench.db'))
+        patients = PatientService()
+        doctors = DoctorService()
+        patients.add_patients([Patient(name=f"Patient {i}", dob="1990-01-15", gender="MF"[i % 2],
+                                       contact=f"555-{i:07d}", address=f"{i} Main St")
+                               for i in range(rows)])
+        cursor = doctors.connection.cursor()
+        cursor.executemany(
+            "INSERT INTO doctors (name, specialization, contact, email) VALUES (%s, %s, %s, %s)",
+            [(f"Dr. {i}", "Cardiology", f"555-{i:07d}", f"dr{i}@hospital.com") for i in range(rows)]
+        )
+        doctors.connection.commit()
+        cursor.close()
+
+        for label, service, method, table, model in (
+                ("get_all_patients", patients, patients.get_all_patients, 'patients', Patient),
+                ("get_all_doctors", doctors, doctors.get_all_doctors, 'doctors', Doctor)):
+            assert [m.to_dict() for m in method()] == [m.to_dict() for m in dict_path(service, table, model)]
+            before = best_of(lambda: dict_path(service, table, model))
+            after = best_of(method)
+            print(f"{backend:>7} {label:>17}: dict+from_dict {before * 1000:7.1f} ms  "
+                  f"RowMapper {after * 1000:7.1f} ms  speedup {before / after:.1f}x  ({rows} rows)")
+        db.reset()
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    saved = dict(db.DB_CONFIG)
+    try:
+        for backend in ('sqlite', 'mock'):
+            run(backend, rows)
+    finally:
+        db.configure(**saved)
+
+if __name__ == '__main__':
+    main()
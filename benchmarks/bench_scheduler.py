@@ -0,0 +1,89 @@
+"""
+Benchmark: morning intake booked one by one vs schedule_requests()
+Each request wants a doctor of one specialization within a random window
+of the working week. One by one, every request takes the first free slot
+found and commits on its own; the batch scheduler balances the doctors'
+load and commits once
+Run with: python -m benchmarks.bench_scheduler [requests] [doctors]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from app.utils import db
+from app.models.appointment import Appointment
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+from app.services.appointment_service import AppointmentService
+from app.services.doctor_patient import DoctorService
+from app.services.patient_service import PatientService
+from app.utils.intervals import to_minutes
+from app.utils.scheduling import AppointmentRequest
+
+def make_requests(count, seed=12):
+    rng = random.Random(seed)
+    requests = []
+    for n in range(count):
+        day = 20 + rng.randrange(5)
+        hour = rng.randrange(9, 15)
+        latest = min(hour + rng.choice((2, 4, 8)), 17)
+        requests.append(AppointmentRequest(n % 500 + 1, "Cardiology", f"2025-01-{day} {hour:02d}:00",
+                                           f"2025-01-{day} {latest:02d}:00", rng.randrange(3)))
+    return requests
+
+def setup(tmpdir, doctors):
+    db.configure(backend='sqlite', sqlite_path=os.path.join(tmpdir, 'bench.db'))
+    with db.transaction():
+        patients = PatientService()
+        for n in range(500):
+            patients.add_patient(Patient(name=f"Patient {n}", dob="1990-01-15", gender="F",
+                                         contact=f"555-{n:07d}", address="Unknown"))
+        directory = DoctorService()
+        for n in range(doctors):
+            directory.add_doctor(Doctor(name=f"Dr. Number{n}", specialization="Cardiology",
+                                        contact="555-0100", email=f"doctor{n}@hospital.com"))
+    return AppointmentService()
+
+def one_by_one(service, requests):
+    booked = []
+    for request in requests:
+        found = service.find_first_free_slot("Cardiology", start=request.earliest, days=1)
+        if found is not None and to_minutes(found[1]) + 30 <= to_minutes(request.latest):
+            doctor_id, when = found
+            service.book_appointment(Appointment(patient_id=request.patient_id, doctor_id=doctor_id,
+                                                 appointment_date=when))
+            booked.append(doctor_id)
+    return booked
+
+def report(label, elapsed, count, doctor_ids, doctors):
+    load = Counter(doctor_ids)
+    spread = [load.get(n, 0) for n in range(1, doctors + 1)]
+    print(f"{label:<12} {elapsed:7.2f} s  {count / elapsed:8.0f} requests/s  booked {len(doctor_ids):5d}  "
+          f"per doctor min {min(spread)} max {max(spread)}")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    doctors = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    requests = make_requests(count)
+    saved = dict(db.DB_CONFIG)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = setup(tmpdir, doctors)
+            started = time.perf_counter()
+            booked = one_by_one(service, requests)
+            report("one by one", time.perf_counter() - started, count, booked, doctors)
+            db.reset()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = setup(tmpdir, doctors)
+            started = time.perf_counter()
+            appointments, _ = service.schedule_requests(requests)
+            report("batch", time.perf_counter() - started, count, [a.doctor_id for a in appointments], doctors)
+            db.reset()
+    finally:
+        db.configure(**saved)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Benchmark: peak memory of get_all_patients vs iter_patients
+Run with: python -m benchmarks.bench_streaming [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from app.utils import db
+from app.models.patient import Patient
+from app.services.patient_service import PatientService
+
+def measure(label, consume):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = consume()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>28}: {count} rows  {elapsed:.3f}s  peak {peak / 1024 / 1024:.1f} MiB")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    saved = dict(db.DB_CONFIG)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db.configure(backend='sqlite', sqlite_path=os.path.join(tmpdir, 'bench.db'))
+            service = PatientService()
+            service.add_patients(
+                Patient(name=f"Patient {i}", dob="1990-01-15", gender="MF"[i % 2],
+                        contact=f"555-{i:07d}", address=f"{i} Main St")
+                for i in range(rows)
+            )
+            measure("get_all_patients", lambda: len(service.get_all_patients()))
+            measure("iter_patients(batch=500)", lambda: sum(1 for _ in service.iter_patients(500)))
+            service.close_connection()
+            db.reset()
+    finally:
+        db.configure(**saved)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: registration-desk workflow with per-call commits vs db.transaction()
+Each workflow registers a patient, issues a bill and updates the address
+Run with: python -m benchmarks.bench_transaction [workflows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from app.utils import db, sqlite_db
+from app.models.patient import Patient
+from app.services.patient_service import PatientService
+from app.services.billing_service import BillingService
+
+def desk_workflow(patients, billing, i):
+    patient = patients.add_patient(Patient(name=f"Patient {i}", dob="1990-01-15", gender="M",
+                                           contact=f"555-{i:07d}", address="Unknown"))
+    billing.create_bill(patient.patient_id, 150.0, "Registration", "2025-01-15")
+    patient.address = f"{i} Main St"
+    patients.update_patient(patient)
+
+def run(workflows, label, batched):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db.configure(backend='sqlite', instrument=True, sqlite_path=os.path.join(tmpdir, 'bench.db'))
+        db.query_stats().reset()
+        patients = PatientService()
+        billing = BillingService()
+
+        started = time.perf_counter()
+        for i in range(workflows):
+            if batched:
+                with db.transaction():
+                    desk_workflow(patients, billing, i)
+            else:
+                desk_workflow(patients, billing, i)
+        elapsed = time.perf_counter() - started
+
+        commits = db.query_stats().snapshot()['commits']['count']
+        db.reset()
+
+    print(f"{label:>24}: {commits:6d} commits  {elapsed / workflows * 1000:7.2f} ms/workflow")
+    return elapsed
+
+def main():
+    workflows = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    saved = dict(db.DB_CONFIG)
+    saved_pragmas = dict(sqlite_db.PRAGMAS)
+    try:
+        for durable in (False, True):
+            if durable:
+                # Every commit is fsynced here, as on a durable database server
+                sqlite_db.PRAGMAS['synchronous'] = 'FULL'
+                sqlite_db.PRAGMAS['journal_mode'] = 'DELETE'
+            mode = 'durable' if durable else 'WAL'
+            per_call = run(workflows, f"{mode} per-call commits", batched=False)
+            batched = run(workflows, f"{mode} db.transaction()", batched=True)
+            print(f"{'':>24}  speedup {per_call / batched:.1f}x")
+    finally:
+        sqlite_db.PRAGMAS.update(saved_pragmas)
+        db.configure(**saved)
+
+if __name__ == '__main__':
+    main()
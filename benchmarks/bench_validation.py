@@ -0,0 +1,62 @@
+"""
+Benchmark: per-object validation vs the batch validation engine
+Validates an import of patient and doctor dictionaries both ways
+Run with: python -m benchmarks.bench_validation [rows]
+"""
+
+import re
+import sys
+import time
+from app.models.patient import Patient
+from app.models.doctor import Doctor
+from app.utils import validation
+
+def legacy_validate_email(email):
+    """validate_email before the pattern was compiled once"""
+    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    return re.match(pattern, email) is not None
+
+def per_object(patient_rows, doctor_rows):
+    errors = []
+    for index, row in enumerate(patient_rows):
+        valid, message = Patient.from_dict(row).validate()
+        if not valid:
+            errors.append((index, message))
+    for index, row in enumerate(doctor_rows):
+        doctor = Doctor.from_dict(row)
+        valid, message = doctor.validate()
+        if valid and not legacy_validate_email(doctor.email):
+            valid, message = False, "Invalid email format"
+        if not valid:
+            errors.append((index, message))
+    return errors
+
+def batch(patient_rows, doctor_rows):
+    errors = validation.PATIENT.validate_records(patient_rows)
+    errors += validation.DOCTOR_IMPORT.validate_records(doctor_rows)
+    return errors
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    patient_rows = [{'patient_id': i, 'name': "" if i % 97 == 0 else f"Patient {i}", 'dob': "1990-01-15",
+                     'gender': "MF"[i % 2], 'contact': f"555-{i:07d}", 'address': "Main St"}
+                    for i in range(rows)]
+    doctor_rows = [{'doctor_id': i, 'name': f"Dr. {i}", 'specialization': "Cardiology",
+                    'contact': "555", 'email': "bad" if i % 89 == 0 else f"dr{i}@hospital.com"}
+                   for i in range(rows)]
+    expected, slow = best_of(lambda: per_object(patient_rows, doctor_rows))
+    found, fast = best_of(lambda: batch(patient_rows, doctor_rows))
+    assert len(expected) == len(found)
+    print(f"per-object {slow * 1000:7.1f} ms  batch {fast * 1000:7.1f} ms  speedup {slow / fast:.1f}x  "
+          f"({rows} patients + {rows} doctors, {len(found)} errors)")
+
+if __name__ == '__main__':
+    main()
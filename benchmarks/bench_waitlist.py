@@ -0,0 +1,48 @@
+"""
+Benchmark: picking the next waitlisted patient, heap vs a scan
+Fills one specialization's waitlist with patients of random urgency,
+then times offering freed slots (and declining half of the offers) with
+the heap-backed Waitlist and with a scan for the best entry of a list
+Run with: python -m benchmarks.bench_waitlist [waiting]
+"""
+
+import random
+import sys
+import time
+from app.utils.waitlist import Waitlist
+
+def main():
+    waiting = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(13)
+    urgencies = [rng.randrange(5) for _ in range(waiting)]
+
+    waitlist = Waitlist()
+    started = time.perf_counter()
+    for n, urgency in enumerate(urgencies):
+        waitlist.add(n, specialization='Cardiology', urgency=urgency)
+    print(f"added {waiting} entries in {time.perf_counter() - started:.2f} s")
+
+    slots = min(2000, waiting // 2)
+    started = time.perf_counter()
+    for slot in range(slots):
+        offer = waitlist.offer(slot, 1, 'Cardiology')
+        if slot % 2:
+            offer = waitlist.decline(offer.offer_id)
+        waitlist.accept(offer.offer_id)
+    heap_time = (time.perf_counter() - started) / slots
+
+    # (-urgency, added, patient_id) rows, best found by scanning
+    rows = [(-urgency, n, n) for n, urgency in enumerate(urgencies)]
+    started = time.perf_counter()
+    for slot in range(min(slots, 200)):
+        best = min(rows)
+        rows.remove(best)
+    scan_time = (time.perf_counter() - started) / min(slots, 200)
+
+    stats = waitlist.stats()
+    print(f"offer with {waiting} waiting: scan {scan_time * 1000:.2f} ms  heap {heap_time * 1e6:.1f} us  "
+          f"({scan_time / heap_time:.0f}x)")
+    print(f"fill rate {stats['fill_rate']:.2f}, {stats['declined']} declined, {stats['waiting']} still waiting")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Unit tests for the in-memory doctor directory
+"""
+
+import unittest
+from app.models.doctor import Doctor
+from app.models.doctor_directory import DoctorDirectory
+
+class TestDoctorDirectory(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.directory = DoctorDirectory([
+            Doctor(1, "Dr. Smith", "Cardiology", "555-0001", "smith@hospital.com"),
+            Doctor(2, "Dr. Johnson", "Neurology", "555-0002", "johnson@hospital.com"),
+            {'doctor_id': 3, 'name': "Dr. Sanchez", 'specialization': "Cardiology",
+             'contact': "555-0003", 'email': "Sanchez@Hospital.com"},
+        ])
+
+    def test_lookups(self):
+        """Test lookups by id, email and specialization"""
+        self.assertEqual(len(self.directory), 3)
+        self.assertEqual(self.directory.get(2).name, "Dr. Johnson")
+        self.assertIsNone(self.directory.get(9))
+        self.assertEqual(self.directory.by_email(" sanchez@hospital.COM").doctor_id, 3)
+        self.assertEqual([d.doctor_id for d in self.directory.by_specialization("Cardiology")], [3, 1])
+        self.assertEqual(self.directory.by_specialization("Dermatology"), [])
+        self.assertEqual(self.directory.specializations(), {"Cardiology": 2, "Neurology": 1})
+
+    def test_name_prefix(self):
+        """Test case-insensitive name prefix search in name order"""
+        self.assertEqual([d.doctor_id for d in self.directory.name_prefix("dr. s")], [3, 1])
+        self.assertEqual([d.doctor_id for d in self.directory.name_prefix("DR.", limit=2)], [2, 3])
+        self.assertEqual(self.directory.name_prefix("Dr. X"), [])
+
+    def test_incremental_updates(self):
+        """Test that put and remove keep every index in step"""
+        self.directory.put(Doctor(1, "Dr. Adams", "Neurology", "555-0001", "adams@hospital.com"))
+        self.assertIsNone(self.directory.by_email("smith@hospital.com"))
+        self.assertEqual([d.doctor_id for d in self.directory.by_specialization("Neurology")], [1, 2])
+        self.assertEqual([d.doctor_id for d in self.directory.name_prefix("dr. a")], [1])
+        self.assertTrue(self.directory.remove(3))
+        self.assertFalse(self.directory.remove(3))
+        self.assertEqual(self.directory.by_specialization("Cardiology"), [])
+        self.assertEqual([d.doctor_id for d in self.directory.all()], [1, 2])
+
+    def test_results_are_copies(self):
+        """Test that editing a returned doctor does not change the directory"""
+        self.directory.get(1).name = "Changed"
+        self.assertEqual(self.directory.get(1).name, "Dr. Smith")
+
+    def test_load_retries_after_concurrent_change(self):
+        """Test that a change made while loading triggers a fresh load"""
+        directory = DoctorDirectory()
+        snapshots = [[Doctor(1, "Dr. Old", "ENT")], [Doctor(1, "Dr. New", "ENT")]]
+
+        def fetch():
+            if len(snapshots) == 2:
+                directory.put(Doctor(1, "Dr. New", "ENT"))
+            return snapshots.pop(0)
+        directory.ensure_loaded(fetch)
+        self.assertEqual(directory.get(1).name, "Dr. New")
+        directory.clear()
+        self.assertFalse(directory.loaded)
+        self.assertEqual(len(directory), 0)
+
+if __name__ == '__main__':
+    unittest.main()
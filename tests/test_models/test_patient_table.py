@@ -0,0 +1,63 @@
+"""
+Unit tests for the columnar patient table
+"""
+
+import unittest
+from datetime import date
+from app.models.patient import Patient
+from app.models.patient_table import PatientTable
+
+class TestPatientTable(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.table = PatientTable.from_patients([
+            Patient(patient_id=1, name="John Doe", dob="1990-01-15", gender="M", contact="123", address="Main St"),
+            Patient(patient_id=2, name="Jane Smith", dob="1985-03-22", gender="F", contact="456", address=None),
+            {'patient_id': 3, 'name': "joanna Ólafsdóttir", 'dob': "2010-06-30", 'gender': "F", 'contact': "789"},
+            Patient(patient_id=5, name="Bob Stone", dob=None, gender=None, contact="000"),
+            Patient(patient_id=7, name="Johan\nNewline", dob="1990-01-16", gender="M", contact="111"),
+        ])
+        self.today = date(2025, 1, 15)
+
+    def ids(self, rows):
+        return [row.patient_id for row in rows]
+
+    def test_lazy_rows(self):
+        """Test that rows read back the stored values"""
+        row = self.table.get(2)
+        self.assertEqual(row.to_dict(), {'patient_id': 2, 'name': "Jane Smith", 'dob': "1985-03-22",
+                                         'gender': "F", 'contact': "456", 'address': None})
+        self.assertEqual(self.table[2].name, "joanna Ólafsdóttir")
+        self.assertIsNone(self.table.get(4))
+        patient = self.table[-1].to_patient()
+        self.assertIsInstance(patient, Patient)
+        self.assertEqual((patient.patient_id, patient.name), (7, "Johan\nNewline"))
+        self.assertEqual(len(self.table), 5)
+
+    def test_filters(self):
+        """Test gender, age band and name prefix filters and their combination"""
+        self.assertEqual(self.ids(self.table.filter(gender="F")), [2, 3])
+        self.assertEqual(self.ids(self.table.filter(gender=("M", None))), [1, 5, 7])
+        # Patient 1 turns 35 on the reference date, patient 7 a day later
+        self.assertEqual(self.ids(self.table.filter(min_age=35, today=self.today)), [1, 2])
+        self.assertEqual(self.ids(self.table.filter(max_age=34, today=self.today)), [3, 7])
+        self.assertEqual(self.ids(self.table.filter(min_age=18, max_age=38, today=self.today)), [1, 7])
+        self.assertEqual(self.ids(self.table.filter(name_prefix="JO")), [1, 3, 7])
+        self.assertEqual(self.ids(self.table.filter(name_prefix="jo", gender="M", max_age=34,
+                                                    today=self.today)), [7])
+
+    def test_masks_combine(self):
+        """Test mask helpers"""
+        women = self.table.gender_mask("F")
+        johns = self.table.name_prefix_mask("john")
+        self.assertEqual(list(self.table.select(self.table.or_masks(women, johns))), [0, 1, 2])
+        self.assertEqual(self.table.count(self.table.and_masks(women, johns)), 0)
+
+    def test_empty_table(self):
+        """Test that an empty table filters to nothing"""
+        table = PatientTable.from_patients([])
+        self.assertEqual(table.filter(gender="F", name_prefix="a"), [])
+
+if __name__ == '__main__':
+    unittest.main()
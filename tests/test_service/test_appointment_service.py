@@ -0,0 +1,261 @@
+"""
+Unit tests for appointment service
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app.utils import db
+from app.services.appointment_service import (AppointmentService, AppointmentConflictError,
+                                              APPOINTMENT_CALENDAR, APPOINTMENT_WAITLIST)
+from app.models.appointment import Appointment
+from app.models.doctor import Doctor
+from app.services.doctor_patient import DoctorService
+from app.utils.scheduling import AppointmentRequest
+
+class TestAppointmentService(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.saved_config = dict(db.DB_CONFIG)
+        db.configure(backend='mock')
+        self.service = AppointmentService()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+
+    def book(self, when, doctor_id=1, patient_id=2, **options):
+        return self.service.book_appointment(
+            Appointment(patient_id=patient_id, doctor_id=doctor_id, appointment_date=when, **options)
+        )
+
+    def test_book_and_detect_conflicts(self):
+        """Test that overlapping bookings of one doctor are refused"""
+        # The seed data has doctor 1 booked 09:00-09:30 on 2025-01-20
+        appointment = self.book("2025-01-20 09:30")
+        self.assertEqual(appointment.appointment_date, "2025-01-20 09:30:00")
+        with self.assertRaises(AppointmentConflictError) as caught:
+            self.book("2025-01-20 09:15", duration_minutes=45)
+        self.assertEqual(caught.exception.conflicts, [1, appointment.appointment_id])
+        self.assertIsInstance(caught.exception, ValueError)
+
+        # Other doctors and adjacent slots are free
+        self.book("2025-01-20 09:15", doctor_id=2)
+        self.book("2025-01-20 10:00", duration_minutes=60)
+        self.assertEqual(self.service.find_conflicts(1, "2025-01-20 10:30"), [appointment.appointment_id + 2])
+        self.assertEqual(self.service.find_conflicts(1, "2025-01-20 11:00"), [])
+
+        with self.assertRaises(ValueError):
+            self.book("2025-01-20 12:00", duration_minutes=0)
+        with self.assertRaises(ValueError):
+            self.service.book_appointment(Appointment(doctor_id=1, appointment_date="2025-01-20 12:00"))
+
+    def test_reschedule_and_cancel(self):
+        """Test that moved and cancelled appointments free their old time"""
+        appointment = self.book("2025-01-21 14:00")
+        with self.assertRaises(AppointmentConflictError):
+            self.service.reschedule_appointment(appointment.appointment_id, "2025-01-20 09:10")
+        self.assertTrue(self.service.reschedule_appointment(appointment.appointment_id, "2025-01-21 14:15"))
+        self.assertEqual(self.service.find_conflicts(1, "2025-01-21 13:50", 20), [])
+        self.assertEqual(self.service.find_conflicts(1, "2025-01-21 14:40"), [appointment.appointment_id])
+        self.assertFalse(self.service.reschedule_appointment(999, "2025-01-21 14:15"))
+
+        self.assertTrue(self.service.cancel_appointment(1))
+        self.assertFalse(self.service.cancel_appointment(1))
+        self.assertEqual(self.service.get_appointment_by_id(1).status, "Cancelled")
+        self.book("2025-01-20 09:00")
+        with self.assertRaises(ValueError):
+            self.service.reschedule_appointment(1, "2025-01-22 09:00")
+
+    def test_transactions(self):
+        """Test uncommitted bookings of the same transaction and rollbacks"""
+        try:
+            with db.transaction():
+                first = self.book("2025-02-03 10:00")
+                with self.assertRaises(AppointmentConflictError):
+                    self.book("2025-02-03 10:15")
+                self.service.cancel_appointment(first.appointment_id)
+                self.book("2025-02-03 10:15")
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+        self.assertEqual(self.service.find_conflicts(1, "2025-02-03 10:00", 60), [])
+        with db.transaction():
+            second = self.book("2025-02-03 10:00")
+        self.assertIn(second.appointment_id, APPOINTMENT_CALENDAR)
+
+    def test_listing(self):
+        """Test listing by doctor, patient and day"""
+        self.book("2025-01-20 11:00", patient_id=1)
+        self.book("2025-01-21 09:00", patient_id=1)
+        self.book("2025-01-20 10:00", doctor_id=2)
+        by_doctor = self.service.get_doctor_appointments(1)
+        self.assertEqual([a.appointment_date for a in by_doctor],
+                         ["2025-01-20 09:00:00", "2025-01-20 11:00:00", "2025-01-21 09:00:00"])
+        window = self.service.get_doctor_appointments(1, "2025-01-20 10:00", "2025-01-21")
+        self.assertEqual([a.appointment_date for a in window], ["2025-01-20 11:00:00"])
+        self.assertEqual(len(self.service.get_patient_appointments(1)), 3)
+        self.assertEqual([a.doctor_id for a in self.service.get_appointments_on("2025-01-20")], [1, 2, 1])
+
+    def test_free_slots(self):
+        """Test free and booked slots and the first free doctor of a specialization"""
+        self.assertEqual(self.service.get_booked_slots(1, "2025-01-20"),
+                         [datetime(2025, 1, 20, 9, 0), datetime(2025, 1, 20, 9, 15)])
+        free = self.service.get_free_slots(1, "2025-01-20", 60)
+        self.assertEqual((free[0], free[-1]), (datetime(2025, 1, 20, 9, 30), datetime(2025, 1, 20, 16, 0)))
+        self.assertEqual(self.service.find_first_free_slot("Cardiology", start="2025-01-20"),
+                         (1, datetime(2025, 1, 20, 9, 30)))
+
+        # Bookings and cancellations update the slots as they commit
+        booked = self.book("2025-01-20 09:30", duration_minutes=20)
+        self.assertEqual(self.service.find_first_free_slot(doctor_ids=[1], start="2025-01-20"),
+                         (1, datetime(2025, 1, 20, 10, 0)))
+        self.service.cancel_appointment(booked.appointment_id)
+        self.assertEqual(self.service.find_first_free_slot(doctor_ids=[1], start="2025-01-20 09:20"),
+                         (1, datetime(2025, 1, 20, 9, 30)))
+
+        # Weekends are off unless a doctor's hours say otherwise
+        self.assertEqual(self.service.find_first_free_slot(doctor_ids=[2], start="2025-01-18"),
+                         (2, datetime(2025, 1, 20, 9, 0)))
+        self.addCleanup(self.service.set_working_hours, 2, None)
+        self.service.set_working_hours(2, {5: [("10:00", "12:00")]})
+        self.assertEqual(self.service.find_first_free_slot(doctor_ids=[2], start="2025-01-18"),
+                         (2, datetime(2025, 1, 18, 10, 0)))
+        self.assertEqual(self.service.get_free_slots(2, "2025-01-20"), [])
+        self.assertIsNone(self.service.find_first_free_slot(doctor_ids=[2], start="2025-01-18",
+                                                            duration_minutes=150))
+        with self.assertRaises(ValueError):
+            self.service.find_first_free_slot()
+
+    def test_schedule_requests(self):
+        """Test that a batch is spread over a specialization and commits together"""
+        doctors = DoctorService()
+        for name in ("Dr. Carter", "Dr. Diaz"):
+            doctors.add_doctor(Doctor(name=name, specialization="Cardiology",
+                                      contact="555-0100", email=f"{name[4:].lower()}@hospital.com"))
+        window = ("2025-01-20 09:00", "2025-01-20 10:00")
+        requests = [AppointmentRequest(n, "Cardiology", *window) for n in range(1, 7)]
+        requests.append(AppointmentRequest(7, "Cardiology", *window, priority=1, duration_minutes=60))
+        requests.append(("8", "Neurology", "2025-01-20 09:00", "2025-01-20 09:20"))
+        booked, unscheduled = self.service.schedule_requests(requests)
+
+        # Doctor 1 already has 09:00-09:30, so the urgent hour goes to doctor 3
+        self.assertEqual([(a.patient_id, a.doctor_id, a.appointment_date[11:16]) for a in booked], [
+            (1, 4, "09:00"), (2, 1, "09:30"), (3, 4, "09:30"), (7, 3, "09:00"),
+        ])
+        self.assertEqual([request[0] for request in unscheduled], [4, 5, 6, "8"])
+        self.assertEqual(self.service.get_appointment_by_id(booked[-1].appointment_id).duration_minutes, 60)
+        self.assertEqual(self.service.find_conflicts(3, "2025-01-20 09:45"), [booked[-1].appointment_id])
+
+        # A failed batch books nothing
+        insert = self.service._insert
+        def failing_insert(appointment, entry):
+            if appointment.patient_id == 2:
+                raise Exception("disk full")
+            return insert(appointment, entry)
+        batch = [AppointmentRequest(n, "Cardiology", "2025-01-21 09:00", "2025-01-21 12:00") for n in (1, 2)]
+        with patch.object(self.service, '_insert', side_effect=failing_insert):
+            with self.assertRaises(Exception):
+                self.service.schedule_requests(batch)
+        self.assertEqual(self.service.get_appointments_on("2025-01-21"), [])
+        self.assertEqual(self.service.get_free_slots(1, "2025-01-21")[0], datetime(2025, 1, 21, 9, 0))
+        with self.assertRaises(ValueError):
+            self.service.schedule_requests([AppointmentRequest(1, "Cardiology", "2025-01-21 12:00", "2025-01-21 09:00")])
+
+    def test_schedule_requests_recheck_the_table(self):
+        """Test that a placement another process booked meanwhile is left unscheduled"""
+        DoctorService().add_doctor(Doctor(name="Dr. Evans", specialization="Dermatology",
+                                          contact="555-0101", email="evans@hospital.com"))
+        self.assertEqual(self.service.get_free_slots(3, "2025-02-05")[0], datetime(2025, 2, 5, 9, 0))
+        self.book_behind_the_index(self.service, "2025-02-05 09:00:00", doctor_id=3)
+        window = ("2025-02-05 09:00", "2025-02-05 09:30")
+        booked, unscheduled = self.service.schedule_requests([
+            AppointmentRequest(1, "Dermatology", *window),
+            AppointmentRequest(2, "Dermatology", "2025-02-05 10:00", "2025-02-05 10:30"),
+        ])
+        self.assertEqual([(a.patient_id, a.appointment_date) for a in booked], [(2, "2025-02-05 10:00:00")])
+        self.assertEqual(unscheduled, [AppointmentRequest(1, "Dermatology", *window)])
+        self.assertEqual(len(self.service.get_appointments_on("2025-02-05")), 2)
+
+    def test_waitlist_backfill(self):
+        """Test that a cancelled future slot is offered to the best waiting patient"""
+        APPOINTMENT_WAITLIST.reset_stats()
+        when = (datetime.now() + timedelta(days=7)).replace(hour=10, minute=0, second=0, microsecond=0)
+        appointment = self.book(when, duration_minutes=45)
+        self.service.add_to_waitlist(3, doctor_id=1)
+        self.service.add_to_waitlist(4, specialization="Cardiology", urgency=2)
+        self.service.add_to_waitlist(5, specialization="Neurology", urgency=9)
+        self.assertEqual([e.patient_id for e in self.service.get_waitlist(specialization="Cardiology")], [4])
+
+        self.service.cancel_appointment(appointment.appointment_id)
+        offer, = self.service.get_slot_offers()
+        self.assertEqual((offer.entry.patient_id, offer.doctor_id), (4, 1))
+        following = self.service.decline_slot_offer(offer.offer_id)
+        self.assertEqual(following.entry.patient_id, 3)
+        booked = self.service.accept_slot_offer(following.offer_id)
+        self.assertEqual((booked.patient_id, booked.doctor_id, booked.duration_minutes), (3, 1, 45))
+        self.assertEqual(self.service.find_conflicts(1, when), [booked.appointment_id])
+        self.assertIsNone(self.service.accept_slot_offer(following.offer_id))
+
+        # Past slots are not offered; taken slots send the patient back
+        self.service.cancel_appointment(1)
+        self.assertEqual(self.service.get_slot_offers(), [])
+        self.service.cancel_appointment(booked.appointment_id)
+        offer, = self.service.get_slot_offers()
+        self.book(when)
+        with self.assertRaises(AppointmentConflictError):
+            self.service.accept_slot_offer(offer.offer_id)
+        self.assertEqual([e.patient_id for e in self.service.get_waitlist(specialization="Cardiology")], [4])
+
+        stats = self.service.waitlist_stats()
+        self.assertEqual((stats['slots_freed'], stats['filled'], stats['unfilled']), (2, 1, 1))
+        self.assertEqual(stats['fill_rate'], 0.5)
+
+    def book_behind_the_index(self, service, when, patient_id=2, doctor_id=1):
+        """Insert an appointment the way another process would, without updating the index"""
+        cursor = service.connection.cursor()
+        cursor.execute("INSERT INTO appointments (patient_id, doctor_id, appointment_date, status) "
+                       "VALUES (%s, %s, %s, %s)", (patient_id, doctor_id, when, 'Scheduled'))
+        service.connection.commit()
+        cursor.close()
+
+    def test_table_is_rechecked(self):
+        """Test that bookings other processes made are caught inside the write transaction"""
+        self.assertEqual(self.service.find_conflicts(1, "2025-02-03 10:00"), [])
+        self.book_behind_the_index(self.service, "2025-02-03 09:45:00")
+        with self.assertRaises(AppointmentConflictError):
+            self.book("2025-02-03 10:00")
+        appointment = self.book("2025-02-03 11:00")
+        with self.assertRaises(AppointmentConflictError):
+            self.service.reschedule_appointment(appointment.appointment_id, "2025-02-03 09:30")
+        self.assertEqual(self.service.get_appointment_by_id(appointment.appointment_id).appointment_date,
+                         "2025-02-03 11:00:00")
+        with self.assertRaises(ValueError):
+            self.book("2025-02-04 10:00", duration_minutes=24 * 60 + 1)
+
+    def test_sqlite_backend(self):
+        """Test booking against SQLite, where durations come from the migrated column"""
+        db.configure(backend='sqlite', sqlite_path=':memory:', pool_size=1)
+        service = AppointmentService()
+        cursor = service.connection.cursor()
+        cursor.execute("INSERT INTO patients (name, contact) VALUES ('A', '1')")
+        cursor.execute("INSERT INTO doctors (name, specialization, email) VALUES ('D', 'X', 'd@x.org')")
+        cursor.execute("INSERT INTO appointments (patient_id, doctor_id, appointment_date) "
+                       "VALUES (1, 1, '2025-03-01 08:00:00')")
+        service.connection.commit()
+        cursor.close()
+        self.assertEqual(service.get_appointment_by_id(1).duration_minutes, 30)
+        with self.assertRaises(AppointmentConflictError):
+            service.book_appointment(Appointment(patient_id=1, doctor_id=1, appointment_date="2025-03-01 08:20"))
+        booked = service.book_appointment(Appointment(patient_id=1, doctor_id=1,
+                                                      appointment_date="2025-03-01 08:30"))
+        self.assertEqual(booked.appointment_id, 2)
+
+        self.book_behind_the_index(service, "2025-03-01 09:00:00", patient_id=1)
+        with self.assertRaises(AppointmentConflictError) as caught:
+            service.book_appointment(Appointment(patient_id=1, doctor_id=1, appointment_date="2025-03-01 09:15"))
+        self.assertEqual(caught.exception.conflicts, [3])
+
+if __name__ == '__main__':
+    unittest.main()
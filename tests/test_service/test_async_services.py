@@ -0,0 +1,114 @@
+"""
+Unit tests for the asyncio service layer
+"""
+
+import asyncio
+import threading
+import unittest
+from app.utils import db
+from app.services.async_services import AsyncPatientService, AsyncBillingService
+from app.models.patient import Patient
+
+class TestAsyncServices(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.saved_config = dict(db.DB_CONFIG)
+        db.configure(backend='mock')
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+
+    def test_queries_run_concurrently(self):
+        """Test that many calls run at once on worker threads"""
+        async def scenario():
+            async with AsyncPatientService(max_concurrency=3) as service:
+                patients = await asyncio.gather(*[
+                    service.add_patient(Patient(name=f"Patient {i}", contact=f"555-{i:04d}"))
+                    for i in range(20)
+                ])
+                everyone = await service.get_all_patients()
+                first = await service.get_patient_by_id(patients[0].patient_id)
+                streamed = [p.patient_id async for p in service.iter_patients(batch_size=7)]
+                return patients, everyone, first, streamed
+
+        patients, everyone, first, streamed = asyncio.run(scenario())
+        self.assertEqual(len({p.patient_id for p in patients}), 20)
+        self.assertEqual(len(everyone), 22)
+        self.assertEqual(first.name, "Patient 0")
+        self.assertEqual(streamed, sorted(p.patient_id for p in everyone))
+        self.assertEqual(db.pool_stats()['in_use'], 0)
+
+    def test_concurrency_is_bounded(self):
+        """Test that no more than max_concurrency calls are in flight"""
+        running = []
+        peak = []
+        lock = threading.Lock()
+        release = threading.Event()
+
+        async def scenario():
+            service = AsyncBillingService(max_concurrency=2)
+
+            def slow_call(name, args, kwargs):
+                with lock:
+                    running.append(name)
+                    peak.append(len(running))
+                release.wait(1)
+                with lock:
+                    running.remove(name)
+                return []
+            service._run = slow_call
+
+            calls = [asyncio.ensure_future(service.get_unpaid_bills()) for _ in range(5)]
+            await asyncio.sleep(0.05)
+            release.set()
+            await asyncio.gather(*calls)
+            service.close()
+
+        asyncio.run(scenario())
+        self.assertEqual(max(peak), 2)
+
+    def test_cancellation(self):
+        """Test that cancelling a waiting call frees its slot and skips the work"""
+        started = []
+        release = threading.Event()
+
+        async def scenario():
+            service = AsyncBillingService(max_concurrency=1)
+
+            def blocking_call(name, args, kwargs):
+                started.append(args)
+                release.wait(1)
+                return args
+            service._run = blocking_call
+
+            first = asyncio.ensure_future(service.get_patient_bills(1))
+            waiting = asyncio.ensure_future(service.get_patient_bills(2))
+            await asyncio.sleep(0.05)
+            waiting.cancel()
+            release.set()
+            result = await first
+            third = await service.get_patient_bills(3)
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            service.close()
+            return result, third
+
+        result, third = asyncio.run(scenario())
+        self.assertEqual((result, third), ((1,), (3,)))
+        self.assertEqual(started, [(1,), (3,)])
+
+    def test_errors_propagate(self):
+        """Test that service exceptions reach the awaiting coroutine"""
+        async def scenario():
+            async with AsyncPatientService() as service:
+                with self.assertRaises(ValueError):
+                    await service.update_patient("not a patient")
+                with self.assertRaises(ValueError):
+                    service.iter_patients(order_by='dob')
+
+        asyncio.run(scenario())
+
+if __name__ == '__main__':
+    unittest.main()
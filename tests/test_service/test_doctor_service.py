@@ -0,0 +1,66 @@
+"""
+Unit tests for doctor service lookups through the doctor directory
+"""
+
+import unittest
+from app.utils import db
+from app.services.doctor_patient import DoctorService, DOCTOR_DIRECTORY
+from app.models.doctor import Doctor
+
+class TestDoctorService(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.saved_config = dict(db.DB_CONFIG)
+        db.configure(backend='mock')
+        self.service = DoctorService()
+        self.cardiologists = len(self.service.get_doctors_by_specialization("Cardiology"))
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+
+    def add_doctor(self, name, specialization="Cardiology"):
+        return self.service.add_doctor(Doctor(name=name, specialization=specialization,
+                                              contact="555-0100", email=f"{name[4:].lower()}@hospital.com"))
+
+    def test_directory_follows_writes(self):
+        """Test that adds, updates and deletes reach the directory"""
+        self.assertTrue(DOCTOR_DIRECTORY.loaded)
+        doctor = self.add_doctor("Dr. Quinn")
+        self.assertEqual(len(self.service.get_doctors_by_specialization("Cardiology")),
+                         self.cardiologists + 1)
+        self.assertEqual([d.doctor_id for d in self.service.search_doctors_by_name("dr. qu")],
+                         [doctor.doctor_id])
+
+        doctor.specialization = "Oncology"
+        self.service.update_doctor(doctor)
+        self.assertEqual([d.name for d in self.service.get_doctors_by_specialization("Oncology")],
+                         ["Dr. Quinn"])
+        self.service.delete_doctor(doctor.doctor_id)
+        self.assertEqual(self.service.get_doctors_by_specialization("Oncology"), [])
+        self.assertEqual(self.service.search_doctors_by_name("dr. qu"), [])
+
+    def test_rolled_back_writes_are_not_listed(self):
+        """Test that the directory only sees committed doctors"""
+        try:
+            with db.transaction():
+                self.add_doctor("Dr. Rivera")
+                self.assertEqual(self.service.search_doctors_by_name("dr. ri"), [])
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+        self.assertEqual(self.service.search_doctors_by_name("dr. ri"), [])
+        with db.transaction():
+            self.add_doctor("Dr. Rivera")
+        self.assertEqual(len(self.service.search_doctors_by_name("dr. ri")), 1)
+
+    def test_reset_reloads(self):
+        """Test that switching databases drops the directory"""
+        self.add_doctor("Dr. Quinn")
+        db.configure(backend='mock')
+        self.assertFalse(DOCTOR_DIRECTORY.loaded)
+        self.assertEqual(DoctorService().search_doctors_by_name("dr. qu"), [])
+
+if __name__ == '__main__':
+    unittest.main()
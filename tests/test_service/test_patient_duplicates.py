@@ -0,0 +1,114 @@
+"""
+Unit tests for PatientService duplicate detection
+"""
+
+import csv
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.utils import db
+from app.services.patient_service import PatientService, DuplicatePatientError
+from app.models.patient import Patient
+
+class TestPatientDuplicates(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.saved_config = dict(db.DB_CONFIG)
+        db.configure(backend='mock')
+        self.service = PatientService()
+        self.ids, _ = self.service.add_patients([
+            Patient(name="Amara Nwosu", contact="555-314-1592"),
+            Patient(name="Tomas Lindqvist", contact="(555) 271 8281"),
+        ])
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+
+    def test_find_duplicates(self):
+        """Test lookups by differently formatted numbers"""
+        found = self.service.find_duplicates("+1 555 314 1592")
+        self.assertEqual([p.name for p in found], ["Amara Nwosu"])
+        self.assertEqual(self.service.find_duplicate_ids("555.271.8281"), [self.ids[1]])
+        self.assertEqual(self.service.find_duplicate_ids("555-271-8281", exclude_id=self.ids[1]), [])
+        self.assertEqual(self.service.find_duplicates("555-000-0000"), [])
+
+    def test_add_patient_check(self):
+        """Test that add_patient refuses a registered number unless told otherwise"""
+        with self.assertRaises(DuplicatePatientError) as caught:
+            self.service.add_patient(Patient(name="A. Nwosu", contact="5553141592"))
+        self.assertEqual(caught.exception.patient_ids, [self.ids[0]])
+        patient = self.service.add_patient(Patient(name="A. Nwosu", contact="5553141592"), check_duplicates=False)
+        with patch.dict(db.DB_CONFIG, check_duplicate_contacts=False):
+            other = self.service.add_patient(Patient(name="A. Nwosu", contact="555-314-1592"))
+        self.assertEqual(self.service.find_duplicate_ids("555-314-1592"),
+                         [self.ids[0], patient.patient_id, other.patient_id])
+
+    def test_lookups_follow_writes(self):
+        """Test that updates and deletes change the stored normalized number"""
+        patient = self.service.get_patient_by_id(self.ids[0])
+        patient.contact = "555-999-0000"
+        self.service.update_patient(patient)
+        self.assertEqual(self.service.find_duplicate_ids("555-314-1592"), [])
+        self.assertEqual(self.service.find_duplicate_ids("5559990000"), [self.ids[0]])
+
+        try:
+            with db.transaction():
+                self.service.delete_patient(self.ids[1])
+                self.assertEqual(self.service.find_duplicate_ids("555-271-8281"), [])
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+        self.assertEqual(self.service.find_duplicate_ids("555-271-8281"), [self.ids[1]])
+        self.service.delete_patient(self.ids[1])
+        self.assertEqual(self.service.find_duplicate_ids("555-271-8281"), [])
+
+    def test_other_writers_are_seen(self):
+        """Test that a number stored without this service is found at once"""
+        connection = db.create_connection()
+        cursor = connection.cursor()
+        cursor.execute("INSERT INTO patients (name, contact, normalized_contact) VALUES (%s, %s, %s)",
+                       ("Other Process", "555 123 9999", "5551239999"))
+        connection.commit()
+        cursor.close()
+        connection.close()
+        self.assertEqual([p.name for p in self.service.find_duplicates("(555) 123-9999")], ["Other Process"])
+        self.assertEqual([d.row for d in self.service.check_duplicates([{'contact': "5551239999"}])], [0])
+
+    def test_check_import_batch(self):
+        """Test checking an import file before add_patients"""
+        rows = [
+            {'name': "Amara N.", 'contact': "555 314 1592"},
+            {'name': "Priya Raman", 'contact': "555-600-7000"},
+            Patient(name="P. Raman", contact="+1-555-600-7000"),
+            {'name': "No Phone"},
+        ]
+        found = self.service.check_duplicates(rows)
+        self.assertEqual([(d.row, d.record_ids, d.rows) for d in found],
+                         [(0, [self.ids[0]], []), (2, [], [1])])
+
+    def test_merge_candidates(self):
+        """Test the batch merge-candidate job and its report"""
+        typo = self.service.add_patient(Patient(name="Amara Nwozu", dob="1988-03-02", contact="+1 555 314 1592"),
+                                        check_duplicates=False)
+        later = self.service.add_patient(Patient(name="Amara Nwosu", dob="1988-03-02", contact="555-314-1592"),
+                                         check_duplicates=False)
+        candidates = self.service.find_merge_candidates(workers=1)
+        self.assertEqual((candidates[0].patient_id, candidates[0].other_id), (typo.patient_id, later.patient_id))
+        self.assertEqual((candidates[0].dob_score, candidates[0].phone_score), (1.0, 1.0))
+        self.assertIn((self.ids[0], later.patient_id), [(c.patient_id, c.other_id) for c in candidates])
+        self.assertNotIn(self.ids[1], [c.other_id for c in candidates])
+
+        path = os.path.join(tempfile.mkdtemp(), "merge.csv")
+        count = self.service.write_merge_report(path, workers=1)
+        with open(path, newline='') as report:
+            rows = list(csv.DictReader(report))
+        self.assertEqual(count, len(candidates))
+        self.assertEqual(len(rows), count)
+        self.assertEqual(set(row['cluster'] for row in rows), {'1'})
+        os.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
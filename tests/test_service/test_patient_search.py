@@ -0,0 +1,60 @@
+"""
+Unit tests for PatientService.search
+"""
+
+import unittest
+from app.utils import db
+from app.services.patient_service import PatientService, PATIENT_SEARCH
+from app.models.patient import Patient
+
+class TestPatientSearch(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.saved_config = dict(db.DB_CONFIG)
+        db.configure(backend='mock')
+        self.service = PatientService()
+        self.ids, _ = self.service.add_patients([
+            Patient(name="Maximilian Okonkwo", contact="555-314-1592", address="1 Harbour Rd"),
+            Patient(name="Maxine Okafor", contact="555-271-8281", address="8 Quarry Lane"),
+        ])
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+
+    def test_search(self):
+        """Test ranked search over name, contact and address"""
+        found = self.service.search("okonkwo")
+        self.assertEqual(found[0].patient_id, self.ids[0])
+        self.assertEqual(self.service.search("maxmilian okonkwo", limit=1)[0].name, "Maximilian Okonkwo")
+        self.assertEqual([p.patient_id for p in self.service.search("271 8281")], [self.ids[1]])
+        self.assertEqual(self.service.search("quarry")[0].patient_id, self.ids[1])
+        self.assertEqual(self.service.search("xyzzy"), [])
+        with self.assertRaises(ValueError):
+            self.service.search("max", limit=0)
+
+    def test_index_follows_writes(self):
+        """Test that adds, updates and deletes reach the index once committed"""
+        self.service.search("okafor")
+        self.assertTrue(PATIENT_SEARCH.loaded)
+        patient = self.service.add_patient(Patient(name="Ngozi Adeyemi", contact="555-161-8033"))
+        self.assertEqual(self.service.search("adeyemi")[0].patient_id, patient.patient_id)
+
+        patient.name = "Ngozi Balogun"
+        self.service.update_patient(patient)
+        self.assertEqual(self.service.search("adeyemi"), [])
+        self.assertEqual(self.service.search("balogun")[0].patient_id, patient.patient_id)
+
+        try:
+            with db.transaction():
+                self.service.delete_patient(patient.patient_id)
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+        self.assertEqual(len(self.service.search("balogun")), 1)
+        self.service.delete_patient(patient.patient_id)
+        self.assertEqual(self.service.search("balogun"), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,13 +4,15 @@ Unit tests for patient service
 
 import unittest
 from unittest.mock import patch, MagicMock
-from app.services.patient_service import PatientService
+from app.services.patient_service import PatientService, PATIENT_CACHE
 from app.models.patient import Patient
 
 class TestPatientService(unittest.TestCase):
     
     def setUp(self):
         """Set up test environment before each test"""
+        PATIENT_CACHE.clear()
+        PATIENT_CACHE.reset_stats()
         self.patient_service = PatientService()
         
         # Mock database connection
@@ -36,7 +38,7 @@ class TestPatientService(unittest.TestCase):
         # Set up mock cursor
         self.mock_cursor.lastrowid = 1
         
-        result = self.patient_service.add_patient(patient)
+        result = self.patient_service.add_patient(patient, check_duplicates=False)
         
         # Verify the patient was added correctly
         self.assertEqual(result.patient_id, 1)
@@ -129,6 +131,34 @@ class TestPatientService(unittest.TestCase):
             (1,)
         )
     
+    def test_get_patient_by_id_is_cached(self):
+        """Test that repeat lookups are served from the cache until the patient changes"""
+        self.mock_cursor.fetchone.return_value = {
+            'patient_id': 1, 'name': 'John Doe', 'dob': '1990-01-15',
+            'gender': 'M', 'contact': '123-456-7890', 'address': '123 Main St'
+        }
+        first = self.patient_service.get_patient_by_id(1)
+        second = self.patient_service.get_patient_by_id(1)
+        self.assertEqual(self.mock_cursor.execute.call_count, 1)
+        self.assertEqual(second.to_dict(), first.to_dict())
+        self.assertIsNot(second, first)
+        
+        # Missing patients are not cached
+        self.mock_cursor.fetchone.return_value = None
+        self.assertIsNone(self.patient_service.get_patient_by_id(2))
+        self.assertIsNone(self.patient_service.get_patient_by_id(2))
+        self.assertEqual(self.mock_cursor.execute.call_count, 3)
+        
+        self.mock_cursor.rowcount = 1
+        first.name = "John Doe Updated"
+        self.patient_service.update_patient(first)
+        self.mock_cursor.fetchone.return_value = first.to_dict()
+        self.assertEqual(self.patient_service.get_patient_by_id(1).name, "John Doe Updated")
+        self.patient_service.delete_patient(1)
+        self.assertNotIn(1, PATIENT_CACHE)
+        stats = PATIENT_CACHE.stats()
+        self.assertEqual((stats['hits'] >= 1, stats['invalidations']), (True, 2))
+    
     def test_update_patient_success(self):
         """Test successful patient update"""
         patient = Patient(
@@ -190,4 +220,125 @@ class TestPatientService(unittest.TestCase):
             address="123 Main St"
         )
         
-        self.mock_cursor.execute.side_effect = Exception
\ No newline at end of file
+        self.mock_cursor.execute.side_effect = Exception
+    
+    def number_inserts(self, first_id, increment=1, failures=()):
+        """Give each executed INSERT the next id, like an auto-increment column"""
+        next_id = [first_id]
+        calls = [0]
+        def execute(query, params=None):
+            if 'INSERT' not in query:
+                return
+            calls[0] += 1
+            if calls[0] in failures:
+                raise failures[calls[0]]
+            self.mock_cursor.lastrowid = next_id[0]
+            next_id[0] += increment
+        self.mock_cursor.execute.side_effect = execute
+    
+    def test_add_patients_batches(self):
+        """Test bulk insert with executemany, one commit per chunk and the real id of every row"""
+        patients = [
+            Patient(name=f"Patient {i}", contact=f"555-000-{i:04d}")
+            for i in range(5)
+        ]
+        # As with auto_increment_increment = 2 on a replicated server
+        self.patient_service._batch_id_step = 2
+        first_ids = iter([11, 15, 19])
+        def executemany(query, rows):
+            self.mock_cursor.lastrowid = next(first_ids)
+        self.mock_cursor.executemany.side_effect = executemany
+        
+        ids, errors = self.patient_service.add_patients(patients, chunk_size=2)
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(ids, [11, 13, 15, 17, 19])
+        self.assertEqual([p.patient_id for p in patients], ids)
+        self.assertEqual(self.mock_cursor.executemany.call_count, 3)
+        self.mock_cursor.execute.assert_not_called()
+        self.assertEqual(self.mock_connection.commit.call_count, 3)
+    
+    def test_add_patients_without_consecutive_ids(self):
+        """Test that rows go in one by one when MySQL may interleave auto-increment ids"""
+        patients = [Patient(name=f"Patient {i}", contact=f"555-000-{i:04d}") for i in range(3)]
+        self.mock_cursor.fetchone.return_value = (2, 1)
+        
+        with patch.dict('app.services.patient_service.DB_CONFIG', backend='mysql'):
+            self.number_inserts(4)
+            ids, errors = self.patient_service.add_patients(patients)
+        
+        self.assertEqual(ids, [4, 5, 6])
+        self.mock_cursor.executemany.assert_not_called()
+    
+    def test_add_patients_reports_failed_rows(self):
+        """Test that invalid rows are reported without aborting the load"""
+        patients = [
+            Patient(name="John Doe", contact="123-456-7890"),
+            Patient(name="", contact="123-456-7890"),
+            {'name': "Jane Smith", 'contact': "987-654-3210"},
+            "not a patient"
+        ]
+        self.mock_cursor.lastrowid = 1
+        
+        ids, errors = self.patient_service.add_patients(patients)
+        
+        self.assertEqual(ids, [1, None, 2, None])
+        self.assertEqual(errors, [(1, "Name is required"), (3, "Invalid patient object")])
+    
+    def test_add_patients_isolates_database_errors(self):
+        """Test that a failing chunk is retried row by row"""
+        patients = [
+            Patient(name="John Doe", contact="123-456-7890"),
+            Patient(name="Jane Smith", contact="987-654-3210")
+        ]
+        # The chunk fails, and so does the retry of its second row
+        self.mock_cursor.executemany.side_effect = Exception("Deadlock")
+        self.number_inserts(7, failures={2: Exception("Data too long")})
+        
+        ids, errors = self.patient_service.add_patients(patients)
+        
+        self.assertEqual(ids, [7, None])
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0], 1)
+        self.mock_connection.rollback.assert_called_once()
+    
+    def test_iter_patients_streams_batches(self):
+        """Test that iter_patients pulls rows with fetchmany and yields lazily"""
+        batches = [
+            [{'patient_id': 1, 'name': 'John Doe'}, {'patient_id': 2, 'name': 'Jane Smith'}],
+            [{'patient_id': 3, 'name': 'Robert Johnson'}],
+            []
+        ]
+        self.mock_cursor.fetchmany.side_effect = batches
+        
+        patients = self.patient_service.iter_patients(batch_size=2)
+        first = next(patients)
+        
+        self.assertEqual(first.name, "John Doe")
+        self.assertEqual(self.mock_cursor.fetchmany.call_count, 1)
+        self.assertEqual([p.patient_id for p in patients], [2, 3])
+        self.mock_connection.cursor.assert_called_once_with(buffered=False)
+        self.mock_cursor.close.assert_called_once()
+    
+    def test_get_patients_page(self):
+        """Test keyset pagination query and continuation cursor"""
+        self.mock_cursor.fetchall.return_value = [
+            {'patient_id': 4, 'name': 'Amy'},
+            {'patient_id': 2, 'name': 'Ben'},
+            {'patient_id': 9, 'name': 'Cat'}
+        ]
+        
+        patients, next_cursor = self.patient_service.get_patients_page(
+            after=('Abe', 7), limit=2, order_by='name'
+        )
+        
+        self.assertEqual([p.name for p in patients], ['Amy', 'Ben'])
+        self.assertEqual(next_cursor, ('Ben', 2))
+        self.mock_cursor.execute.assert_called_once_with(
+            "SELECT * FROM patients WHERE (name, patient_id) > (%s, %s) "
+            "ORDER BY name, patient_id LIMIT %s",
+            ('Abe', 7, 3)
+        )
+        
+        with self.assertRaises(ValueError):
+            self.patient_service.get_patients_page(order_by='address')
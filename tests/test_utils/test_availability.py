@@ -0,0 +1,86 @@
+"""
+Unit tests for slot-bitmap availability
+"""
+
+import unittest
+from app.utils.availability import (AvailabilityIndex, WorkingHours, slot_mask, day_masks, slot_starts,
+                                    SLOTS_PER_DAY)
+from app.utils.intervals import to_minutes
+
+MONDAY = to_minutes("2025-01-20") // 1440
+
+def at(text):
+    return to_minutes(text)
+
+class TestAvailability(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.index = AvailabilityIndex()
+        self.index.load([
+            (1, 'a', at("2025-01-20 09:00"), at("2025-01-20 09:30")),
+            (2, 'b', at("2025-01-20 09:00"), at("2025-01-20 12:00")),
+            (3, 'a', at("2025-01-20 09:20"), at("2025-01-20 09:40")),
+        ])
+
+    def test_masks(self):
+        """Test slot masks of partial and multi-day intervals"""
+        self.assertEqual(slot_mask(0, 15), 0b1)
+        self.assertEqual(slot_mask(10, 31), 0b111)
+        self.assertEqual(slot_mask(30, 30), 0)
+        self.assertEqual(list(day_masks(1440 - 15, 1440 + 15)), [(0, 1 << (SLOTS_PER_DAY - 1)), (1, 1)])
+        self.assertEqual(slot_starts(0b11101110, 3), [1, 5])
+        hours = WorkingHours({0: [("09:00", "12:00"), ("13:00", "17:00")]})
+        self.assertEqual(hours.mask(0), slot_mask(540, 720) | slot_mask(780, 1020))
+        self.assertEqual(hours.mask(6), 0)
+
+    def test_free_slots(self):
+        """Test working slots minus overlapping bookings"""
+        self.assertEqual(self.index.free_slots('a', MONDAY)[:2], [39, 40])
+        self.assertEqual(self.index.free_slots('b', MONDAY, slots=16), [48, 49, 50, 51, 52])
+        self.assertEqual(self.index.free_slots('c', MONDAY)[0], 36)
+        self.assertEqual(self.index.free_slots('a', MONDAY + 5), [])
+
+        # Removing one of two overlapping bookings keeps the other's slots
+        self.index.remove(1)
+        self.assertEqual(self.index.free_slots('a', MONDAY)[:2], [36, 39])
+        self.index.put(3, 'a', at("2025-01-21 09:00"), at("2025-01-21 09:15"))
+        self.assertEqual(self.index.free_slots('a', MONDAY)[0], 36)
+        self.assertEqual(self.index.booked_mask('a', MONDAY + 1), 1 << 36)
+
+    def test_first_free(self):
+        """Test the earliest free run across a group of doctors"""
+        self.assertEqual(self.index.first_free(['a', 'b'], MONDAY), ('a', MONDAY, 39))
+        self.assertEqual(self.index.first_free(['b'], MONDAY, slots=2), ('b', MONDAY, 48))
+        self.assertEqual(self.index.first_free(['a', 'b'], MONDAY, from_slot=50), ('a', MONDAY, 50))
+        # Runs may not spill into the next lane or past working hours
+        self.assertEqual(self.index.first_free(['a', 'b'], MONDAY, from_slot=67, slots=2), ('a', MONDAY + 1, 36))
+        # Saturday start skips the weekend
+        self.assertEqual(self.index.first_free(['b'], MONDAY - 2), ('b', MONDAY, 48))
+        self.assertIsNone(self.index.first_free(['a'], MONDAY + 5, days=2))
+        self.assertIsNone(self.index.first_free([], MONDAY))
+        with self.assertRaises(ValueError):
+            self.index.first_free(['a'], MONDAY, slots=0)
+
+    def test_working_hours(self):
+        """Test per-doctor templates and that they survive clear()"""
+        self.index.set_hours('b', WorkingHours({0: [("13:00", "14:00")]}))
+        self.assertEqual(self.index.first_free(['b'], MONDAY), ('b', MONDAY, 52))
+        self.assertEqual(self.index.first_free(['b'], MONDAY, slots=5), None)
+        self.index.clear()
+        self.index.load([])
+        self.assertEqual(self.index.free_slots('b', MONDAY), [52, 53, 54, 55])
+        self.index.set_hours('b', None)
+        self.assertEqual(self.index.free_slots('b', MONDAY)[0], 36)
+
+    def test_many_doctors(self):
+        """Test folding over lanes when only a late lane is free"""
+        index = AvailabilityIndex()
+        entries = [(n, n, at("2025-01-20 09:00"), at("2025-01-20 17:00")) for n in range(37)]
+        entries.append((99, 30, at("2025-01-20 09:00"), at("2025-01-20 10:00")))
+        index.load(entries[:30] + entries[31:])
+        self.assertEqual(index.first_free(list(range(37)), MONDAY), (30, MONDAY, 40))
+        self.assertEqual(index.first_free(list(range(37)) + [500], MONDAY), (500, MONDAY, 36))
+
+if __name__ == '__main__':
+    unittest.main()
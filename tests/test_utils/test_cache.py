@@ -0,0 +1,111 @@
+"""
+Unit tests for the LRU/TTL cache and the snapshot index base
+"""
+
+import unittest
+from app.utils.cache import LRUCache, SnapshotIndex, clear_all
+
+
+class ItemSet(SnapshotIndex):
+    """Smallest snapshot index: a set of items"""
+
+    def _reset(self):
+        self.items = set()
+
+    def _fill(self, items):
+        self.items.update(items)
+
+    def add(self, item):
+        with self._lock:
+            if self._changed():
+                self.items.add(item)
+
+class TestLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.now = 0.0
+        self.cache = LRUCache(maxsize=2, ttl=10, clock=lambda: self.now)
+
+    def test_least_recently_used_is_evicted(self):
+        """Test LRU eviction order and counters"""
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.cache.put('c', 3)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual((self.cache.get('a'), self.cache.get('c')), (1, 3))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['size']),
+                         (3, 1, 1, 2))
+
+    def test_entries_expire(self):
+        """Test that entries older than the TTL are dropped"""
+        self.cache.put('a', 1)
+        self.now = 9.9
+        self.assertIn('a', self.cache)
+        self.now = 10.0
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+
+    def test_invalidation_blocks_stale_loads(self):
+        """Test that a load racing an invalidation is not stored"""
+        def slow_load():
+            self.cache.invalidate('a')
+            return 'old'
+        self.assertEqual(self.cache.get_or_load('a', slow_load), 'old')
+        self.assertNotIn('a', self.cache)
+        self.assertEqual(self.cache.get_or_load('a', lambda: 'new'), 'new')
+        self.assertEqual(self.cache.get_or_load('a', lambda: 'newer'), 'new')
+        self.assertEqual(self.cache.get_or_load('b', lambda: None), None)
+        self.assertNotIn('b', self.cache)
+
+    def test_clear(self):
+        """Test clearing one cache and every cache"""
+        self.cache.put('a', 1)
+        clear_all()
+        self.assertEqual(len(self.cache), 0)
+        disabled = LRUCache(maxsize=0)
+        disabled.put('a', 1)
+        self.assertIsNone(disabled.get('a'))
+
+
+class TestSnapshotIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.now = 0.0
+        self.index = ItemSet()
+        self.index.clock = lambda: self.now
+        self.table = {1, 2}
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return list(self.table)
+
+    def test_reload_after_max_age(self):
+        """Test that a snapshot is read again once it is older than max_age"""
+        self.index.ensure_loaded(self.fetch, max_age=60)
+        self.table.add(3)       # written by another process
+        self.now = 59
+        self.assertEqual(self.index.ensure_loaded(self.fetch, max_age=60).items, {1, 2})
+        self.now = 60
+        self.assertEqual(self.index.ensure_loaded(self.fetch, max_age=60).items, {1, 2, 3})
+        self.assertEqual(self.index.ensure_loaded(self.fetch).items, {1, 2, 3})
+        self.assertEqual(self.fetches, 2)
+
+    def test_reload_racing_writes_keeps_contents(self):
+        """Test that a reload overtaken by local writes every time keeps the current contents"""
+        self.index.ensure_loaded(self.fetch, max_age=60)
+        self.now = 60
+        def racing_fetch():
+            self.index.add(len(self.index.items) + 10)
+            return self.fetch()
+        self.index.ensure_loaded(racing_fetch, max_age=60)
+        self.assertEqual(self.index.items, {1, 2, 12, 13, 14})
+        self.assertEqual(self.index.loaded_at, 60)
+        self.assertEqual(self.index.ensure_loaded(self.fetch, max_age=60).items, {1, 2, 12, 13, 14})
+
+if __name__ == '__main__':
+    unittest.main()
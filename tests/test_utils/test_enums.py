@@ -0,0 +1,101 @@
+"""
+Unit tests for the dictionary-encoded enumerations
+"""
+
+import unittest
+from unittest.mock import MagicMock
+from app.utils.enums import APPOINTMENT_STATUS, SPECIALIZATION, CodeTable, NULL
+from app.utils.row_mapper import RowMapper
+from app.models.appointment import Appointment
+from app.models.doctor import Doctor
+from app.models.user import User
+
+class TestCodeTable(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.table = CodeTable('status', ['Open', 'Closed'])
+
+    def test_codes(self):
+        """Test that known values get stable codes and new ones are appended"""
+        self.assertEqual(self.table.code(None), NULL)
+        self.assertEqual([self.table.code('Open'), self.table.code('Closed')], [1, 2])
+        self.assertIsNone(self.table.lookup('Pending'))
+        self.assertEqual(self.table.code('Pending'), 3)
+        self.assertEqual(self.table.lookup('Pending'), 3)
+        self.assertEqual(self.table.value(3), 'Pending')
+        self.assertEqual(self.table.codes('Open', 'Unknown'), {1})
+        self.assertEqual(self.table.known, ('Open', 'Closed'))
+
+    def test_non_string_values(self):
+        """Test that values are stored as strings"""
+        code = self.table.code(5)
+        self.assertEqual(self.table.value(code), '5')
+        self.assertEqual(self.table.code('5'), code)
+        self.assertEqual(self.table.lookup(5), code)
+
+    def test_values_are_shared(self):
+        """Test that equal values decode to one canonical string"""
+        first = ''.join(['Clo', 'sed'])
+        second = ''.join(['Close', 'd'])
+        self.assertIs(self.table.value(self.table.code(first)), self.table.value(self.table.code(second)))
+        self.assertIs(self.table.canonical(first), self.table.canonical(second))
+        self.assertEqual(self.table.canonical('Pending'), 'Pending')
+        self.assertIsNone(self.table.lookup('Pending'))
+
+    def test_size_is_capped(self):
+        """Test that a full table refuses new values instead of growing"""
+        table = CodeTable('tiny', ['A', 'B'], max_size=4)
+        self.assertEqual(table.code('C'), 3)
+        with self.assertRaises(ValueError):
+            table.code('D')
+        self.assertEqual(len(table), 4)
+        self.assertEqual(table.canonical('D'), 'D')
+
+    def test_learning_table(self):
+        """Test that a learning table codes the values it maps until it is full"""
+        table = CodeTable('specialization', max_size=3, learn=True)
+        first = table.shared[''.join(['Cardio', 'logy'])]
+        self.assertIs(table.shared[''.join(['Cardiol', 'ogy'])], first)
+        self.assertEqual(table.lookup('Cardiology'), 1)
+        table.shared['Neurology']
+        self.assertEqual(table.shared['Oncology'], 'Oncology')
+        self.assertIsNone(table.lookup('Oncology'))
+        self.assertIsNone(table.shared[None])
+        self.assertEqual(len(table), 3)
+
+
+class TestEncodedModels(unittest.TestCase):
+
+    def test_mapped_rows_share_strings(self):
+        """Test that the row mapper hands models the shared string of encoded fields"""
+        mapper = RowMapper(Appointment, encoded={'status': APPOINTMENT_STATUS})
+        cursor = MagicMock()
+        cursor.description = [(name,) for name in ('appointment_id', 'patient_id', 'doctor_id',
+                                                   'appointment_date', 'status', 'duration_minutes')]
+        rows = [(n, 1, 1, '2025-01-20 09:00:00', ''.join(['Cancel', 'led']), 30) for n in range(2)]
+        first, second = mapper.all(cursor, rows)
+        self.assertIs(first.status, second.status)
+        self.assertIs(mapper.one(cursor, {'status': ''.join(['Sched', 'uled'])}).status,
+                      APPOINTMENT_STATUS.value(APPOINTMENT_STATUS.lookup('Scheduled')))
+        self.assertEqual(Appointment(appointment_date='2025-01-20', status='Lost').validate(), (False, "Invalid status"))
+
+    def test_mapped_doctors_share_specializations(self):
+        """Test that doctors read through the service share one string per specialization"""
+        mapper = RowMapper(Doctor, encoded={'specialization': SPECIALIZATION})
+        cursor = MagicMock()
+        cursor.description = [(name,) for name in ('doctor_id', 'name', 'specialization', 'contact', 'email')]
+        rows = [(n, f"Dr. {n}", ''.join(['Cardio', 'logy']), None, None) for n in range(2)]
+        first, second = mapper.all(cursor, rows)
+        self.assertIs(first.specialization, second.specialization)
+        self.assertIsNotNone(SPECIALIZATION.lookup('Cardiology'))
+
+    def test_user_roles(self):
+        """Test the role checks"""
+        self.assertTrue(User(role='admin').is_admin())
+        self.assertTrue(User(role='doctor').is_doctor())
+        self.assertFalse(User(role='doctor').is_receptionist())
+        self.assertFalse(User().is_admin())
+
+if __name__ == '__main__':
+    unittest.main()
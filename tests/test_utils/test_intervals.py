@@ -0,0 +1,72 @@
+"""
+Unit tests for the per-key interval index
+"""
+
+import unittest
+from datetime import date, datetime
+from app.utils.intervals import IntervalIndex, to_minutes, from_minutes, parse_datetime
+
+class TestIntervalIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.index = IntervalIndex()
+        self.index.load([
+            (1, 'a', 100, 130),
+            (2, 'a', 130, 160),
+            (3, 'a', 200, 320),
+            (4, 'b', 100, 200),
+        ])
+
+    def ids(self, key, start, end, **options):
+        return [item_id for _, _, item_id in self.index.overlapping(key, start, end, **options)]
+
+    def test_minutes(self):
+        """Test conversion between datetimes and minutes"""
+        self.assertEqual(to_minutes("2025-01-20 09:30:00") - to_minutes("2025-01-20"), 570)
+        self.assertEqual(to_minutes(date(2025, 1, 21)) - to_minutes(datetime(2025, 1, 20)), 1440)
+        self.assertEqual(from_minutes(to_minutes("2025-01-20 09:30")), datetime(2025, 1, 20, 9, 30))
+        with self.assertRaises(ValueError):
+            parse_datetime("next tuesday")
+
+    def test_overlapping(self):
+        """Test half-open overlap checks"""
+        self.assertEqual(self.ids('a', 120, 140), [1, 2])
+        self.assertEqual(self.ids('a', 160, 200), [])
+        self.assertEqual(self.ids('a', 300, 310), [3])
+        self.assertEqual(self.ids('a', 0, 1000), [1, 2, 3])
+        self.assertEqual(self.ids('a', 120, 140, exclude=1), [2])
+        self.assertEqual(self.ids('b', 150, 151), [4])
+        self.assertEqual(self.ids('c', 0, 1000), [])
+
+    def test_long_intervals(self):
+        """Test that a long interval far before the query is still found"""
+        self.index.put(5, 'a', 1000, 5000)
+        self.index.put(6, 'a', 1100, 1110)
+        self.assertEqual(self.ids('a', 4000, 4010), [5])
+        self.assertEqual(self.ids('a', 1105, 1106), [5, 6])
+
+    def test_put_and_remove(self):
+        """Test moving and dropping intervals"""
+        self.index.put(1, 'b', 300, 330)
+        self.assertEqual(self.ids('a', 100, 130), [])
+        self.assertEqual(self.index.get(1), ('b', 300, 330))
+        self.assertEqual(self.index.between('b', 0, 1000), [(100, 200, 4), (300, 330, 1)])
+        self.assertTrue(self.index.remove(4))
+        self.assertFalse(self.index.remove(4))
+        self.assertIsNone(self.index.get(4))
+        self.assertEqual(self.ids('b', 0, 1000), [1])
+        self.assertEqual(len(self.index), 3)
+        with self.assertRaises(ValueError):
+            self.index.put(7, 'a', 10, 10)
+
+    def test_same_start(self):
+        """Test several intervals starting at the same minute"""
+        self.index.put(8, 'c', 50, 60)
+        self.index.put(9, 'c', 50, 90)
+        self.index.remove(8)
+        self.assertEqual(self.index.get(9), ('c', 50, 90))
+        self.assertEqual(self.ids('c', 80, 85), [9])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Unit tests for record linkage
+"""
+
+import io
+import unittest
+from app.utils import linkage
+from app.utils.linkage import soundex, jaro_winkler, find_candidates, clusters
+
+RECORDS = [
+    (1, "Jonathan Smith", "1980-04-12", "555-123-4567"),
+    (2, "Jonathon Smith", "1980-04-12", "(555) 123 4567"),
+    (3, "Jon Smyth", "1980-12-04", "+1 555 123 4567"),
+    (4, "Maria Garcia", "1975-01-30", "555-987-6543"),
+    (5, "Maria Garcia", "1990-07-01", "555-222-1111"),
+    (6, "Wei Chen", None, None),
+]
+
+class TestLinkage(unittest.TestCase):
+
+    def test_soundex(self):
+        """Test standard Soundex codes"""
+        codes = [soundex(w) for w in ["Robert", "Rupert", "Rubin", "Ashcraft", "Tymczak", "Pfister", "Lee"]]
+        self.assertEqual(codes, ["R163", "R163", "R150", "A261", "T522", "P236", "L000"])
+        self.assertIsNone(soundex("123"))
+        self.assertIsNone(soundex(None))
+
+    def test_jaro_winkler(self):
+        """Test reference Jaro-Winkler similarities"""
+        self.assertAlmostEqual(jaro_winkler("martha", "marhta"), 0.9611, places=4)
+        self.assertAlmostEqual(jaro_winkler("dwayne", "duane"), 0.84, places=4)
+        self.assertAlmostEqual(jaro_winkler("dixon", "dicksonx"), 0.8133, places=4)
+        self.assertEqual(jaro_winkler("abc", "abc"), 1.0)
+        self.assertEqual(jaro_winkler("abc", ""), 0.0)
+        self.assertEqual(jaro_winkler("abc", "xyz"), 0.0)
+
+    def test_blocks(self):
+        """Test that only records sharing a key are paired"""
+        prepared = [linkage.prepare(*record) for record in RECORDS]
+        blocks, skipped = linkage.make_blocks(prepared)
+        self.assertEqual(skipped, 0)
+        grouped = sorted((kind, [r[0] for r in members]) for kind, members in blocks)
+        self.assertIn((linkage.DOB, [1, 2]), grouped)
+        self.assertIn((linkage.PHONE, [1, 2, 3]), grouped)
+        self.assertIn((linkage.NAME, [4, 5]), grouped)
+        self.assertFalse(any(6 in [r[0] for r in members] for _, members in blocks))
+
+        # Oversized blocks are dropped and their key no longer hides pairs
+        prepared = [linkage.prepare(*record) for record in RECORDS]
+        blocks, skipped = linkage.make_blocks(prepared, max_block=2)
+        self.assertEqual(skipped, 1)
+        self.assertIsNone(prepared[0][4][linkage.PHONE])
+
+    def test_find_candidates(self):
+        """Test scoring, thresholds and report order"""
+        candidates = find_candidates(RECORDS, workers=1)
+        pairs = [(c.patient_id, c.other_id) for c in candidates]
+        self.assertEqual(pairs[0], (1, 2))
+        self.assertIn((1, 3), pairs)
+        self.assertIn((2, 3), pairs)
+        self.assertNotIn((4, 5), pairs)
+        self.assertEqual(candidates, sorted(candidates, key=lambda c: -c.score))
+        first = candidates[0]
+        self.assertEqual((first.dob_score, first.phone_score), (1.0, 1.0))
+        self.assertEqual(len(pairs), len(set(pairs)))
+
+        self.assertEqual(find_candidates(RECORDS, threshold=0.99, workers=1), [])
+        self.assertIn((4, 5), [(c.patient_id, c.other_id)
+                               for c in find_candidates(RECORDS, threshold=0.5, workers=1)])
+        with self.assertRaises(ValueError):
+            find_candidates(RECORDS, threshold=1.5)
+
+    def test_process_pool(self):
+        """Test that pooled scoring matches scoring in process"""
+        records = RECORDS + [(10 + i, f"Patient{i} Jones", "2000-01-01", None) for i in range(20)]
+        expected = find_candidates(records, workers=1, batch_pairs=1)
+        self.assertEqual(find_candidates(records, workers=2, batch_pairs=1), expected)
+
+    def test_report(self):
+        """Test clusters and the CSV report"""
+        candidates = find_candidates(RECORDS, workers=1)
+        self.assertEqual(clusters(candidates), [[1, 2, 3]])
+        report = io.StringIO()
+        linkage.write_report(candidates, report)
+        lines = report.getvalue().splitlines()
+        self.assertEqual(lines[0], "cluster,patient_id,other_id,score,name_score,dob_score,phone_score")
+        self.assertEqual(lines[1], "1,1,2,0.9857,0.9714,1.0,1.0")
+        self.assertEqual(len(lines), len(candidates) + 1)
+
+if __name__ == '__main__':
+    unittest.main()
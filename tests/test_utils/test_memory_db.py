@@ -0,0 +1,162 @@
+"""
+Unit tests for the in-memory table engine
+"""
+
+import unittest
+from unittest.mock import patch
+from app.utils import memory_db
+from app.utils.memory_db import MemoryDatabase, ProgrammingError, IntegrityError
+from app.utils.enums import PAYMENT_STATUS
+
+class TestMemoryDatabase(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.database = MemoryDatabase()
+        self.connection = self.database.connect()
+        self.cursor = self.connection.cursor(dictionary=True)
+        self.cursor.executemany(
+            "INSERT INTO patients (name, dob, gender, contact, address) VALUES (%s, %s, %s, %s, %s)",
+            [(f"Patient {i}", "1990-01-15", "MF"[i % 2], f"555-{i:04d}", "Main St") for i in range(1, 101)]
+        )
+        self.cursor.execute(
+            "INSERT INTO billing (patient_id, amount, description, payment_status, date_issued) "
+            "VALUES (%s, %s, %s, 'Unpaid', %s), (%s, %s, %s, 'Paid', %s)",
+            (7, 50, "X-ray", "2025-02-01", 7, 20, "Consult", "2025-01-01")
+        )
+        self.connection.commit()
+
+    def test_point_lookup_by_primary_key(self):
+        """Test SELECT by primary key"""
+        self.cursor.execute("SELECT * FROM patients WHERE patient_id = %s", (42,))
+        row = self.cursor.fetchone()
+        self.assertEqual(row['name'], "Patient 42")
+        self.assertIsNone(self.cursor.fetchone())
+
+    def test_secondary_index_lookup(self):
+        """Test that equality on an indexed column uses the index"""
+        self.cursor.execute("SELECT patient_id FROM patients WHERE contact = %s", ("555-0010",))
+        self.assertEqual(self.cursor.fetchall(), [{'patient_id': 10}])
+        index = self.database.table('patients').indexes[('contact',)]
+        self.assertEqual(index.lookup("555-0010"), {10})
+
+    def test_plan_cache_is_bounded(self):
+        """Test that IN lists of many lengths do not grow the plan cache without limit"""
+        with patch.object(memory_db, 'PLAN_CACHE_SIZE', 8):
+            for size in range(1, 20):
+                query = f"SELECT patient_id FROM patients WHERE patient_id IN ({', '.join(['%s'] * size)})"
+                self.cursor.execute(query, tuple(range(1, size + 1)))
+                self.assertEqual(len(self.cursor.fetchall()), size)
+            self.assertEqual(len(self.database._plans), 8)
+        self.cursor.execute("SELECT * FROM patients WHERE patient_id = %s", (42,))
+        self.assertEqual(self.cursor.fetchone()['name'], "Patient 42")
+
+    def test_range_order_and_limit(self):
+        """Test primary key ranges with ORDER BY and LIMIT"""
+        self.cursor.execute(
+            "SELECT patient_id FROM patients WHERE patient_id > %s ORDER BY patient_id DESC LIMIT 3",
+            (50,)
+        )
+        self.assertEqual([r['patient_id'] for r in self.cursor.fetchall()], [100, 99, 98])
+
+    def test_keyset_seek_on_ordered_index(self):
+        """Test row-value seeks and ORDER BY served by an ordered index"""
+        self.cursor.execute("UPDATE patients SET name = %s WHERE patient_id = %s", ("Aaron", 60))
+        query = ("SELECT patient_id, name FROM patients WHERE (name, patient_id) > (%s, %s) "
+                 "ORDER BY name, patient_id LIMIT %s")
+        self.cursor.execute(query, ("", 0, 2))
+        self.assertEqual([r['patient_id'] for r in self.cursor.fetchall()], [60, 1])
+        self.cursor.execute(query, ("Patient 1", 1, 3))
+        self.assertEqual([r['name'] for r in self.cursor.fetchall()],
+                         ["Patient 10", "Patient 100", "Patient 11"])
+        self.cursor.execute(
+            "SELECT patient_id FROM patients WHERE (name, patient_id) < (%s, %s) "
+            "ORDER BY name DESC, patient_id DESC LIMIT 2", ("Patient 10", 10))
+        self.assertEqual([r['patient_id'] for r in self.cursor.fetchall()], [1, 60])
+
+    def test_join_with_alias(self):
+        """Test the billing/patients join the billing service runs"""
+        self.cursor.execute("""
+            SELECT b.*, p.name as patient_name
+            FROM billing b
+            JOIN patients p ON b.patient_id = p.patient_id
+            WHERE b.patient_id = %s
+            ORDER BY b.date_issued DESC
+        """, (7,))
+        rows = self.cursor.fetchall()
+        self.assertEqual([r['description'] for r in rows], ["X-ray", "Consult"])
+        self.assertEqual(rows[0]['patient_name'], "Patient 7")
+
+    def test_update_and_delete(self):
+        """Test UPDATE and DELETE report affected rows and keep indexes current"""
+        self.cursor.execute("UPDATE patients SET contact = %s WHERE patient_id = %s", ("555-9999", 3))
+        self.assertEqual(self.cursor.rowcount, 1)
+        self.cursor.execute("SELECT patient_id FROM patients WHERE contact = %s", ("555-0003",))
+        self.assertEqual(self.cursor.fetchall(), [])
+        self.cursor.execute("DELETE FROM patients WHERE gender = %s", ("F",))
+        self.assertEqual(self.cursor.rowcount, 50)
+        self.cursor.execute("SELECT COUNT(*) AS total FROM patients")
+        self.assertEqual(self.cursor.fetchone()['total'], 50)
+
+    def test_rollback(self):
+        """Test that rollback undoes uncommitted changes"""
+        self.cursor.execute("DELETE FROM patients WHERE patient_id = %s", (1,))
+        self.cursor.execute("INSERT INTO patients (name, contact) VALUES (%s, %s)", ("New", "1"))
+        self.connection.rollback()
+        self.cursor.execute("SELECT COUNT(*) FROM patients")
+        self.assertEqual(self.cursor.fetchone()['COUNT(*)'], 100)
+        self.cursor.execute("SELECT name FROM patients WHERE patient_id = %s", (1,))
+        self.assertEqual(self.cursor.fetchone()['name'], "Patient 1")
+
+    def test_tuple_rows_and_description(self):
+        """Test that plain cursors return tuples with a description"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT patient_id, name FROM patients WHERE patient_id IN (%s, %s)", (2, 5))
+        self.assertEqual([d[0] for d in cursor.description], ['patient_id', 'name'])
+        self.assertEqual(cursor.fetchall(), [(2, "Patient 2"), (5, "Patient 5")])
+
+    def test_unbuffered_cursor_fetches_lazily(self):
+        """Test that unbuffered cursors produce rows as they are fetched"""
+        cursor = self.connection.cursor(dictionary=True, buffered=False)
+        cursor.execute("SELECT patient_id FROM patients")
+        self.assertEqual(cursor.rowcount, -1)
+        self.assertEqual([r['patient_id'] for r in cursor.fetchmany(2)], [1, 2])
+        # Rows inserted or deleted mid-stream do not break the scan
+        self.cursor.execute("DELETE FROM patients WHERE patient_id = %s", (3,))
+        self.assertEqual([r['patient_id'] for r in cursor.fetchmany(2)], [4, 5])
+        self.assertEqual(len(cursor.fetchall()), 95)
+
+    def test_encoded_columns(self):
+        """Test that dictionary-encoded columns store codes but read back as strings"""
+        billing = self.database.table('billing')
+        position = billing.positions['payment_status']
+        self.assertEqual(sorted(row[position] for row in billing.rows.values()),
+                         sorted(PAYMENT_STATUS.codes('Unpaid', 'Paid')))
+        self.cursor.execute("SELECT * FROM billing WHERE payment_status = %s", ("Unpaid",))
+        self.assertEqual([(r['description'], r['payment_status']) for r in self.cursor.fetchall()],
+                         [("X-ray", "Unpaid")])
+        self.cursor.execute("SELECT bill_id FROM billing WHERE payment_status IN ('Paid', 'Void')")
+        self.assertEqual(self.cursor.fetchall(), [{'bill_id': 2}])
+        self.cursor.execute("SELECT bill_id FROM billing WHERE payment_status = %s", ("Refunded",))
+        self.assertEqual(self.cursor.fetchall(), [])
+        self.cursor.execute("SELECT gender, COUNT(*) AS n FROM patients GROUP BY gender ORDER BY gender")
+        self.assertEqual(self.cursor.fetchall(), [{'gender': 'F', 'n': 50}, {'gender': 'M', 'n': 50}])
+        # Ordering and LIKE use the string values, not the codes
+        self.cursor.execute("SELECT bill_id FROM billing WHERE payment_status LIKE 'p%' "
+                            "ORDER BY payment_status DESC")
+        self.assertEqual(self.cursor.fetchall(), [{'bill_id': 2}])
+        self.cursor.execute("UPDATE billing SET payment_status = %s WHERE bill_id = %s", ("Paid", 1))
+        self.cursor.execute("SELECT COUNT(*) AS n FROM billing WHERE payment_status = 'Paid'")
+        self.assertEqual(self.cursor.fetchone()['n'], 2)
+
+    def test_errors(self):
+        """Test unknown names and duplicate keys"""
+        with self.assertRaises(ProgrammingError):
+            self.cursor.execute("SELECT * FROM nurses")
+        with self.assertRaises(ProgrammingError):
+            self.cursor.execute("SELECT shoe_size FROM patients")
+        with self.assertRaises(IntegrityError):
+            self.cursor.execute("INSERT INTO patients (patient_id, name) VALUES (%s, %s)", (1, "Dup"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Unit tests for the schema migration runner
+"""
+
+import os
+import tempfile
+import unittest
+from app.utils import db, migrations, sqlite_db
+from app.utils.query_stats import normalize_sql
+from app.services.patient_service import PatientService
+from app.services.doctor_patient import DoctorService
+from app.services.appointment_service import AppointmentService
+from app.services.billing_service import BillingService
+from app.models.appointment import Appointment
+
+
+class FakeMySQLCursor:
+    """Cursor that answers information_schema lookups from a set of existing names"""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.executed = []
+        self.count = 0
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+        if 'information_schema' in query:
+            self.count = int(params[-1] in self.existing)
+
+    def fetchone(self):
+        return (self.count,)
+
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.connection = sqlite_db.connect(':memory:', create_schema=False)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.connection.close()
+
+    def test_migrate_records_versions(self):
+        """Test that migrations apply in order up to the target and are recorded"""
+        self.assertEqual(migrations.current_version(self.connection), 0)
+        self.assertEqual(migrations.migrate(self.connection, target=1), [1])
+        self.assertEqual(migrations.current_version(self.connection), 1)
+        self.assertEqual(migrations.migrate(self.connection), [2, 3, 4])
+        self.assertEqual(migrations.migrate(self.connection), [])
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+        self.assertEqual(cursor.fetchall(), [(1,), (2,), (3,), (4,)])
+
+    def test_failed_migration_is_not_recorded(self):
+        """Test that a failing migration raises and leaves the version unchanged"""
+        migrations.migrate(self.connection)
+        broken = migrations.Migration(5, "Broken", sqlite=["CREATE INDEX idx_bad ON nurses (name)"], mysql=[])
+        with self.assertRaises(Exception):
+            migrations.migrate(self.connection, migrations=migrations.MIGRATIONS + [broken])
+        self.assertEqual(migrations.current_version(self.connection), 4)
+
+    def test_contacts_are_normalized(self):
+        """Test that migration 4 fills normalized_contact for existing patients"""
+        migrations.migrate(self.connection, target=3)
+        cursor = self.connection.cursor()
+        cursor.executemany("INSERT INTO patients (name, contact) VALUES (%s, %s)",
+                           [("A", "+1 (555) 314-1592"), ("B", "12-34")])
+        self.connection.commit()
+        migrations.migrate(self.connection)
+        cursor.execute("SELECT name, normalized_contact FROM patients ORDER BY name")
+        self.assertEqual(cursor.fetchall(), [("A", "5553141592"), ("B", None)])
+
+    def test_service_queries_use_indexes(self):
+        """Test that EXPLAIN shows every service query using its expected index"""
+        migrations.migrate(self.connection)
+        for name, index, used, plan in migrations.check_query_plans(self.connection):
+            self.assertTrue(used, f"{name} does not use {index}: {plan}")
+
+    def test_service_queries_use_indexes_through_the_pool(self):
+        """Test the plan check on a pooled handle, which must report the SQLite dialect"""
+        saved_config = dict(db.DB_CONFIG)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        db.configure(backend='sqlite', sqlite_path=os.path.join(tmpdir.name, 'test.db'))
+        self.addCleanup(db.configure, **saved_config)
+        connection = db.create_connection()
+        self.addCleanup(connection.close)
+        self.assertEqual(migrations.dialect_of(connection), 'sqlite')
+        for name, index, used, plan in migrations.check_query_plans(connection):
+            self.assertTrue(used, f"{name} does not use {index}: {plan}")
+
+        db.configure(sqlite_replica_path=os.path.join(tmpdir.name, 'replica.db'))
+        self.assertEqual(migrations.dialect_of(db.create_connection()), 'sqlite')
+
+    def test_service_queries_match_the_services(self):
+        """Test that every checked query is a statement the services actually run"""
+        saved_config = dict(db.DB_CONFIG)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        db.configure(backend='sqlite', instrument=True, sqlite_path=os.path.join(tmpdir.name, 'test.db'))
+        self.addCleanup(db.configure, **saved_config)
+        db.query_stats().reset()
+        billing = BillingService()
+        billing.get_patient_bills(1)
+        billing.get_unpaid_bills()
+        billing.get_unpaid_bills_page(after=('2025-01-01', 0))
+        PatientService().get_patients_page(after=('', 0), order_by='name')
+        DoctorService().get_doctors_page(after=('', 0), order_by='name')
+        appointments = AppointmentService()
+        appointments.get_doctor_appointments(1, '2025-01-20 00:00:00', '2025-01-21 00:00:00')
+        appointments.get_patient_appointments(1)
+        appointments.get_appointments_on('2025-01-20')
+        cursor = appointments.connection.cursor()
+        cursor.execute("INSERT INTO patients (name, contact) VALUES ('A', '1')")
+        cursor.execute("INSERT INTO doctors (name, specialization, email) VALUES ('D', 'X', 'd@x.org')")
+        appointments.connection.commit()
+        cursor.close()
+        appointments.book_appointment(Appointment(patient_id=1, doctor_id=1, appointment_date='2025-06-02 10:00'))
+        PatientService().find_duplicate_ids('555-314-1592')
+        executed = db.query_stats().statements
+        for name, query, params, index in migrations.SERVICE_QUERIES:
+            self.assertIn(normalize_sql(query), executed, f"{name} no longer runs the checked query")
+
+    def test_mysql_ddl_skips_existing_objects(self):
+        """Test that MySQL index and column statements check information_schema first"""
+        cursor = FakeMySQLCursor({'idx_patients_name', 'duration_minutes'})
+        migrations.CreateIndex('idx_patients_name', 'patients', ('name',)).apply(cursor)
+        migrations.CreateIndex('idx_doctors_name', 'doctors', ('name',)).apply(cursor)
+        migrations.AddColumn('appointments', 'duration_minutes', 'INT NOT NULL DEFAULT 30').apply(cursor)
+        ddl = [query for query in cursor.executed if 'information_schema' not in query]
+        self.assertEqual(ddl, ["CREATE INDEX idx_doctors_name ON doctors (name)"])
+
+if __name__ == '__main__':
+    unittest.main()
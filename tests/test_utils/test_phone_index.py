@@ -0,0 +1,51 @@
+"""
+Unit tests for the normalized phone-number index
+"""
+
+import unittest
+from app.utils.phone_index import PhoneIndex, DuplicateRow
+from app.utils.validation import normalize_phone
+
+class TestPhoneIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.index = PhoneIndex([
+            (1, "555-123-4567"),
+            (2, "(555) 987 6543"),
+            (3, "+1 555 123 4567"),
+            (4, "12"),
+            (5, None),
+        ])
+
+    def test_normalize_phone(self):
+        """Test the canonical digits-only form"""
+        self.assertEqual(normalize_phone("+1 (555) 123-4567"), "5551234567")
+        self.assertEqual(normalize_phone("555.123.4567"), "5551234567")
+        self.assertEqual(normalize_phone("123 4567"), "1234567")
+        self.assertIsNone(normalize_phone("12-34"))
+        self.assertIsNone(normalize_phone(""))
+        self.assertIsNone(normalize_phone(None))
+
+    def test_lookup(self):
+        """Test that differently formatted numbers find each other"""
+        self.assertEqual(self.index.lookup("5551234567"), [1, 3])
+        self.assertEqual(self.index.lookup("555 987-6543"), [2])
+        self.assertEqual(self.index.lookup("555-000-0000"), [])
+        self.assertEqual(self.index.lookup("12"), [])
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn(4, self.index)
+
+    def test_check_batch(self):
+        """Test checking a batch against the index and against itself"""
+        found = self.index.check(["555-987-6543", "555-222-3333", None, "5552223333", "555 222 3333"])
+        self.assertEqual(found, [
+            DuplicateRow(0, [2], []),
+            DuplicateRow(3, [], [1]),
+            DuplicateRow(4, [], [1, 3]),
+        ])
+        self.assertEqual(self.index.check([]), [])
+        self.assertEqual(PhoneIndex().check(["555-987-6543"]), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+"""
+Unit tests for the shared connection pool
+"""
+
+import sqlite3
+import threading
+import time
+import unittest
+from app.utils import db
+from app.utils.pool import ConnectionPool, PooledConnection, PoolTimeout
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class SQLiteStandIn:
+    """Minimal raw connection around an in-memory SQLite database"""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.healthy = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return self.conn.cursor()
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.conn.rollback()
+
+    def is_connected(self):
+        return self.healthy and not self.closed
+
+    def close(self):
+        self.closed = True
+        self.conn.close()
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.clock = FakeClock()
+        self.created = []
+
+        def factory():
+            conn = SQLiteStandIn()
+            self.created.append(conn)
+            return conn
+
+        self.pool = ConnectionPool(factory, max_size=2, timeout=0.05,
+                                   idle_timeout=60, clock=self.clock)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.pool.close()
+
+    def test_checkout_reuses_returned_connection(self):
+        """Test that a checked-in connection is handed out again"""
+        conn = self.pool.checkout()
+        self.pool.checkin(conn)
+        self.assertIs(self.pool.checkout(), conn)
+        self.assertEqual(self.pool.stats()['created'], 1)
+
+    def test_pool_is_bounded(self):
+        """Test that checkout times out when every connection is in use"""
+        self.pool.clock = time.monotonic
+        self.pool.checkout()
+        self.pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            self.pool.checkout()
+        stats = self.pool.stats()
+        self.assertEqual(stats['in_use'], 2)
+        self.assertEqual(stats['timeouts'], 1)
+
+    def test_waiting_checkout_is_served_by_checkin(self):
+        """Test that a blocked checkout receives a returned connection"""
+        self.pool.clock = time.monotonic
+        self.pool.timeout = 5
+        first = self.pool.checkout()
+        self.pool.checkout()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(self.pool.checkout()))
+        waiter.start()
+        self.pool.checkin(first)
+        waiter.join(5)
+        self.assertEqual(result, [first])
+        self.assertEqual(self.pool.stats()['waits'], 1)
+
+    def test_idle_eviction(self):
+        """Test that idle connections are closed after idle_timeout"""
+        conn = self.pool.checkout()
+        self.pool.checkin(conn)
+        self.clock.now += 61
+        self.assertEqual(self.pool.evict_idle(), 1)
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.pool.stats()['idle'], 0)
+
+    def test_unhealthy_connection_is_replaced(self):
+        """Test that a failed health check discards the idle connection"""
+        conn = self.pool.checkout()
+        self.pool.checkin(conn)
+        conn.healthy = False
+        replacement = self.pool.checkout()
+        self.assertIsNot(replacement, conn)
+        self.assertEqual(self.pool.stats()['health_check_failures'], 1)
+
+    def test_pooled_connection_releases_after_commit(self):
+        """Test that a service handle only holds a connection while working"""
+        handle = PooledConnection(self.pool)
+        cursor = handle.cursor()
+        cursor.execute("CREATE TABLE t (x INTEGER)")
+        cursor.close()
+        self.assertEqual(self.pool.stats()['in_use'], 1)
+        handle.commit()
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+
+        cursor = handle.cursor()
+        cursor.execute("SELECT 1")
+        self.assertEqual(cursor.fetchone(), (1,))
+        cursor.close()
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+
+    def test_read_snapshot_is_ended_before_checkin(self):
+        """Test that a connection used only for reads is rolled back when returned"""
+        handle = PooledConnection(self.pool)
+        cursor = handle.cursor()
+        cursor.execute("SELECT 1")
+        cursor.close()
+        raw = self.created[0]
+        self.assertEqual(raw.rollbacks, 1)
+
+        # Committed writes need no extra rollback
+        cursor = handle.cursor()
+        cursor.execute("CREATE TABLE t (x INTEGER)")
+        cursor.execute("SELECT x FROM t")
+        cursor.close()
+        handle.commit()
+        self.assertEqual(raw.rollbacks, 1)
+
+        cursor = handle.cursor()
+        cursor.execute("SELECT 1")
+        handle.close()
+        self.assertEqual(raw.rollbacks, 2)
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+
+class TestCreateConnection(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.saved_config = dict(db.DB_CONFIG)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+
+    def test_services_share_pool(self):
+        """Test that many handles share a bounded number of connections"""
+        db.configure(pool_size=1)
+        handles = [db.create_connection() for _ in range(10)]
+        for handle in handles:
+            cursor = handle.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM patients")
+            cursor.close()
+        stats = db.pool_stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['checkouts'], 10)
+
+    def test_unknown_option(self):
+        """Test that configure rejects unknown settings"""
+        with self.assertRaises(ValueError):
+            db.configure(not_an_option=True)
+
+if __name__ == '__main__':
+    unittest.main()
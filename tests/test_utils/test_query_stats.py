@@ -0,0 +1,66 @@
+"""
+Unit tests for query timing instrumentation
+"""
+
+import unittest
+from app.utils import db
+from app.utils.query_stats import normalize_sql, InstrumentedConnection
+from app.services.patient_service import PatientService
+from app.services.doctor_patient import DoctorService
+
+class TestQueryStats(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.saved_config = dict(db.DB_CONFIG)
+        db.configure(instrument=True)
+        db.query_stats().reset()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+        db.query_stats().reset()
+
+    def test_normalize_sql(self):
+        """Test that literals, placeholders and whitespace are normalized"""
+        self.assertEqual(
+            normalize_sql("SELECT *\n  FROM patients WHERE patient_id = %s AND name = 'x' LIMIT 10"),
+            "SELECT * FROM patients WHERE patient_id = ? AND name = ? LIMIT ?"
+        )
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+            "SELECT * FROM t WHERE id IN (...)"
+        )
+
+    def test_service_calls_are_recorded(self):
+        """Test latency, rows, commits and errors for service calls"""
+        patients = PatientService()
+        patients.get_all_patients()
+        patients.get_patient_by_id(1)
+        patients.get_patient_by_id(2)
+        patients.delete_patient(2)
+        with self.assertRaises(Exception):
+            patients.connection.cursor().execute("SELECT * FROM no_such_table")
+        DoctorService().get_all_doctors()
+
+        snapshot = db.query_stats().snapshot()
+        by_id = snapshot['statements']["SELECT * FROM patients WHERE patient_id = ?"]
+        self.assertEqual(by_id['count'], 2)
+        self.assertEqual(by_id['rows'], 2)
+        self.assertEqual(snapshot['statements']["SELECT * FROM doctors"]['rows'], 2)
+        self.assertEqual(snapshot['statements']["SELECT * FROM no_such_table"]['errors'], 1)
+        self.assertEqual(snapshot['commits']['count'], 1)
+
+        text = db.query_stats().export_text()
+        self.assertIn('hms_db_statement_seconds_count{sql="SELECT * FROM doctors"} 1', text)
+        self.assertIn('hms_db_commit_seconds_count 1', text)
+
+    def test_disabled_means_no_wrapping(self):
+        """Test that raw connections are left alone when instrumentation is off"""
+        db.configure(instrument=False)
+        connection = db.get_pool().checkout()
+        self.assertNotIsInstance(connection, InstrumentedConnection)
+        db.get_pool().checkin(connection)
+
+if __name__ == '__main__':
+    unittest.main()
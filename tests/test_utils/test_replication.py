@@ -0,0 +1,123 @@
+"""
+Unit tests for read/write splitting between a primary and a read replica
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from app.utils import db, replication, sqlite_db
+from app.utils.replication import SQLiteReplicator, read_from_primary
+from app.services.patient_service import PatientService
+from app.services.appointment_service import AppointmentService, APPOINTMENT_WAITLIST
+from app.models.appointment import Appointment
+from app.services.billing_service import BillingService
+from app.services.doctor_patient import DoctorService
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+
+class TestReadReplica(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a primary and a replica SQLite file kept in sync on demand"""
+        self.saved_config = dict(db.DB_CONFIG)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        primary = os.path.join(self.tmpdir.name, 'primary.db')
+        replica = os.path.join(self.tmpdir.name, 'replica.db')
+        sqlite_db.connect(primary).close()
+        self.replicator = SQLiteReplicator(primary, replica)
+        self.replicator.sync()
+        db.configure(backend='sqlite', sqlite_path=primary, sqlite_replica_path=replica)
+        replication.forget_writes()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+        replication.forget_writes()
+        self.tmpdir.cleanup()
+
+    def add_patient(self, service):
+        return service.add_patient(Patient(name="John Doe", contact="123-456-7890"))
+
+    def test_reads_go_to_replica(self):
+        """Test that writes hit the primary and reads see them only after replication"""
+        service = PatientService()
+        self.add_patient(service)
+        self.assertEqual(service.get_all_patients(), [])
+
+        self.replicator.sync()
+        self.assertEqual([p.name for p in service.get_all_patients()], ["John Doe"])
+        self.assertEqual(db.pool_stats()['in_use'], 0)
+        self.assertEqual(db.get_replica_pool().stats()['in_use'], 0)
+
+    def test_read_your_writes_window(self):
+        """Test that a thread reads from the primary shortly after its own write"""
+        db.configure(read_your_writes=60)
+        patient = self.add_patient(PatientService())
+        # A different service in the same thread sees the write too
+        self.assertEqual(PatientService().get_patient_by_id(patient.patient_id).name, "John Doe")
+        self.assertEqual(BillingService().get_unpaid_bills(), [])
+
+    def test_read_from_primary(self):
+        """Test forcing reads to the primary"""
+        service = PatientService()
+        self.add_patient(service)
+        with read_from_primary():
+            self.assertEqual(len(service.get_all_patients()), 1)
+        self.assertEqual(service.get_all_patients(), [])
+
+    def test_cache_misses_read_the_primary(self):
+        """Test that a lagging replica cannot put an old row back into the patient cache"""
+        service = PatientService()
+        patient = self.add_patient(service)
+        self.replicator.sync()
+        self.assertEqual(service.get_patient_by_id(patient.patient_id).name, "John Doe")
+        patient.name = "Jane Doe"
+        service.update_patient(patient)
+        self.assertEqual(service.get_patient_by_id(patient.patient_id).name, "Jane Doe")
+        self.assertEqual(PatientService().get_patient_by_id(patient.patient_id).name, "Jane Doe")
+
+    def test_snapshots_load_from_the_primary(self):
+        """Test that in-memory indexes are not built from a lagging replica"""
+        DoctorService().add_doctor(Doctor(name="Dr. Lee", specialization="ENT", email="lee@hospital.com"))
+        self.add_patient(PatientService())
+        self.assertEqual([d.name for d in DoctorService().get_doctors_by_specialization("ENT")], ["Dr. Lee"])
+        self.assertEqual([p.name for p in PatientService().search("John")], ["John Doe"])
+
+    def test_appointments_change_on_the_primary(self):
+        """Test that rescheduling and cancelling read the row on the primary, not a lagging replica"""
+        DoctorService().add_doctor(Doctor(name="Dr. Lee", specialization="ENT", email="lee@hospital.com"))
+        self.add_patient(PatientService())
+        APPOINTMENT_WAITLIST.clear()
+        self.addCleanup(APPOINTMENT_WAITLIST.clear)
+        service = AppointmentService()
+        service.add_to_waitlist(1, doctor_id=1)
+        when = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d 09:00")
+        appointment = service.book_appointment(Appointment(patient_id=1, doctor_id=1, appointment_date=when,
+                                                           duration_minutes=45))
+        self.assertIsNone(service.get_appointment_by_id(appointment.appointment_id))
+
+        self.assertTrue(service.reschedule_appointment(appointment.appointment_id, when[:11] + "10:00"))
+        self.assertTrue(service.cancel_appointment(appointment.appointment_id))
+        [offer] = service.get_slot_offers()
+        self.assertEqual(offer.slot, (when[:11] + "10:00:00", 45))
+        with self.assertRaises(ValueError):
+            service.reschedule_appointment(appointment.appointment_id, when)
+
+    def test_background_replicator(self):
+        """Test that the replicator thread copies writes to the replica"""
+        self.replicator.interval = 0.01
+        self.replicator.start()
+        try:
+            service = PatientService()
+            self.add_patient(service)
+            deadline = time.monotonic() + 5
+            while not service.get_all_patients():
+                self.assertLess(time.monotonic(), deadline, "write was never replicated")
+                time.sleep(0.01)
+        finally:
+            self.replicator.stop()
+
+if __name__ == '__main__':
+    unittest.main()
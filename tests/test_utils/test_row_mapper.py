@@ -0,0 +1,45 @@
+"""
+Unit tests for positional row mapping
+"""
+
+import unittest
+from unittest.mock import MagicMock
+from app.utils.row_mapper import RowMapper
+from app.models.doctor import Doctor
+
+class TestRowMapper(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.mapper = RowMapper(Doctor)
+        self.cursor = MagicMock()
+        self.cursor.description = [(name,) for name in
+                                   ('email', 'doctor_id', 'name', 'specialization', 'contact')]
+
+    def test_tuple_rows(self):
+        """Test that tuple rows map through the column positions"""
+        doctors = self.mapper.all(self.cursor, [
+            ('a@x.com', 1, 'Dr. A', 'Cardiology', '555'),
+            ('b@x.com', 2, 'Dr. B', 'Neurology', None),
+        ])
+        self.assertEqual([d.to_dict() for d in doctors], [
+            {'doctor_id': 1, 'name': 'Dr. A', 'specialization': 'Cardiology', 'contact': '555', 'email': 'a@x.com'},
+            {'doctor_id': 2, 'name': 'Dr. B', 'specialization': 'Neurology', 'contact': None, 'email': 'b@x.com'},
+        ])
+        self.assertEqual(self.mapper.one(self.cursor, ('c@x.com', 3, 'Dr. C', 'ENT', '1')).name, 'Dr. C')
+        self.assertIsNone(self.mapper.one(self.cursor, None))
+
+    def test_dict_rows(self):
+        """Test that dictionary rows still go through from_dict"""
+        doctor = self.mapper.one(self.cursor, {'doctor_id': 4, 'name': 'Dr. D'})
+        self.assertEqual((doctor.doctor_id, doctor.name, doctor.email), (4, 'Dr. D', None))
+        self.assertEqual(self.mapper.all(self.cursor, []), [])
+
+    def test_missing_column(self):
+        """Test that a result lacking a model field is rejected"""
+        self.cursor.description = [('doctor_id',), ('name',)]
+        with self.assertRaises(ValueError):
+            self.mapper.all(self.cursor, [(1, 'Dr. A')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Unit tests for batch appointment scheduling
+"""
+
+import unittest
+from app.utils.availability import AvailabilityIndex, WorkingHours
+from app.utils.intervals import to_minutes
+from app.utils.scheduling import AppointmentRequest, BatchScheduler
+
+DOCTORS = {'Cardiology': [1, 2, 3], 'Neurology': [4]}
+
+def at(text):
+    return to_minutes(text)
+
+def request(patient_id, earliest, latest, priority=0, specialization='Cardiology'):
+    return AppointmentRequest(patient_id, specialization, at(earliest), at(latest), priority)
+
+class TestBatchScheduler(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.index = AvailabilityIndex()
+        # Doctor 1 is busy all Monday morning, doctor 2 for one slot
+        self.index.load([
+            (1, 1, at("2025-01-20 09:00"), at("2025-01-20 12:00")),
+            (2, 2, at("2025-01-20 09:00"), at("2025-01-20 09:15")),
+        ])
+        self.scheduler = BatchScheduler(self.index, self.doctors_of)
+
+    def doctors_of(self, specialization):
+        return DOCTORS.get(specialization, [])
+
+    def assign(self, requests, slots=2):
+        return [placed[1:] for placed in self.scheduler.assign(requests, lambda r: slots)]
+
+    def test_balances_load(self):
+        """Test that requests go to the least loaded doctor first"""
+        placed = self.assign([request(n, "2025-01-20 09:00", "2025-01-20 17:00") for n in range(4)])
+        self.assertEqual(placed, [
+            (3, at("2025-01-20 09:00")),
+            (2, at("2025-01-20 09:15")),
+            (3, at("2025-01-20 09:30")),
+            (2, at("2025-01-20 09:45")),
+        ])
+
+    def test_windows_and_priority(self):
+        """Test windows, held time and that urgent requests are placed first"""
+        self.index.set_hours(3, WorkingHours({}))
+        scheduler = BatchScheduler(self.index, self.doctors_of,
+                                   held=[(2, at("2025-01-20 09:15"), at("2025-01-20 12:00"))])
+        placed = scheduler.assign([
+            request(1, "2025-01-20 11:10", "2025-01-20 12:40"),
+            request(2, "2025-01-20 11:10", "2025-01-20 12:40", priority=5),
+            request(3, "2025-01-20 11:10", "2025-01-20 12:40"),
+            request(4, "2025-01-18 00:00", "2025-01-20 09:10", specialization='Neurology'),
+            request(5, "2025-01-20 11:00", "2025-01-20 11:20", specialization='Neurology'),
+            request(6, "2025-01-20 11:00", "2025-01-20 12:00", specialization='Dermatology'),
+        ], lambda r: 2)
+        self.assertEqual([p[1:] for p in placed], [
+            (1, at("2025-01-20 12:00")),
+            (2, at("2025-01-20 12:00")),
+            (None, None),
+            (None, None),
+            (None, None),
+            (None, None),
+        ])
+        self.assertEqual(placed[1][0].patient_id, 2)
+        self.assertEqual(self.scheduler.assign([], lambda r: 1), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Unit tests for the embedded SQLite backend
+"""
+
+import os
+import tempfile
+import unittest
+from app.utils import db
+from app.utils.sqlite_db import translate_placeholders
+from app.services.patient_service import PatientService
+from app.services.billing_service import BillingService
+from app.models.patient import Patient
+
+class TestSQLiteBackend(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.saved_config = dict(db.DB_CONFIG)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db.configure(backend='sqlite', sqlite_path=os.path.join(self.tmpdir.name, 'test.db'))
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+        self.tmpdir.cleanup()
+
+    def test_translate_placeholders(self):
+        """Test that %s becomes ? everywhere except inside string literals"""
+        self.assertEqual(
+            translate_placeholders("SELECT * FROM t WHERE a = %s AND b = '%s' AND c LIKE '50%%'"),
+            "SELECT * FROM t WHERE a = ? AND b = '%s' AND c LIKE '50%%'"
+        )
+        self.assertEqual(translate_placeholders("SELECT %s %% 2"), "SELECT ? % 2")
+
+    def test_wal_mode(self):
+        """Test that connections use write-ahead logging"""
+        cursor = db.create_connection().cursor()
+        cursor.execute("PRAGMA journal_mode")
+        self.assertEqual(cursor.fetchone()[0], 'wal')
+        cursor.close()
+
+    def test_patient_service_crud(self):
+        """Test PatientService end to end on SQLite"""
+        service = PatientService()
+        patient = service.add_patient(Patient(name="John Doe", dob="1990-01-15", gender="M",
+                                              contact="123-456-7890", address="123 Main St"))
+        self.assertEqual(patient.patient_id, 1)
+        self.assertEqual(service.get_patient_by_id(1).name, "John Doe")
+
+        patient.address = "1 New Rd"
+        self.assertTrue(service.update_patient(patient))
+        self.assertEqual([p.address for p in service.get_all_patients()], ["1 New Rd"])
+
+        self.assertTrue(service.delete_patient(1))
+        self.assertIsNone(service.get_patient_by_id(1))
+
+    def test_bulk_insert_ids(self):
+        """Test that add_patients reports the ids the rows were stored under"""
+        service = PatientService()
+        service.add_patient(Patient(name="First", contact="555-0100"))
+        service.delete_patient(1)
+        names = [f"Patient {n}" for n in range(5)]
+        ids, errors = service.add_patients([Patient(name=n, contact="555-0100") for n in names], chunk_size=2)
+        self.assertEqual(errors, [])
+        self.assertEqual([service.get_patient_by_id(patient_id).name for patient_id in ids], names)
+
+    def test_billing_service_dictionary_rows(self):
+        """Test that joined billing rows come back as dictionaries"""
+        patient = PatientService().add_patient(Patient(name="Jane Smith", contact="987-654-3210"))
+        billing = BillingService()
+        bill_id = billing.create_bill(patient.patient_id, 150.0, "Consultation fee", "2025-01-15")
+        bills = billing.get_unpaid_bills()
+        self.assertEqual(bills[0]['bill_id'], bill_id)
+        self.assertEqual(bills[0]['patient_name'], "Jane Smith")
+        self.assertTrue(billing.mark_as_paid(bill_id))
+        self.assertEqual(billing.get_unpaid_bills(), [])
+
+    def test_keyset_pagination(self):
+        """Test that pages follow each other without gaps or repeats"""
+        service = PatientService()
+        names = ["Carol", "alice", "Bob", "Alice", "Dave", "Bob", "Erin"]
+        service.add_patients([Patient(name=n, contact="555-0100") for n in names])
+
+        seen = []
+        after = None
+        while True:
+            page, after = service.get_patients_page(after, limit=3, order_by='name')
+            seen.extend((p.name, p.patient_id) for p in page)
+            if after is None:
+                break
+        self.assertEqual(seen, sorted(zip(names, range(1, 8))))
+
+        billing = BillingService()
+        for day in (3, 1, 2, 1):
+            billing.create_bill(1, 10.0, "Visit", f"2025-01-0{day}")
+        first, after = billing.get_unpaid_bills_page(limit=3)
+        second, after = billing.get_unpaid_bills_page(after, limit=3)
+        self.assertEqual([b['bill_id'] for b in first + second], [2, 4, 3, 1])
+        self.assertIsNone(after)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Unit tests for the db.transaction() unit of work
+"""
+
+import os
+import tempfile
+import unittest
+from app.utils import db
+from app.services.patient_service import PatientService
+from app.services.billing_service import BillingService
+from app.models.patient import Patient
+
+class TransactionTests:
+    """Scenarios run against each backend"""
+
+    def configure(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.saved_config = dict(db.DB_CONFIG)
+        self.configure()
+        db.query_stats().reset()
+        self.patients = PatientService()
+        self.billing = BillingService()
+        self.start_count = len(self.patients.get_all_patients())
+
+    def tearDown(self):
+        """Clean up after each test"""
+        db.configure(**self.saved_config)
+        db.query_stats().reset()
+
+    def register(self, name="John Doe"):
+        patient = self.patients.add_patient(Patient(name=name, contact="123-456-7890"), check_duplicates=False)
+        self.billing.create_bill(patient.patient_id, 150.0, "Registration", "2025-01-15")
+        return patient
+
+    def test_single_commit_for_workflow(self):
+        """Test that service commits inside a transaction become one commit"""
+        with db.transaction() as transaction:
+            patient = self.register()
+            patient.address = "1 New Rd"
+            self.patients.update_patient(patient)
+        self.assertEqual(transaction.deferred_commits, 3)
+        self.assertEqual(db.query_stats().snapshot()['commits']['count'], 1)
+        self.assertEqual(self.patients.get_patient_by_id(patient.patient_id).address, "1 New Rd")
+        self.assertEqual(len(self.billing.get_patient_bills(patient.patient_id)), 1)
+        self.assertEqual(db.pool_stats()['in_use'], 0)
+
+    def test_exception_rolls_back_everything(self):
+        """Test that an exception leaving the block undoes every step"""
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                patient = self.register()
+                raise RuntimeError("printer jammed")
+        self.assertIsNone(self.patients.get_patient_by_id(patient.patient_id))
+        self.assertEqual(self.billing.get_patient_bills(patient.patient_id), [])
+        self.assertEqual(db.query_stats().snapshot()['commits']['count'], 0)
+        self.assertEqual(db.pool_stats()['in_use'], 0)
+
+    def test_failed_service_call_only_undoes_itself(self):
+        """Test that a service's own rollback inside a transaction is local"""
+        with db.transaction():
+            patient = self.register()
+            # A service step that writes, fails and rolls back its own work
+            connection = self.patients.connection
+            cursor = connection.cursor()
+            try:
+                cursor.execute("INSERT INTO patients (name, contact) VALUES (%s, %s)", ("Temp", "1"))
+                with self.assertRaises(Exception):
+                    cursor.execute("INSERT INTO patients (patient_id, name, contact) VALUES (%s, %s, %s)",
+                                   (patient.patient_id, "Duplicate", "2"))
+                connection.rollback()
+            finally:
+                cursor.close()
+            self.patients.add_patient(Patient(name="Jane Smith", contact="987-654-3210"), check_duplicates=False)
+        names = [p.name for p in self.patients.get_all_patients()]
+        self.assertEqual(len(names), self.start_count + 2)
+        self.assertIn("Jane Smith", names)
+        self.assertNotIn("Temp", names)
+        self.assertEqual(len(self.billing.get_patient_bills(patient.patient_id)), 1)
+
+    def test_nested_scope_rolls_back_alone(self):
+        """Test that a nested transaction is a savepoint"""
+        with db.transaction():
+            kept = self.register("Kept")
+            with self.assertRaises(RuntimeError):
+                with db.transaction():
+                    dropped = self.register("Dropped")
+                    raise RuntimeError("cancelled")
+        self.assertIsNotNone(self.patients.get_patient_by_id(kept.patient_id))
+        self.assertIsNone(self.patients.get_patient_by_id(dropped.patient_id))
+        self.assertEqual(db.query_stats().snapshot()['commits']['count'], 1)
+
+    def test_after_commit_callbacks(self):
+        """Test that callbacks run after the commit and are dropped on rollback"""
+        calls = []
+        db.after_commit(lambda: calls.append('now'))
+        with db.transaction():
+            db.after_commit(lambda: calls.append('committed'))
+            with self.assertRaises(RuntimeError):
+                with db.transaction():
+                    db.after_commit(lambda: calls.append('nested'))
+                    raise RuntimeError
+            self.assertEqual(calls, ['now'])
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                db.after_commit(lambda: calls.append('rolled back'))
+                raise RuntimeError
+        self.assertEqual(calls, ['now', 'committed'])
+
+
+class TestMockTransaction(TransactionTests, unittest.TestCase):
+
+    def configure(self):
+        db.configure(backend='mock', instrument=True)
+
+
+class TestSQLiteTransaction(TransactionTests, unittest.TestCase):
+
+    def configure(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        db.configure(backend='sqlite', instrument=True,
+                     sqlite_path=os.path.join(self.tmpdir.name, 'test.db'))
+
+if __name__ == '__main__':
+    unittest.main()
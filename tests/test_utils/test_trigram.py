@@ -0,0 +1,76 @@
+"""
+Unit tests for the trigram search index
+"""
+
+import unittest
+from app.utils.trigram import TrigramIndex, tokens, query_grams
+
+class TestTrigramIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.index = TrigramIndex()
+        self.index.load([
+            (1, ("John Smith", "555-123-4567", "12 Main St")),
+            (2, ("Jane Smythe", "555-987-6543", "4 Oak Avenue")),
+            (3, ("Johanna Jones", "(555) 222 3333", "99 Main Street")),
+        ])
+
+    def ids(self, query, **options):
+        return [doc_id for doc_id, _ in self.index.search(query, **options)]
+
+    def test_tokens(self):
+        """Test tokenization of words and phone numbers"""
+        self.assertEqual(tokens("John Smith", None, "555-123-4567"),
+                         ['john', 'smith', '555', '123', '4567', '5551234567'])
+        self.assertEqual(query_grams("12-3"), {'  1', ' 12', '123'})
+
+    def test_ranked_matches(self):
+        """Test partial names, typos, phone fragments and addresses"""
+        self.assertEqual(self.ids("smith"), [1])
+        self.assertEqual(self.ids("smith", threshold=0.4), [1, 2])
+        self.assertEqual(self.ids("jo")[:2], [1, 3])
+        self.assertEqual(self.ids("smyth")[0], 2)
+        self.assertEqual(self.ids("123-4567"), [1])
+        self.assertEqual(self.ids("2223333"), [3])
+        self.assertEqual(self.ids("main street")[0], 3)
+        self.assertEqual(self.ids("smith", limit=1, threshold=0.4), [1])
+        self.assertEqual(self.ids("zzz"), [])
+        self.assertEqual(self.ids(""), [])
+
+    def test_updates(self):
+        """Test put, remove and compaction"""
+        self.index.put(1, "Jon Smith", "555-000-1111", "7 Elm Rd")
+        self.assertEqual(self.ids("123-4567"), [])
+        self.assertEqual(self.ids("elm"), [1])
+        self.index.put(4, "Smith Carter", None, None)
+        self.assertIn(4, self.ids("smith"))
+        self.assertTrue(self.index.remove(2))
+        self.assertFalse(self.index.remove(2))
+        self.assertTrue(self.index.remove(3))
+        # Dead slots were compacted out of the postings
+        self.assertEqual(self.index._dead, 0)
+        self.assertEqual(sorted(self.ids("smith")), [1, 4])
+        self.assertEqual(len(self.index), 2)
+
+    def test_repeated_updates_reuse_slots(self):
+        """Test that compaction reclaims the slots of replaced versions"""
+        for n in range(1000):
+            self.index.put(1, f"Jon Smith {n}", "555-000-1111", "7 Elm Rd")
+            self.assertLessEqual(len(self.index._doc_ids), 2 * len(self.index) + 1)
+        self.assertEqual(self.ids("999")[0], 1)
+        self.assertEqual(self.ids("oak"), [2])
+        self.assertEqual(self.ids("johanna"), [3])
+        self.assertEqual(max(max(posting) for posting in self.index._postings.values()),
+                         len(self.index._doc_ids) - 1)
+
+    def test_unloaded_index_ignores_changes(self):
+        """Test that changes before the first load only bump the generation"""
+        index = TrigramIndex()
+        index.put(1, "John")
+        self.assertEqual(len(index), 0)
+        index.ensure_loaded(lambda: [(1, ("John",))])
+        self.assertEqual([doc_id for doc_id, _ in index.search("john")], [1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Unit tests for the batch validation engine
+"""
+
+import unittest
+from app.utils import validation
+from app.utils.validation import RowError
+from app.models.patient import Patient
+from app.models.doctor import Doctor
+from app.models.appointment import Appointment
+
+class TestValidation(unittest.TestCase):
+
+    def test_matches_model_validate(self):
+        """Test that the first error per row is what Model.validate returns"""
+        cases = [
+            (validation.PATIENT, [
+                Patient(name="John Doe", contact="123"), Patient(name="  ", contact=""),
+                Patient(name="Jane", contact=" \t"), Patient(),
+            ]),
+            (validation.DOCTOR, [
+                Doctor(name="Dr. A", specialization="ENT", email="a@x.com"),
+                Doctor(name="Dr. B", specialization=" ", email=None), Doctor(name="Dr. C", specialization="ENT"),
+            ]),
+            (validation.APPOINTMENT, [
+                Appointment(appointment_date="2025-01-20 09:00"), Appointment(appointment_date=" ", status="Gone"),
+                Appointment(status="Completed"),
+            ]),
+        ]
+        for validator, records in cases:
+            first = validation.first_errors(validator.validate_records(records))
+            for row, record in enumerate(records):
+                valid, message = record.validate()
+                self.assertEqual(first.get(row, "Valid"), message)
+                self.assertEqual(validator.validate_one(record), (valid, message))
+
+    def test_structured_errors(self):
+        """Test that every failing field is reported per row"""
+        errors = validation.DOCTOR_IMPORT.validate_records([
+            {'name': "Dr. A", 'specialization': "ENT", 'email': "a@x.com"},
+            {'name': "", 'specialization': "", 'email': "not-an-email"},
+        ])
+        self.assertEqual(errors, [
+            RowError(1, 'name', "Name is required"),
+            RowError(1, 'specialization', "Specialization is required"),
+            RowError(1, 'email', "Invalid email format"),
+        ])
+
+    def test_columns(self):
+        """Test validating column lists directly"""
+        errors = validation.PATIENT_IMPORT.validate_columns({
+            'name': ["A", "B", None],
+            'contact': ["123-456-7890", "12", "555-000-1111"],
+        })
+        self.assertEqual([(e.row, e.field) for e in errors], [(1, 'contact'), (2, 'name')])
+
+if __name__ == '__main__':
+    unittest.main()
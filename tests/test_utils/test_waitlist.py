@@ -0,0 +1,109 @@
+"""
+Unit tests for the appointment waitlist
+"""
+
+import unittest
+from app.utils.waitlist import Waitlist
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestWaitlist(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test environment before each test"""
+        self.clock = FakeClock()
+        self.waitlist = Waitlist(clock=self.clock)
+
+    def add(self, patient_id, **options):
+        self.clock.now += 1
+        return self.waitlist.add(patient_id, **options)
+
+    def test_order(self):
+        """Test that urgency goes first, then the longest wait"""
+        self.add(1, doctor_id=7)
+        self.add(2, doctor_id=7, urgency=2)
+        self.add(3, doctor_id=7)
+        self.add(4, specialization='Cardiology')
+        self.assertEqual([e.patient_id for e in self.waitlist.entries(doctor_id=7)], [2, 1, 3])
+        self.assertEqual([e.patient_id for e in self.waitlist.entries(specialization='Cardiology')], [4])
+        with self.assertRaises(ValueError):
+            self.waitlist.add(5)
+
+        # The doctor's own list and the specialization's list compete
+        offers = [self.waitlist.offer(n, 7, 'Cardiology') for n in range(4)]
+        self.assertEqual([o.entry.patient_id for o in offers], [2, 1, 3, 4])
+        self.assertIsNone(self.waitlist.offer(4, 7, 'Cardiology'))
+        self.assertEqual(len(self.waitlist), 0)
+
+    def test_remove_is_lazy(self):
+        """Test that removed entries are skipped when they reach the top"""
+        first = self.add(1, doctor_id=7)
+        self.add(2, doctor_id=7)
+        self.assertTrue(self.waitlist.remove(first.entry_id))
+        self.assertFalse(self.waitlist.remove(first.entry_id))
+        self.assertEqual(self.waitlist.offer('slot', 7).entry.patient_id, 2)
+        self.assertIsNone(self.waitlist.offer('slot', 8, 'Neurology'))
+
+    def test_offers_and_stats(self):
+        """Test accept, decline and withdraw, and the fill counters"""
+        self.add(1, doctor_id=7, urgency=1)
+        self.add(2, specialization='Cardiology')
+        offer = self.waitlist.offer('monday', 7, 'Cardiology')
+        self.assertEqual(self.waitlist.offers(patient_id=1), [offer])
+
+        # Declining passes the slot on; the patient gets their place back once it is filled
+        self.clock.now += 60
+        following = self.waitlist.decline(offer.offer_id)
+        self.assertEqual((following.entry.patient_id, following.slot, following.doctor_id), (2, 'monday', 7))
+        self.assertIsNone(self.waitlist.decline(offer.offer_id))
+        self.assertEqual(self.waitlist.entries(doctor_id=7), [])
+        self.clock.now += 60
+        self.assertEqual(self.waitlist.accept(following.offer_id), following)
+        self.assertIsNone(self.waitlist.accept(following.offer_id))
+        self.assertEqual([e.patient_id for e in self.waitlist.entries(doctor_id=7)], [1])
+
+        # Withdrawn offers put the patient back
+        withdrawn = self.waitlist.offer('tuesday', 7)
+        self.assertTrue(self.waitlist.withdraw(withdrawn.offer_id))
+        self.assertFalse(self.waitlist.withdraw(withdrawn.offer_id))
+        self.assertEqual(len(self.waitlist), 1)
+
+        stats = self.waitlist.stats()
+        self.assertEqual(stats['slots_freed'], 2)
+        self.assertEqual((stats['offers'], stats['declined'], stats['filled'], stats['unfilled']), (3, 1, 1, 1))
+        self.assertEqual(stats['fill_rate'], 0.5)
+        self.assertEqual(stats['mean_backfill_seconds'], 120.0)
+
+        self.waitlist.clear()
+        self.assertEqual(self.waitlist.stats()['waiting'], 0)
+        self.waitlist.reset_stats()
+
+        # A slot everyone declines goes round once, then counts as unfilled
+        self.add(1, doctor_id=7)
+        self.add(2, doctor_id=7)
+        first = self.waitlist.offer('wednesday', 7)
+        second = self.waitlist.decline(first.offer_id)
+        self.assertEqual(second.entry.patient_id, 2)
+        self.assertIsNone(self.waitlist.decline(second.offer_id))
+        self.assertEqual([e.patient_id for e in self.waitlist.entries(doctor_id=7)], [1, 2])
+        stats = self.waitlist.stats()
+        self.assertEqual((stats['slots_freed'], stats['offers'], stats['declined'], stats['unfilled']), (1, 2, 2, 1))
+
+        # Entries holding off a slot can still be removed
+        first = self.waitlist.offer('thursday', 7)
+        self.assertEqual(self.waitlist.decline(first.offer_id).entry.patient_id, 2)
+        self.assertTrue(self.waitlist.remove(first.entry.entry_id))
+        self.assertFalse(self.waitlist.remove(first.entry.entry_id))
+
+        self.waitlist.clear()
+        self.assertEqual(self.waitlist.stats()['waiting'], 0)
+        self.waitlist.reset_stats()
+        self.assertEqual(self.waitlist.stats()['slots_freed'], 0)
+
+if __name__ == '__main__':
+    unittest.main()